@@ -10,14 +10,14 @@ Amazon buybox'ta → verdict DEĞİŞTİRME, sadece confidence kırp + risk flag
 from __future__ import annotations
 
 import asyncio
-import base64
 import json
 import logging
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
 import httpx
 
 from app.core.config import get_settings
+from app.core.keyed_lock import KeyedLock
 
 logger = logging.getLogger(__name__)
 
@@ -70,22 +70,40 @@ def _condition_score(title: str, description: str, declared_condition: str) -> D
 
 # ─── Edition check (Google Books + Open Library yedek) ────────────────────────
 
-async def _check_edition(isbn: str, client: httpx.AsyncClient) -> Dict[str, Any]:
+async def _check_edition(isbn: str, client: httpx.AsyncClient, refresh: bool = False,
+                         partial_ok: bool = False) -> Dict[str, Any]:
     """
-    ISBN için kitap metadata + yeni baskı tespiti.
+    ISBN için kitap metadata + yeni baskı tespiti (book_meta_store cache'li).
 
-    Akış:
-      1. Google Books  → title, authors, publisher, categories, description, pageCount
-      2. Open Library Search → subjects, work_key (editions endpoint için)
-      3. Work & Edition API  → tüm baskıların yıllarını karşılaştır (en güvenilir yöntem)
-         Fallback: Google Books secondary search (eski yöntem)
-      4. OL Books API (son çare, jscmd=data)
+    Edition metadata neredeyse hiç değişmez → sonuç book_meta_store'da 30 gün
+    saklanır; scan'ler ve analyze_isbn cache'ten okur. refresh=True → yeniden çek.
+    partial_ok=True → resolve_editions_bulk'tan gelen (has_newer_edition'sız) kayıt da kabul.
     """
+    from app import book_meta_store
+
     isbn13 = _to_isbn13(isbn) or isbn
-    headers = {"User-Agent": OL_USER_AGENT}
+    if not refresh:
+        cached = book_meta_store.get(isbn13, partial_ok=partial_ok)
+        if cached is not None:
+            return cached
+    result = await _fetch_edition(isbn, client)
+    book_meta_store.put(isbn13, result)
+    return result
+
+
+def _year_from_text(text: str) -> Optional[int]:
+    for chunk in (text or "").split():
+        try:
+            y = int(chunk)
+            if 1900 < y < 2030:
+                return y
+        except (ValueError, TypeError):
+            pass
+    return None
 
-    # ── 1. Google Books — birincil metadata kaynağı ───────────────────────────
-    gb_meta: Dict[str, Any] = {}
+
+async def _gb_volume(client: httpx.AsyncClient, isbn13: str) -> Dict[str, Any]:
+    """Google Books — birincil metadata kaynağı."""
     try:
         r = await client.get(
             GOOGLE_BOOKS_API,
@@ -96,32 +114,39 @@ async def _check_edition(isbn: str, client: httpx.AsyncClient) -> Dict[str, Any]
         if r.status_code == 200:
             items = r.json().get("items") or []
             if items:
-                vi = items[0].get("volumeInfo", {})
-                pub_date = vi.get("publishedDate", "")
-                year = int(pub_date[:4]) if pub_date and len(pub_date) >= 4 else None
-                gb_meta = {
-                    "edition_year": year,
-                    "google_title":  vi.get("title", ""),
-                    "authors":       vi.get("authors") or [],
-                    "publisher":     vi.get("publisher", ""),
-                    "categories":    vi.get("categories") or [],
-                    "description":   (vi.get("description") or "")[:300],
-                    "page_count":    vi.get("pageCount"),
-                    "avg_rating":    vi.get("averageRating"),
-                    "ratings_count": vi.get("ratingsCount"),
-                    "source":        "google_books",
-                }
+                return _gb_meta(items[0].get("volumeInfo", {}))
     except Exception as e:
         logger.debug("Google Books error: %s", e)
+    return {}
+
+
+def _gb_meta(vi: Dict[str, Any]) -> Dict[str, Any]:
+    pub_date = vi.get("publishedDate", "")
+    try:
+        year = int(pub_date[:4]) if pub_date and len(pub_date) >= 4 else None
+    except ValueError:
+        year = None
+    return {
+        "edition_year": year,
+        "google_title":  vi.get("title", ""),
+        "authors":       vi.get("authors") or [],
+        "publisher":     vi.get("publisher", ""),
+        "categories":    vi.get("categories") or [],
+        "description":   (vi.get("description") or "")[:300],
+        "page_count":    vi.get("pageCount"),
+        "avg_rating":    vi.get("averageRating"),
+        "ratings_count": vi.get("ratingsCount"),
+        "source":        "google_books",
+    }
+
 
-    # ── 2. Open Library Search — subjects + work_key ──────────────────────────
-    ol_meta: Dict[str, Any] = {}
-    work_key: Optional[str] = None
+async def _ol_search(client: httpx.AsyncClient, isbn13: str) -> Tuple[Dict[str, Any], Optional[str]]:
+    """Open Library Search — subjects + work_key."""
     try:
         r = await client.get(
             OPEN_LIBRARY_SEARCH,
             params={"isbn": isbn13, "fields": "key,title,author_name,publisher,subject,first_publish_year,number_of_pages_median"},
-            headers=headers, timeout=10,
+            headers={"User-Agent": OL_USER_AGENT}, timeout=10,
         )
         if r.status_code == 200:
             docs = r.json().get("docs") or []
@@ -134,7 +159,7 @@ async def _check_edition(isbn: str, client: httpx.AsyncClient) -> Dict[str, Any]
                 subjects   = [s for s in (doc.get("subject")      or []) if isinstance(s, str)][:6]
                 publishers = doc.get("publisher") or []
                 authors    = doc.get("author_name") or []
-                ol_meta = {
+                return {
                     "edition_year": year,
                     "google_title": doc.get("title", ""),
                     "authors":      authors,
@@ -143,86 +168,150 @@ async def _check_edition(isbn: str, client: httpx.AsyncClient) -> Dict[str, Any]
                     "description":  "",
                     "page_count":   doc.get("number_of_pages_median"),
                     "source":       "open_library",
-                }
+                }, work_key
     except Exception as e:
         logger.debug("Open Library Search error: %s", e)
+    return {}, None
 
-    # ── 3. Work & Edition API — has_newer_edition (en güvenilir yöntem) ───────
-    has_newer: Optional[bool] = None
-    current_year = gb_meta.get("edition_year") or ol_meta.get("edition_year")
 
-    if work_key and current_year:
-        try:
-            r = await client.get(
-                f"{OPEN_LIBRARY_WORKS}{work_key}/editions.json",
-                params={"limit": 100, "fields": "isbn_13,isbn_10,publish_date"},
-                headers=headers, timeout=12,
-            )
-            if r.status_code == 200:
-                entries = r.json().get("entries") or []
-                edition_years: List[int] = []
-                current_isbn_year: Optional[int] = None
-                for e in entries:
-                    isbns13 = e.get("isbn_13") or []
-                    isbns10 = e.get("isbn_10") or []
-                    pub_date = e.get("publish_date", "")
-                    yr = None
-                    for chunk in (pub_date or "").split():
-                        try:
-                            y = int(chunk)
-                            if 1900 < y < 2030:
-                                yr = y; break
-                        except (ValueError, TypeError):
-                            pass
-                    if yr:
-                        edition_years.append(yr)
-                        # Bu baskı bizim ISBN'imiz mi?
-                        all_isbns = isbns13 + isbns10
-                        if isbn13 in all_isbns or isbn in all_isbns:
-                            current_isbn_year = yr
-                if edition_years:
-                    newest_year = max(edition_years)
-                    check_year  = current_isbn_year or current_year
-                    has_newer   = newest_year > check_year
-                    logger.debug(
-                        "Work editions isbn=%s work=%s editions=%d newest=%d current=%d has_newer=%s",
-                        isbn13, work_key, len(edition_years), newest_year, check_year, has_newer,
-                    )
-        except Exception as e:
-            logger.debug("Work & Edition API error isbn=%s: %s", isbn13, e)
+async def _ol_books_data(client: httpx.AsyncClient, isbn13: str) -> Dict[str, Any]:
+    """
+    OL Books API (jscmd=data) ham kaydı — hem son çare metadata hem de
+    DDC/LC classification için tek istek.
+    """
+    try:
+        r = await client.get(
+            OPEN_LIBRARY_API,
+            params={"bibkeys": f"ISBN:{isbn13}", "format": "json", "jscmd": "data"},
+            headers={"User-Agent": OL_USER_AGENT}, timeout=10,
+        )
+        if r.status_code == 200:
+            return r.json().get(f"ISBN:{isbn13}") or {}
+    except Exception as e:
+        logger.debug("Open Library Books API error: %s", e)
+    return {}
+
+
+def _ol_books_meta(book: Dict[str, Any]) -> Dict[str, Any]:
+    if not book:
+        return {}
+    publishers = [p.get("name","") for p in (book.get("publishers") or []) if isinstance(p, dict)]
+    subjects   = [s.get("name","") for s in (book.get("subjects")   or []) if isinstance(s, dict)]
+    authors    = [a.get("name","") for a in (book.get("authors")    or []) if isinstance(a, dict)]
+    ol_desc    = book.get("description", "")
+    if isinstance(ol_desc, dict): ol_desc = ol_desc.get("value", "")
+    return {
+        "edition_year": _year_from_text(book.get("publish_date", "")),
+        "google_title": book.get("title", ""),
+        "authors":      authors,
+        "publisher":    publishers[0] if publishers else "",
+        "categories":   subjects[:5],
+        "description":  (ol_desc or "")[:300],
+        "page_count":   book.get("number_of_pages"),
+        "source":       "open_library_books",
+    }
+
+
+async def _work_has_newer(client: httpx.AsyncClient, work_key: str, isbn: str, isbn13: str,
+                          current_year: int) -> Optional[bool]:
+    """Work & Edition API — tüm baskıların yıllarını karşılaştır (en güvenilir yöntem)."""
+    try:
+        r = await client.get(
+            f"{OPEN_LIBRARY_WORKS}{work_key}/editions.json",
+            params={"limit": 100, "fields": "isbn_13,isbn_10,publish_date"},
+            headers={"User-Agent": OL_USER_AGENT}, timeout=12,
+        )
+        if r.status_code == 200:
+            entries = r.json().get("entries") or []
+            edition_years: List[int] = []
+            current_isbn_year: Optional[int] = None
+            for e in entries:
+                yr = _year_from_text(e.get("publish_date", ""))
+                if yr:
+                    edition_years.append(yr)
+                    # Bu baskı bizim ISBN'imiz mi?
+                    all_isbns = (e.get("isbn_13") or []) + (e.get("isbn_10") or [])
+                    if isbn13 in all_isbns or isbn in all_isbns:
+                        current_isbn_year = yr
+            if edition_years:
+                newest_year = max(edition_years)
+                check_year  = current_isbn_year or current_year
+                logger.debug(
+                    "Work editions isbn=%s work=%s editions=%d newest=%d current=%d has_newer=%s",
+                    isbn13, work_key, len(edition_years), newest_year, check_year, newest_year > check_year,
+                )
+                return newest_year > check_year
+    except Exception as e:
+        logger.debug("Work & Edition API error isbn=%s: %s", isbn13, e)
+    return None
+
+
+async def _gb_has_newer(client: httpx.AsyncClient, gb_meta: Dict[str, Any], isbn: str, isbn13: str,
+                        current_year: int) -> Optional[bool]:
+    """Fallback: Google Books secondary search (aynı başlık + yazar, en yeni)."""
+    try:
+        title   = gb_meta["google_title"]
+        authors = gb_meta.get("authors") or []
+        query   = f'intitle:"{title[:25]}"'
+        if authors:
+            query += f' inauthor:"{authors[0].split()[-1]}"'
+        r2 = await client.get(
+            GOOGLE_BOOKS_API,
+            params={"q": query, "maxResults": 8, "orderBy": "newest",
+                    "fields": "items(volumeInfo(publishedDate,industryIdentifiers))"},
+            timeout=10,
+        )
+        if r2.status_code == 200:
+            for item in (r2.json().get("items") or []):
+                pd     = (item.get("volumeInfo") or {}).get("publishedDate", "")
+                idents = (item.get("volumeInfo") or {}).get("industryIdentifiers") or []
+                item_isbns = [x.get("identifier", "") for x in idents]
+                if isbn13 in item_isbns or isbn in item_isbns:
+                    continue  # aynı baskı
+                if pd and len(pd) >= 4:
+                    try:
+                        if int(pd[:4]) > current_year:
+                            return True
+                    except (ValueError, TypeError):
+                        pass
+    except Exception as e:
+        logger.debug("Google Books newer-edition fallback error: %s", e)
+    return None
+
+
+async def _xisbn_has_newer(client: httpx.AsyncClient, isbn: str, isbn13: str,
+                           current_year: int) -> Optional[bool]:
+    """OCLC xISBN — related editions (1000 req/gün ücretsiz)."""
+    try:
+        _xisbn_r = await client.get(
+            "http://xisbn.worldcat.org/webservices/xid/isbn/" + isbn13,
+            params={"method": "getEditions", "format": "json", "fl": "year,isbn"},
+            headers={"User-Agent": OL_USER_AGENT},
+            timeout=8,
+        )
+        if _xisbn_r.status_code == 200:
+            _xdata = _xisbn_r.json()
+            if _xdata.get("stat") == "ok":
+                _other_years = []
+                for _rel in _xdata.get("list") or []:
+                    _rel_isbns = _rel.get("isbn") or []
+                    if isbn13 in _rel_isbns or isbn in _rel_isbns:
+                        continue  # bu bizim baskımız
+                    _yr = _rel.get("year")
+                    if _yr:
+                        try: _other_years.append(int(_yr))
+                        except (ValueError, TypeError): pass
+                if _other_years:
+                    logger.debug("xISBN isbn=%s other_years=%s has_newer=%s",
+                                 isbn13, _other_years[:5], max(_other_years) > current_year)
+                    return max(_other_years) > current_year
+    except Exception as _xi_err:
+        logger.debug("xISBN error isbn=%s: %s", isbn13, _xi_err)
+    return None
 
-    # Fallback: Google Books secondary search (has_newer tespit edilemezse)
-    if has_newer is None and gb_meta.get("google_title") and current_year:
-        try:
-            title   = gb_meta["google_title"]
-            authors = gb_meta.get("authors") or []
-            query   = f'intitle:"{title[:25]}"'
-            if authors:
-                query += f' inauthor:"{authors[0].split()[-1]}"'
-            r2 = await client.get(
-                GOOGLE_BOOKS_API,
-                params={"q": query, "maxResults": 8, "orderBy": "newest",
-                        "fields": "items(volumeInfo(publishedDate,industryIdentifiers))"},
-                timeout=10,
-            )
-            if r2.status_code == 200:
-                for item in (r2.json().get("items") or []):
-                    pd     = (item.get("volumeInfo") or {}).get("publishedDate", "")
-                    idents = (item.get("volumeInfo") or {}).get("industryIdentifiers") or []
-                    item_isbns = [x.get("identifier", "") for x in idents]
-                    if isbn13 in item_isbns or isbn in item_isbns:
-                        continue  # aynı baskı
-                    if pd and len(pd) >= 4:
-                        try:
-                            if int(pd[:4]) > current_year:
-                                has_newer = True
-                                break
-                        except (ValueError, TypeError):
-                            pass
-        except Exception as e:
-            logger.debug("Google Books newer-edition fallback error: %s", e)
 
-    # ── Sonuçları birleştir: Google Books metadata öncelikli, OL subjects ekle ─
+def _merge_meta(gb_meta: Dict[str, Any], ol_meta: Dict[str, Any]) -> Dict[str, Any]:
+    """Google Books metadata öncelikli, OL subjects eklenir."""
     base = gb_meta if gb_meta else ol_meta
     if gb_meta and ol_meta:
         # OL'un subjects'i genellikle daha zengin — merge
@@ -233,120 +322,34 @@ async def _check_edition(isbn: str, client: httpx.AsyncClient) -> Dict[str, Any]
         # OL page_count bazen daha doğru (median of all editions)
         if not gb_meta.get("page_count") and ol_meta.get("page_count"):
             base["page_count"] = ol_meta["page_count"]
+    return dict(base)
 
-    if not base:
-        # Son çare: OL Books API (jscmd=data)
-        try:
-            r = await client.get(
-                OPEN_LIBRARY_API,
-                params={"bibkeys": f"ISBN:{isbn13}", "format": "json", "jscmd": "data"},
-                headers=headers, timeout=10,
-            )
-            if r.status_code == 200:
-                data = r.json()
-                book = data.get(f"ISBN:{isbn13}") or {}
-                if book:
-                    pub_date = book.get("publish_date", "")
-                    year = None
-                    for chunk in pub_date.split():
-                        try:
-                            y = int(chunk)
-                            if 1900 < y < 2030:
-                                year = y; break
-                        except (ValueError, TypeError): pass
-                    publishers = [p.get("name","") for p in (book.get("publishers") or []) if isinstance(p, dict)]
-                    subjects   = [s.get("name","") for s in (book.get("subjects")   or []) if isinstance(s, dict)]
-                    authors    = [a.get("name","") for a in (book.get("authors")    or []) if isinstance(a, dict)]
-                    ol_desc    = book.get("description", "")
-                    if isinstance(ol_desc, dict): ol_desc = ol_desc.get("value", "")
-                    base = {
-                        "edition_year": year,
-                        "google_title": book.get("title", ""),
-                        "authors":      authors,
-                        "publisher":    publishers[0] if publishers else "",
-                        "categories":   subjects[:5],
-                        "description":  (ol_desc or "")[:300],
-                        "page_count":   book.get("number_of_pages"),
-                        "source":       "open_library_books",
-                    }
-        except Exception as e:
-            logger.debug("Open Library Books API error: %s", e)
-
-    # ── 4b. OCLC xISBN — related editions (has_newer_edition için ek doğrulama) ───
-    # 1000 req/gün ücretsiz, ISBN → related edition ISBN listesi
-    # has_newer zaten None ise xISBN ile doldur
-    if has_newer is None:
-        try:
-            _xisbn_r = await client.get(
-                "http://xisbn.worldcat.org/webservices/xid/isbn/" + isbn13,
-                params={"method": "getEditions", "format": "json", "fl": "year,isbn"},
-                headers={"User-Agent": OL_USER_AGENT},
-                timeout=8,
-            )
-            if _xisbn_r.status_code == 200:
-                _xdata = _xisbn_r.json()
-                if _xdata.get("stat") == "ok":
-                    _related = _xdata.get("list") or []
-                    _other_years = []
-                    for _rel in _related:
-                        _rel_isbns = _rel.get("isbn") or []
-                        if isbn13 in _rel_isbns or isbn in _rel_isbns:
-                            continue  # bu bizim baskımız
-                        _yr = _rel.get("year")
-                        if _yr:
-                            try: _other_years.append(int(_yr))
-                            except (ValueError, TypeError): pass
-                    if _other_years and current_year:
-                        has_newer = max(_other_years) > current_year
-                        logger.debug("xISBN isbn=%s other_years=%s has_newer=%s",
-                                     isbn13, _other_years[:5], has_newer)
-        except Exception as _xi_err:
-            logger.debug("xISBN error isbn=%s: %s", isbn13, _xi_err)
-
-    result = dict(base)
-    result["has_newer_edition"] = has_newer
-    result["work_key"]          = work_key  # downstream kullanım için
 
-    # ── 5. Open Library jscmd=data — DDC + LC classification ─────────────────
-    # Open Library /api/books?jscmd=data endpoint'i classifications objesi döndürür:
-    # {"classifications": {"dewey_decimal_class": ["512.5"], "lc_classifications": ["QA76"]}}
-    # HathiTrust'tan daha güvenilir (canlı test edilmiş format).
+def _apply_classification(result: Dict[str, Any], ol_book: Dict[str, Any]) -> None:
+    """
+    DDC + LC classification (OL jscmd=data kaydından) + textbook skoru — result yerinde güncellenir.
+    {"classifications": {"dewey_decimal_class": ["512.5"], "lc_classifications": ["QA76"]}}
+    HathiTrust'tan daha güvenilir (canlı test edilmiş format).
+    """
     result["dewey"]    = None
     result["lc_class"] = None
     result["is_textbook_likely"] = False  # default
 
-    try:
-        _ol_data_r = await client.get(
-            OPEN_LIBRARY_API,
-            params={"bibkeys": f"ISBN:{isbn13}", "format": "json", "jscmd": "data"},
-            headers={"User-Agent": OL_USER_AGENT},
-            timeout=8,
-        )
-        if _ol_data_r.status_code == 200:
-            _ol_data = _ol_data_r.json()
-            _book_data = _ol_data.get(f"ISBN:{isbn13}") or {}
-            _classifications = _book_data.get("classifications") or {}
-
-            # Dewey Decimal
-            _dewey_list = _classifications.get("dewey_decimal_class") or []
-            if _dewey_list:
-                result["dewey"] = str(_dewey_list[0]).strip()
-
-            # LC Classification
-            _lc_list = _classifications.get("lc_classifications") or []
-            if _lc_list:
-                result["lc_class"] = str(_lc_list[0]).strip()
-
-            # Subjects supplement (jscmd=data has richer subjects than search)
-            if not result.get("categories"):
-                _subjs = [s.get("name","") for s in (_book_data.get("subjects") or [])
-                          if isinstance(s, dict) and s.get("name")]
-                if _subjs:
-                    result["categories"] = _subjs[:6]
-    except Exception as _ol_class_err:
-        logger.debug("OL classification error isbn=%s: %s", isbn13, _ol_class_err)
-
-    # 5c. Derive textbook classification from DDC / LC / subjects
+    _classifications = ol_book.get("classifications") or {}
+    _dewey_list = _classifications.get("dewey_decimal_class") or []
+    if _dewey_list:
+        result["dewey"] = str(_dewey_list[0]).strip()
+    _lc_list = _classifications.get("lc_classifications") or []
+    if _lc_list:
+        result["lc_class"] = str(_lc_list[0]).strip()
+    # Subjects supplement (jscmd=data has richer subjects than search)
+    if not result.get("categories"):
+        _subjs = [s.get("name","") for s in (ol_book.get("subjects") or [])
+                  if isinstance(s, dict) and s.get("name")]
+        if _subjs:
+            result["categories"] = _subjs[:6]
+
+    # Derive textbook classification from DDC / LC / subjects
     try:
         from app.analytics import dewey_to_category, lc_class_to_category, subjects_to_textbook_score
         _tb_score = 0.0
@@ -369,18 +372,166 @@ async def _check_edition(isbn: str, client: httpx.AsyncClient) -> Dict[str, Any]
     except Exception as _tb_err:
         logger.debug("Textbook classification error: %s", _tb_err)
 
+
+async def _fetch_edition(isbn: str, client: httpx.AsyncClient) -> Dict[str, Any]:
+    """
+    Akış:
+      1. Paralel: Google Books (title, authors, publisher, categories, description, pageCount)
+                  + Open Library Search (subjects, work_key)
+                  + OL Books API jscmd=data (son çare metadata + DDC/LC classification)
+      2. has_newer_edition: Work & Edition API → Google Books secondary search → xISBN
+         (sıralı fallback; her adım sadece öncekiler sonuç veremezse çalışır)
+    """
+    isbn13 = _to_isbn13(isbn) or isbn
+
+    gb_meta, (ol_meta, work_key), ol_book = await asyncio.gather(
+        _gb_volume(client, isbn13),
+        _ol_search(client, isbn13),
+        _ol_books_data(client, isbn13),
+    )
+
+    # ── has_newer_edition ─────────────────────────────────────────────────────
+    has_newer: Optional[bool] = None
+    current_year = gb_meta.get("edition_year") or ol_meta.get("edition_year")
+
+    if work_key and current_year:
+        has_newer = await _work_has_newer(client, work_key, isbn, isbn13, current_year)
+    if has_newer is None and gb_meta.get("google_title") and current_year:
+        has_newer = await _gb_has_newer(client, gb_meta, isbn, isbn13, current_year)
+
+    base = _merge_meta(gb_meta, ol_meta)
+
+    if not base:
+        # Son çare: OL Books API (jscmd=data)
+        base = _ol_books_meta(ol_book)
+        current_year = current_year or base.get("edition_year")
+
+    if has_newer is None and current_year:
+        has_newer = await _xisbn_has_newer(client, isbn, isbn13, current_year)
+
+    result = dict(base)
+    result["has_newer_edition"] = has_newer
+    result["work_key"]          = work_key  # downstream kullanım için
+
+    _apply_classification(result, ol_book)
     return result
 
 
+# ─── Toplu metadata çözümleme (scan listeleri için) ────────────────────────────
+
+OL_BULK_SIZE = 50   # /api/books?bibkeys=ISBN:a,ISBN:b,...
+GB_BULK_SIZE = 20   # q=isbn:a OR isbn:b ... (maxResults üst sınırı 40)
+
+
+async def _ol_books_bulk(client: httpx.AsyncClient, isbns: List[str]) -> Dict[str, Dict[str, Any]]:
+    try:
+        r = await client.get(
+            OPEN_LIBRARY_API,
+            params={"bibkeys": ",".join(f"ISBN:{i}" for i in isbns), "format": "json", "jscmd": "data"},
+            headers={"User-Agent": OL_USER_AGENT}, timeout=20,
+        )
+        if r.status_code == 200:
+            data = r.json()
+            return {i: data[f"ISBN:{i}"] for i in isbns if data.get(f"ISBN:{i}")}
+    except Exception as e:
+        logger.debug("Open Library bulk error n=%d: %s", len(isbns), e)
+    return {}
+
+
+async def _gb_bulk(client: httpx.AsyncClient, isbns: List[str]) -> Dict[str, Dict[str, Any]]:
+    try:
+        r = await client.get(
+            GOOGLE_BOOKS_API,
+            params={"q": " OR ".join(f"isbn:{i}" for i in isbns), "maxResults": 40,
+                    "fields": "items(volumeInfo(title,authors,publishedDate,publisher,categories,description,pageCount,averageRating,ratingsCount,industryIdentifiers))"},
+            timeout=20,
+        )
+        if r.status_code != 200:
+            return {}
+        wanted = set(isbns)
+        out: Dict[str, Dict[str, Any]] = {}
+        for item in r.json().get("items") or []:
+            vi = item.get("volumeInfo") or {}
+            for ident in vi.get("industryIdentifiers") or []:
+                i13 = _to_isbn13(ident.get("identifier", "")) or ""
+                if i13 in wanted and i13 not in out:
+                    out[i13] = _gb_meta(vi)
+        return out
+    except Exception as e:
+        logger.debug("Google Books bulk error n=%d: %s", len(isbns), e)
+    return {}
+
+
+async def resolve_editions_bulk(isbns: List[str], client: Optional[httpx.AsyncClient] = None,
+                                concurrency: int = 4) -> Dict[str, int]:
+    """
+    Scan listesindeki ISBN'lerin metadata'sını toplu isteklerle çöz ve
+    book_meta_store'a partial kayıt olarak yaz:
+      OL Books jscmd=data  → OL_BULK_SIZE ISBN/istek (subjects, DDC/LC, sayfa, yıl)
+      Google Books OR-query → GB_BULK_SIZE ISBN/istek (title, yazar, yayıncı, kategori)
+    ISBN başına 4+ istek yerine ~0.07 istek. has_newer_edition work/edition API gerektirdiği
+    için None kalır — analyze_isbn / meta_backfill kaydı tam hale getirir.
+    Taze (tam veya partial) kaydı olanlar atlanır; hiçbir kaynakta bulunmayanlar yazılmaz
+    (tekil _check_edition yolu dener).
+    """
+    from app import book_meta_store
+
+    wanted = book_meta_store.stale(
+        [i13 for i13 in (_to_isbn13(i) for i in isbns) if i13], partial_ok=True,
+    )
+    stats = {"requested": len(wanted), "resolved": 0, "requests": 0}
+    if not wanted:
+        return stats
+
+    own_client = client is None
+    client = client or httpx.AsyncClient(timeout=20)
+    sem = asyncio.Semaphore(max(1, concurrency))
+
+    async def _limited(coro):
+        async with sem:
+            stats["requests"] += 1
+            return await coro
+
+    try:
+        ol_parts, gb_parts = await asyncio.gather(
+            asyncio.gather(*[_limited(_ol_books_bulk(client, wanted[i:i + OL_BULK_SIZE]))
+                             for i in range(0, len(wanted), OL_BULK_SIZE)]),
+            asyncio.gather(*[_limited(_gb_bulk(client, wanted[i:i + GB_BULK_SIZE]))
+                             for i in range(0, len(wanted), GB_BULK_SIZE)]),
+        )
+    finally:
+        if own_client:
+            await client.aclose()
+
+    ol_books: Dict[str, Dict[str, Any]] = {k: v for part in ol_parts for k, v in part.items()}
+    gb_metas: Dict[str, Dict[str, Any]] = {k: v for part in gb_parts for k, v in part.items()}
+
+    for isbn13 in wanted:
+        ol_book = ol_books.get(isbn13) or {}
+        result = _merge_meta(gb_metas.get(isbn13) or {}, _ol_books_meta(ol_book))
+        if not result:
+            continue
+        result["has_newer_edition"] = None
+        result["work_key"] = None
+        result["partial"] = True
+        _apply_classification(result, ol_book)
+        book_meta_store.put(isbn13, result, partial=True)
+        stats["resolved"] += 1
+
+    logger.info("resolve_editions_bulk: %s", stats)
+    return stats
+
+
 # ─── eBay kapak resmi ──────────────────────────────────────────────────────────
 
 async def _fetch_image_b64(url: str, client: httpx.AsyncClient) -> Optional[str]:
+    """image_cache üzerinden: URL başına bir indirme, vision için küçültülmüş, stok görseller tekil."""
     if not url:
         return None
     try:
-        r = await client.get(url, timeout=15, follow_redirects=True)
-        if r.status_code == 200 and "image" in r.headers.get("content-type", ""):
-            return base64.standard_b64encode(r.content).decode()
+        from app import image_cache
+        info = await image_cache.fetch(url, client)
+        return info["b64"] if info else None
     except Exception as e:
         logger.debug("Image fetch error: %s", e)
     return None
@@ -549,14 +700,33 @@ def _apply_verdict_override(result: dict, candidate: dict, cond_score: int) -> d
 # Aynı ISBN için tekrar Gemini çağırmaz — günlük kota 10-15 sorgu ile dolar.
 import time as _time
 _ai_cache: Dict[str, Dict[str, Any]] = {}
-_ai_cache_lock = asyncio.Lock()
 _AI_CACHE_TTL = 3600 * 6  # 6 saat
-# In-flight set: aynı ISBN için paralel duplicate çağrı önle
-_ai_inflight: set = set()
+# Key başına kilit: aynı key için paralel duplicate LLM çağrısı önle (farklı key'ler paralel)
+_ai_inflight = KeyedLock()
 
 
 async def analyze_isbn(isbn: str, candidate: Dict[str, Any]) -> Dict[str, Any]:
-    s = get_settings()
+    _require_llm()
+    cache_key = _cache_key(isbn, candidate)
+
+    # Cache okuma await içermez → kilitsiz. Aynı key'i hesaplayan varsa onun kilidinde
+    # bekle ve sonucunu oku; farklı key'ler (farklı ISBN/ilan) paralel ilerler.
+    hit = _ai_cache_hit(cache_key)
+    if hit is not None:
+        logger.info("AI cache HIT key=%s", cache_key)
+        return hit
+    if _ai_inflight.locked(cache_key):
+        logger.info("AI in-flight, waiting for key=%s", cache_key)
+    async with _ai_inflight(cache_key):
+        hit = _ai_cache_hit(cache_key)
+        if hit is not None:
+            return hit
+        result = await _analyze_uncached(isbn, candidate)
+        _ai_cache[cache_key] = result
+    return result
+
+
+def _require_llm() -> None:
     # Router birden fazla provider dener — en az birinin key'i olmalı
     from app.llm_router import get_status as _llm_status
     _status = _llm_status()
@@ -564,7 +734,8 @@ async def analyze_isbn(isbn: str, candidate: Dict[str, Any]) -> Dict[str, Any]:
     if not _configured:
         raise RuntimeError("Hiçbir LLM API key'i yapılandırılmamış — GEMINI_API_KEY, GROQ_API_KEY veya OPENROUTER_API_KEY gerekli")
 
-    # ── Cache kontrolü ────────────────────────────────────────
+
+def _cache_key(isbn: str, candidate: Dict[str, Any]) -> str:
     # Composite key: ISBN + buy_price_bucket (her $5 band) + source_condition
     # Böylece aynı ISBN'in farklı fiyat/kondisyon kombinasyonları ayrı analiz alır
     isbn_clean = isbn.replace("-", "").replace(" ", "").strip()
@@ -577,80 +748,99 @@ async def analyze_isbn(isbn: str, candidate: Dict[str, Any]) -> Dict[str, Any]:
     seller = candidate.get("ebay_seller_name") or candidate.get("seller_name") or ""
     # Use item_id if available (most specific), else seller name
     listing_key = item_id[:16] if item_id else seller[:20]
-    cache_key = f"{isbn_clean}:{price_bucket}:{source_cond}:{listing_key}"
-
-    # Step 1: cache read (lock held briefly, no await inside)
-    async with _ai_cache_lock:
-        if cache_key in _ai_cache:
-            cached = _ai_cache[cache_key]
-            if _time.time() - cached.get("_cached_at", 0) < _AI_CACHE_TTL:
-                logger.info("AI cache HIT key=%s", cache_key)
-                return {**cached, "_from_cache": True}
-        already_inflight = cache_key in _ai_inflight
-        if not already_inflight:
-            _ai_inflight.add(cache_key)
-
-    # Step 2: if another coroutine is already computing this key, wait OUTSIDE the lock
-    if already_inflight:
-        logger.info("AI in-flight, waiting for key=%s", cache_key)
-        for _ in range(200):  # max 60s wait (200 × 0.3s)
-            await asyncio.sleep(0.3)
-            async with _ai_cache_lock:
-                if cache_key in _ai_cache:
-                    cached = _ai_cache[cache_key]
-                    if _time.time() - cached.get("_cached_at", 0) < _AI_CACHE_TTL:
-                        return {**cached, "_from_cache": True}
-                if cache_key not in _ai_inflight:
-                    # inflight cleared (completed or errored) — proceed with own call
-                    _ai_inflight.add(cache_key)
-                    break
-        else:
-            logger.warning("AI in-flight wait timed out for key=%s — proceeding", cache_key)
-            async with _ai_cache_lock:
-                _ai_inflight.add(cache_key)
+    return f"{isbn_clean}:{price_bucket}:{source_cond}:{listing_key}"
+
+
+def _ai_cache_hit(cache_key: str) -> Optional[Dict[str, Any]]:
+    cached = _ai_cache.get(cache_key)
+    if cached and _time.time() - cached.get("_cached_at", 0) < _AI_CACHE_TTL:
+        return {**cached, "_from_cache": True}
+    return None
 
+
+async def _analyze_uncached(isbn: str, candidate: Dict[str, Any]) -> Dict[str, Any]:
     isbn13 = _to_isbn13(isbn) or isbn
 
     async with httpx.AsyncClient(timeout=30) as client:
-        edition_task = _check_edition(isbn, client)
-        img_url = candidate.get("ebay_image_url", "")
-        image_task = _fetch_image_b64(img_url, client) if img_url else asyncio.sleep(0, result=None)
-
-        # NYT bestseller + Hardcover demand — paralel
-        async def _nyt_safe():
-            try:
-                from app.nyt_client import get_isbn_nyt_history
-                return await get_isbn_nyt_history(isbn)
-            except Exception:
-                return {}
-
-        async def _hardcover_safe():
-            try:
-                from app.hardcover_client import get_book_demand
-                return await get_book_demand(isbn)
-            except Exception:
-                return {}
-
-        edition_data, image_b64, nyt_data, hc_data = await asyncio.gather(
-            edition_task, image_task, _nyt_safe(), _hardcover_safe()
-        )
+        edition_data, image_b64, nyt_data, hc_data = await _gather_context(isbn, candidate, client)
 
     # Deterministic: kondisyon skoru
-    cond_analysis = _condition_score(
+    cond_analysis = _candidate_condition(candidate)
+
+    # Görsel bu ISBN için daha önce değerlendirildiyse (aynı ilan / aynı stok görsel)
+    # vision çağrısı atlanır — karar önbellekten, analiz reasoning task'ı ile
+    seen = await asyncio.to_thread(_image_verdict, image_b64, isbn13) if image_b64 else None
+
+    # AI: Gemini Vision + Google Search
+    prompt = _build_prompt(isbn, isbn13, candidate, edition_data, cond_analysis)
+    gemini_result = await _call_llm(prompt, None if seen else image_b64)
+    if seen:
+        gemini_result["image_verdict"] = seen.get("verdict", "UNCERTAIN")
+        gemini_result["image_notes"] = seen.get("notes", "")
+        gemini_result["image_from_cache"] = True
+    elif image_b64 and gemini_result.get("image_verdict") in _KNOWN_IMAGE_VERDICTS:
+        await asyncio.to_thread(_remember_image_verdict, image_b64, isbn13, {
+            "verdict": gemini_result["image_verdict"],
+            "notes": gemini_result.get("image_notes", ""),
+            "provider": gemini_result.get("_provider", ""),
+        })
+    return _finalize(isbn, candidate, gemini_result, edition_data, cond_analysis,
+                     bool(image_b64), nyt_data, hc_data)
+
+
+# Yalnız kesin kararlar saklanır; UNCERTAIN / parse hatası bir sonraki istekte yeniden denenir
+_KNOWN_IMAGE_VERDICTS = ("MATCH", "MISMATCH", "STOCK_PHOTO")
+
+
+def _image_verdict(image_b64: str, isbn13: str) -> Optional[Dict[str, Any]]:
+    from app import image_cache
+    return image_cache.get_verdict(image_cache.digest(image_b64), isbn13)
+
+
+def _remember_image_verdict(image_b64: str, isbn13: str, data: Dict[str, Any]) -> None:
+    from app import image_cache
+    image_cache.put_verdict(image_cache.digest(image_b64), isbn13, data)
+
+
+async def _gather_context(isbn: str, candidate: Dict[str, Any], client: httpx.AsyncClient,
+                          with_image: bool = True) -> Tuple[Dict[str, Any], Optional[str], Dict[str, Any], Dict[str, Any]]:
+    """Edition + kapak görseli + NYT + Hardcover — paralel. Dönüş: (edition, image_b64, nyt, hc)."""
+    edition_task = _check_edition(isbn, client)
+    img_url = candidate.get("ebay_image_url", "") if with_image else ""
+    image_task = _fetch_image_b64(img_url, client) if img_url else asyncio.sleep(0, result=None)
+
+    # NYT bestseller + Hardcover demand — paralel
+    async def _nyt_safe():
+        try:
+            from app.nyt_client import get_isbn_nyt_history
+            return await get_isbn_nyt_history(isbn)
+        except Exception:
+            return {}
+
+    async def _hardcover_safe():
+        try:
+            from app.hardcover_client import get_book_demand
+            return await get_book_demand(isbn)
+        except Exception:
+            return {}
+
+    edition_data, image_b64, nyt_data, hc_data = await asyncio.gather(
+        edition_task, image_task, _nyt_safe(), _hardcover_safe()
+    )
+    return edition_data, image_b64, nyt_data, hc_data
+
+
+def _candidate_condition(candidate: Dict[str, Any]) -> Dict[str, Any]:
+    return _condition_score(
         candidate.get("ebay_title", ""),
         candidate.get("ebay_description", ""),
         candidate.get("source_condition", "used"),
     )
 
-    # AI: Gemini Vision + Google Search
-    prompt = _build_prompt(isbn, isbn13, candidate, edition_data, cond_analysis)
-    try:
-        gemini_result = await _call_llm(prompt, image_b64)
-    except Exception:
-        async with _ai_cache_lock:
-            _ai_inflight.discard(cache_key)
-        raise
 
+def _finalize(isbn: str, candidate: Dict[str, Any], gemini_result: Dict[str, Any],
+              edition_data: Dict[str, Any], cond_analysis: Dict[str, Any], image_verified: bool,
+              nyt_data: Dict[str, Any], hc_data: Dict[str, Any]) -> Dict[str, Any]:
     # Deterministic ayarlamalar (verdict değiştirmeden confidence/risk)
     gemini_result = _apply_deterministic_adjustments(gemini_result, candidate, edition_data, cond_analysis)
 
@@ -673,7 +863,7 @@ async def analyze_isbn(isbn: str, candidate: Dict[str, Any]) -> Dict[str, Any]:
         "condition_flags": cond_analysis["condition_flags"],
         "condition_risk": cond_analysis["condition_risk"],
         "condition_score": cond_analysis["condition_score"],
-        "image_verified": bool(image_b64),
+        "image_verified": image_verified,
         "amazon_seller_count": candidate.get("amazon_seller_count"),
         "amazon_is_sold_by_amazon": candidate.get("amazon_is_sold_by_amazon", False),
         "seasonality_mult": candidate.get("seasonality_mult"),
@@ -688,13 +878,148 @@ async def analyze_isbn(isbn: str, candidate: Dict[str, Any]) -> Dict[str, Any]:
         "_cached_at": _time.time(),
     })
 
-    # Cache'e kaydet ve inflight'tan çıkar
-    async with _ai_cache_lock:
-        _ai_cache[cache_key] = gemini_result
-        _ai_inflight.discard(cache_key)
     return gemini_result
 
 
+# ── Batch analiz ──────────────────────────────────────────────────────────────
+# Görselsiz adaylar (hepsi "reasoning" task) tek istekte: uzun system prompt bir kez gider,
+# her istek RPM kotasından N aday karşılar. Yanıt {"results": [...]} — aday başına bir eleman.
+_BATCH_TOKENS_PER_ITEM = 800
+_VERDICTS = ("BUY", "PASS", "WATCH")
+
+
+async def analyze_batch(items: List[Dict[str, Any]], batch_size: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    items: [{"isbn", "candidate"}] — sonuç listesi aynı sırada.
+    Cache'te olanlar doğrudan döner; görselli adaylar (vision) ve batch yanıtında bölümü
+    parse / doğrulanamayan adaylar tekil analyze_isbn'e düşer. Tekil hata tüm listeyi
+    düşürmez: o eleman {"isbn", "verdict": "UNKNOWN", "error"} olur.
+    """
+    _require_llm()
+    size = max(1, int(batch_size or get_settings().ai_batch_size))
+    results: List[Optional[Dict[str, Any]]] = [None] * len(items)
+    batchable: List[int] = []
+    singles: List[int] = []
+    for i, it in enumerate(items):
+        cand = it.get("candidate") or {}
+        hit = _ai_cache_hit(_cache_key(it["isbn"], cand))
+        if hit is not None:
+            results[i] = hit
+        elif cand.get("ebay_image_url"):
+            singles.append(i)
+        else:
+            batchable.append(i)
+
+    groups = [batchable[k:k + size] for k in range(0, len(batchable), size)]
+    async with httpx.AsyncClient(timeout=30) as client:
+        failed = await asyncio.gather(*(_analyze_group(items, g, results, client) for g in groups))
+    fell_back = [i for f in failed for i in f]
+    singles += fell_back
+
+    async def _single(i: int) -> None:
+        it = items[i]
+        try:
+            results[i] = await analyze_isbn(it["isbn"], it.get("candidate") or {})
+        except Exception as e:
+            logger.error("AI batch single fallback error isbn=%s: %s", it["isbn"], e)
+            results[i] = {"isbn": it["isbn"], "verdict": "UNKNOWN", "error": str(e)[:200]}
+
+    await asyncio.gather(*(_single(i) for i in sorted(singles)))
+    logger.info("AI batch: items=%d groups=%d batched=%d single=%d",
+                len(items), len(groups), len(batchable) - len(fell_back), len(singles))
+    return results  # type: ignore[return-value]
+
+
+async def _analyze_group(items: List[Dict[str, Any]], idxs: List[int],
+                         results: List[Optional[Dict[str, Any]]], client: httpx.AsyncClient) -> List[int]:
+    """Bir grubu tek LLM isteğiyle analiz et, results'a yaz. Dönüş: tekile düşecek indeksler."""
+    if len(idxs) < 2:
+        return idxs  # tek aday için batch prompt'u kazanç sağlamaz
+    from app.llm_router import route as llm_route
+
+    ctx = await asyncio.gather(*(
+        _gather_context(items[i]["isbn"], items[i].get("candidate") or {}, client, with_image=False)
+        for i in idxs
+    ))
+    sections, conds = [], []
+    for n, (i, (edition, _, _, _)) in enumerate(zip(idxs, ctx), 1):
+        isbn, cand = items[i]["isbn"], items[i].get("candidate") or {}
+        cond = _candidate_condition(cand)
+        conds.append(cond)
+        sections.append(f"### CANDIDATE id={n}\n" + _build_prompt(isbn, _to_isbn13(isbn) or isbn, cand, edition, cond))
+
+    try:
+        res = await llm_route(
+            task="reasoning",
+            system_prompt=_system_prompt(False, batch=True),
+            user_prompt="\n\n".join(sections),
+            max_tokens=_BATCH_TOKENS_PER_ITEM * len(idxs),
+            json_mode=True,
+            cache_ttl_s=_AI_CACHE_TTL,
+            required_fields=("results",),
+            partial_ok=True,   # kesik yanıtta tamamlanmış bölümler _split_batch ile kurtarılır
+        )
+    except Exception as e:
+        logger.warning("AI batch LLM çağrısı başarısız (n=%d), tekile düşülüyor: %s", len(idxs), e)
+        return idxs
+
+    sections_by_id = _split_batch(res.get("text", ""), [str(n) for n in range(1, len(idxs) + 1)])
+    failed: List[int] = []
+    for n, (i, (edition, _, nyt, hc), cond) in enumerate(zip(idxs, ctx, conds), 1):
+        el = sections_by_id.get(str(n))
+        if el is None:
+            failed.append(i)
+            continue
+        isbn, cand = items[i]["isbn"], items[i].get("candidate") or {}
+        parsed = _parse_json(json.dumps(el))
+        parsed.pop("id", None)
+        parsed["_provider"] = res.get("provider", "unknown")
+        parsed["_model"] = res.get("model", "unknown")
+        parsed["_batch_size"] = len(idxs)
+        result = _finalize(isbn, cand, parsed, edition, cond, False, nyt, hc)
+        _ai_cache[_cache_key(isbn, cand)] = result
+        results[i] = result
+    if failed:
+        logger.info("AI batch: %d/%d bölüm doğrulanamadı, tekile düşülüyor", len(failed), len(idxs))
+    return failed
+
+
+def _split_batch(text: str, ids: List[str]) -> Dict[str, Dict[str, Any]]:
+    """
+    Batch yanıtını aday başına böl. Dizi elemanları tek tek çözülür: kesilmiş / bozuk
+    çıktıda o noktaya kadar tamamlanan bölümler kurtarılır. dict olmayan, bilinmeyen veya
+    tekrar eden id'li, geçersiz verdict'li eleman atlanır.
+    """
+    import re
+    t = re.sub(r",\s*([}\]])", r"\1", text or "")
+    start = t.find("[")
+    if start < 0:
+        return {}
+    dec = json.JSONDecoder()
+    wanted = set(ids)
+    out: Dict[str, Dict[str, Any]] = {}
+    pos = start + 1
+    while pos < len(t):
+        while pos < len(t) and t[pos] in " \t\r\n,":
+            pos += 1
+        if pos >= len(t) or t[pos] == "]":
+            break
+        try:
+            el, pos = dec.raw_decode(t, pos)
+        except ValueError:
+            break
+        if not isinstance(el, dict):
+            continue
+        cid = str(el.get("id", "")).strip()
+        if cid not in wanted or cid in out:
+            continue
+        if str(el.get("verdict", "")).upper() not in _VERDICTS:
+            continue
+        el["verdict"] = str(el["verdict"]).upper()
+        out[cid] = el
+    return out
+
+
 async def _call_llm(prompt: str, image_b64: Optional[str]) -> Dict[str, Any]:
     """
     Multi-LLM router ile analiz:
@@ -715,6 +1040,8 @@ async def _call_llm(prompt: str, image_b64: Optional[str]) -> Dict[str, Any]:
             image_b64=image_b64,
             max_tokens=1200,
             json_mode=(task == "reasoning"),  # enforce JSON for non-vision calls
+            cache_ttl_s=_AI_CACHE_TTL,        # aynı prompt restart sonrası da kota harcamaz
+            required_fields=_REQUIRED_FIELDS,  # stream: bozuk JSON'da erken geçiş, tamamlanınca kes
         )
         text = result["text"]
         parsed = _parse_json(text)
@@ -739,7 +1066,46 @@ async def _call_llm(prompt: str, image_b64: Optional[str]) -> Dict[str, Any]:
         return _parse_json(str(partial).replace("'", '"'))
 
 
-def _system_prompt(has_image: bool) -> str:
+_RESPONSE_SCHEMA = """{
+  "verdict": "BUY or PASS or WATCH",
+  "confidence": 0-100,
+  "summary": "2-3 sentence analysis.",
+  "price_trend": "RISING or STABLE or DECLINING or UNKNOWN",
+  "price_trend_reason": "brief explanation based on provided data",
+  "risk_level": "LOW or MEDIUM or HIGH",
+  "risks": [],
+  "competitors": "comment on competing sellers",
+  "buy_suggestion": "max price and preferred condition",
+  "image_verdict": "MATCH or MISMATCH or UNCERTAIN or NO_IMAGE",
+  "image_notes": "what you see in the image",
+  "isbn_conflict": false,
+  "isbn_conflict_note": "",
+  "sources_checked": ["provided_data"]
+}"""
+
+
+# Karar için gereken alanlar (_RESPONSE_SCHEMA sırasıyla); sources_checked gelmeden kesilebilir,
+# _parse_json eksiği varsayılanla doldurur
+_REQUIRED_FIELDS = (
+    "verdict", "confidence", "summary", "price_trend", "price_trend_reason", "risk_level", "risks",
+    "competitors", "buy_suggestion", "image_verdict", "image_notes", "isbn_conflict", "isbn_conflict_note",
+)
+
+
+def _system_prompt(has_image: bool, batch: bool = False) -> str:
+    if batch:
+        # Batch: her aday "### CANDIDATE id=N" bölümü; yanıt aday başına bir eleman
+        reply = (
+            "The user message contains several independent listings, each under a "
+            "\"### CANDIDATE id=N\" header. Analyze EACH one separately — never mix data between them.\n\n"
+            "Reply ONLY with this JSON (no markdown, no extra text), one element per candidate, "
+            "same order, \"id\" copied from its header:\n"
+            '{"results": [{"id": N, ...fields below...}]}\n'
+            "Fields of each element:\n" + _RESPONSE_SCHEMA
+        )
+    else:
+        reply = "Reply ONLY with this JSON (no markdown, no extra text):\n" + _RESPONSE_SCHEMA
+
     img_part = """
 Analyze the provided eBay listing image:
 - Does the cover match this book (title/author visible)?
@@ -765,23 +1131,7 @@ IMPORTANT RULES:
 - Do NOT recommend "SKIP" for profitable deals unless there's a concrete risk (ISBN conflict, severe condition, Amazon is selling).
 - Base buy_suggestion on the provided buy price with a small margin (10-15% above current).
 
-Reply ONLY with this JSON (no markdown, no extra text):
-{{
-  "verdict": "BUY or PASS or WATCH",
-  "confidence": 0-100,
-  "summary": "2-3 sentence analysis.",
-  "price_trend": "RISING or STABLE or DECLINING or UNKNOWN",
-  "price_trend_reason": "brief explanation based on provided data",
-  "risk_level": "LOW or MEDIUM or HIGH",
-  "risks": [],
-  "competitors": "comment on competing sellers",
-  "buy_suggestion": "max price and preferred condition",
-  "image_verdict": "MATCH or MISMATCH or UNCERTAIN or NO_IMAGE",
-  "image_notes": "what you see in the image",
-  "isbn_conflict": false,
-  "isbn_conflict_note": "",
-  "sources_checked": ["provided_data"]
-}}"""
+{reply}"""
 
 
 def _build_prompt(isbn: str, isbn13: str, c: Dict[str, Any],
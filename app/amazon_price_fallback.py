@@ -22,6 +22,8 @@ from typing import Any, Dict, Optional
 
 import httpx
 
+from app.core.circuit_breaker import get_breaker
+
 logger = logging.getLogger("trackerbundle.amazon_fallback")
 
 # ── Cache ─────────────────────────────────────────────────────────────────────
@@ -85,7 +87,8 @@ async def _try_serper(
 ) -> Optional[float]:
     """Serper Google Shopping API → Amazon fiyatı çıkarmaya çalış."""
     try:
-        r = await client.post(
+        r = await get_breaker("amazon_fallback.serper").call(
+            client.post,
             _SERPER_URL,
             json={"q": query, "gl": "us", "hl": "en", "num": 10},
             headers={"X-API-KEY": api_key, "Content-Type": "application/json"},
@@ -114,7 +117,8 @@ async def _try_serpapi(
 ) -> Optional[float]:
     """SerpApi Google Shopping API → Amazon fiyatı çıkarmaya çalış."""
     try:
-        r = await client.get(
+        r = await get_breaker("amazon_fallback.serpapi").call(
+            client.get,
             _SERPAPI_URL,
             params={
                 "engine": "google_shopping",
@@ -190,7 +194,13 @@ async def get_amazon_price_via_shopping(
 
     if not price or price <= 0:
         logger.debug("Amazon fallback found nothing for isbn=%s", isbn)
-        _store(isbn, {})
+        # Sağlayıcı circuit'i açıksa "bulunamadı" cache'lenmez — kesinti geçince tekrar denenir
+        providers_down = (
+            (not serper_key or get_breaker("amazon_fallback.serper").is_open())
+            and (not serpapi_key or get_breaker("amazon_fallback.serpapi").is_open())
+        )
+        if not providers_down:
+            _store(isbn, {})
         return {}
 
     result = _build_amazon_data(price, condition_hint)
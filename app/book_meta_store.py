@@ -0,0 +1,169 @@
+"""
+Book Metadata Store — _check_edition sonuçlarının kalıcı cache'i (SQLite).
+
+Edition metadata (title, yazar, yayıncı, DDC/LC, has_newer_edition) neredeyse
+hiç değişmez; Google Books / Open Library / xISBN çağrıları ISBN başına bir kez
+yapılır ve META_TTL_S boyunca tekrar kullanılır.
+
+  - Bulunan metadata   → META_TTL_S (30 gün)
+  - Bulunamayan ISBN   → MISS_TTL_S (6 saat) — geçici API hatası kalıcı boşluk yaratmasın
+  - partial kayıtlar   → toplu çözümleyiciden (ai_analyst.resolve_editions_bulk) gelir:
+                         title/yazar/yıl/subjects/DDC var, has_newer_edition yok. Scan'ler
+                         bunları kullanır; analyze_isbn ve backfill tam kayda yükseltir.
+  - backfill_isbns()   → watchlist + BookDepot envanterinde taze kaydı olmayan ISBN'ler
+                         (scan_queue "meta_backfill" job'u bunları önceden ısıtır)
+"""
+from __future__ import annotations
+
+import json
+import logging
+import sqlite3
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+from app.core.config import get_settings
+
+logger = logging.getLogger("trackerbundle.book_meta")
+
+META_TTL_S = 30 * 86400
+MISS_TTL_S = 6 * 3600
+
+_schema_ready: set = set()
+
+
+def _path() -> Path:
+    return get_settings().resolved_data_dir() / "book_meta.db"
+
+
+def _connect() -> sqlite3.Connection:
+    p = _path()
+    p.parent.mkdir(parents=True, exist_ok=True)
+    con = sqlite3.connect(p, timeout=10)
+    con.row_factory = sqlite3.Row
+    con.execute("PRAGMA synchronous=NORMAL;")
+    if str(p) not in _schema_ready:
+        con.execute("PRAGMA journal_mode=WAL;")
+        con.execute(
+            """
+            CREATE TABLE IF NOT EXISTS book_meta (
+              isbn TEXT PRIMARY KEY,
+              fetched_at REAL NOT NULL,
+              found INTEGER NOT NULL,
+              partial INTEGER NOT NULL DEFAULT 0,
+              data_json TEXT NOT NULL
+            );
+            """
+        )
+        cols = {r["name"] for r in con.execute("PRAGMA table_info(book_meta);")}
+        if "partial" not in cols:
+            con.execute("ALTER TABLE book_meta ADD COLUMN partial INTEGER NOT NULL DEFAULT 0;")
+        _schema_ready.add(str(p))
+    return con
+
+
+def _is_found(data: Dict[str, Any]) -> bool:
+    return bool(data.get("source"))
+
+
+def _fresh(row: sqlite3.Row, now: float, partial_ok: bool = False) -> bool:
+    if row["partial"] and not partial_ok:
+        return False
+    ttl = META_TTL_S if row["found"] else MISS_TTL_S
+    return now - float(row["fetched_at"]) <= ttl
+
+
+def get(isbn: str, partial_ok: bool = False) -> Optional[Dict[str, Any]]:
+    """Taze kayıt varsa metadata dict, yoksa None. partial_ok=False → partial kayıt yok sayılır."""
+    try:
+        with _connect() as con:
+            r = con.execute(
+                "SELECT fetched_at, found, partial, data_json FROM book_meta WHERE isbn=?;", (isbn,)
+            ).fetchone()
+    except Exception as e:
+        logger.debug("book_meta get failed isbn=%s: %s", isbn, e)
+        return None
+    if r is None or not _fresh(r, time.time(), partial_ok):
+        return None
+    return json.loads(r["data_json"])
+
+
+def put(isbn: str, data: Dict[str, Any], fetched_at: Optional[float] = None, partial: bool = False) -> None:
+    try:
+        with _connect() as con:
+            con.execute(
+                """
+                INSERT INTO book_meta(isbn, fetched_at, found, partial, data_json) VALUES(?,?,?,?,?)
+                ON CONFLICT(isbn) DO UPDATE SET
+                    fetched_at=excluded.fetched_at, found=excluded.found,
+                    partial=excluded.partial, data_json=excluded.data_json
+                """,
+                (isbn, fetched_at or time.time(), int(_is_found(data)), int(partial),
+                 json.dumps(data, default=str)),
+            )
+    except Exception as e:
+        logger.debug("book_meta put failed isbn=%s: %s", isbn, e)
+
+
+def stale(isbns: Iterable[str], partial_ok: bool = False) -> List[str]:
+    """Taze kaydı olmayan ISBN'ler (giriş sırası korunur, tekrarlar atılır)."""
+    wanted = list(dict.fromkeys(i for i in isbns if i))
+    if not wanted:
+        return []
+    now = time.time()
+    fresh: set = set()
+    with _connect() as con:
+        for i in range(0, len(wanted), 500):
+            chunk = wanted[i:i + 500]
+            rows = con.execute(
+                f"SELECT isbn, fetched_at, found, partial FROM book_meta WHERE isbn IN ({','.join('?' * len(chunk))});",
+                chunk,
+            ).fetchall()
+            fresh.update(r["isbn"] for r in rows if _fresh(r, now, partial_ok))
+    return [i for i in wanted if i not in fresh]
+
+
+def stats() -> Dict[str, int]:
+    try:
+        with _connect() as con:
+            r = con.execute(
+                "SELECT COUNT(*) AS n, COALESCE(SUM(found),0) AS found, COALESCE(SUM(partial),0) AS partial FROM book_meta;"
+            ).fetchone()
+        return {"entries": int(r["n"]), "found": int(r["found"]), "partial": int(r["partial"])}
+    except Exception:
+        return {"entries": 0, "found": 0, "partial": 0}
+
+
+# ── Backfill hedefleri ────────────────────────────────────────────────────────
+
+def watched_isbns() -> List[str]:
+    """ISBN watchlist + watchlist_store (kind=isbn) + BookDepot envanteri, ISBN-13'e normalize."""
+    from app.isbn_utils import parse_isbn
+
+    raw: List[str] = []
+    try:
+        from app import isbn_store
+        raw.extend(isbn_store.list_isbns())
+    except Exception as e:
+        logger.debug("isbn_store okunamadı: %s", e)
+    try:
+        from app import watchlist_store
+        raw.extend(it.key for it in watchlist_store.list_items() if it.kind == "isbn" and it.enabled)
+    except Exception as e:
+        logger.debug("watchlist_store okunamadı: %s", e)
+    try:
+        from app import bookdepot_store
+        raw.extend(bookdepot_store.all_isbns())
+    except Exception as e:
+        logger.debug("bookdepot envanteri okunamadı: %s", e)
+
+    out: List[str] = []
+    for x in raw:
+        info = parse_isbn(str(x))
+        if info.valid and info.isbn13:
+            out.append(info.isbn13)
+    return list(dict.fromkeys(out))
+
+
+def backfill_isbns() -> List[str]:
+    return stale(watched_isbns())
@@ -0,0 +1,348 @@
+"""
+BookDepot Inventory Store — bookmarklet kazımaları ve katalog export'ları için indeksli SQLite.
+
+Eskiden tek bir bookdepot_inventory.json vardı: her bookmarklet POST'u tüm dosyayı
+yeniden yazıyor, /bookdepot/inventory her şeyi yükleyip Python'da filtreliyordu ve
+scanner her ISBN için dosyayı baştan parse ediyordu.
+
+  - upsert_many()  → tek transaction, executemany (bookmarklet sayfası)
+  - import_csv()   → tam katalog export'u satır satır, batch_size'lık transaction'larla
+                     (bellekte tüm dosya tutulmaz)
+  - query()        → price / scraped_at indeksleri üzerinden sayfalı fiyat aralığı sorgusu
+  - get_many()     → scan başına tek sorgu (csv_arb_scanner fast path)
+
+Fark takibi (bookdepot_sweep):
+  - Her upsert önceki fiyatla karşılaştırılır; fiyat değiştiyse bookdepot_price_history'ye
+    satır eklenir, prev_price / price_changed_at güncellenir.
+  - pending_rescan() → yeni görülen veya son Amazon taramasından sonra fiyatı düşen
+    item'lar (scanned_at ile). Tam katalog sweep'lerinin maliyeti katalog boyutuyla değil
+    değişiklik sayısıyla orantılı olur.
+  - deactivate_missing(ts) → tam sweep'te görünmeyen item'lar active=0 (sorgu/scan dışı).
+
+İlk bağlantıda eski bookdepot_inventory.json varsa içe aktarılır ve
+bookdepot_inventory.json.migrated olarak yeniden adlandırılır.
+"""
+from __future__ import annotations
+
+import csv
+import io
+import logging
+import sqlite3
+import time
+from pathlib import Path
+from typing import Any, Dict, IO, Iterable, List, Optional, Tuple
+
+from app.core.config import get_settings
+
+logger = logging.getLogger("trackerbundle.bookdepot_store")
+
+_schema_ready: set = set()
+
+# BookDepot katalog export'larında görülen başlık varyantları (küçük harf, boşluksuz)
+_CSV_COLUMNS = {
+    "isbn":  ("isbn", "isbn13", "ean", "upc"),
+    "title": ("title", "booktitle", "name"),
+    "price": ("price", "ourprice", "saleprice", "yourprice", "netprice"),
+    "qty":   ("qty", "quantity", "stock", "available", "qtyavailable"),
+    "url":   ("url", "link", "producturl"),
+}
+_ADDED_COLUMNS = (
+    ("prev_price", "REAL"),
+    ("price_changed_at", "INTEGER"),
+    ("first_seen_at", "INTEGER"),
+    ("scanned_at", "INTEGER"),                    # son Amazon rescan'i için kuyruğa alındığı an
+    ("active", "INTEGER NOT NULL DEFAULT 1"),     # son tam sweep'te görüldü mü
+)
+_ITEM_COLS = "isbn, title, price, qty, url, scraped_at, prev_price, price_changed_at, first_seen_at, scanned_at, active"
+_SORTS = {
+    "scraped_at": "scraped_at DESC, isbn",
+    "price":      "price ASC, isbn",
+    "price_desc": "price DESC, isbn",
+}
+
+
+def _path() -> Path:
+    return get_settings().resolved_data_dir() / "bookdepot.db"
+
+
+def _legacy_path() -> Path:
+    return get_settings().resolved_data_dir() / "bookdepot_inventory.json"
+
+
+def _connect() -> sqlite3.Connection:
+    p = _path()
+    p.parent.mkdir(parents=True, exist_ok=True)
+    con = sqlite3.connect(p, timeout=10)
+    con.row_factory = sqlite3.Row
+    con.execute("PRAGMA synchronous=NORMAL;")
+    if str(p) not in _schema_ready:
+        con.execute("PRAGMA journal_mode=WAL;")
+        con.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS bookdepot_item (
+              isbn TEXT PRIMARY KEY,
+              title TEXT NOT NULL DEFAULT '',
+              price REAL,
+              qty TEXT,
+              url TEXT NOT NULL DEFAULT '',
+              scraped_at INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_bookdepot_price ON bookdepot_item(price);
+            CREATE INDEX IF NOT EXISTS idx_bookdepot_scraped ON bookdepot_item(scraped_at);
+            CREATE TABLE IF NOT EXISTS bookdepot_price_history (
+              isbn TEXT NOT NULL,
+              price REAL NOT NULL,
+              seen_at INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_bookdepot_hist ON bookdepot_price_history(isbn, seen_at);
+            """
+        )
+        cols = {r["name"] for r in con.execute("PRAGMA table_info(bookdepot_item);")}
+        for col, ddl in _ADDED_COLUMNS:
+            if col not in cols:
+                con.execute(f"ALTER TABLE bookdepot_item ADD COLUMN {col} {ddl};")
+        con.execute("CREATE INDEX IF NOT EXISTS idx_bookdepot_pending ON bookdepot_item(active, scanned_at);")
+        _schema_ready.add(str(p))
+        _migrate_legacy(con)
+    return con
+
+
+def _migrate_legacy(con: sqlite3.Connection) -> None:
+    legacy = _legacy_path()
+    if not legacy.exists():
+        return
+    try:
+        from app.core.json_store import _read_unsafe
+        items = (_read_unsafe(legacy, default={"items": {}}).get("items") or {}).values()
+        with con:
+            n = _upsert(con, items, int(time.time()))
+        legacy.rename(legacy.with_name(legacy.name + ".migrated"))
+        logger.info("bookdepot: %d item eski JSON envanterinden taşındı", n)
+    except Exception as e:
+        logger.warning("bookdepot legacy migration failed: %s", e)
+
+
+def normalize_isbn(raw: Any) -> Optional[str]:
+    isbn = str(raw or "").replace("-", "").replace(" ", "").strip().upper()
+    return isbn if len(isbn) >= 10 else None
+
+
+def _price(raw: Any) -> Optional[float]:
+    if raw is None or raw == "":
+        return None
+    try:
+        return round(float(str(raw).replace("$", "").replace(",", "").strip()), 2)
+    except ValueError:
+        return None
+
+
+def _row(item: Dict[str, Any], now: int) -> Optional[Tuple]:
+    isbn = normalize_isbn(item.get("isbn"))
+    if isbn is None:
+        return None
+    qty = item.get("qty")
+    return (
+        isbn,
+        str(item.get("title") or "")[:300],
+        _price(item.get("price")),
+        None if qty in (None, "") else str(qty),
+        str(item.get("url") or ""),
+        int(item.get("scraped_at") or now),
+    )
+
+
+def _upsert(con: sqlite3.Connection, items: Iterable[Dict[str, Any]], now: int) -> Dict[str, int]:
+    rows = list({r[0]: r for r in (_row(i, now) for i in items) if r is not None}.values())
+    prev: Dict[str, Optional[float]] = {}
+    for i in range(0, len(rows), 500):
+        chunk = [r[0] for r in rows[i:i + 500]]
+        prev.update(con.execute(
+            f"SELECT isbn, price FROM bookdepot_item WHERE isbn IN ({','.join('?' * len(chunk))});", chunk
+        ).fetchall())
+
+    history, new, dropped = [], 0, 0
+    for isbn, _, price, *_ in rows:
+        if isbn not in prev:
+            new += 1
+        elif price is not None and prev[isbn] is not None and price < prev[isbn]:
+            dropped += 1
+        if price is not None and (isbn not in prev or price != prev[isbn]):
+            history.append((isbn, price, now))
+
+    # first_seen_at sadece INSERT'te yazılır; çakışmada excluded.first_seen_at = now
+    con.executemany(
+        """
+        INSERT INTO bookdepot_item(isbn, title, price, qty, url, scraped_at, first_seen_at, active)
+        VALUES(?,?,?,?,?,?,?,1)
+        ON CONFLICT(isbn) DO UPDATE SET
+            prev_price=CASE WHEN excluded.price IS NOT bookdepot_item.price
+                            THEN bookdepot_item.price ELSE bookdepot_item.prev_price END,
+            price_changed_at=CASE WHEN excluded.price IS NOT bookdepot_item.price
+                                  THEN excluded.first_seen_at ELSE bookdepot_item.price_changed_at END,
+            title=excluded.title, price=excluded.price, qty=excluded.qty,
+            url=excluded.url, scraped_at=excluded.scraped_at, active=1
+        """,
+        [(*r, now) for r in rows],
+    )
+    con.executemany("INSERT INTO bookdepot_price_history(isbn, price, seen_at) VALUES(?,?,?);", history)
+    return {"upserted": len(rows), "new": new, "price_dropped": dropped}
+
+
+# ── Yazma ─────────────────────────────────────────────────────────────────────
+
+def upsert_many(items: Iterable[Dict[str, Any]], now: Optional[int] = None) -> Dict[str, int]:
+    """
+    Item'ları (isbn, title, price, qty, url) ekle/güncelle; geçersiz ISBN'ler atlanır.
+    Returns {upserted, new, price_dropped}.
+    """
+    with _connect() as con:
+        return _upsert(con, items, int(now or time.time()))
+
+
+def import_csv(fh: IO[str], batch_size: int = 1000, now: Optional[int] = None) -> Dict[str, int]:
+    """
+    BookDepot katalog CSV'sini akış halinde içe aktar. Başlık eşlemesi _CSV_COLUMNS'a göre
+    (büyük/küçük harf ve boşluk duyarsız); ISBN sütunu yoksa ValueError.
+    """
+    reader = csv.DictReader(fh)
+    header = {(h or "").strip().lower().replace(" ", "").replace("_", ""): h for h in (reader.fieldnames or [])}
+    cols = {k: next((header[a] for a in aliases if a in header), None) for k, aliases in _CSV_COLUMNS.items()}
+    if cols["isbn"] is None:
+        raise ValueError(f"CSV'de ISBN sütunu yok (başlık: {reader.fieldnames})")
+
+    ts = int(now or time.time())
+    stats = {"rows": 0, "imported": 0, "skipped": 0, "new": 0, "price_dropped": 0}
+    batch: List[Dict[str, Any]] = []
+
+    def _flush() -> None:
+        diff = upsert_many(batch, ts)
+        stats["imported"] += diff["upserted"]
+        stats["skipped"] += len(batch) - diff["upserted"]
+        stats["new"] += diff["new"]
+        stats["price_dropped"] += diff["price_dropped"]
+        batch.clear()
+
+    for row in reader:
+        stats["rows"] += 1
+        batch.append({k: (row.get(c) if c else None) for k, c in cols.items()})
+        if len(batch) >= batch_size:
+            _flush()
+    if batch:
+        _flush()
+    return stats
+
+
+def import_csv_file(fb: IO[bytes], batch_size: int = 1000, now: Optional[int] = None) -> Dict[str, int]:
+    """Binary dosya (spool edilmiş HTTP gövdesi / indirilen export) üzerinden import_csv."""
+    fh = io.TextIOWrapper(fb, encoding="utf-8-sig", errors="replace", newline="")
+    try:
+        return import_csv(fh, batch_size=batch_size, now=now)
+    finally:
+        fh.detach()   # fb'yi çağıran kapatır
+
+
+def deactivate_missing(seen_since: int) -> int:
+    """Tam sweep sonrası: seen_since'ten beri görülmeyen aktif item'ları pasifleştir."""
+    with _connect() as con:
+        return con.execute(
+            "UPDATE bookdepot_item SET active=0 WHERE active=1 AND scraped_at < ?;", (seen_since,)
+        ).rowcount
+
+
+def mark_scanned(isbns: Iterable[str], now: Optional[int] = None) -> None:
+    ts = int(now or time.time())
+    with _connect() as con:
+        con.executemany("UPDATE bookdepot_item SET scanned_at=? WHERE isbn=?;", [(ts, i) for i in isbns])
+
+
+def clear() -> int:
+    with _connect() as con:
+        con.execute("DELETE FROM bookdepot_price_history;")
+        return con.execute("DELETE FROM bookdepot_item;").rowcount
+
+
+# ── Okuma ─────────────────────────────────────────────────────────────────────
+
+def query(
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    limit: Optional[int] = None,
+    offset: int = 0,
+    sort: str = "scraped_at",
+) -> Tuple[int, List[Dict[str, Any]]]:
+    """(toplam eşleşen, sayfa) — fiyat filtresi verilirse fiyatı olmayan item'lar hariç."""
+    where, args = ["active=1"], []
+    if min_price is not None:
+        where.append("price >= ?")
+        args.append(min_price)
+    if max_price is not None:
+        where.append("price <= ?")
+        args.append(max_price)
+    clause = f"WHERE {' AND '.join(where)}"
+    order = _SORTS.get(sort, _SORTS["scraped_at"])
+    with _connect() as con:
+        total = con.execute(f"SELECT COUNT(*) FROM bookdepot_item {clause};", args).fetchone()[0]
+        rows = con.execute(
+            f"SELECT {_ITEM_COLS} FROM bookdepot_item {clause} ORDER BY {order} LIMIT ? OFFSET ?;",
+            [*args, -1 if limit is None else int(limit), max(0, int(offset))],
+        ).fetchall()
+    return int(total), [dict(r) for r in rows]
+
+
+def get(isbn: str) -> Optional[Dict[str, Any]]:
+    with _connect() as con:
+        r = con.execute(f"SELECT {_ITEM_COLS} FROM bookdepot_item WHERE isbn=?;", (isbn,)).fetchone()
+    return dict(r) if r else None
+
+
+def get_many(isbns: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+    wanted = list(dict.fromkeys(i for i in isbns if i))
+    out: Dict[str, Dict[str, Any]] = {}
+    with _connect() as con:
+        for i in range(0, len(wanted), 500):
+            chunk = wanted[i:i + 500]
+            rows = con.execute(
+                f"SELECT {_ITEM_COLS} FROM bookdepot_item WHERE active=1 AND isbn IN ({','.join('?' * len(chunk))});",
+                chunk,
+            ).fetchall()
+            out.update((r["isbn"], dict(r)) for r in rows)
+    return out
+
+
+def pending_rescan(limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Amazon'a karşı yeniden taranması gereken aktif item'lar: hiç taranmamış (yeni) veya
+    son taramadan sonra fiyatı düşmüş. Fiyatı olmayanlar hariç; en ucuz önce.
+    """
+    with _connect() as con:
+        rows = con.execute(
+            f"""
+            SELECT {_ITEM_COLS} FROM bookdepot_item
+            WHERE active=1 AND price > 0 AND (
+                scanned_at IS NULL
+                OR (price_changed_at > scanned_at AND prev_price IS NOT NULL AND price < prev_price)
+            )
+            ORDER BY price ASC, isbn LIMIT ?;
+            """,
+            (-1 if limit is None else int(limit),),
+        ).fetchall()
+    return [dict(r) for r in rows]
+
+
+def history(isbn: str) -> List[Dict[str, Any]]:
+    """ISBN'in fiyat geçmişi (sadece değişimler), eskiden yeniye."""
+    with _connect() as con:
+        rows = con.execute(
+            "SELECT price, seen_at FROM bookdepot_price_history WHERE isbn=? ORDER BY seen_at, rowid;", (isbn,)
+        ).fetchall()
+    return [dict(r) for r in rows]
+
+
+def all_isbns() -> List[str]:
+    with _connect() as con:
+        return [r[0] for r in con.execute("SELECT isbn FROM bookdepot_item WHERE active=1;")]
+
+
+def count() -> int:
+    with _connect() as con:
+        return int(con.execute("SELECT COUNT(*) FROM bookdepot_item WHERE active=1;").fetchone()[0])
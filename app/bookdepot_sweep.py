@@ -0,0 +1,91 @@
+"""
+BookDepot Sweep — tam katalog export'unu periyodik olarak çek, önceki snapshot ile farkla
+ve sadece değişen ISBN'leri Amazon'a karşı yeniden tara.
+
+  run_sweep(url)  → export'u diske stream et → bookdepot_store.import_csv_file (fiyat
+                    geçmişi + prev_price) → bu sweep'te görünmeyenleri pasifleştir →
+                    scan_queue.rescan_bookdepot() (yeni / fiyatı düşenler)
+  sweep_loop()    → startup'ta başlar; BOOKDEPOT_CATALOG_URL tanımlıysa her
+                    BOOKDEPOT_SWEEP_INTERVAL_S'de bir run_sweep()
+
+50k başlıklık bir katalogda maliyet: CSV'nin bir kez okunması + değişen satır sayısı
+kadar Amazon taraması.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import tempfile
+import time
+from typing import IO, Any, Dict, Optional
+
+import httpx
+
+from app import bookdepot_store
+from app.core.config import get_settings
+
+logger = logging.getLogger("trackerbundle.bookdepot_sweep")
+
+_last: Dict[str, Any] = {}
+
+
+async def _download(url: str, dest: IO[bytes]) -> int:
+    size = 0
+    async with httpx.AsyncClient(follow_redirects=True, timeout=httpx.Timeout(60.0, connect=15.0)) as c:
+        async with c.stream("GET", url) as r:
+            r.raise_for_status()
+            async for chunk in r.aiter_bytes():
+                dest.write(chunk)
+                size += len(chunk)
+    return size
+
+
+async def run_sweep(url: Optional[str] = None, rescan: bool = True) -> Dict[str, Any]:
+    """Tek sweep. URL yoksa ValueError, indirme hatasında httpx.HTTPError."""
+    url = url or get_settings().bookdepot_catalog_url
+    if not url:
+        raise ValueError("BOOKDEPOT_CATALOG_URL tanımlı değil")
+
+    t0 = time.time()
+    started = int(t0)
+    with tempfile.TemporaryFile("w+b") as tmp:
+        size = await _download(url, tmp)
+        tmp.seek(0)
+        stats: Dict[str, Any] = await asyncio.to_thread(bookdepot_store.import_csv_file, tmp, 1000, started)
+
+    # Boş / bozuk export tüm envanteri pasifleştirmesin
+    stats["deactivated"] = (
+        await asyncio.to_thread(bookdepot_store.deactivate_missing, started) if stats["imported"] else 0
+    )
+    stats["job_ids"] = []
+    if rescan:
+        from app import scan_queue
+        stats["job_ids"] = await scan_queue.rescan_bookdepot()
+    stats.update(bytes=size, duration_s=round(time.time() - t0, 1), finished_at=int(time.time()))
+
+    _last.clear()
+    _last.update(stats)
+    logger.info(
+        "bookdepot sweep: rows=%d new=%d dropped=%d deactivated=%d jobs=%d (%.1fs)",
+        stats["rows"], stats["new"], stats["price_dropped"], stats["deactivated"],
+        len(stats["job_ids"]), stats["duration_s"],
+    )
+    return stats
+
+
+async def sweep_loop() -> None:
+    s = get_settings()
+    interval = int(s.bookdepot_sweep_interval_s)
+    if interval <= 0 or not s.bookdepot_catalog_url:
+        return
+    while True:
+        try:
+            await run_sweep()
+        except Exception as e:
+            _last.update(error=str(e)[:200], failed_at=int(time.time()))
+            logger.warning("bookdepot sweep failed: %s", e)
+        await asyncio.sleep(interval)
+
+
+def status() -> Dict[str, Any]:
+    return dict(_last)
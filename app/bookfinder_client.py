@@ -6,15 +6,22 @@ Sources (parallel):
   BookFinder · AbeBooks · ThriftBooks · BetterWorldBooks
   Biblio · Alibris · GoodwillBooks · HPB (Half Price Books)
 
-Cache: 24 hours per ISBN
+Cache: (isbn, source) başına — marketplace 24h, perakende 12h, bulk seller 6h,
+boş/hatalı kaynak 1h. Sadece bayat/başarısız kaynaklar yeniden çekilir.
+
+fetch_bookfinder(budget_s=..., min_sources=...) deadline-aware çalışır: yeterli
+kaynak cevap verince veya bütçe dolunca döner; geç kalanlar arka planda cache'i
+günceller. Kaynak başına gecikme histogramı dar bütçelerde hangi kaynakların
+deneneceğini belirler.
 """
 from __future__ import annotations
-import asyncio, json, logging, random, re, time
+import asyncio, json, logging, random, re, sqlite3, time
 from pathlib import Path
 from typing import Optional
 import httpx
+from app.core.circuit_breaker import CircuitBreaker, CircuitOpenError, get_breaker
 from app.core.config import get_settings
-from app.core.json_store import file_lock, _read_unsafe, _write_unsafe
+from app import html_extract
 
 logger = logging.getLogger("trackerbundle.bookfinder")
 _CACHE_TTL_S = 24 * 3600  # 24 saat
@@ -75,31 +82,81 @@ def _source_urls(isbn: str) -> dict:
         "etsy":         f"https://www.etsy.com/search?q={isbn}",
     }
 
+# ── Cache: (isbn, source) başına ─────────────────────────────────────────────
+# Her kaynak kendi satırında, kendi TTL'iyle saklanır; okurken birleştirilir.
+# 13 kaynaktan 3'ü hata verirse sadece o 3'ü (kısa TTL sonunda) yeniden denenir.
+_SOURCE_TTL_S = {
+    # Bulk seller stokları hızlı döner
+    "bookpal": 6 * 3600, "bookdepot": 6 * 3600, "textbookrush": 6 * 3600,
+    "campusbooks": 6 * 3600, "chegg": 6 * 3600,
+    # Perakende
+    "thriftbooks": 12 * 3600, "bwb": 12 * 3600, "goodwill": 12 * 3600, "hpb": 12 * 3600,
+}                              # diğerleri (marketplace'ler) → _CACHE_TTL_S
+_EMPTY_TTL_S = 3600            # sonuç yok / parse edilemedi → 1 saat sonra yeniden dene
+_FORCE_MIN_AGE_S = 15 * 60     # force=True: son 15 dk'da başarıyla çekilen kaynak tekrar çekilmez
+_PRUNE_INTERVAL_S = 3600
+
+_schema_ready: set = set()
+_last_prune = 0.0
+
+
 def _cache_path() -> Path:
-    return get_settings().resolved_data_dir() / "bookfinder_cache.json"
+    return get_settings().resolved_data_dir() / "bookfinder_cache.db"
 
-def _cache_get(isbn: str) -> Optional[dict]:
-    try:
-        data = _read_unsafe(_cache_path(), default={"entries": {}})
-        entry = data.get("entries", {}).get(isbn)
-        if entry and time.time() - entry.get("ts", 0) < _CACHE_TTL_S:
-            return entry
-    except Exception:
-        pass
-    return None
 
-def _cache_set(isbn: str, result: dict) -> None:
+def _connect() -> sqlite3.Connection:
     p = _cache_path()
+    p.parent.mkdir(parents=True, exist_ok=True)
+    con = sqlite3.connect(p, timeout=10)
+    con.execute("PRAGMA synchronous=NORMAL;")
+    if str(p) not in _schema_ready:
+        con.execute("PRAGMA journal_mode=WAL;")
+        con.execute(
+            """
+            CREATE TABLE IF NOT EXISTS bf_source_cache (
+              isbn TEXT NOT NULL,
+              source TEXT NOT NULL,
+              fetched_at REAL NOT NULL,
+              data_json TEXT,                 -- NULL = kaynak sonuç döndürmedi
+              PRIMARY KEY (isbn, source)
+            );
+            """
+        )
+        _schema_ready.add(str(p))
+    return con
+
+
+def _ttl(source: str, has_data: bool) -> float:
+    return _SOURCE_TTL_S.get(source, _CACHE_TTL_S) if has_data else _EMPTY_TTL_S
+
+
+def _cache_get(isbn: str) -> dict:
+    """{source: (fetched_at, data | None)}"""
     try:
-        with file_lock(p):
-            data = _read_unsafe(p, default={"entries": {}})
-            now = time.time()
-            data["entries"] = {k: v for k, v in data.get("entries", {}).items()
-                               if now - v.get("ts", 0) < _CACHE_TTL_S * 4}
-            data["entries"][isbn] = {**result, "ts": int(now)}
-            _write_unsafe(p, data)
-    except Exception:
-        pass
+        with _connect() as con:
+            rows = con.execute(
+                "SELECT source, fetched_at, data_json FROM bf_source_cache WHERE isbn=?;", (isbn,)
+            ).fetchall()
+        return {src: (ts, json.loads(d) if d else None) for src, ts, d in rows}
+    except Exception as e:
+        logger.debug("bookfinder cache read err isbn=%s: %s", isbn, e)
+        return {}
+
+
+def _cache_set(isbn: str, source: str, data: Optional[dict]) -> None:
+    global _last_prune
+    now = time.time()
+    try:
+        with _connect() as con:
+            con.execute(
+                "INSERT OR REPLACE INTO bf_source_cache(isbn, source, fetched_at, data_json) VALUES(?,?,?,?);",
+                (isbn, source, now, json.dumps(data) if data else None),
+            )
+            if now - _last_prune > _PRUNE_INTERVAL_S:
+                _last_prune = now
+                con.execute("DELETE FROM bf_source_cache WHERE fetched_at < ?;", (now - _CACHE_TTL_S * 4,))
+    except Exception as e:
+        logger.debug("bookfinder cache write err isbn=%s source=%s: %s", isbn, source, e)
 
 def _ua() -> str: return random.choice(_UA)
 
@@ -138,7 +195,7 @@ def _is_new(cond_str: str) -> bool:
 
 def _jsonld_offers(html: str, seller: str, sid: str, default_ship: float = 0.0) -> list:
     offers = []
-    for blob in re.findall(r'<script[^>]+type=["\']application/ld\+json["\'][^>]*>(.*?)</script>', html, re.DOTALL):
+    for blob in html_extract.jsonld_blobs(html):
         try:
             d = json.loads(blob)
             raw = d.get("offers", [])
@@ -158,7 +215,7 @@ def _jsonld_offers(html: str, seller: str, sid: str, default_ship: float = 0.0)
 def _price_regex(html: str, seller: str, sid: str, ship: float = 0.0, cond: str = "USED", limit: int = 8) -> list:
     offers = []
     seen = set()
-    for m in re.finditer(r'(?:data-price|"price"|itemprop=["\']price["\'])["\s:=]+["\']?([\d]+\.[\d]{2})["\']?', html):
+    for m in html_extract.PRICE_ATTR.finditer(html):
         p = float(m.group(1))
         if 0.5 < p < 500 and p not in seen:
             seen.add(p)
@@ -166,6 +223,10 @@ def _price_regex(html: str, seller: str, sid: str, ship: float = 0.0, cond: str
             if len(offers) >= limit: break
     return offers
 
+def _parse_generic(html: str, seller: str, sid: str, ship: float = 0.0) -> list:
+    """JSON-LD offers; yoksa fiyat attribute regex'i."""
+    return _jsonld_offers(html, seller, sid, ship) or _price_regex(html, seller, sid, ship)
+
 def _stats(offers: list) -> Optional[dict]:
     if not offers: return None
     offers = sorted(offers, key=lambda x: x["total"])[:_MAX_OFFERS]
@@ -175,8 +236,7 @@ def _stats(offers: list) -> Optional[dict]:
 
 # ── Source 1: BookFinder ─────────────────────────────────────────────────────
 def _bf_rsc(html: str) -> Optional[dict]:
-    for chunk in re.findall(r'self\.__next_f\.push\(\[1,"(.*?)"\]\)', html, re.DOTALL):
-        if "newOffers" not in chunk and "usedOffers" not in chunk: continue
+    for chunk in html_extract.rsc_chunks(html, "newOffers", "usedOffers"):
         try:
             u = chunk.encode().decode("unicode_escape")
             idx = u.find("newOffers")
@@ -196,16 +256,36 @@ def _bf_rsc(html: str) -> Optional[dict]:
         except Exception: continue
     return None
 
-# Global IP block flag — 403/block tespit edilince diğer ISBN'leri deneme
-_bookfinder_ip_blocked = False
-_bookfinder_block_until = 0.0
+_BF_AFFILIATES = {"ABEBOOKS":"AbeBooks","ALIBRIS":"Alibris","BIBLIO":"Biblio",
+                  "THRIFTBOOKS":"ThriftBooks","BETTERWORLDBOOKS":"BetterWorldBooks"}
+
+def _parse_bookfinder(html: str) -> tuple:
+    """BookFinder sayfası → (new_offers, used_offers). Önce RSC payload, sonra JSON-LD."""
+    sr = _bf_rsc(html)
+    if sr:
+        def _po(o, cond):
+            p = float(o.get("priceInUsd") or 0)
+            s = float(o.get("shippingPriceInUsd") or 0)
+            if p <= 0: return None
+            aff = str(o.get("affiliate","BF"))
+            return _o(p, s, _BF_AFFILIATES.get(aff, aff.title()), aff, cond, "", str(o.get("conditionText",""))[:80])
+        new_o  = [x for x in [_po(o,"NEW")  for o in (sr.get("newOffers")  or [])] if x]
+        used_o = [x for x in [_po(o,"USED") for o in (sr.get("usedOffers") or [])] if x]
+        if new_o or used_o:
+            return new_o, used_o
+    jld = _jsonld_offers(html, "BookFinder", "BF")
+    return [o for o in jld if o["condition"]=="NEW"], [o for o in jld if o["condition"]!="NEW"]
+
+def _breaker(src: str) -> CircuitBreaker:
+    """Kaynak başına circuit breaker — 8s timeout'a yaklaşan yanıtlar da hata sayılır."""
+    return get_breaker(f"bookfinder.{src}", slow_call_s=6.0)
+
+
+_BF_BLOCK_S = 3600   # 403/429/503 → VPS IP engeli, 1 saat skip
 
 async def _src_bookfinder(c: httpx.AsyncClient, isbn: str) -> Optional[dict]:
-    global _bookfinder_ip_blocked, _bookfinder_block_until
-    import time as _t
-
-    # IP block aktifse skip et (1 saatlik cooldown)
-    if _bookfinder_ip_blocked and _t.time() < _bookfinder_block_until:
+    # IP block / art arda hata → circuit open, ağa çıkmadan skip
+    if _breaker("bookfinder").is_open():
         return None
 
     # Config flag: BOOKFINDER_ENABLED=false ile tamamen kapatılabilir
@@ -216,60 +296,49 @@ async def _src_bookfinder(c: httpx.AsyncClient, isbn: str) -> Optional[dict]:
     for url in [f"https://www.bookfinder.com/isbn/{isbn}/",
                 f"https://www.bookfinder.com/search/?keywords={isbn}&currency=USD&destination=us&mode=basic&lang=en&st=sh&ac=qr"]:
         try:
-            r = await c.get(url, headers=_hdrs(), timeout=8)
+            r = await _breaker("bookfinder").call(c.get, url, headers=_hdrs(), timeout=8)
             if r.status_code in (403, 429, 503):
-                _bookfinder_ip_blocked = True
-                _bookfinder_block_until = _t.time() + 3600  # 1 saat
+                _breaker("bookfinder").trip(f"http_{r.status_code}", open_s=_BF_BLOCK_S)
                 logger.warning("BookFinder IP engellendi (HTTP %d) — 1 saat skip edilecek", r.status_code)
                 return None
             if r.status_code != 200:
                 logger.warning("bookfinder non-200 url=%s status=%s", url, r.status_code)
                 continue
-            sr = _bf_rsc(r.text)
-            if sr:
-                def _po(o, cond):
-                    p = float(o.get("priceInUsd") or 0)
-                    s = float(o.get("shippingPriceInUsd") or 0)
-                    if p <= 0: return None
-                    aff = str(o.get("affiliate","BF"))
-                    return _o(p, s, {"ABEBOOKS":"AbeBooks","ALIBRIS":"Alibris","BIBLIO":"Biblio",
-                                     "THRIFTBOOKS":"ThriftBooks","BETTERWORLDBOOKS":"BetterWorldBooks"}.get(aff, aff.title()),
-                              aff, cond, "", str(o.get("conditionText",""))[:80])
-                new_o  = [x for x in [_po(o,"NEW")  for o in (sr.get("newOffers")  or [])] if x]
-                used_o = [x for x in [_po(o,"USED") for o in (sr.get("usedOffers") or [])] if x]
-                if new_o or used_o:
-                    return {"source":"bookfinder","new":_stats(new_o),"used":_stats(used_o),"url":url}
-            jld = _jsonld_offers(r.text, "BookFinder", "BF")
-            if jld:
-                new_o = [o for o in jld if o["condition"]=="NEW"]
-                used_o = [o for o in jld if o["condition"]!="NEW"]
+            new_o, used_o = await html_extract.run(_parse_bookfinder, r.text)
+            if new_o or used_o:
                 return {"source":"bookfinder","new":_stats(new_o),"used":_stats(used_o),"url":url}
+        except CircuitOpenError:
+            return None
         except Exception as e:
             logger.warning("bookfinder src err url=%s: %s", url, e)
     return None
 
 # ── Source 2: AbeBooks ───────────────────────────────────────────────────────
+def _parse_abebooks(html: str) -> list:
+    all_o = []
+    blob = html_extract.utag_data(html)
+    if blob:
+        try:
+            d = json.loads(blob)
+            for i, ps in enumerate(d.get("product_price", [])):
+                p  = float(str(ps).replace(",","").replace("$",""))
+                s  = float(str((d.get("product_shipping") or [])[i:i+1][0] if d.get("product_shipping") else 0).replace(",","").replace("$",""))
+                raw_cd = str((d.get("product_condition") or [])[i:i+1][0] if d.get("product_condition") else "used")
+                cd = raw_cd.lower()
+                if p > 0: all_o.append(_o(p, s, "AbeBooks", "ABEBOOKS", "NEW" if _is_new(cd) else "USED"))
+        except Exception: pass
+    if not all_o:
+        all_o = _jsonld_offers(html, "AbeBooks", "ABEBOOKS")
+    if not all_o:
+        all_o = _price_regex(html, "AbeBooks", "ABEBOOKS", 0.0)
+    return all_o
+
 async def _src_abebooks(c: httpx.AsyncClient, isbn: str) -> Optional[dict]:
     url = f"https://www.abebooks.com/servlet/SearchResults?isbn={isbn}&n=100121503"
     try:
-        r = await c.get(url, headers=_hdrs("https://www.abebooks.com/"), timeout=8)
+        r = await _breaker("abebooks").call(c.get, url, headers=_hdrs("https://www.abebooks.com/"), timeout=8)
         if r.status_code != 200: return None
-        all_o = []
-        m = re.search(r'window\.utag_data\s*=\s*(\{.*?\});\s*</script>', r.text, re.DOTALL)
-        if m:
-            try:
-                d = json.loads(m.group(1))
-                for i, ps in enumerate(d.get("product_price", [])):
-                    p  = float(str(ps).replace(",","").replace("$",""))
-                    s  = float(str((d.get("product_shipping") or [])[i:i+1][0] if d.get("product_shipping") else 0).replace(",","").replace("$",""))
-                    raw_cd = str((d.get("product_condition") or [])[i:i+1][0] if d.get("product_condition") else "used")
-                    cd = raw_cd.lower()
-                    if p > 0: all_o.append(_o(p, s, "AbeBooks", "ABEBOOKS", "NEW" if _is_new(cd) else "USED"))
-            except Exception: pass
-        if not all_o:
-            all_o = _jsonld_offers(r.text, "AbeBooks", "ABEBOOKS")
-        if not all_o:
-            all_o = _price_regex(r.text, "AbeBooks", "ABEBOOKS", 0.0)
+        all_o = await html_extract.run(_parse_abebooks, r.text)
         if not all_o: return None
         return {"source":"abebooks","new":_stats([o for o in all_o if o["condition"]=="NEW"]),
                 "used":_stats([o for o in all_o if o["condition"]!="NEW"]),"url":url}
@@ -280,10 +349,9 @@ async def _src_abebooks(c: httpx.AsyncClient, isbn: str) -> Optional[dict]:
 async def _src_thriftbooks(c: httpx.AsyncClient, isbn: str) -> Optional[dict]:
     url = f"https://www.thriftbooks.com/isbn/{isbn}/"
     try:
-        r = await c.get(url, headers=_hdrs("https://www.thriftbooks.com/"), timeout=8)
+        r = await _breaker("thriftbooks").call(c.get, url, headers=_hdrs("https://www.thriftbooks.com/"), timeout=8)
         if r.status_code != 200: return None
-        all_o = _jsonld_offers(r.text, "ThriftBooks", "THRIFTBOOKS")
-        if not all_o: all_o = _price_regex(r.text, "ThriftBooks", "THRIFTBOOKS", 0)
+        all_o = await html_extract.run(_parse_generic, r.text, "ThriftBooks", "THRIFTBOOKS", 0)
         if not all_o: return None
         return {"source":"thriftbooks","new":_stats([o for o in all_o if o["condition"]=="NEW"]),
                 "used":_stats([o for o in all_o if o["condition"]!="NEW"]),"url":url}
@@ -294,10 +362,9 @@ async def _src_thriftbooks(c: httpx.AsyncClient, isbn: str) -> Optional[dict]:
 async def _src_bwb(c: httpx.AsyncClient, isbn: str) -> Optional[dict]:
     url = f"https://www.betterworldbooks.com/search/results?q={isbn}"
     try:
-        r = await c.get(url, headers=_hdrs("https://www.betterworldbooks.com/"), timeout=8)
+        r = await _breaker("bwb").call(c.get, url, headers=_hdrs("https://www.betterworldbooks.com/"), timeout=8)
         if r.status_code != 200: return None
-        all_o = _jsonld_offers(r.text, "BetterWorldBooks", "BETTERWORLDBOOKS")
-        if not all_o: all_o = _price_regex(r.text, "BetterWorldBooks", "BETTERWORLDBOOKS", 0)
+        all_o = await html_extract.run(_parse_generic, r.text, "BetterWorldBooks", "BETTERWORLDBOOKS", 0)
         if not all_o: return None
         return {"source":"bwb","new":_stats([o for o in all_o if o["condition"]=="NEW"]),
                 "used":_stats([o for o in all_o if o["condition"]!="NEW"]),"url":url}
@@ -308,10 +375,9 @@ async def _src_bwb(c: httpx.AsyncClient, isbn: str) -> Optional[dict]:
 async def _src_biblio(c: httpx.AsyncClient, isbn: str) -> Optional[dict]:
     url = f"https://www.biblio.com/search/?q={isbn}&type=isbn"
     try:
-        r = await c.get(url, headers=_hdrs("https://www.biblio.com/"), timeout=8)
+        r = await _breaker("biblio").call(c.get, url, headers=_hdrs("https://www.biblio.com/"), timeout=8)
         if r.status_code != 200: return None
-        all_o = _jsonld_offers(r.text, "Biblio", "BIBLIO")
-        if not all_o: all_o = _price_regex(r.text, "Biblio", "BIBLIO", 0.0)
+        all_o = await html_extract.run(_parse_generic, r.text, "Biblio", "BIBLIO", 0.0)
         if not all_o: return None
         return {"source":"biblio","new":_stats([o for o in all_o if o["condition"]=="NEW"]),
                 "used":_stats([o for o in all_o if o["condition"]!="NEW"]),"url":url}
@@ -322,10 +388,9 @@ async def _src_biblio(c: httpx.AsyncClient, isbn: str) -> Optional[dict]:
 async def _src_alibris(c: httpx.AsyncClient, isbn: str) -> Optional[dict]:
     url = f"https://www.alibris.com/search/books/isbn/{isbn}"
     try:
-        r = await c.get(url, headers=_hdrs("https://www.alibris.com/"), timeout=8)
+        r = await _breaker("alibris").call(c.get, url, headers=_hdrs("https://www.alibris.com/"), timeout=8)
         if r.status_code != 200: return None
-        all_o = _jsonld_offers(r.text, "Alibris", "ALIBRIS")
-        if not all_o: all_o = _price_regex(r.text, "Alibris", "ALIBRIS", 0)
+        all_o = await html_extract.run(_parse_generic, r.text, "Alibris", "ALIBRIS", 0)
         if not all_o: return None
         return {"source":"alibris","new":_stats([o for o in all_o if o["condition"]=="NEW"]),
                 "used":_stats([o for o in all_o if o["condition"]!="NEW"]),"url":url}
@@ -333,20 +398,21 @@ async def _src_alibris(c: httpx.AsyncClient, isbn: str) -> Optional[dict]:
         logger.debug("alibris err=%s", e); return None
 
 # ── Source 7: GoodwillBooks ──────────────────────────────────────────────────
+def _parse_goodwill(html: str) -> list:
+    all_o = _jsonld_offers(html, "GoodwillBooks", "GOODWILL")
+    if not all_o:
+        # Goodwill uses Shopify — look for product JSON (prices in cents)
+        all_o = [_o(p, 0.0, "GoodwillBooks", "GOODWILL", "USED")
+                 for p in html_extract.find_prices(html_extract.PRICE_JSON_CENTS, html, 0.5, 500, 6, scale=0.01)]
+    if not all_o: all_o = _price_regex(html, "GoodwillBooks", "GOODWILL", 0.0)
+    return all_o
+
 async def _src_goodwill(c: httpx.AsyncClient, isbn: str) -> Optional[dict]:
     url = f"https://www.goodwillbooks.com/search?query={isbn}"
     try:
-        r = await c.get(url, headers=_hdrs("https://www.goodwillbooks.com/"), timeout=8)
+        r = await _breaker("goodwill").call(c.get, url, headers=_hdrs("https://www.goodwillbooks.com/"), timeout=8)
         if r.status_code != 200: return None
-        all_o = _jsonld_offers(r.text, "GoodwillBooks", "GOODWILL")
-        if not all_o:
-            # Goodwill uses Shopify — look for product JSON
-            for m in re.finditer(r'"price":\s*"?(\d+)"?', r.text):
-                p = float(m.group(1)) / 100  # Shopify prices in cents
-                if 0.5 < p < 500:
-                    all_o.append(_o(p, 0.0, "GoodwillBooks", "GOODWILL", "USED"))
-                    if len(all_o) >= 6: break
-        if not all_o: all_o = _price_regex(r.text, "GoodwillBooks", "GOODWILL", 0.0)
+        all_o = await html_extract.run(_parse_goodwill, r.text)
         if not all_o: return None
         return {"source":"goodwill","new":_stats([o for o in all_o if o["condition"]=="NEW"]),
                 "used":_stats([o for o in all_o if o["condition"]!="NEW"]),"url":url}
@@ -354,20 +420,21 @@ async def _src_goodwill(c: httpx.AsyncClient, isbn: str) -> Optional[dict]:
         logger.debug("goodwill err=%s", e); return None
 
 # ── Source 8: HPB (Half Price Books) ────────────────────────────────────────
+def _parse_hpb(html: str) -> list:
+    all_o = _jsonld_offers(html, "HPB", "HPB")
+    if not all_o:
+        # HPB Shopify — prices in cents
+        all_o = [_o(p, 0.0, "Half Price Books", "HPB", "USED")
+                 for p in html_extract.find_prices(html_extract.PRICE_JSON_INT, html, 0.5, 500, 6, scale=0.01)]
+    if not all_o: all_o = _price_regex(html, "Half Price Books", "HPB", 0.0)
+    return all_o
+
 async def _src_hpb(c: httpx.AsyncClient, isbn: str) -> Optional[dict]:
     url = f"https://www.hpb.com/search?q={isbn}&type=product"
     try:
-        r = await c.get(url, headers=_hdrs("https://www.hpb.com/"), timeout=8)
+        r = await _breaker("hpb").call(c.get, url, headers=_hdrs("https://www.hpb.com/"), timeout=8)
         if r.status_code != 200: return None
-        all_o = _jsonld_offers(r.text, "HPB", "HPB")
-        if not all_o:
-            # HPB Shopify — prices in cents
-            for m in re.finditer(r'"price":\s*(\d+)', r.text):
-                p = float(m.group(1)) / 100
-                if 0.5 < p < 500:
-                    all_o.append(_o(p, 0.0, "Half Price Books", "HPB", "USED"))
-                    if len(all_o) >= 6: break
-        if not all_o: all_o = _price_regex(r.text, "Half Price Books", "HPB", 0.0)
+        all_o = await html_extract.run(_parse_hpb, r.text)
         if not all_o: return None
         return {"source":"hpb","new":_stats([o for o in all_o if o["condition"]=="NEW"]),
                 "used":_stats([o for o in all_o if o["condition"]!="NEW"]),"url":url}
@@ -381,11 +448,9 @@ async def _src_bookpal(c: httpx.AsyncClient, isbn: str) -> Optional[dict]:
     """BookPal — bulk/wholesale new books, typically case-quantity discounts."""
     url = f"https://www.bookpal.com/search?q={isbn}"
     try:
-        r = await c.get(url, headers=_hdrs("https://www.bookpal.com/"), timeout=8)
+        r = await _breaker("bookpal").call(c.get, url, headers=_hdrs("https://www.bookpal.com/"), timeout=8)
         if r.status_code != 200: return None
-        all_o = _jsonld_offers(r.text, "BookPal", "BOOKPAL")
-        if not all_o:
-            all_o = _price_regex(r.text, "BookPal", "BOOKPAL", 0.0)
+        all_o = await html_extract.run(_parse_generic, r.text, "BookPal", "BOOKPAL", 0.0)
         if not all_o: return None
         return {"source": "bookpal",
                 "new":  _stats([o for o in all_o if o["condition"] == "NEW"]),
@@ -395,20 +460,22 @@ async def _src_bookpal(c: httpx.AsyncClient, isbn: str) -> Optional[dict]:
         logger.debug("bookpal err=%s", e); return None
 
 
+def _parse_bookdepot(html: str) -> list:
+    all_o = _jsonld_offers(html, "BookDepot", "BOOKDEPOT")
+    if not all_o:
+        # BookDepot uses span class="price" or data-price attrs
+        all_o = [_o(p, 0.0, "BookDepot", "BOOKDEPOT", "NEW")
+                 for p in html_extract.find_prices(html_extract.DOLLAR, html, 0.5, 300, 8)]
+    return all_o
+
+
 async def _src_bookdepot(c: httpx.AsyncClient, isbn: str) -> Optional[dict]:
     """BookDepot — Canadian bulk seller, deeply discounted remainders & overstock."""
     url = f"https://www.bookdepot.com/Store/Search.aspx?q={isbn}"
     try:
-        r = await c.get(url, headers=_hdrs("https://www.bookdepot.com/"), timeout=8)
+        r = await _breaker("bookdepot").call(c.get, url, headers=_hdrs("https://www.bookdepot.com/"), timeout=8)
         if r.status_code != 200: return None
-        all_o = _jsonld_offers(r.text, "BookDepot", "BOOKDEPOT")
-        if not all_o:
-            # BookDepot uses span class="price" or data-price attrs
-            for m in re.finditer(r'\$\s*([\d]+\.[\d]{2})', r.text):
-                p = float(m.group(1))
-                if 0.5 < p < 300:
-                    all_o.append(_o(p, 0.0, "BookDepot", "BOOKDEPOT", "NEW"))
-                    if len(all_o) >= 8: break
+        all_o = await html_extract.run(_parse_bookdepot, r.text)
         if not all_o: return None
         return {"source": "bookdepot",
                 "new":  _stats([o for o in all_o if o["condition"] == "NEW"]),
@@ -422,11 +489,9 @@ async def _src_textbookrush(c: httpx.AsyncClient, isbn: str) -> Optional[dict]:
     """TextbookRush — textbook buyback + used textbooks, good for academic ISBNs."""
     url = f"https://www.textbookrush.com/search?q={isbn}"
     try:
-        r = await c.get(url, headers=_hdrs("https://www.textbookrush.com/"), timeout=8)
+        r = await _breaker("textbookrush").call(c.get, url, headers=_hdrs("https://www.textbookrush.com/"), timeout=8)
         if r.status_code != 200: return None
-        all_o = _jsonld_offers(r.text, "TextbookRush", "TBR")
-        if not all_o:
-            all_o = _price_regex(r.text, "TextbookRush", "TBR", 3.99)
+        all_o = await html_extract.run(_parse_generic, r.text, "TextbookRush", "TBR", 3.99)
         if not all_o: return None
         return {"source": "textbookrush",
                 "new":  _stats([o for o in all_o if o["condition"] == "NEW"]),
@@ -440,11 +505,9 @@ async def _src_campusbooks(c: httpx.AsyncClient, isbn: str) -> Optional[dict]:
     """CampusBooks — price comparison aggregator for textbooks (new + used + rental)."""
     url = f"https://www.campusbooks.com/search/{isbn}"
     try:
-        r = await c.get(url, headers=_hdrs("https://www.campusbooks.com/"), timeout=8)
+        r = await _breaker("campusbooks").call(c.get, url, headers=_hdrs("https://www.campusbooks.com/"), timeout=8)
         if r.status_code != 200: return None
-        all_o = _jsonld_offers(r.text, "CampusBooks", "CB")
-        if not all_o:
-            all_o = _price_regex(r.text, "CampusBooks", "CB", 3.99)
+        all_o = await html_extract.run(_parse_generic, r.text, "CampusBooks", "CB", 3.99)
         if not all_o: return None
         return {"source": "campusbooks",
                 "new":  _stats([o for o in all_o if o["condition"] == "NEW"]),
@@ -454,20 +517,22 @@ async def _src_campusbooks(c: httpx.AsyncClient, isbn: str) -> Optional[dict]:
         logger.debug("campusbooks err=%s", e); return None
 
 
+def _parse_chegg(html: str) -> list:
+    all_o = _jsonld_offers(html, "Chegg", "CHEGG")
+    if not all_o:
+        # Chegg uses JSON data in script tags
+        all_o = [_o(p, 0.0, "Chegg", "CHEGG", "USED")
+                 for p in html_extract.find_prices(html_extract.PRICE_JSON_DECIMAL, html, 0.5, 400, 6)]
+    return all_o
+
+
 async def _src_chegg(c: httpx.AsyncClient, isbn: str) -> Optional[dict]:
     """Chegg — textbook rental + used sales, strong for college textbooks."""
     url = f"https://www.chegg.com/search?q={isbn}"
     try:
-        r = await c.get(url, headers=_hdrs("https://www.chegg.com/"), timeout=8)
+        r = await _breaker("chegg").call(c.get, url, headers=_hdrs("https://www.chegg.com/"), timeout=8)
         if r.status_code != 200: return None
-        all_o = _jsonld_offers(r.text, "Chegg", "CHEGG")
-        if not all_o:
-            # Chegg uses JSON data in script tags
-            for m in re.finditer(r'"price"\s*:\s*"?([\d]+\.[\d]{2})"?', r.text):
-                p = float(m.group(1))
-                if 0.5 < p < 400:
-                    all_o.append(_o(p, 0.0, "Chegg", "CHEGG", "USED"))
-                    if len(all_o) >= 6: break
+        all_o = await html_extract.run(_parse_chegg, r.text)
         if not all_o: return None
         return {"source": "chegg",
                 "new":  _stats([o for o in all_o if o["condition"] == "NEW"]),
@@ -477,6 +542,106 @@ async def _src_chegg(c: httpx.AsyncClient, isbn: str) -> Optional[dict]:
         logger.debug("chegg err=%s", e); return None
 
 
+# ── Source registry + gecikme histogramları ─────────────────────────────────
+_SOURCES = [
+    ("bookfinder",   _src_bookfinder),
+    ("abebooks",     _src_abebooks),
+    ("thriftbooks",  _src_thriftbooks),
+    ("bwb",          _src_bwb),
+    ("biblio",       _src_biblio),
+    ("alibris",      _src_alibris),
+    ("goodwill",     _src_goodwill),
+    ("hpb",          _src_hpb),
+    # Bulk sellers
+    ("bookpal",      _src_bookpal),
+    ("bookdepot",    _src_bookdepot),
+    ("textbookrush", _src_textbookrush),
+    ("campusbooks",  _src_campusbooks),
+    ("chegg",        _src_chegg),
+]
+
+# Saf sayfa parser'ları (html → offers) — scripts/bench_html_extract.py bunları ölçer
+PARSERS = {
+    "bookfinder":   lambda h: [o for part in _parse_bookfinder(h) for o in part],
+    "abebooks":     _parse_abebooks,
+    "thriftbooks":  lambda h: _parse_generic(h, "ThriftBooks", "THRIFTBOOKS", 0),
+    "bwb":          lambda h: _parse_generic(h, "BetterWorldBooks", "BETTERWORLDBOOKS", 0),
+    "biblio":       lambda h: _parse_generic(h, "Biblio", "BIBLIO", 0.0),
+    "alibris":      lambda h: _parse_generic(h, "Alibris", "ALIBRIS", 0),
+    "goodwill":     _parse_goodwill,
+    "hpb":          _parse_hpb,
+    "bookpal":      lambda h: _parse_generic(h, "BookPal", "BOOKPAL", 0.0),
+    "bookdepot":    _parse_bookdepot,
+    "textbookrush": lambda h: _parse_generic(h, "TextbookRush", "TBR", 3.99),
+    "campusbooks":  lambda h: _parse_generic(h, "CampusBooks", "CB", 3.99),
+    "chegg":        _parse_chegg,
+}
+
+_LAT_BUCKETS = (0.25, 0.5, 1.0, 2.0, 4.0, 8.0, float("inf"))   # saniye üst sınırları
+_LAT_MIN_SAMPLES = 5     # daha az örnekli kaynak bütçeden bağımsız denenir
+_LAT_DECAY = 0.98        # her yeni örnekte eski sayımlar sönümlenir → yakın geçmiş ağırlıklı
+_LAT_EXPLORE_P = 0.05
+
+_latency: dict = {}      # source → [bucket ağırlıkları]
+_samples: dict = {}      # source → toplam örnek sayısı
+_background: set = set()
+
+
+def _observe(source: str, elapsed: float) -> None:
+    h = _latency.setdefault(source, [0.0] * len(_LAT_BUCKETS))
+    for i in range(len(h)):
+        h[i] *= _LAT_DECAY
+    h[next(i for i, ub in enumerate(_LAT_BUCKETS) if elapsed <= ub)] += 1.0
+    _samples[source] = _samples.get(source, 0) + 1
+
+
+def latency_quantile(source: str, q: float = 0.9) -> Optional[float]:
+    """Histogramdan q-quantile üst sınırı (bucket çözünürlüğünde). Yetersiz örnek → None."""
+    h = _latency.get(source)
+    if not h or _samples.get(source, 0) < _LAT_MIN_SAMPLES:
+        return None
+    target, acc = q * sum(h), 0.0
+    for ub, w in zip(_LAT_BUCKETS, h):
+        acc += w
+        if acc >= target:
+            return ub
+    return _LAT_BUCKETS[-1]
+
+
+def _select_sources(budget_s: Optional[float]) -> list:
+    """
+    Bütçe varsa p90'ı bütçeyi aşan kaynakları ele (en az 3 kaynak her zaman denenir).
+    Elenen kaynaklar _LAT_EXPLORE_P olasılıkla yine denenir — histogram güncel kalsın.
+    """
+    if not budget_s:
+        return list(_SOURCES)
+    fits = [(n, f) for n, f in _SOURCES
+            if (latency_quantile(n) or 0.0) <= budget_s or random.random() < _LAT_EXPLORE_P]
+    if len(fits) >= 3:
+        return fits
+    ranked = sorted(_SOURCES, key=lambda nf: latency_quantile(nf[0]) or 0.0)
+    return ranked[:3]
+
+
+async def _timed(source: str, fn, client: httpx.AsyncClient, isbn: str) -> Optional[dict]:
+    t0 = time.monotonic()
+    try:
+        return await fn(client, isbn)
+    finally:
+        _observe(source, time.monotonic() - t0)
+
+
+def latency_snapshot() -> dict:
+    return {
+        src: {
+            "samples": _samples.get(src, 0),
+            "p50_le_s": latency_quantile(src, 0.5),
+            "p90_le_s": latency_quantile(src, 0.9),
+        }
+        for src, _ in _SOURCES
+    }
+
+
 # ── Merge ─────────────────────────────────────────────────────────────────────
 def _merge(results: list) -> tuple[list, list]:
     new_all, used_all = [], []
@@ -493,59 +658,89 @@ def _merge(results: list) -> tuple[list, list]:
             sorted(used_all, key=lambda x: x["total"])[:_MAX_OFFERS])
 
 # ── Main entry ───────────────────────────────────────────────────────────────
-async def fetch_bookfinder(isbn: str, condition: str = "all", force: bool = False) -> dict:
-    """condition: 'all' | 'new' | 'used'"""
+async def fetch_bookfinder(
+    isbn: str,
+    condition: str = "all",
+    force: bool = False,
+    budget_s: Optional[float] = None,
+    min_sources: Optional[int] = None,
+) -> dict:
+    """
+    condition: 'all' | 'new' | 'used'
+    force:       TTL'i yok say — ama son _FORCE_MIN_AGE_S içinde başarıyla çekilen kaynaklar
+                 tekrar çekilmez.
+    budget_s:    gecikme bütçesi — süre dolunca o ana kadar cevap veren kaynaklarla dön.
+                 Verilirse p90 gecikmesi bütçeyi aşan kaynaklar hiç denenmez.
+    min_sources: (cache'tekiler dahil) bu kadar kaynak sonucu olunca beklemeden dön.
+    Geç kalan kaynaklar arka planda tamamlanır ve kendi cache satırlarını günceller.
+    None/None → tüm bayat kaynaklar beklenir.
+    """
     isbn_clean = re.sub(r"[^0-9X]", "", isbn.upper().strip())
+    now = time.time()
+
+    def _fresh(src: str, entry) -> bool:
+        ts, data = entry
+        if force:
+            return data is not None and now - ts < _FORCE_MIN_AGE_S
+        return now - ts < _ttl(src, data is not None)
+
+    cached = {src: e for src, e in _cache_get(isbn_clean).items() if _fresh(src, e)}
+    have = [data for _, data in cached.values() if data]
+    oldest = int(now - min((ts for ts, _ in cached.values()), default=now))
+    to_fetch = [(n, f) for n, f in _select_sources(budget_s) if n not in cached]
 
-    if not force:
-        cached = _cache_get(isbn_clean)
-        if cached:
-            age = int(time.time() - cached.get("ts", time.time()))
-            result = {**cached, "cached": True, "cache_age_s": age}
-            # Apply condition filter on cached result too
-            if condition == "new":
-                result = {**result, "used": None}
-            elif condition == "used":
-                result = {**result, "new": None}
-            # Update cheapest after filter
-            all_offers = []
-            if result.get("new"): all_offers += result["new"].get("offers", [])
-            if result.get("used"): all_offers += result["used"].get("offers", [])
-            if all_offers:
-                all_offers.sort(key=lambda x: x["total"])
-                result["cheapest"] = all_offers[0]["total"]
-                result["total_offers"] = len(all_offers)
-            return result
+    if not to_fetch:
+        out = _build_result(isbn_clean, condition, have, tried=len(cached))
+        return {**out, "cached": True, "cache_age_s": oldest}
 
     # rate limit sleep kaldırıldı — kaynaklar paralel çalışıyor
+    client = httpx.AsyncClient(follow_redirects=True, timeout=12)
+    tasks = {asyncio.create_task(_fetch_source(name, fn, client, isbn_clean)): name for name, fn in to_fetch}
+
+    deadline = time.monotonic() + budget_s if budget_s else None
+    need = len(tasks) if not min_sources else min(max(0, min_sources - len(have)), len(tasks))
+    pending = set(tasks)
+    answered = 0
+    while pending and answered < need:
+        timeout = None if deadline is None else deadline - time.monotonic()
+        if timeout is not None and timeout <= 0:
+            break
+        done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+        if not done:
+            break
+        answered += sum(1 for t in done if not t.exception() and t.result())
+
+    fetched = [t.result() for t in tasks if t.done() and not t.exception() and t.result()]
+    out = _build_result(isbn_clean, condition, have + fetched, tried=len(cached) + len(tasks))
+    out["cached"] = False
+    out["cache_age_s"] = oldest
+    out["cached_sources"] = sorted(d["source"] for d in have)
+    if pending:
+        # Geç kalan kaynaklar arka planda biter, cache satırlarını kendileri yazar
+        out["late_sources"] = sorted(tasks[t] for t in pending)
+        bg = asyncio.create_task(_finish_late(isbn_clean, pending, client))
+        _background.add(bg)
+        bg.add_done_callback(_background.discard)
+    else:
+        await client.aclose()
+    return out
 
-    async with httpx.AsyncClient(follow_redirects=True, timeout=12) as client:
-        tasks = await asyncio.gather(
-            _src_bookfinder(client, isbn_clean),
-            _src_abebooks(client, isbn_clean),
-            _src_thriftbooks(client, isbn_clean),
-            _src_bwb(client, isbn_clean),
-            _src_biblio(client, isbn_clean),
-            _src_alibris(client, isbn_clean),
-            _src_goodwill(client, isbn_clean),
-            _src_hpb(client, isbn_clean),
-            # Bulk sellers
-            _src_bookpal(client, isbn_clean),
-            _src_bookdepot(client, isbn_clean),
-            _src_textbookrush(client, isbn_clean),
-            _src_campusbooks(client, isbn_clean),
-            _src_chegg(client, isbn_clean),
-            return_exceptions=True,
-        )
 
-    results = [r for r in tasks if isinstance(r, dict) and r]
+async def _fetch_source(name: str, fn, client: httpx.AsyncClient, isbn: str) -> Optional[dict]:
+    """Kaynağı çek ve (isbn, source) satırına yaz. Circuit açıksa boş sonuç cache'lenmez."""
+    data = await _timed(name, fn, client, isbn)
+    if data or not get_breaker(f"bookfinder.{name}").is_open():
+        _cache_set(isbn, name, data or None)
+    return data
+
+
+def _build_result(isbn_clean: str, condition: str, results: list, tried: int) -> dict:
     sources_ok = [r["source"] for r in results]
     logger.info("bookfinder isbn=%s sources=%s", isbn_clean, sources_ok)
 
     if not results:
-        exceptions = [str(r) for r in tasks if isinstance(r, Exception)]
-        logger.warning("bookfinder all failed isbn=%s exceptions=%s", isbn_clean, exceptions[:3])
-        return {"ok": False, "error": "Tüm kaynaklar başarısız", "isbn": isbn_clean, "tried": 13, "hint": "VPS IP engellenmiş olabilir"}
+        logger.warning("bookfinder all failed isbn=%s tried=%d", isbn_clean, tried)
+        return {"ok": False, "error": "Tüm kaynaklar başarısız", "isbn": isbn_clean, "tried": tried, "hint": "VPS IP engellenmiş olabilir"}
 
     new_o, used_o = _merge(results)
 
@@ -560,7 +755,7 @@ async def fetch_bookfinder(isbn: str, condition: str = "all", force: bool = Fals
     cheapest = min(all_t) if all_t else None
 
     urls = _source_urls(isbn_clean)
-    out = {
+    return {
         "ok":           True,
         "isbn":         isbn_clean,
         "condition":    condition,
@@ -576,5 +771,12 @@ async def fetch_bookfinder(isbn: str, condition: str = "all", force: bool = Fals
         "cached":       False,
         "cache_age_s":  0,
     }
-    _cache_set(isbn_clean, out)
-    return out
+
+
+async def _finish_late(isbn_clean: str, pending: set, client: httpx.AsyncClient) -> None:
+    try:
+        await asyncio.wait(pending)
+    except Exception as e:
+        logger.debug("bookfinder late sources isbn=%s: %s", isbn_clean, e)
+    finally:
+        await client.aclose()
@@ -32,6 +32,7 @@ from typing import Any, Dict, List, Optional
 
 import httpx
 
+from app.core.circuit_breaker import CircuitOpenError, get_breaker
 from app.core.config import get_settings
 from app.core.json_store import file_lock, _read_unsafe, _write_unsafe
 
@@ -90,7 +91,8 @@ async def _fetch_bookscouter(isbn: str, client: httpx.AsyncClient) -> List[Dict]
         return []
 
     try:
-        r = await client.get(
+        r = await get_breaker("buyback.bookscouter").call(
+            client.get,
             f"https://api.bookscouter.com/v1/book/{isbn}/prices",
             params={"type": "sell"},
             headers={
@@ -141,6 +143,8 @@ async def _fetch_bookscouter(isbn: str, client: httpx.AsyncClient) -> List[Dict]
 
         return sorted(offers, key=lambda x: x["cash"], reverse=True)
 
+    except CircuitOpenError:
+        return []
     except Exception as e:
         logger.warning("BookScouter fetch error isbn=%s: %s", isbn, e)
         return []
@@ -161,7 +165,8 @@ async def _fetch_booksrun(isbn: str, client: httpx.AsyncClient) -> List[Dict]:
         return []
 
     try:
-        r = await client.get(
+        r = await get_breaker("buyback.booksrun").call(
+            client.get,
             f"https://booksrun.com/api/price/sell/{isbn}",
             params={"key": key},
             headers={"Accept": "application/json"},
@@ -200,6 +205,8 @@ async def _fetch_booksrun(isbn: str, client: httpx.AsyncClient) -> List[Dict]:
             "source": "booksrun_api",
         }]
 
+    except CircuitOpenError:
+        return []
     except Exception as e:
         logger.warning("BooksRun fetch error isbn=%s: %s", isbn, e)
         return []
@@ -377,7 +384,8 @@ async def get_buyback_price_trend(isbn: str) -> Dict[str, Any]:
             # BookScouter history endpoint resmi dokümanda yok.
             # /v1/book/{isbn}/prices?type=sell mevcut current fiyatları döndürür.
             # Trend için tek anlık veri yeterli değil — "stable" döndür.
-            r = await client.get(
+            r = await get_breaker("buyback.bookscouter").call(
+                client.get,
                 f"https://api.bookscouter.com/v1/book/{isbn13}/prices",
                 params={"type": "sell"},
                 headers={"x-api-key": key},
@@ -501,7 +509,7 @@ async def _fetch_valore(isbn: str, client: httpx.AsyncClient) -> List[Dict]:
         req_obj = AWSRequest(method="GET", url=endpoint, headers={"Host": host})
         SigV4Auth(creds, "execute-api", "us-east-1").add_auth(req_obj)
 
-        r = await client.get(endpoint, headers=dict(req_obj.headers), timeout=10)
+        r = await get_breaker("buyback.valore").call(client.get, endpoint, headers=dict(req_obj.headers), timeout=10)
         if r.status_code == 200:
             price = float(r.json().get("price") or 0)
             if price > 0:
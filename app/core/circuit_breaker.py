@@ -0,0 +1,171 @@
+"""
+Circuit breaker — upstream kaynak başına (BookFinder, buyback API'leri, eBay sold
+scrape, Serper/SerpAPI, NYT, Hardcover).
+
+  closed     → istekler geçer; art arda `failure_threshold` hata (exception,
+               403/429/5xx veya `slow_call_s`'yi aşan yanıt) → open
+  open       → istekler ağa çıkmadan CircuitOpenError ile reddedilir;
+               `open_s` sonra half_open
+  half_open  → tek probe isteğine izin verilir: başarılı → closed,
+               başarısız → tekrar open (open_s ikiye katlanır, max_open_s'e kadar)
+
+Kullanım:
+    r = await get_breaker("bookfinder.abebooks").call(client.get, url, timeout=8)
+    get_breaker("bookfinder.bookfinder").trip("http_403", open_s=3600)   # IP block
+
+State process-local'dir (API ve scan worker ayrı breaker tutar); /status snapshot_all() gösterir.
+"""
+from __future__ import annotations
+
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from app.core.config import get_settings
+
+logger = logging.getLogger("trackerbundle.circuit")
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+FAILURE_STATUSES = frozenset({401, 403, 429})   # + tüm 5xx
+
+
+class CircuitOpenError(Exception):
+    def __init__(self, name: str, retry_in_s: float):
+        super().__init__(f"circuit_open:{name} (retry in {retry_in_s:.0f}s)")
+        self.name = name
+        self.retry_in_s = retry_in_s
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: Optional[int] = None,
+        open_s: Optional[float] = None,
+        max_open_s: float = 1800.0,
+        slow_call_s: Optional[float] = None,
+    ):
+        s = get_settings()
+        self.name = name
+        self.failure_threshold = int(failure_threshold or s.circuit_failure_threshold)
+        self.base_open_s = float(open_s or s.circuit_open_s)
+        self.max_open_s = max(float(max_open_s), self.base_open_s)
+        self.slow_call_s = slow_call_s
+        self._state = CLOSED
+        self._failures = 0
+        self._open_s = self.base_open_s
+        self._open_until = 0.0
+        self._probe_in_flight = False
+        self.last_error: Optional[str] = None
+        self.opened_total = 0
+        self.rejected_total = 0
+
+    # ── State ────────────────────────────────────────────────────────────────
+
+    @property
+    def state(self) -> str:
+        if self._state == OPEN and time.time() >= self._open_until:
+            self._state = HALF_OPEN
+            self._probe_in_flight = False
+        return self._state
+
+    def is_open(self) -> bool:
+        """İstek şu an reddedilir mi (probe hakkını tüketmez)."""
+        st = self.state
+        return st == OPEN or (st == HALF_OPEN and self._probe_in_flight)
+
+    def allow(self) -> bool:
+        st = self.state
+        if st == CLOSED:
+            return True
+        if st == HALF_OPEN and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return True
+        self.rejected_total += 1
+        return False
+
+    def record_success(self) -> None:
+        if self._state != CLOSED:
+            logger.info("circuit %s closed", self.name)
+        self._state = CLOSED
+        self._failures = 0
+        self._open_s = self.base_open_s
+        self._probe_in_flight = False
+
+    def record_failure(self, reason: str) -> None:
+        self.last_error = reason
+        if self._state == HALF_OPEN:
+            self._open(reason, min(self._open_s * 2, self.max_open_s))
+            return
+        self._failures += 1
+        if self._state == CLOSED and self._failures >= self.failure_threshold:
+            self._open(reason, self._open_s)
+
+    def trip(self, reason: str, open_s: Optional[float] = None) -> None:
+        """Eşiği beklemeden aç (örn. IP block tespit edildi)."""
+        self.last_error = reason
+        self._open(reason, open_s if open_s is not None else self._open_s)
+
+    def _open(self, reason: str, open_s: float) -> None:
+        self._state = OPEN
+        self._open_s = open_s
+        self._open_until = time.time() + open_s
+        self._probe_in_flight = False
+        self.opened_total += 1
+        logger.warning("circuit %s OPEN for %.0fs (%s)", self.name, open_s, reason)
+
+    # ── Çağrı sarmalayıcı ───────────────────────────────────────────────────
+
+    async def call(self, fn: Callable[..., Awaitable[Any]], *args: Any, **kwargs: Any) -> Any:
+        """
+        fn(*args, **kwargs)'ı breaker üzerinden çalıştır. Dönen değer httpx.Response ise
+        403/429/5xx hata sayılır (yanıt yine de döndürülür — çağıran mevcut akışını korur).
+        """
+        if not self.allow():
+            raise CircuitOpenError(self.name, max(0.0, self._open_until - time.time()))
+        t0 = time.monotonic()
+        try:
+            result = await fn(*args, **kwargs)
+        except Exception as e:
+            self.record_failure(type(e).__name__)
+            raise
+        except BaseException:
+            self._probe_in_flight = False   # iptal: probe hakkını geri ver
+            raise
+        elapsed = time.monotonic() - t0
+        status = getattr(result, "status_code", None)
+        if isinstance(status, int) and (status in FAILURE_STATUSES or status >= 500):
+            self.record_failure(f"http_{status}")
+        elif self.slow_call_s is not None and elapsed > self.slow_call_s:
+            self.record_failure(f"slow_{elapsed:.1f}s")
+        else:
+            self.record_success()
+        return result
+
+    def snapshot(self) -> Dict[str, Any]:
+        st = self.state
+        return {
+            "state": st,
+            "failures": self._failures,
+            "retry_in_s": max(0, int(self._open_until - time.time())) if st == OPEN else 0,
+            "last_error": self.last_error,
+            "opened_total": self.opened_total,
+            "rejected_total": self.rejected_total,
+        }
+
+
+# ── Registry ──────────────────────────────────────────────────────────────────
+
+_breakers: Dict[str, CircuitBreaker] = {}
+
+
+def get_breaker(name: str, **kwargs: Any) -> CircuitBreaker:
+    """İsimle breaker döndür; ilk çağrıda kwargs ile oluşturulur."""
+    b = _breakers.get(name)
+    if b is None:
+        b = _breakers[name] = CircuitBreaker(name, **kwargs)
+    return b
+
+
+def snapshot_all() -> Dict[str, Dict[str, Any]]:
+    return {name: b.snapshot() for name, b in sorted(_breakers.items())}
@@ -44,6 +44,31 @@ class Settings(BaseSettings):
     sched_tick_seconds: int = Field(default=300, validation_alias="SCHED_TICK_SECONDS")
     sched_batch_limit: int = Field(default=5, validation_alias="SCHED_BATCH_LIMIT")
 
+    # Scan job queue (app/scan_queue.py)
+    # Aynı anda çalışan job sayısı + tüm job'ların paylaştığı global ISBN bütçesi
+    scan_max_concurrent_jobs: int = Field(default=2, validation_alias="SCAN_MAX_CONCURRENT_JOBS")
+    scan_global_concurrency: int = Field(default=8, validation_alias="SCAN_GLOBAL_CONCURRENCY")
+    scan_isbn_min_interval_s: float = Field(default=0.15, validation_alias="SCAN_ISBN_MIN_INTERVAL_S")
+    # inline: job'lar API process'inde çalışır | external: app.scan_worker servisi çalıştırır
+    scan_worker_mode: str = Field(default="inline", validation_alias="SCAN_WORKER_MODE")
+    scan_worker_poll_s: float = Field(default=1.0, validation_alias="SCAN_WORKER_POLL_S")
+    # Çalışan job'un lease'i: sahibi bu sürede heartbeat yazmazsa job başka process'çe recover edilir
+    scan_job_lease_s: float = Field(default=60.0, validation_alias="SCAN_JOB_LEASE_S")
+    # Upstream circuit breaker: art arda bu kadar hata → open; open süresi (half-open probe'a kadar)
+    circuit_failure_threshold: int = Field(default=5, validation_alias="CIRCUIT_FAILURE_THRESHOLD")
+    circuit_open_s: float = Field(default=60.0, validation_alias="CIRCUIT_OPEN_S")
+    # Watchlist + BookDepot ISBN'leri için edition metadata backfill aralığı (0 = kapalı)
+    meta_backfill_interval_s: int = Field(default=6 * 3600, validation_alias="META_BACKFILL_INTERVAL_S")
+    # BookDepot tam katalog sweep'i: CSV export URL'i + aralık (URL yoksa veya 0 = kapalı).
+    # Sadece yeni / fiyatı düşen ISBN'ler Amazon'a karşı yeniden taranır.
+    bookdepot_catalog_url: str | None = Field(default=None, validation_alias="BOOKDEPOT_CATALOG_URL")
+    bookdepot_sweep_interval_s: int = Field(default=24 * 3600, validation_alias="BOOKDEPOT_SWEEP_INTERVAL_S")
+    # Suggested price materializer: watchlist ISBN'leri arka planda yeniden hesaplanır (0 = kapalı).
+    # Günlük Finding bütçesi aralıklara bölünür; max_age'den eski sonuçlar yenilenir.
+    sgprice_materialize_interval_s: int = Field(default=900, validation_alias="SGPRICE_MATERIALIZE_INTERVAL_S")
+    sgprice_materialize_max_age_s: int = Field(default=24 * 3600, validation_alias="SGPRICE_MATERIALIZE_MAX_AGE_S")
+    sgprice_finding_daily_budget: int = Field(default=2500, validation_alias="SGPRICE_FINDING_DAILY_BUDGET")
+
     # Price limits (base)
     default_new_limit: float = Field(default=50.0, validation_alias="DEFAULT_NEW_LIMIT")
     default_good_limit: float = Field(default=30.0, validation_alias="DEFAULT_GOOD_LIMIT")
@@ -53,6 +78,17 @@ class Settings(BaseSettings):
     groq_api_key:        str | None = Field(default=None, validation_alias="GROQ_API_KEY")
     cerebras_api_key:    str | None = Field(default=None, validation_alias="CEREBRAS_API_KEY")
     openrouter_api_key:  str | None = Field(default=None, validation_alias="OPENROUTER_API_KEY")
+    # llm_router kalıcı yanıt önbelleği (llm_cache) — LRU satır sınırı
+    llm_cache_max_entries: int = Field(default=5000, validation_alias="LLM_CACHE_MAX_ENTRIES")
+    # llm_router hedging: yanıt bu kadar saniye gecikirse sıradaki providera da gönder (0 = kapalı)
+    llm_hedge_after_s: float = Field(default=0.0, validation_alias="LLM_HEDGE_AFTER_S")
+    # required_fields veren çağrılarda yanıtı stream et + JSON'u artımlı denetle (bozuksa erken kes)
+    llm_stream: bool = Field(default=True, validation_alias="LLM_STREAM")
+    # ai_analyst.analyze_batch: tek LLM isteğinde analiz edilen görselsiz aday sayısı
+    ai_batch_size: int = Field(default=5, validation_alias="AI_BATCH_SIZE")
+    # Vision görselleri (image_cache): uzun kenar üst sınırı ve önbellekteki görsel sayısı
+    vision_image_max_side: int = Field(default=640, validation_alias="VISION_IMAGE_MAX_SIDE")
+    image_cache_max_entries: int = Field(default=2000, validation_alias="IMAGE_CACHE_MAX_ENTRIES")
 
     # Buyback APIs
     bookscouter_api_key: str | None = Field(default=None, validation_alias="BOOKSCOUTER_API_KEY")
@@ -70,6 +106,11 @@ class Settings(BaseSettings):
     hardcover_api_key: str | None = Field(default=None, validation_alias="HARDCOVER_API_KEY")
     # BookFinder scraping (VPS IP'si engellenirse false yap)
     bookfinder_enabled: bool = Field(default=True, validation_alias="BOOKFINDER_ENABLED")
+    # Scan içinde BookFinder fan-out: bütçe (sn) ve erken dönüş için yeterli kaynak sayısı
+    bookfinder_budget_s: float = Field(default=6.0, validation_alias="BOOKFINDER_BUDGET_S")
+    bookfinder_min_sources: int = Field(default=5, validation_alias="BOOKFINDER_MIN_SOURCES")
+    # Bu boyuttan (KB) büyük scrape HTML'leri event loop yerine thread'de parse edilir
+    html_offload_min_kb: int = Field(default=128, validation_alias="HTML_OFFLOAD_MIN_KB")
     # ValoreBooks Sellback API (ücretsiz — APIsupport@valorebooks.com'dan credentials al)
     valore_access_key: str | None = Field(default=None, validation_alias="VALORE_ACCESS_KEY")
     valore_secret_key: str | None = Field(default=None, validation_alias="VALORE_SECRET_KEY")
@@ -0,0 +1,183 @@
+"""
+JSON stream validator — LLM çıktısı parça parça gelirken JSON nesnesini artımlı denetler.
+
+Tam yanıtı bekleyip sonra onarmak yerine akış sırasında karar:
+
+    v = JsonStreamValidator(required=("verdict", "confidence"))
+    async for chunk in stream:
+        v.feed(chunk)
+        if v.invalid or v.satisfied:
+            break                    # üretimi kes
+    v.invalid   → "no_json" | "unexpected 'x' at N" | "bad literal ..." (kesin bozuk)
+    v.satisfied → nesne kapandı ya da required alanların hepsi tamamlandı
+    v.text()    → geçerli JSON: kapanmış nesne ya da tamamlanmış üst-seviye alanlar + "}"
+    v.raw()     → şimdiye kadar gelen ham metin (kesik çıktıdan kurtarma için)
+
+Toleranslar ai_analyst._parse_json'ın onardıklarıyla aynı: JSON öncesi metin / ``` fence
+(max_preamble karaktere kadar), sondaki virgül (",}" / ",]"), nesne sonrası metin. Üst
+seviye bir nesne ({) olmalı. Literal'ler (sayı / true / false / null) bitince doğrulanır.
+"""
+from __future__ import annotations
+
+import re
+from typing import Iterable, List, Optional, Set
+
+_WS = " \t\r\n"
+_LITERAL_START = "-0123456789tfn"
+_LITERAL_CHARS = set("+-.0123456789eEtrufalsn")
+_LITERAL_RE = re.compile(r"-?(?:0|[1-9]\d*)(?:\.\d+)?(?:[eE][+-]?\d+)?|true|false|null")
+_WORDS = ("true", "false", "null")
+
+
+class JsonStreamValidator:
+    __slots__ = ("required", "max_preamble", "invalid", "complete", "fields",
+                 "_buf", "_pos", "_start", "_end", "_member_end", "_stack", "_expect",
+                 "_in_string", "_escape", "_is_key", "_key", "_top_key", "_literal")
+
+    def __init__(self, required: Iterable[str] = (), max_preamble: int = 300) -> None:
+        self.required: Set[str] = set(required)
+        self.max_preamble = max_preamble
+        self.invalid: Optional[str] = None
+        self.complete = False
+        self.fields: Set[str] = set()       # değeri tamamlanmış üst-seviye alanlar
+        self._buf: List[str] = []
+        self._pos = 0
+        self._start = -1                   # ilk "{" konumu
+        self._end = -1                     # kapanış "}" sonrası
+        self._member_end = -1              # son tamamlanan üst-seviye alanın sonu
+        self._stack: List[str] = []
+        self._expect = ""
+        self._in_string = False
+        self._escape = False
+        self._is_key = False
+        self._key: List[str] = []
+        self._top_key = ""
+        self._literal: Optional[str] = None
+
+    @property
+    def satisfied(self) -> bool:
+        return self.invalid is None and (self.complete or bool(self.required) and self.required <= self.fields)
+
+    @property
+    def missing(self) -> Set[str]:
+        return self.required - self.fields
+
+    def feed(self, chunk: str) -> None:
+        self._buf.append(chunk)
+        for c in chunk:
+            if self.invalid or self.complete:
+                break
+            self._step(c, self._pos)
+            self._pos += 1
+
+    def raw(self) -> str:
+        return "".join(self._buf)
+
+    def text(self) -> str:
+        raw = self.raw()
+        if self.complete:
+            return raw[self._start:self._end]
+        if self._member_end > 0:
+            return raw[self._start:self._member_end] + "}"
+        return raw
+
+    # ── Durum makinesi ────────────────────────────────────────────────────────
+
+    def _fail(self, reason: str) -> None:
+        self.invalid = reason
+
+    def _step(self, c: str, i: int) -> None:
+        if self._start < 0:
+            if c == "{":
+                self._start = i
+                self._stack.append("{")
+                self._expect = "key"
+            elif i + 1 > self.max_preamble:
+                self._fail("no_json")
+            return
+
+        if self._in_string:
+            if self._escape:
+                self._escape = False
+            elif c == "\\":
+                self._escape = True
+            elif c == '"':
+                self._in_string = False
+                if self._is_key:
+                    if len(self._stack) == 1:
+                        self._top_key = "".join(self._key)
+                    self._expect = "colon"
+                else:
+                    self._value_done(i)
+            elif self._is_key and len(self._stack) == 1:
+                self._key.append(c)
+            return
+
+        if self._literal is not None:
+            if c in _LITERAL_CHARS:
+                self._literal += c
+                if self._literal[0] in "tfn" and not any(w.startswith(self._literal) for w in _WORDS):
+                    self._fail(f"bad literal {self._literal!r} at {i}")
+                return
+            lit, self._literal = self._literal, None
+            if not _LITERAL_RE.fullmatch(lit):
+                self._fail(f"bad literal {lit!r} at {i}")
+                return
+            self._value_done(i - 1)
+
+        if c in _WS:
+            return
+        top = self._stack[-1]
+        exp = self._expect
+        if exp == "key":
+            # "{" sonrası ve "," sonrası — "}" sondaki virgül toleransı
+            if c == '"':
+                self._in_string, self._is_key, self._key = True, True, []
+            elif c == "}":
+                self._close(c, i)
+            else:
+                self._fail(f"unexpected {c!r} at {i}")
+        elif exp == "colon":
+            if c == ":":
+                self._expect = "value"
+            else:
+                self._fail(f"unexpected {c!r} at {i}")
+        elif exp == "value":
+            if c == "{":
+                self._stack.append("{")
+                self._expect = "key"
+            elif c == "[":
+                self._stack.append("[")
+                self._expect = "value"
+            elif c == '"':
+                self._in_string, self._is_key = True, False
+            elif c in _LITERAL_START:
+                self._literal = c
+            elif c == "]" and top == "[":
+                self._close(c, i)
+            else:
+                self._fail(f"unexpected {c!r} at {i}")
+        else:  # "next": "," ya da kapanış
+            if c == ",":
+                self._expect = "key" if top == "{" else "value"
+            elif c in "}]":
+                self._close(c, i)
+            else:
+                self._fail(f"unexpected {c!r} at {i}")
+
+    def _close(self, c: str, i: int) -> None:
+        if (c == "}") != (self._stack[-1] == "{"):
+            self._fail(f"mismatched {c!r} at {i}")
+            return
+        self._stack.pop()
+        if not self._stack:
+            self.complete = True
+            self._end = i + 1
+        else:
+            self._value_done(i)
+
+    def _value_done(self, i: int) -> None:
+        self._expect = "next"
+        if len(self._stack) == 1:
+            self.fields.add(self._top_key)
+            self._member_end = i + 1
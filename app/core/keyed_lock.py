@@ -0,0 +1,57 @@
+"""
+Keyed lock — anahtar (ISBN / cache key) başına asyncio.Lock.
+
+Tek bir modül kilidi ağ çağrısı boyunca tutulunca farklı ISBN'ler için gelen istekler
+sıraya girer. KeyedLock aynı anahtarı serileştirir (çift fetch / çift LLM çağrısı olmaz),
+farklı anahtarlar paralel ilerler:
+
+    _locks = KeyedLock()
+    async with _locks(isbn):
+        cached = read()             # bekleyen ikinci çağrı burada ilkinin sonucunu görür
+        if cached is None:
+            cached = await fetch()
+            write(cached)
+
+Kilit, bekleyen/tutan kalmayınca sözlükten silinir → boyut eşzamanlı anahtar sayısıyla
+sınırlı. Kilitler ilk kullanımda oluşturulur (import anında event loop gerekmez).
+"""
+from __future__ import annotations
+
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Hashable, List
+
+
+class KeyedLock:
+    __slots__ = ("_locks",)
+
+    def __init__(self) -> None:
+        self._locks: Dict[Hashable, List] = {}   # key → [lock, kullanan sayısı]
+
+    @asynccontextmanager
+    async def __call__(self, key: Hashable) -> AsyncIterator[None]:
+        entry = self._locks.get(key)
+        if entry is None:
+            entry = self._locks[key] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0 and self._locks.get(key) is entry:
+                del self._locks[key]
+
+    def locked(self, key: Hashable) -> bool:
+        entry = self._locks.get(key)
+        return entry is not None and entry[0].locked()
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._locks
+
+    def __len__(self) -> int:
+        return len(self._locks)
+
+    def clear(self) -> None:
+        """Test izolasyonu için — tutulan kilitleri bırakmaz, sadece kaydı unutur."""
+        self._locks.clear()
@@ -0,0 +1,157 @@
+"""
+Quantile sketch — birleştirilebilir (mergeable) t-digest.
+
+Ham fiyat listesi tutmadan dağılım özeti: sıralı centroid'ler (mean, weight).
+
+    d = TDigest()
+    d.extend([12.5, 14.0, 9.99])
+    d.merge(other)              # günlük bucket'ları / pencereleri birleştir
+    d.quantile(0.5)             # medyan; 0.1 / 0.9 → p10 / p90
+    s = d.to_json(); TDigest.from_json(s)   # kompakt: [[mean, weight], ...]
+
+    describe([12.5, 14.0, 9.99])   # tek geçiş: count/min/max/avg/p10/p50/p90 (sıralama yok)
+
+compression=δ: centroid sayısı ~δ ile sınırlı; uçlardaki centroid'ler küçük kalır
+(p10/p90 doğruluğu korunur). Az örnekte (n ≲ δ/4) her örnek kendi centroid'inde
+kalır → quantile ve samples() tam sonuç verir.
+"""
+from __future__ import annotations
+
+import json
+import math
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+PERCENTILES = (("p10", 0.1), ("p50", 0.5), ("p90", 0.9))
+
+
+class TDigest:
+    __slots__ = ("compression", "count", "_c", "_buf")
+
+    def __init__(self, compression: float = 50.0, centroids: Optional[Iterable[Sequence[float]]] = None):
+        self.compression = float(compression)
+        self._c: List[List[float]] = []
+        self._buf: List[List[float]] = []
+        self.count = 0.0
+        for m, w in centroids or ():
+            self._buf.append([float(m), float(w)])
+            self.count += float(w)
+        if self._buf:
+            self._compress()
+
+    # ── Yazma ─────────────────────────────────────────────────────────────────
+
+    def add(self, x: float, w: float = 1.0) -> None:
+        if w <= 0 or x is None or math.isnan(x):
+            return
+        self._buf.append([float(x), float(w)])
+        self.count += w
+        if len(self._buf) > self.compression * 4:
+            self._compress()
+
+    def extend(self, xs: Iterable[float]) -> None:
+        for x in xs:
+            self.add(x)
+
+    def merge(self, other: "TDigest") -> "TDigest":
+        for m, w in other.centroids():
+            self._buf.append([m, w])
+            self.count += w
+        self._compress()
+        return self
+
+    # ── Sıkıştırma ────────────────────────────────────────────────────────────
+
+    def _k(self, q: float) -> float:
+        """k1 ölçek fonksiyonu: centroid'ler q=0/1 yakınında küçük, ortada büyük."""
+        q = min(1.0, max(0.0, q))
+        return self.compression / (2 * math.pi) * math.asin(2 * q - 1)
+
+    def _compress(self) -> None:
+        pts = sorted(self._c + self._buf)
+        self._buf = []
+        if not pts:
+            self._c = []
+            return
+        total = sum(w for _, w in pts)
+        out = [list(pts[0])]
+        before = 0.0   # mevcut centroid'den önceki toplam ağırlık
+        for m, w in pts[1:]:
+            cur = out[-1]
+            if self._k((before + cur[1] + w) / total) - self._k(before / total) <= 1.0:
+                cur[0] = (cur[0] * cur[1] + m * w) / (cur[1] + w)
+                cur[1] += w
+            else:
+                before += cur[1]
+                out.append([m, w])
+        self._c = out
+
+    # ── Okuma ─────────────────────────────────────────────────────────────────
+
+    def centroids(self) -> List[Tuple[float, float]]:
+        if self._buf:
+            self._compress()
+        return [(m, w) for m, w in self._c]
+
+    def quantile(self, q: float) -> Optional[float]:
+        """q ∈ [0, 1]; komşu centroid merkezleri arasında doğrusal interpolasyon."""
+        c = self.centroids()
+        if not c:
+            return None
+        target = min(1.0, max(0.0, q)) * self.count
+        cum = 0.0
+        prev: Optional[Tuple[float, float]] = None   # (center, mean)
+        for m, w in c:
+            center = cum + w / 2
+            if target <= center:
+                if prev is None or center == prev[0]:
+                    return m
+                t = (target - prev[0]) / (center - prev[0])
+                return prev[1] + t * (m - prev[1])
+            prev = (center, m)
+            cum += w
+        return c[-1][0]
+
+    def percentiles(self) -> Dict[str, Optional[float]]:
+        """{"p10", "p50", "p90"} — centroid sayısı sabit sınırlı olduğundan veri boyutundan bağımsız."""
+        return {k: (round(v, 2) if (v := self.quantile(q)) is not None else None) for k, q in PERCENTILES}
+
+    def samples(self) -> List[float]:
+        """Centroid'leri ağırlıkları kadar tekrar eden yaklaşık örnek listesi (az örnekte tam)."""
+        out: List[float] = []
+        for m, w in self.centroids():
+            out.extend([round(m, 2)] * max(1, int(round(w))))
+        return out
+
+    # ── Serileştirme ──────────────────────────────────────────────────────────
+
+    def to_json(self) -> str:
+        return json.dumps(
+            [[round(m, 4), int(w) if float(w).is_integer() else round(w, 4)] for m, w in self.centroids()],
+            separators=(",", ":"),
+        )
+
+    @classmethod
+    def from_json(cls, s: Optional[str], compression: float = 50.0) -> "TDigest":
+        return cls(compression, json.loads(s) if s else None)
+
+
+def describe(values: Iterable[float], compression: float = 50.0) -> Optional[Dict[str, float]]:
+    """
+    Fiyat listesinin özeti tek geçişte: {count, min, max, avg, p10, p50, p90}.
+    Boş girdi → None. Liste sıralanmaz / kopyalanmaz (generator da verilebilir).
+    """
+    d = TDigest(compression)
+    n = 0
+    total = 0.0
+    lo = math.inf
+    hi = -math.inf
+    for v in values:
+        v = float(v)
+        d.add(v)
+        n += 1
+        total += v
+        lo = min(lo, v)
+        hi = max(hi, v)
+    if not n:
+        return None
+    return {"count": n, "min": round(lo, 2), "max": round(hi, 2), "avg": round(total / n, 2), **d.percentiles()}
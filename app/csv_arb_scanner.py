@@ -18,6 +18,7 @@ from __future__ import annotations
 from enum import Enum
 
 import asyncio
+import contextlib
 import logging
 import math
 import time
@@ -134,7 +135,10 @@ class ArbResult:
     # ── Ek analizler ──────────────────────────────────────────────────────────
     edition_year: Optional[int] = None         # Google Books'tan yayın yılı
     has_newer_edition: Optional[bool] = None   # daha yeni baskı var mı?
-    price_volatility: str = ""                 # "LOW"|"MEDIUM"|"HIGH"
+    price_volatility: str = ""                 # "LOW"|"MEDIUM"|"HIGH" (eBay sold p90/p10)
+    ebay_sold_p10: Optional[float] = None      # son 365 gün eBay satış dağılımı
+    ebay_sold_p50: Optional[float] = None
+    ebay_sold_p90: Optional[float] = None
     seasonality_mult: Optional[float] = None   # bu aydaki çarpan
     # ── Buyback kanalı (BookScouter/BooksRun) ─────────────────────────────────
     buyback_cash: Optional[float] = None        # en iyi buyback teklifi ($)
@@ -497,7 +501,13 @@ async def _get_bookfinder_offers(isbn: str) -> List[Dict]:
     """BookFinder kaynaklarından (AbeBooks, ThriftBooks...) fiyat çek."""
     try:
         from app.bookfinder_client import fetch_bookfinder
-        result = await fetch_bookfinder(isbn, condition="all")
+        from app.core.config import get_settings
+        s = get_settings()
+        result = await fetch_bookfinder(
+            isbn, condition="all",
+            budget_s=s.bookfinder_budget_s or None,
+            min_sources=s.bookfinder_min_sources or None,
+        )
         if not result.get("ok"):
             return []
 
@@ -535,15 +545,14 @@ async def _get_bookfinder_offers(isbn: str) -> List[Dict]:
         return []
 
 
-async def _get_bookdepot_offers(isbn: str) -> List[Dict]:
-    """BookDepot envanterinden alım fiyatı çek (lokal JSON store)."""
+async def _get_bookdepot_offers(isbn: str, inventory: Optional[Dict[str, Dict]] = None) -> List[Dict]:
+    """BookDepot envanterinden alım fiyatı çek. inventory: scan başına bir kez yüklenmiş {isbn: item}."""
     try:
-        from app.core.json_store import _read_unsafe
-        from app.core.config import get_settings
-        p = get_settings().resolved_data_dir() / "bookdepot_inventory.json"
-        data = _read_unsafe(p, default={"items": {}})
-        store = data.get("items", {})
-        item = store.get(isbn)
+        if inventory is not None:
+            item = inventory.get(isbn)
+        else:
+            from app import bookdepot_store
+            item = bookdepot_store.get(isbn)
         if not item or not item.get("price") or item["price"] <= 0:
             return []
         return [{
@@ -551,14 +560,28 @@ async def _get_bookdepot_offers(isbn: str) -> List[Dict]:
             "source_condition": "used",
             "buy_price": round(float(item["price"]), 2),
             "item_id": f"bd_{isbn}",
-            "title": item.get("title", "")[:120],
-            "url": item.get("url", ""),
+            "title": (item.get("title") or "")[:120],
+            "url": item.get("url") or "",
         }]
     except Exception as e:
         logger.warning("BookDepot offers failed isbn=%s: %s", isbn, e)
         return []
 
 
+def _sold_distribution(isbn: str) -> Dict[str, Any]:
+    """Son 365 günün eBay satış dağılımı (sold_items_store → sold_stats_store sketch'i)."""
+    from app import sold_items_store
+    return sold_items_store.distribution(isbn, 365, None)
+
+
+def _volatility_tier(dist: Dict[str, Any]) -> str:
+    """p90/p10 oranı: <1.5 LOW, <2.5 MEDIUM, aksi HIGH. 3'ten az satışta etiket yok."""
+    if (dist.get("count") or 0) < 3 or not dist.get("p10"):
+        return ""
+    ratio = dist["p90"] / dist["p10"]
+    return "LOW" if ratio < 1.5 else "MEDIUM" if ratio < 2.5 else "HIGH"
+
+
 # ── Ana tarayıcı ─────────────────────────────────────────────────────────────
 
 async def _scan_one(
@@ -567,8 +590,14 @@ async def _scan_one(
     fees: FeeConfig,
     isbn_buy_prices: Dict[str, float] = {},
     isbn_amazon_prices: Dict[str, float] = {},
+    freshness: Optional[Dict[str, float]] = None,
+    bd_inventory: Optional[Dict[str, Dict]] = None,
 ) -> List[ArbResult]:
-    """Tek ISBN için tüm kaynakları tara, ArbResult listesi döndür."""
+    """
+    Tek ISBN için tüm kaynakları tara, ArbResult listesi döndür.
+    freshness: market_snapshot_store kaynak başına max yaş (saniye); sadece bayat
+    bileşenler yeniden çekilir. None → DEFAULT_FRESHNESS.
+    """
     isbn_buy_prices = isbn_buy_prices or {}
     isbn_amazon_prices = isbn_amazon_prices or {}
     asin = _isbn13_to_asin(isbn)
@@ -587,13 +616,13 @@ async def _scan_one(
             return {}
 
     async def _get_book_meta_safe(isbn):
-        """Book metadata + NYT bestseller check — OL Search, HathiTrust, LoC, NYT."""
+        """Book metadata (book_meta_store, toplu prefetch dahil) + NYT bestseller check."""
         try:
             async with httpx.AsyncClient(timeout=5) as _mc:
                 from app.ai_analyst import _check_edition
                 from app.nyt_client import get_isbn_nyt_history
                 meta, nyt = await asyncio.gather(
-                    asyncio.wait_for(_check_edition(isbn, _mc), timeout=5.0),
+                    asyncio.wait_for(_check_edition(isbn, _mc, partial_ok=True), timeout=5.0),
                     asyncio.wait_for(get_isbn_nyt_history(isbn), timeout=5.0),
                     return_exceptions=True,
                 )
@@ -605,14 +634,26 @@ async def _scan_one(
         except Exception:
             return {}
 
-    amazon_data, ebay_offers, bf_offers, bd_offers, buyback_data, buyback_trend_data, book_meta = await asyncio.gather(
-        _get_amazon_prices(asin),
-        _get_ebay_offers(isbn, filters=filters),
+    # Cross-scan memoization: taze snapshot varsa upstream'e gidilmez.
+    # BookDepot yerel katalogdan okunur → memoize edilmez. BookFinder de edilmez: bookfinder_client
+    # kaynak başına TTL'li cache tutar ve bütçe dolunca kısmi sonuç döner (late_sources arka
+    # planda tamamlanır) — snapshot o kısmi sonucu 24 saat dondururdu. Metadata da edilmez:
+    # book_meta_store hit / miss için ayrı TTL tutar, NYT kendi cache'inde — 30 günlük snapshot
+    # başarısız aramayı ve bestseller durumunu dondururdu.
+    from app import market_snapshot_store as _snap
+    _pv = lambda v: v.value if hasattr(v, "value") else str(v)
+    ebay_source = f"ebay:{_pv(filters.isbn_match_policy)}:{_pv(filters.invalid_isbn_policy)}"
+
+    (amazon_data, ebay_offers, bf_offers, bd_offers, buyback_data, buyback_trend_data, book_meta,
+     sold_dist) = await asyncio.gather(
+        _snap.memoize(isbn, "amazon", lambda: _get_amazon_prices(asin), freshness),
+        _snap.memoize(isbn, ebay_source, lambda: _get_ebay_offers(isbn, filters=filters), freshness),
         _get_bookfinder_offers(isbn),
-        _get_bookdepot_offers(isbn),
-        _get_buyback_prices(isbn),
-        _get_buyback_trend_safe(isbn),
+        _get_bookdepot_offers(isbn, bd_inventory),
+        _snap.memoize(isbn, "buyback", lambda: _get_buyback_prices(isbn), freshness),
+        _snap.memoize(isbn, "buyback_trend", lambda: _get_buyback_trend_safe(isbn), freshness),
         _get_book_meta_safe(isbn),
+        asyncio.to_thread(_sold_distribution, isbn),
         return_exceptions=True,
     )
 
@@ -630,6 +671,8 @@ async def _scan_one(
         buyback_trend_data = {}
     if isinstance(book_meta, Exception):
         book_meta = {}
+    if isinstance(sold_dist, Exception):
+        sold_dist = {}
 
     # Hata itemlarını filtrele ama reason kaydet
     ebay_error = next((o["_error"] for o in (ebay_offers or []) if "_error" in o), None)
@@ -783,6 +826,13 @@ async def _scan_one(
                     r.nyt_rank       = nyt.get("highest_rank")
                     r.nyt_note       = nyt.get("note", "")
 
+            # eBay satış dağılımı (yerel sketch/store — ağ çağrısı yok)
+            if sold_dist.get("count"):
+                r.ebay_sold_p10 = sold_dist.get("p10")
+                r.ebay_sold_p50 = sold_dist.get("p50")
+                r.ebay_sold_p90 = sold_dist.get("p90")
+                r.price_volatility = _volatility_tier(sold_dist)
+
             # sell_source: "used_buybox" / "new_top1" formatı (P1 fix)
             _sec = (amazon_data.get(bb_type) or {}) if bb_type else {}
             _has_bb = bool((_sec.get("buybox") or {}).get("total"))
@@ -850,6 +900,9 @@ async def _scan_one(
     return results
 
 
+_BULK_META_MIN = 10   # bu sayıdan küçük listelerde toplu metadata prefetch yapılmaz
+
+
 async def scan_isbn_list(
     isbns: List[str],
     filters: ScanFilters,
@@ -860,10 +913,15 @@ async def scan_isbn_list(
     isbn_amazon_prices: Dict[str, float] = {},  # opsiyonel: Amazon Business Report ortalama satış fiyatı
     pause_event: Any = None,   # asyncio.Event — set iken scanner bekler (pause)
     cancel_event: Any = None,  # asyncio.Event — set iken scanner durur (cancel)
+    gate: Any = None,          # opsiyonel: () → async context manager (scan_queue fair-share slot)
+    freshness: Optional[Dict[str, float]] = None,  # kaynak başına max snapshot yaşı (market_snapshot_store)
 ) -> Dict[str, Any]:
     """
     ISBN listesini paralel tara (max `concurrency` aynı anda).
-    Returns {accepted, rejected, stats, duration_s}
+    gate verilirse her ISBN global upstream bütçesinden slot alır ve ISBN'ler arası
+    bekleme gate tarafından (tüm job'lar için ortak) uygulanır.
+    Returns {accepted, rejected, stats, scanned} — scanned: taraması tamamlanan ISBN'ler
+    (cancel'da yarıda kalanlar hariç).
     """
     isbn_buy_prices = isbn_buy_prices or {}
     isbn_amazon_prices = isbn_amazon_prices or {}
@@ -873,6 +931,7 @@ async def scan_isbn_list(
     total = len(isbns)
     accepted: List[Dict] = []
     rejected: List[Dict] = []
+    scanned: List[str] = []
 
     # eBay Browse API rate limit koruması: concurrency=1 ile bile
     # peş peşe istekler 429 alabilir. ISBN başına minimum bekleme.
@@ -880,30 +939,41 @@ async def scan_isbn_list(
     _last_request_lock = asyncio.Lock()
     _last_request_time: list = [0.0]
 
+    async def _may_continue() -> bool:
+        """Cancel → False; pause → resume gelene kadar bekle."""
+        if cancel_event and cancel_event.is_set():
+            return False
+        if pause_event and pause_event.is_set():
+            logger.info("scan_isbn_list: paused, waiting for resume...")
+            while pause_event.is_set():
+                if cancel_event and cancel_event.is_set():
+                    return False
+                await asyncio.sleep(0.5)
+            logger.info("scan_isbn_list: resumed")
+        return True
+
     async def _run(isbn: str):
         nonlocal done_count
         async with sem:
-            # eBay rate limit: ISBN'ler arası minimum bekleme
-            async with _last_request_lock:
-                elapsed = time.time() - _last_request_time[0]
-                if elapsed < _isbn_delay:
-                    await asyncio.sleep(_isbn_delay - elapsed)
-                _last_request_time[0] = time.time()
-
-            # Cancel check — hemen çık
-            if cancel_event and cancel_event.is_set():
+            # eBay rate limit: ISBN'ler arası minimum bekleme (gate varsa global pacing onda)
+            if gate is None:
+                async with _last_request_lock:
+                    elapsed = time.time() - _last_request_time[0]
+                    if elapsed < _isbn_delay:
+                        await asyncio.sleep(_isbn_delay - elapsed)
+                    _last_request_time[0] = time.time()
+
+            if not await _may_continue():
                 return
 
-            # Pause check — resume gelene kadar bekle
-            if pause_event and pause_event.is_set():
-                logger.info("scan_isbn_list: paused, waiting for resume...")
-                while pause_event.is_set():
-                    if cancel_event and cancel_event.is_set():
-                        return
-                    await asyncio.sleep(0.5)
-                logger.info("scan_isbn_list: resumed")
-
-            results = await _scan_one(isbn.strip(), filters, fees, isbn_buy_prices=isbn_buy_prices, isbn_amazon_prices=isbn_amazon_prices)
+            async with (gate() if gate is not None else contextlib.nullcontext()):
+                if cancel_event and cancel_event.is_set():
+                    return
+                results = await _scan_one(
+                    isbn.strip(), filters, fees,
+                    isbn_buy_prices=isbn_buy_prices, isbn_amazon_prices=isbn_amazon_prices,
+                    freshness=freshness, bd_inventory=bd_inventory,
+                )
             new_acc: List[Dict] = []
             new_rej: List[Dict] = []
             for r in results:
@@ -914,6 +984,7 @@ async def scan_isbn_list(
                 else:
                     rejected.append(d)
                     new_rej.append(d)
+            scanned.append(isbn.strip())
             done_count += 1
             if on_progress:
                 try:
@@ -926,6 +997,40 @@ async def scan_isbn_list(
                 except Exception:
                     pass
 
+    async def _prefetch_metadata() -> None:
+        from app.ai_analyst import resolve_editions_bulk
+        async with (gate() if gate is not None else contextlib.nullcontext()):
+            if cancel_event and cancel_event.is_set():
+                return
+            await resolve_editions_bulk([i.strip() for i in isbns if i.strip()])
+
+    # Büyük listelerde metadata'yı toplu isteklerle önceden çöz → _scan_one cache'ten okur.
+    # Prefetch de upstream trafiği: fair-share slot'u içinde, cancel gelince yarıda bırakılır.
+    if len(isbns) >= _BULK_META_MIN and await _may_continue():
+        prefetch = asyncio.ensure_future(asyncio.wait_for(_prefetch_metadata(), timeout=60))
+        waiters = {prefetch}
+        if cancel_event is not None:
+            waiters.add(asyncio.ensure_future(cancel_event.wait()))
+        try:
+            await asyncio.wait(waiters, return_when=asyncio.FIRST_COMPLETED)
+            if prefetch.done():
+                prefetch.result()
+            else:
+                logger.info("scan_isbn_list: cancelled during metadata prefetch")
+        except Exception as e:
+            logger.warning("scan_isbn_list: bulk metadata prefetch failed: %s", e)
+        finally:
+            for w in waiters:
+                w.cancel()
+
+    # BookDepot envanteri job başına tek sorguyla yüklenir (ISBN başına okuma yok)
+    try:
+        from app import bookdepot_store
+        bd_inventory = await asyncio.to_thread(bookdepot_store.get_many, [i.strip() for i in isbns])
+    except Exception as e:
+        logger.warning("scan_isbn_list: bookdepot inventory load failed: %s", e)
+        bd_inventory = None
+
     await asyncio.gather(*[_run(isbn) for isbn in isbns if isbn.strip()])
 
     # Accepted'i ROI'ye göre sırala
@@ -970,6 +1075,7 @@ async def scan_isbn_list(
             "invalid_input_count": invalid_input_count,
             "amazon_unavailable": amazon_unavailable,
         },
+        "scanned": scanned,
     }
 
 
@@ -317,6 +317,63 @@ def _safe_int(x: Any) -> Optional[int]:
         return None
 
 
+def _first(obj: Dict[str, Any], key: str) -> Any:
+    """Finding JSON'da her alan tek elemanlı liste: {"itemId": ["123"]} → "123"."""
+    v = obj.get(key)
+    return v[0] if isinstance(v, list) and v else None
+
+
+def _iso_ts(s: Optional[str]) -> Optional[int]:
+    if not s:
+        return None
+    try:
+        from datetime import datetime
+        return int(datetime.fromisoformat(s.replace("Z", "+00:00")).timestamp())
+    except ValueError:
+        return None
+
+
+def finding_items(j: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    findCompletedItems yanıtından bireysel satışlar:
+      [{item_id, price, shipping, total, cond (normalize_condition bucket), ended_at}]
+    Fiyatı olmayan / parse edilemeyen item'lar atlanır.
+    """
+    out: List[Dict[str, Any]] = []
+    resp = _first(j, "findCompletedItemsResponse") or {}
+    sr = _first(resp, "searchResult") or {}
+    for it in sr.get("item") or []:
+        cur = _first(_first(it, "sellingStatus") or {}, "currentPrice") or {}
+        try:
+            price_f = float(cur.get("__value__"))
+        except (TypeError, ValueError):
+            continue
+
+        ship_f = 0.0
+        try:
+            sv = (_first(_first(it, "shippingInfo") or {}, "shippingServiceCost") or {}).get("__value__")
+            if sv is not None:
+                ship_f = float(sv)
+        except Exception:
+            ship_f = 0.0
+
+        cond_raw = ""
+        try:
+            cond_raw = _first(_first(it, "condition") or {}, "conditionDisplayName") or ""
+        except Exception:
+            pass
+
+        out.append({
+            "item_id": _first(it, "itemId"),
+            "price": price_f,
+            "shipping": ship_f,
+            "total": round(price_f + ship_f, 2),
+            "cond": normalize_condition(cond_raw, None),
+            "ended_at": _iso_ts(_first(_first(it, "listingInfo") or {}, "endTime")),
+        })
+    return out
+
+
 async def finding_sold_stats(
     client: httpx.AsyncClient,
     isbn: str,
@@ -396,50 +453,22 @@ async def finding_sold_stats(
     # Parse nested Finding API JSON
     totals: List[float] = []
     by_cond: Dict[str, List[float]] = {}
+    items: List[Dict[str, Any]] = []
 
     try:
-        resp = (j.get("findCompletedItemsResponse") or [{}])[0]
-        sr = (resp.get("searchResult") or [{}])[0]
-        items = sr.get("item") or []
-
-        for it in items:
-            # selling price
-            selling = (it.get("sellingStatus") or [{}])[0]
-            cur = (selling.get("currentPrice") or [{}])[0]
-            price_val = cur.get("__value__")
-            if price_val is None:
-                continue
-
-            try:
-                price_f = float(price_val)
-            except (TypeError, ValueError):
-                continue
-
-            # shipping
-            ship_f = 0.0
-            try:
-                ship_info = (it.get("shippingInfo") or [{}])[0]
-                ship_cost = (ship_info.get("shippingServiceCost") or [{}])[0]
-                sv = ship_cost.get("__value__")
-                if sv is not None:
-                    ship_f = float(sv)
-            except Exception:
-                ship_f = 0.0
-
-            total_f = price_f + ship_f
-            totals.append(total_f)
-
-            # condition bucket
-            cond_raw = ""
-            try:
-                cond_info = (it.get("condition") or [{}])[0]
-                cond_raw = (cond_info.get("conditionDisplayName") or [""]) [0]
-            except Exception:
-                pass
-            bucket = normalize_condition(cond_raw, None)
-            by_cond.setdefault(bucket, []).append(total_f)
+        items = finding_items(j)
     except Exception:
         logger.exception("Finding API parse error for isbn=%s", isbn)
+    for it in items:
+        totals.append(it["total"])
+        by_cond.setdefault(it["cond"], []).append(it["total"])
+
+    # Tekil satış kayıtları (itemId ile) — tekrar görülenler no-op
+    try:
+        from app import sold_items_store
+        sold_items_store.ingest(isbn_clean, items, "finding")
+    except Exception:
+        logger.debug("sold_items_store ingest failed isbn=%s (non-fatal)", isbn_clean)
 
     result: Dict[str, Any] = {
         "isbn": isbn_clean,
@@ -6,20 +6,28 @@ TTL katmanları:
   - 30d ve 100d period  → SHORT_TTL_HOURS  (varsayılan 24 saat — günlük kota)
   - 365d ve 1095d period → LONG_TTL_DAYS   (varsayılan 30 gün — aylık yenileme)
 
-Cache anahtarı: isbn_clean + period_days + condition_filter
-JSON formatı: {"ts": float, "totals": [float, ...]}
+Depolama: {cache_dir}/finding_cache.db (SQLite, WAL)
+  finding_entry(isbn, days, cond, ts, totals)   PK (isbn, days, cond), INDEX (expires_at)
+  → get/set tek satır; clear_isbn ve ISBN başına sorgular PK önekiyle O(o ISBN'in kayıtları);
+    cache_stats COUNT/SUM ile (dosya stat'ı yok); expiry süpürmesi expires_at indeksinden.
 
-Thread/process güvenli: atomic write (tmp + os.replace).
+finding_sold ISBN başına tek 90 günlük item listesini (isbn, 90, "items") satırında tutar.
+
+Eskiden her anahtar ayrı bir sha1-adlı JSON dosyasıydı; clear_isbn / cache_stats tüm
+dizini açıp parse ediyordu. İlk bağlantıda eski *.json dosyaları içe aktarılıp silinir.
 
 Rate-limit fallback: get_stale() TTL'i yok sayarak cache'den okur.
 Eğer eBay rate-limit verirse stale cache kullanılır, hiç cache yoksa boş liste döner.
+Bu yüzden kayıtlar TTL dolunca hemen silinmez: compact() (ve startup'ta başlayan
+compact_loop) sadece TTL + FINDING_CACHE_STALE_GRACE_DAYS'i aşanları siler.
 """
 from __future__ import annotations
 
-import hashlib
+import asyncio
 import json
 import logging
 import os
+import sqlite3
 import time
 from functools import lru_cache
 from pathlib import Path
@@ -32,6 +40,12 @@ logger = logging.getLogger("trackerbundle.finding_cache")
 _SHORT_TTL = int(float(os.getenv("SGPRICE_SHORT_TTL_HOURS", "24")) * 3600)
 # 365d/3yr: ayda 1 kez yenile (30 gün) — tarihsel data nadiren değişir
 _LONG_TTL  = int(float(os.getenv("SGPRICE_LONG_TTL_DAYS",  "30")) * 86400)
+# TTL sonrası stale fallback için tutma süresi; sonrasında compactor siler
+_STALE_GRACE = int(float(os.getenv("FINDING_CACHE_STALE_GRACE_DAYS", "30")) * 86400)
+_COMPACT_INTERVAL_S = int(os.getenv("FINDING_CACHE_COMPACT_INTERVAL_S", "3600"))
+
+_schema_ready: set = set()
+_last_compact: dict = {}
 
 
 @lru_cache(maxsize=1)
@@ -64,26 +78,88 @@ def _ttl_for(days_back: int) -> int:
     return _LONG_TTL if days_back >= 365 else _SHORT_TTL
 
 
-def _cache_path(isbn: str, days_back: int, condition: Optional[str]) -> Path:
-    key = f"{isbn}:{days_back}:{condition or 'all'}"
-    h = hashlib.sha1(key.encode()).hexdigest()[:16]
-    return _cache_dir() / f"{h}.json"
+def _cond(condition: Optional[str]) -> str:
+    return condition or "all"
+
+
+def _db_path() -> Path:
+    return _cache_dir() / "finding_cache.db"
+
+
+def _connect() -> sqlite3.Connection:
+    p = _db_path()
+    con = sqlite3.connect(p, timeout=10)
+    con.row_factory = sqlite3.Row
+    con.execute("PRAGMA synchronous=NORMAL;")
+    if str(p) not in _schema_ready:
+        con.execute("PRAGMA journal_mode=WAL;")
+        con.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS finding_entry (
+              isbn TEXT NOT NULL,
+              days INTEGER NOT NULL,
+              cond TEXT NOT NULL,
+              ts REAL NOT NULL,
+              expires_at REAL NOT NULL,
+              totals TEXT NOT NULL,
+              PRIMARY KEY (isbn, days, cond)
+            );
+            CREATE INDEX IF NOT EXISTS idx_finding_expires ON finding_entry(expires_at);
+            """
+        )
+        _schema_ready.add(str(p))
+        _migrate_legacy(con)
+    return con
+
+
+def _migrate_legacy(con: sqlite3.Connection) -> None:
+    """Eski sha1-adlı JSON dosyalarını (tek seferlik) tabloya aktar ve sil."""
+    n = 0
+    for path in _cache_dir().glob("????????????????.json"):   # sha1[:16].json
+        try:
+            entry = json.loads(path.read_text(encoding="utf-8"))
+            if entry.get("isbn") is None or entry.get("days") is None:
+                continue
+            _upsert(con, entry["isbn"], int(entry["days"]), entry.get("condition"),
+                    entry.get("totals") or [], float(entry.get("ts", 0)))
+            n += 1
+            path.unlink(missing_ok=True)
+        except Exception:
+            logger.debug("legacy finding cache file skipped: %s", path.name)
+    if n:
+        con.commit()
+        logger.info("finding_cache: %d eski JSON kaydı içe aktarıldı", n)
+
+
+def _upsert(con: sqlite3.Connection, isbn: str, days_back: int, condition: Optional[str],
+            totals: List[float], ts: float) -> None:
+    con.execute(
+        "INSERT OR REPLACE INTO finding_entry(isbn, days, cond, ts, expires_at, totals) VALUES(?,?,?,?,?,?);",
+        (isbn, days_back, _cond(condition), ts, ts + _ttl_for(days_back) + _STALE_GRACE,
+         json.dumps(totals, separators=(",", ":"))),
+    )
+
+
+def _read(isbn: str, days_back: int, condition: Optional[str]) -> Optional[sqlite3.Row]:
+    with _connect() as con:
+        return con.execute(
+            "SELECT ts, totals FROM finding_entry WHERE isbn=? AND days=? AND cond=?;",
+            (isbn, days_back, _cond(condition)),
+        ).fetchone()
 
 
 def get_cached(isbn: str, days_back: int, condition: Optional[str]) -> Optional[List[float]]:
     """Cache hit ise float listesi döndür, stale/yok ise None."""
-    path = _cache_path(isbn, days_back, condition)
     try:
-        if not path.exists():
+        row = _read(isbn, days_back, condition)
+        if row is None:
             return None
-        raw = path.read_text(encoding="utf-8")
-        entry = json.loads(raw)
-        age = time.time() - float(entry.get("ts", 0))
+        age = time.time() - float(row["ts"])
         ttl = _ttl_for(days_back)
         if age > ttl:
             logger.debug("Cache stale isbn=%s days=%d cond=%s age=%.0fs", isbn, days_back, condition, age)
             return None
-        totals = entry.get("totals") or []
+        totals = json.loads(row["totals"])
         logger.debug("Cache HIT isbn=%s days=%d cond=%s count=%d age=%.0fs", isbn, days_back, condition, len(totals), age)
         return totals
     except Exception:
@@ -95,16 +171,14 @@ def get_stale(isbn: str, days_back: int, condition: Optional[str]) -> Optional[L
     """
     TTL'i yok sayarak cache'den okur.
     Rate-limit hatası geldiğinde stale data döndürmek için kullanılır.
-    Cache dosyası yoksa None döner.
+    Kayıt yoksa None döner.
     """
-    path = _cache_path(isbn, days_back, condition)
     try:
-        if not path.exists():
+        row = _read(isbn, days_back, condition)
+        if row is None:
             return None
-        raw = path.read_text(encoding="utf-8")
-        entry = json.loads(raw)
-        totals = entry.get("totals") or []
-        age = time.time() - float(entry.get("ts", 0))
+        totals = json.loads(row["totals"])
+        age = time.time() - float(row["ts"])
         logger.debug(
             "Stale cache READ isbn=%s days=%d cond=%s count=%d age=%.0fs",
             isbn, days_back, condition, len(totals), age,
@@ -116,45 +190,69 @@ def get_stale(isbn: str, days_back: int, condition: Optional[str]) -> Optional[L
 
 
 def set_cached(isbn: str, days_back: int, condition: Optional[str], totals: List[float]) -> None:
-    """Sonuçları cache'e yaz (atomic)."""
-    path = _cache_path(isbn, days_back, condition)
-    entry = {"ts": time.time(), "totals": totals, "isbn": isbn, "days": days_back, "condition": condition}
-    tmp = path.with_suffix(".tmp")
+    """Sonuçları cache'e yaz (tek satır upsert)."""
     try:
-        tmp.write_text(json.dumps(entry, ensure_ascii=False), encoding="utf-8")
-        os.replace(tmp, path)
+        with _connect() as con:
+            _upsert(con, isbn, days_back, condition, totals, time.time())
         logger.debug("Cache WRITE isbn=%s days=%d cond=%s count=%d", isbn, days_back, condition, len(totals))
     except Exception as e:
         logger.warning("Cache write error isbn=%s days=%d: %s", isbn, days_back, e)
-        try:
-            tmp.unlink(missing_ok=True)
-        except Exception:
-            pass
 
 
 def clear_isbn(isbn: str) -> int:
-    """Bir ISBN'e ait tüm cache dosyalarını sil. Silinen sayı döner."""
-    removed = 0
+    """Bir ISBN'e ait tüm cache kayıtlarını sil (PK öneki — diğer ISBN'lere dokunmaz). Silinen sayı döner."""
     try:
-        for path in _cache_dir().glob("*.json"):
-            try:
-                entry = json.loads(path.read_text(encoding="utf-8"))
-                if entry.get("isbn") == isbn:
-                    path.unlink(missing_ok=True)
-                    removed += 1
-            except Exception:
-                pass
+        with _connect() as con:
+            return con.execute("DELETE FROM finding_entry WHERE isbn=?;", (isbn,)).rowcount
     except Exception:
-        pass
-    return removed
+        return 0
+
+
+def compact(now: Optional[float] = None) -> int:
+    """TTL + stale grace süresini aşan kayıtları sil (expires_at indeksi). Silinen sayı döner."""
+    now = time.time() if now is None else now
+    with _connect() as con:
+        n = con.execute("DELETE FROM finding_entry WHERE expires_at < ?;", (now,)).rowcount
+    _last_compact.update(ts=int(now), removed=n)
+    if n:
+        logger.info("finding_cache compact: %d expired entries removed", n)
+    return n
+
+
+async def compact_loop() -> None:
+    """Startup'ta başlar; FINDING_CACHE_COMPACT_INTERVAL_S'de bir compact() (0 → kapalı)."""
+    if _COMPACT_INTERVAL_S <= 0:
+        return
+    while True:
+        try:
+            await asyncio.to_thread(compact)
+        except Exception as e:
+            logger.warning("finding_cache compact failed: %s", e)
+        await asyncio.sleep(_COMPACT_INTERVAL_S)
 
 
 def cache_stats() -> dict:
-    """Toplam cache dosya sayısı ve toplam boyut (bytes)."""
+    """Kayıt / ISBN sayısı, TTL'i geçmiş (stale) kayıtlar ve DB boyutu (bytes)."""
     try:
-        files = list(_cache_dir().glob("*.json"))
-        total_bytes = sum(f.stat().st_size for f in files if f.exists())
-        return {"files": len(files), "bytes": total_bytes}
+        now = time.time()
+        with _connect() as con:
+            r = con.execute(
+                """
+                SELECT COUNT(*) AS n, COUNT(DISTINCT isbn) AS isbns,
+                       SUM(CASE WHEN expires_at - ? < ? THEN 1 ELSE 0 END) AS stale
+                FROM finding_entry;
+                """,
+                (_STALE_GRACE, now),
+            ).fetchone()
+        size = sum(f.stat().st_size for f in _cache_dir().glob("finding_cache.db*"))
+        return {
+            "files": int(r["n"]),        # eski alan adı — kayıt sayısı
+            "entries": int(r["n"]),
+            "isbns": int(r["isbns"]),
+            "stale": int(r["stale"] or 0),
+            "bytes": size,
+            "last_compact": dict(_last_compact),
+        }
     except Exception:
         return {"files": 0, "bytes": 0}
 
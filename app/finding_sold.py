@@ -0,0 +1,210 @@
+"""
+Finding Sold — ISBN başına tek, paylaşılan findCompletedItems çağrısı.
+
+Eskiden:
+  - suggested_price_endpoint: 30d + 90d × new + used → 4 çağrı (koşullar sırayla)
+  - scheduler_ebay._fetch_sold: ayrı bir tüm-koşullar çağrısı
+  - suggested_price._finding_sold_avg: 30/100/365/1095 gün için 4 çağrı daha
+Hepsi aynı 90 günlük veriyi (eBay Finding en fazla 90 gün saklar) farklı filtrelerle
+yeniden çekiyordu.
+
+Şimdi:
+  fetch(client, isbn) → son 90 gün, tüm koşullar, sayfalı (FINDING_SOLD_MAX_PAGES × 100)
+                        tek sonuç seti: {"items": [...finding_items], "fetched_at", "source"}
+  window(items, days, cond)  → pencere / koşul toplamları (lokal filtre)
+  summary(items)             → eski finding_sold_stats şekli (sold_count/min/max/avg/by_condition)
+
+Önbellek: finding_cache'te (isbn, 90, "items") satırı — SHORT_TTL (24s) boyunca ağ yok.
+Backoff / HTTP hatasında stale satır döner. Aynı ISBN için eşzamanlı çağrılar tek
+isteği paylaşır (market_snapshot_store.memoize ile aynı in-flight deseni).
+Her canlı çekimde item'lar sold_items_store'a (itemId ile tekil) yazılır.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from app import finding_cache
+from app.core.config import get_settings
+from app.ebay_client import BOOKS_CATEGORY_ID, _safe_int, finding_items
+
+logger = logging.getLogger("trackerbundle.finding_sold")
+
+FINDING_MAX_DAYS = 90
+_ITEMS_KEY = "items"            # finding_cache cond sütunu — pencere/koşul cache'lerinden ayrı
+_PAGE_SIZE = 100
+_MAX_PAGES = int(os.getenv("FINDING_SOLD_MAX_PAGES", "3"))
+
+_inflight: Dict[str, "asyncio.Future[Dict[str, Any]]"] = {}
+
+
+def _clean(isbn: str) -> str:
+    return isbn.replace("-", "").replace(" ", "").strip()
+
+
+def _result(items: List[Dict[str, Any]], source: str, calls: int = 0) -> Dict[str, Any]:
+    return {"items": items, "source": source, "calls": calls, "fetched_at": time.time()}
+
+
+async def fetch(client: httpx.AsyncClient, isbn: str, *, force: bool = False) -> Dict[str, Any]:
+    """
+    Son 90 günün tüm satışları (koşul filtresiz). source: "cache" | "live" | "stale" | "empty";
+    calls: bu çağrının harcadığı Finding isteği (sayfa) sayısı — kota bütçesi için.
+    EBAY_APP_ID yoksa RuntimeError.
+    """
+    isbn_clean = _clean(isbn)
+    if not force:
+        cached = finding_cache.get_cached(isbn_clean, FINDING_MAX_DAYS, _ITEMS_KEY)
+        if cached is not None:
+            return _result(cached, "cache")
+
+    fut = _inflight.get(isbn_clean)
+    if fut is not None:
+        return await asyncio.shield(fut)
+    fut = asyncio.get_running_loop().create_future()
+    _inflight[isbn_clean] = fut
+    try:
+        res = await _fetch_live(client, isbn_clean)
+    except BaseException as e:
+        fut.set_exception(e)
+        fut.exception()   # bekleyen yoksa "never retrieved" uyarısını bastır
+        raise
+    else:
+        fut.set_result(res)
+        return res
+    finally:
+        _inflight.pop(isbn_clean, None)
+
+
+def _stale(isbn_clean: str) -> Dict[str, Any]:
+    stale = finding_cache.get_stale(isbn_clean, FINDING_MAX_DAYS, _ITEMS_KEY)
+    if stale is not None:
+        return _result(stale, "stale")
+    return _result([], "empty")
+
+
+async def _fetch_live(client: httpx.AsyncClient, isbn_clean: str) -> Dict[str, Any]:
+    if finding_cache.is_rate_limited():
+        st = finding_cache.rate_limit_status()
+        logger.warning(
+            "Finding API backoff aktif (%.0fs kaldı) — stale cache dönülüyor isbn=%s",
+            st.get("remaining_seconds", 0), isbn_clean,
+        )
+        return _stale(isbn_clean)
+
+    s = get_settings()
+    app_id = s.ebay_app_id or s.ebay_client_id
+    if not app_id:
+        raise RuntimeError("EBAY_APP_ID (veya EBAY_CLIENT_ID) eksik")
+
+    now = datetime.now(timezone.utc)
+    params: Dict[str, str] = {
+        "OPERATION-NAME": "findCompletedItems",
+        "SERVICE-VERSION": "1.13.0",
+        "SECURITY-APPNAME": app_id,
+        "RESPONSE-DATA-FORMAT": "JSON",
+        "REST-PAYLOAD": "true",
+        "keywords": isbn_clean,
+        "categoryId": BOOKS_CATEGORY_ID,
+        "paginationInput.entriesPerPage": str(_PAGE_SIZE),
+        "itemFilter(0).name": "SoldItemsOnly",
+        "itemFilter(0).value": "true",
+        "itemFilter(1).name": "EndTimeFrom",
+        "itemFilter(1).value": (now - timedelta(days=FINDING_MAX_DAYS)).strftime("%Y-%m-%dT%H:%M:%S.000Z"),
+    }
+
+    items: List[Dict[str, Any]] = []
+    calls = 0
+    for page in range(1, max(1, _MAX_PAGES) + 1):
+        params["paginationInput.pageNumber"] = str(page)
+        calls += 1
+        try:
+            r = await client.get("https://svcs.ebay.com/services/search/FindingService/v1",
+                                 params=params, timeout=25)
+            if not r.is_success:
+                body_text = r.text[:600]
+                logger.error("Finding API HTTP %d isbn=%s page=%d body=%s",
+                             r.status_code, isbn_clean, page, body_text)
+                # Rate-limit tespiti → 23h backoff başlat
+                if r.status_code in (429, 500) and any(
+                    kw in body_text for kw in ("RateLimiter", "exceeded operation", "rate limit", "quota")
+                ):
+                    finding_cache.set_rate_limited(23)
+            r.raise_for_status()
+            j = r.json()
+        except Exception as e:
+            logger.warning("Finding API error isbn=%s page=%d err=%s — trying stale cache", isbn_clean, page, e)
+            if page == 1:
+                return {**_stale(isbn_clean), "calls": calls}
+            break   # sonraki sayfalar alınamadı → elimizdekiyle devam
+        page_items = finding_items(j)
+        items.extend(page_items)
+        if len(page_items) < _PAGE_SIZE or page >= _total_pages(j):
+            break
+
+    finding_cache.set_cached(isbn_clean, FINDING_MAX_DAYS, _ITEMS_KEY, items)
+    try:
+        from app import sold_items_store
+        sold_items_store.ingest(isbn_clean, items, "finding")
+    except Exception:
+        logger.debug("sold_items_store ingest failed isbn=%s (non-fatal)", isbn_clean)
+    logger.info("Finding sold isbn=%s: %d items (tek çağrı, tüm pencereler/koşullar)", isbn_clean, len(items))
+    return _result(items, "live", calls)
+
+
+def _total_pages(j: Dict[str, Any]) -> int:
+    try:
+        resp = j["findCompletedItemsResponse"][0]
+        return int(resp["paginationOutput"][0]["totalPages"][0])
+    except Exception:
+        return 1
+
+
+# ── Lokal türetme ────────────────────────────────────────────────────────────
+
+def window(
+    items: List[Dict[str, Any]],
+    days: int,
+    cond: Optional[str] = None,
+    now: Optional[float] = None,
+) -> List[float]:
+    """days içinde biten satışların toplamları. cond: "new" | "used" | None. ended_at yoksa dahil."""
+    from app.sold_items_store import cond_key
+
+    since = (now or time.time()) - days * 86400
+    return [
+        it["total"] for it in items
+        if (it.get("ended_at") is None or it["ended_at"] >= since)
+        and (cond is None or cond_key(it.get("cond")) == cond)
+    ]
+
+
+def summary(items: List[Dict[str, Any]], isbn: str = "") -> Dict[str, Any]:
+    """ebay_client.finding_sold_stats ile aynı şekil (scheduler_ebay uyumu)."""
+    totals = [it["total"] for it in items]
+    by_cond: Dict[str, List[float]] = {}
+    for it in items:
+        by_cond.setdefault(it["cond"], []).append(it["total"])
+    return {
+        "isbn": _clean(isbn),
+        "sold_count": len(totals),
+        "sold_min": _safe_int(min(totals)) if totals else None,
+        "sold_max": _safe_int(max(totals)) if totals else None,
+        "sold_avg": _safe_int(sum(totals) / len(totals)) if totals else None,
+        "by_condition": {
+            b: {"count": len(v), "avg": _safe_int(sum(v) / len(v)),
+                "min": _safe_int(min(v)), "max": _safe_int(max(v))}
+            for b, v in by_cond.items()
+        },
+    }
+
+
+async def fetch_sold_stats(client: httpx.AsyncClient, isbn: str) -> Dict[str, Any]:
+    """Paylaşılan 90d sonuçtan finding_sold_stats şeklinde özet."""
+    return summary((await fetch(client, isbn))["items"], isbn)
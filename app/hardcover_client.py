@@ -24,6 +24,7 @@ from typing import Any, Dict, Optional
 
 import httpx
 
+from app.core.circuit_breaker import get_breaker
 from app.core.config import get_settings
 
 logger = logging.getLogger("trackerbundle.hardcover")
@@ -87,7 +88,8 @@ async def get_book_demand(isbn: str) -> Dict[str, Any]:
 
     try:
         async with httpx.AsyncClient(timeout=10) as client:
-            r = await client.post(
+            r = await get_breaker("hardcover", slow_call_s=8.0).call(
+                client.post,
                 HARDCOVER_GQL,
                 json={"query": _QUERY_BY_ISBN, "variables": {"isbn": isbn13}},
                 headers={
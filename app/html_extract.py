@@ -0,0 +1,167 @@
+"""
+HTML extraction — scraper'lar için önceden derlenmiş pattern'ler ve bölge taraması.
+
+BookFinder kaynakları ve eBay sold sayfaları yüzlerce KB HTML döndürür; eskiden
+her parse çağrısı tüm gövde üzerinde DOTALL regex çalıştırıyordu. Burada:
+
+  - Pattern'ler modül yüklenirken bir kez derlenir.
+  - Önce ilgili bölge str.find ile bulunur (JSON-LD <script>, Next.js RSC push'ları,
+    window.utag_data, eBay s-item__price listesi); regex sadece o bölgede çalışır.
+    İşaret hiç yoksa regex hiç çalışmaz.
+  - Büyük dokümanlar (>= html_offload_min_kb) run() ile thread'e aktarılır; event loop
+    parse süresince diğer scan'lere hizmet vermeye devam eder.
+
+Kaynak parser'ları saf fonksiyonlardır (html → sonuç); tests/fixtures/html altındaki
+benchmark corpus'u (scripts/bench_html_extract.py) aynı fonksiyonları ölçer.
+"""
+from __future__ import annotations
+
+import asyncio
+import re
+from typing import Any, Callable, Iterator, List, Optional, TypeVar
+
+from app.core.config import get_settings
+
+T = TypeVar("T")
+
+JSONLD_OPEN = re.compile(r'<script[^>]+type=["\']application/ld\+json["\'][^>]*>')
+RSC_PUSH = 'self.__next_f.push([1,"'
+UTAG_DATA = re.compile(r'window\.utag_data\s*=\s*(\{.*?\});\s*</script>', re.DOTALL)
+PRICE_ATTR = re.compile(r'(?:data-price|"price"|itemprop=["\']price["\'])["\s:=]+["\']?([\d]+\.[\d]{2})["\']?')
+PRICE_JSON_DECIMAL = re.compile(r'"price"\s*:\s*"?([\d]+\.[\d]{2})"?')
+PRICE_JSON_CENTS = re.compile(r'"price":\s*"?(\d+)"?')       # Shopify (Goodwill)
+PRICE_JSON_INT = re.compile(r'"price":\s*(\d+)')              # Shopify (HPB)
+DOLLAR = re.compile(r'\$\s*([\d]+\.[\d]{2})')
+EBAY_SOLD_PRICE = re.compile(
+    r'class="[^"]*s-item__price[^"]*"[^>]*>\s*\$([0-9,]+(?:\.[0-9]{1,2})?)', re.IGNORECASE
+)
+EBAY_ITEM_START = re.compile(r'<li[^>]*class="[^"]*\bs-item\b', re.IGNORECASE)
+EBAY_ITEM_ID = re.compile(r'/itm/(?:[^"/?]+/)?(\d{9,15})')
+EBAY_SOLD_DATE = re.compile(r'Sold(?:\s|&nbsp;)+([A-Z][a-z]{2})\s+(\d{1,2}),\s+(\d{4})')
+EBAY_SHIPPING = re.compile(
+    r'class="[^"]*s-item__shipping[^"]*"[^>]*>\s*\+?\s*\$([0-9,]+(?:\.[0-9]{1,2})?)', re.IGNORECASE
+)
+
+
+# ── Bölge bulucular ──────────────────────────────────────────────────────────
+
+def jsonld_blobs(html: str) -> List[str]:
+    """<script type="application/ld+json"> gövdeleri (sadece script etiketlerinin etrafı taranır)."""
+    out: List[str] = []
+    pos = html.find("ld+json")
+    while pos >= 0:
+        start = html.rfind("<script", 0, pos)
+        m = JSONLD_OPEN.match(html, start) if start >= 0 else None
+        if m is None or m.end() <= pos:
+            pos = html.find("ld+json", pos + 7)
+            continue
+        end = html.find("</script>", m.end())
+        if end < 0:
+            break
+        out.append(html[m.end():end])
+        pos = html.find("ld+json", end + 9)
+    return out
+
+
+def rsc_chunks(html: str, *needles: str) -> Iterator[str]:
+    """Next.js `self.__next_f.push([1,"..."])` payload'ları; needles verilirse sadece onları içerenler."""
+    pos = html.find(RSC_PUSH)
+    while pos >= 0:
+        start = pos + len(RSC_PUSH)
+        end = html.find('"])', start)
+        if end < 0:
+            return
+        chunk = html[start:end]
+        if not needles or any(n in chunk for n in needles):
+            yield chunk
+        pos = html.find(RSC_PUSH, end + 3)
+
+
+def utag_data(html: str) -> Optional[str]:
+    """AbeBooks `window.utag_data = {...};` JSON metni."""
+    pos = html.find("window.utag_data")
+    while pos >= 0:
+        m = UTAG_DATA.match(html, pos)
+        if m:
+            return m.group(1)
+        pos = html.find("window.utag_data", pos + 16)
+    return None
+
+
+def find_prices(pattern: "re.Pattern[str]", html: str, lo: float, hi: float,
+                limit: int, scale: float = 1.0) -> List[float]:
+    """pattern'in ilk grubundan (lo, hi) aralığındaki fiyatlar, limit dolunca tarama durur."""
+    out: List[float] = []
+    for m in pattern.finditer(html):
+        p = float(m.group(1)) * scale
+        if lo < p < hi:
+            out.append(p)
+            if len(out) >= limit:
+                break
+    return out
+
+
+def ebay_sold_prices(html: str) -> List[float]:
+    """eBay sold sonuçlarındaki s-item__price değerleri (ilk item dahil, sırayla)."""
+    start = html.find("s-item__price")
+    if start < 0:
+        # Büyük/küçük harf farklı class adı — nadir; tüm gövdeyi tara
+        if "s-item__price" not in html.lower():
+            return []
+        start = 0
+    else:
+        start = html.rfind("<", 0, start)
+    out: List[float] = []
+    for m in EBAY_SOLD_PRICE.finditer(html, max(start, 0)):
+        try:
+            out.append(float(m.group(1).replace(",", "")))
+        except ValueError:
+            pass
+    return out
+
+
+def ebay_sold_items(html: str) -> List[dict]:
+    """
+    eBay sold sonuçları, item bazında (sayfa sırasıyla, ilk promo kartı dahil):
+      [{item_id (yoksa None), price, shipping, ended_at (satış günü, UTC epoch | None)}]
+    Her <li class="s-item"> bloğu bir sonraki bloğa kadar taranır; fiyatı olmayan bloklar atlanır.
+    """
+    from datetime import datetime, timezone
+
+    starts = [m.start() for m in EBAY_ITEM_START.finditer(html)]
+    out: List[dict] = []
+    for i, start in enumerate(starts):
+        end = starts[i + 1] if i + 1 < len(starts) else len(html)
+        price_m = EBAY_SOLD_PRICE.search(html, start, end)
+        if price_m is None:
+            continue
+        try:
+            price = float(price_m.group(1).replace(",", ""))
+        except ValueError:
+            continue
+        id_m = EBAY_ITEM_ID.search(html, start, end)
+        ship_m = EBAY_SHIPPING.search(html, start, end)
+        date_m = EBAY_SOLD_DATE.search(html, start, end)
+        ended_at = None
+        if date_m:
+            try:
+                ended_at = int(datetime.strptime(" ".join(date_m.groups()), "%b %d %Y")
+                               .replace(tzinfo=timezone.utc).timestamp())
+            except ValueError:
+                pass
+        out.append({
+            "item_id": id_m.group(1) if id_m else None,
+            "price": price,
+            "shipping": float(ship_m.group(1).replace(",", "")) if ship_m else 0.0,
+            "ended_at": ended_at,
+        })
+    return out
+
+
+# ── Offload ──────────────────────────────────────────────────────────────────
+
+async def run(fn: Callable[..., T], html: str, *args: Any) -> T:
+    """Küçük dokümanları doğrudan, büyükleri thread'de parse et."""
+    if len(html) < get_settings().html_offload_min_kb * 1024:
+        return fn(html, *args)
+    return await asyncio.to_thread(fn, html, *args)
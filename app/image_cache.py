@@ -0,0 +1,247 @@
+"""
+Image Cache — vision çağrıları için görsel indirme + küçültme + içerik hash'i ile tekilleştirme.
+
+eBay görselleri tam boy (s-l1600, ~300-800 KB) iniyordu; ai_analyst ve listing_verifier aynı
+görseli ayrı ayrı indiriyordu. Vision modelleri kapak doğrulaması için ~640 px'ten fazlasını
+kullanmaz (Gemini 768×768 karo başına token sayar) — fazlası gecikme ve token israfı.
+
+  image_url(url PK, sha, fetched_at)               → URL bir kez indirilir
+  image_blob(sha PK, b64, mime, width, height, orig_bytes, bytes, created_at, last_hit_at)
+    sha → ham içeriğin sha256'sı: farklı ilanlardaki aynı stok görsel tek satır
+  image_verdict(digest, isbn, data, created_at)    → görsel + ISBN için vision kararı
+    digest → sha256(b64) — llm_cache.make_key ile aynı görsel özeti; _VERDICT_TTL_S sonra
+    geçersiz, görseli evict edilince silinir
+
+Küçültme: eBay URL'leri s-l<N> boyut varyantına çevrilir (bağımlılıksız); Pillow kuruluysa
+VISION_IMAGE_MAX_SIDE'a sığdırılıp JPEG olarak yeniden kodlanır. Pillow yoksa indirilen
+bayt aynen kullanılır.
+"""
+from __future__ import annotations
+
+import asyncio
+import base64
+import hashlib
+import io
+import json
+import logging
+import re
+import sqlite3
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+import httpx
+
+from app.core.config import get_settings
+from app.core.keyed_lock import KeyedLock
+
+logger = logging.getLogger("trackerbundle.image_cache")
+
+_schema_ready: set = set()
+_url_locks = KeyedLock()
+
+_URL_TTL_S = 30 * 86400
+_VERDICT_TTL_S = 30 * 86400
+_JPEG_QUALITY = 82
+# i.ebayimg.com'un sunduğu boyut varyantları (uzun kenar, px)
+_EBAY_SIZES = (140, 225, 300, 400, 500, 640, 960, 1200, 1600)
+_EBAY_SIZE_RE = re.compile(r"(i\.ebayimg\.com/.+/s-l)(\d+)(\.(?:jpe?g|png|webp))", re.IGNORECASE)
+
+
+def _path() -> Path:
+    return get_settings().resolved_data_dir() / "image_cache.db"
+
+
+def _connect() -> sqlite3.Connection:
+    p = _path()
+    p.parent.mkdir(parents=True, exist_ok=True)
+    con = sqlite3.connect(p, timeout=10)
+    con.row_factory = sqlite3.Row
+    con.execute("PRAGMA synchronous=NORMAL;")
+    if str(p) not in _schema_ready:
+        con.execute("PRAGMA journal_mode=WAL;")
+        con.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS image_url (
+              url TEXT PRIMARY KEY,
+              sha TEXT NOT NULL,
+              fetched_at INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS image_blob (
+              sha TEXT PRIMARY KEY,
+              b64 TEXT NOT NULL,
+              mime TEXT NOT NULL,
+              width INTEGER,
+              height INTEGER,
+              orig_bytes INTEGER NOT NULL,
+              bytes INTEGER NOT NULL,
+              created_at INTEGER NOT NULL,
+              last_hit_at INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_image_blob_lru ON image_blob(last_hit_at);
+            CREATE TABLE IF NOT EXISTS image_verdict (
+              digest TEXT NOT NULL,
+              isbn TEXT NOT NULL,
+              data TEXT NOT NULL,
+              created_at INTEGER NOT NULL,
+              PRIMARY KEY (digest, isbn)
+            );
+            CREATE INDEX IF NOT EXISTS idx_image_verdict_age ON image_verdict(created_at);
+            """
+        )
+        _schema_ready.add(str(p))
+    return con
+
+
+def digest(image_b64: str) -> str:
+    return hashlib.sha256(image_b64.encode()).hexdigest()
+
+
+def sized_url(url: str, max_side: Optional[int] = None) -> str:
+    """eBay görsel URL'sini max_side'a sığan en büyük s-l<N> varyantına çevir; diğerleri aynen."""
+    max_side = int(max_side or get_settings().vision_image_max_side)
+    size = max([s for s in _EBAY_SIZES if s <= max_side] or [_EBAY_SIZES[0]])
+    m = _EBAY_SIZE_RE.search(url or "")
+    if not m or int(m.group(2)) <= size:
+        return url
+    return url[:m.start(2)] + str(size) + url[m.end(2):]
+
+
+def _downscale(raw: bytes, mime: str, max_side: int) -> Tuple[bytes, str, Optional[int], Optional[int]]:
+    """Pillow varsa max_side'a sığdır + JPEG; yoksa / çözülemezse ham bayt."""
+    try:
+        from PIL import Image
+    except ImportError:
+        return raw, mime, None, None
+    try:
+        with Image.open(io.BytesIO(raw)) as im:
+            w, h = im.size
+            if max(w, h) <= max_side and mime in ("image/jpeg", "image/png", "image/webp"):
+                return raw, mime, w, h
+            im = im.convert("RGB")
+            im.thumbnail((max_side, max_side))
+            buf = io.BytesIO()
+            im.save(buf, "JPEG", quality=_JPEG_QUALITY, optimize=True)
+            return buf.getvalue(), "image/jpeg", im.size[0], im.size[1]
+    except Exception as e:
+        logger.debug("image downscale failed: %s", e)
+        return raw, mime, None, None
+
+
+# ── Okuma / yazma ────────────────────────────────────────────────────────────
+
+def _row_info(row: sqlite3.Row) -> Dict[str, Any]:
+    return {k: row[k] for k in ("sha", "b64", "mime", "width", "height", "orig_bytes", "bytes")}
+
+
+def _lookup_url(url: str, now: int) -> Optional[Dict[str, Any]]:
+    with _connect() as con:
+        row = con.execute(
+            """
+            SELECT b.* FROM image_url u JOIN image_blob b ON b.sha = u.sha
+            WHERE u.url=? AND u.fetched_at > ?;
+            """,
+            (url, now - _URL_TTL_S),
+        ).fetchone()
+        if row is None:
+            return None
+        con.execute("UPDATE image_blob SET last_hit_at=? WHERE sha=?;", (now, row["sha"]))
+    return _row_info(row)
+
+
+def _store(url: str, raw: bytes, mime: str, now: int) -> Dict[str, Any]:
+    """Ham içeriği sha ile kaydet; aynı içerik daha önce geldiyse (stok görsel) mevcut satır."""
+    sha = hashlib.sha256(raw).hexdigest()
+    s = get_settings()
+    with _connect() as con:
+        row = con.execute("SELECT * FROM image_blob WHERE sha=?;", (sha,)).fetchone()
+        deduped = row is not None
+        if row is None:
+            out, out_mime, w, h = _downscale(raw, mime, int(s.vision_image_max_side))
+            b64 = base64.standard_b64encode(out).decode()
+            con.execute(
+                """
+                INSERT INTO image_blob(sha, b64, mime, width, height, orig_bytes, bytes, created_at, last_hit_at)
+                VALUES(?,?,?,?,?,?,?,?,?);
+                """,
+                (sha, b64, out_mime, w, h, len(raw), len(out), now, now),
+            )
+            _evict(con, int(s.image_cache_max_entries))
+            row = con.execute("SELECT * FROM image_blob WHERE sha=?;", (sha,)).fetchone()
+        else:
+            con.execute("UPDATE image_blob SET last_hit_at=? WHERE sha=?;", (now, sha))
+        con.execute("INSERT OR REPLACE INTO image_url(url, sha, fetched_at) VALUES(?,?,?);", (url, sha, now))
+    return {**_row_info(row), "deduped": deduped}
+
+
+def _evict(con: sqlite3.Connection, max_entries: int) -> None:
+    n = con.execute("SELECT COUNT(*) FROM image_blob;").fetchone()[0]
+    if n <= max_entries:
+        return
+    rows = con.execute(
+        "SELECT sha, b64 FROM image_blob ORDER BY last_hit_at LIMIT ?;", (n - max_entries,)
+    ).fetchall()
+    con.executemany("DELETE FROM image_blob WHERE sha=?;", [(r["sha"],) for r in rows])
+    con.executemany("DELETE FROM image_verdict WHERE digest=?;", [(digest(r["b64"]),) for r in rows])
+    con.execute("DELETE FROM image_url WHERE sha NOT IN (SELECT sha FROM image_blob);")
+
+
+async def fetch(url: str, client: httpx.AsyncClient) -> Optional[Dict[str, Any]]:
+    """
+    {"sha", "b64", "mime", "width", "height", "orig_bytes", "bytes", "from_cache", "deduped"}
+    — indirilemezse / görsel değilse None. Aynı URL için eşzamanlı çağrılar tek indirme paylaşır.
+    """
+    if not url:
+        return None
+    url = sized_url(url)
+    async with _url_locks(url):
+        now = int(time.time())
+        hit = await asyncio.to_thread(_lookup_url, url, now)
+        if hit is not None:
+            return {**hit, "from_cache": True, "deduped": False}
+        r = await client.get(url, timeout=15, follow_redirects=True)
+        mime = r.headers.get("content-type", "").split(";")[0].strip()
+        if r.status_code != 200 or "image" not in mime:
+            return None
+        info = await asyncio.to_thread(_store, url, r.content, mime, now)
+    logger.debug("image fetched url=%s orig=%dB sent=%dB deduped=%s",
+                 url, info["orig_bytes"], info["bytes"], info["deduped"])
+    return {**info, "from_cache": False}
+
+
+def get_verdict(image_digest: str, isbn: str, now: Optional[int] = None) -> Optional[Dict[str, Any]]:
+    now = int(now if now is not None else time.time())
+    with _connect() as con:
+        row = con.execute(
+            "SELECT data FROM image_verdict WHERE digest=? AND isbn=? AND created_at > ?;",
+            (image_digest, isbn, now - _VERDICT_TTL_S),
+        ).fetchone()
+    return json.loads(row["data"]) if row else None
+
+
+def put_verdict(image_digest: str, isbn: str, data: Dict[str, Any], now: Optional[int] = None) -> None:
+    now = int(now if now is not None else time.time())
+    with _connect() as con:
+        con.execute(
+            "INSERT OR REPLACE INTO image_verdict(digest, isbn, data, created_at) VALUES(?,?,?,?);",
+            (image_digest, isbn, json.dumps(data, ensure_ascii=False), now),
+        )
+        con.execute("DELETE FROM image_verdict WHERE created_at <= ?;", (now - _VERDICT_TTL_S,))
+
+
+def stats() -> Dict[str, Any]:
+    with _connect() as con:
+        b = con.execute(
+            "SELECT COUNT(*), COALESCE(SUM(orig_bytes), 0), COALESCE(SUM(bytes), 0) FROM image_blob;"
+        ).fetchone()
+        urls = con.execute("SELECT COUNT(*) FROM image_url;").fetchone()[0]
+        verdicts = con.execute("SELECT COUNT(*) FROM image_verdict;").fetchone()[0]
+    return {"images": b[0], "urls": urls, "verdicts": verdicts, "orig_bytes": b[1], "bytes": b[2],
+            "max_entries": int(get_settings().image_cache_max_entries)}
+
+
+def clear() -> int:
+    with _connect() as con:
+        con.execute("DELETE FROM image_url;")
+        con.execute("DELETE FROM image_verdict;")
+        return con.execute("DELETE FROM image_blob;").rowcount
@@ -397,10 +397,9 @@ async def _verify_image_vision(
         return {"status": "NO_IMAGE", "verdict": "NO_IMAGE", "notes": "Görsel URL yok"}
 
     try:
-        from app.ai_analyst import _fetch_image_b64
-        from app.llm_router import route as llm_route
+        from app.ai_analyst import _fetch_image_b64, _image_verdict
 
-        # Görüntüyü indir
+        # Görüntüyü indir (image_cache: URL başına bir kez, küçültülmüş)
         async with httpx.AsyncClient(timeout=15) as client:
             image_b64 = await _fetch_image_b64(image_url, client)
 
@@ -414,7 +413,33 @@ async def _verify_image_vision(
         except Exception:
             pass
 
-        sys_prompt = """You are a book cover verification expert.
+        # Aynı görsel (içerik hash'i) bu ISBN için daha önce değerlendirildi → vision çağrısı yok
+        parsed = await asyncio.to_thread(_image_verdict, image_b64, isbn13)
+        if parsed:
+            parsed["from_image_cache"] = True
+        else:
+            parsed = await _vision_llm(image_b64, isbn13, expected_title, candidate)
+        parsed.setdefault("status", parsed.get("verdict", "UNCERTAIN"))
+
+        # Stock photo + used condition = risky
+        if parsed.get("is_stock_photo") and candidate.get("source_condition") == "used":
+            parsed["stock_photo_risk"] = True
+            parsed["notes"] = (parsed.get("notes") or "") + " ⚠️ Stock fotoğraf + used kondisyon: gerçek durum gizlenmiş olabilir."
+
+        return parsed
+
+    except Exception as e:
+        logger.warning("_verify_image_vision isbn=%s error: %s", isbn, e)
+        return {"status": "ERROR", "verdict": "UNCERTAIN", "notes": f"Vision hatası: {str(e)[:80]}"}
+
+
+async def _vision_llm(image_b64: str, isbn13: str, expected_title: str,
+                      candidate: Dict[str, Any]) -> Dict[str, Any]:
+    """Vision LLM çağrısı + JSON parse; kesin karar image_cache'e yazılır."""
+    from app.ai_analyst import _KNOWN_IMAGE_VERDICTS, _remember_image_verdict
+    from app.llm_router import route as llm_route
+
+    sys_prompt = """You are a book cover verification expert.
 Your job: examine the image and determine if it matches the expected book.
 Reply ONLY with this JSON (no markdown):
 {
@@ -433,75 +458,70 @@ UNCERTAIN: can't determine (blurry, wrong angle, partial view)
 STOCK_PHOTO: plain white background with no imperfections = publisher stock photo (used condition should show real item)
 """
 
-        user_prompt = f"""Expected book:
+    user_prompt = f"""Expected book:
 Title: {expected_title[:100]}
 ISBN: {isbn13}
 Declared condition: {candidate.get('source_condition', '?')}
 
 Does the eBay listing image show THIS specific book?"""
 
-        result = await llm_route(
-            task="vision",
-            system_prompt=sys_prompt,
-            user_prompt=user_prompt,
-            image_b64=image_b64,
-            max_tokens=400,
-        )
-
-        import json as _json
-        import re as _re
-        text = result["text"].strip()
-
-        # Strip markdown fences
-        for fence in ["```json", "```"]:
-            if fence in text:
-                parts = text.split(fence)
-                text = parts[1] if len(parts) >= 3 else text.replace(fence, "")
-        text = text.strip()
-
-        # Robust JSON extraction: find {…}, fix trailing commas, partial-parse on failure
-        s, e = text.find("{"), text.rfind("}") + 1
-        parsed = None
-        if s >= 0 and e > s:
-            candidate_json = text[s:e]
-            # Fix trailing commas before } or ]
-            candidate_json = _re.sub(r",\s*}", "}", candidate_json)
-            candidate_json = _re.sub(r",\s*]", "]", candidate_json)
-            try:
-                parsed = _json.loads(candidate_json)
-            except (_json.JSONDecodeError, ValueError):
-                # Partial parse: try progressively shorter strings
-                for end in range(len(candidate_json), 0, -1):
-                    try:
-                        parsed = _json.loads(candidate_json[:end])
-                        if isinstance(parsed, dict):
-                            parsed["_partial"] = True
-                            break
-                    except (_json.JSONDecodeError, ValueError):
-                        continue
-
-        if not parsed or not isinstance(parsed, dict):
-            parsed = {"verdict": "UNCERTAIN", "notes": text[:200], "parse_error": True}
-
-        # Ensure required fields
-        for k, v in [("verdict","UNCERTAIN"), ("confidence",0), ("notes",""), ("is_stock_photo",None)]:
-            if k not in parsed:
-                parsed[k] = v
-
-        parsed["provider"] = result.get("provider", "unknown")
-        parsed["model"] = result.get("model", "")
-        parsed["status"] = parsed.get("verdict", "UNCERTAIN")
-
-        # Stock photo + used condition = risky
-        if parsed.get("is_stock_photo") and candidate.get("source_condition") == "used":
-            parsed["stock_photo_risk"] = True
-            parsed["notes"] = (parsed.get("notes") or "") + " ⚠️ Stock fotoğraf + used kondisyon: gerçek durum gizlenmiş olabilir."
-
-        return parsed
-
-    except Exception as e:
-        logger.warning("_verify_image_vision isbn=%s error: %s", isbn, e)
-        return {"status": "ERROR", "verdict": "UNCERTAIN", "notes": f"Vision hatası: {str(e)[:80]}"}
+    result = await llm_route(
+        task="vision",
+        system_prompt=sys_prompt,
+        user_prompt=user_prompt,
+        image_b64=image_b64,
+        max_tokens=400,
+        cache_ttl_s=7 * 86400,   # aynı görsel + kitap → sonuç değişmez, Gemini kotası korunur
+        required_fields=("verdict", "confidence", "notes", "is_stock_photo", "condition_notes"),
+    )
+
+    import json as _json
+    import re as _re
+    text = result["text"].strip()
+
+    # Strip markdown fences
+    for fence in ["```json", "```"]:
+        if fence in text:
+            parts = text.split(fence)
+            text = parts[1] if len(parts) >= 3 else text.replace(fence, "")
+    text = text.strip()
+
+    # Robust JSON extraction: find {…}, fix trailing commas, partial-parse on failure
+    s, e = text.find("{"), text.rfind("}") + 1
+    parsed = None
+    if s >= 0 and e > s:
+        candidate_json = text[s:e]
+        # Fix trailing commas before } or ]
+        candidate_json = _re.sub(r",\s*}", "}", candidate_json)
+        candidate_json = _re.sub(r",\s*]", "]", candidate_json)
+        try:
+            parsed = _json.loads(candidate_json)
+        except (_json.JSONDecodeError, ValueError):
+            # Partial parse: try progressively shorter strings
+            for end in range(len(candidate_json), 0, -1):
+                try:
+                    parsed = _json.loads(candidate_json[:end])
+                    if isinstance(parsed, dict):
+                        parsed["_partial"] = True
+                        break
+                except (_json.JSONDecodeError, ValueError):
+                    continue
+
+    if not parsed or not isinstance(parsed, dict):
+        parsed = {"verdict": "UNCERTAIN", "notes": text[:200], "parse_error": True}
+
+    # Ensure required fields
+    for k, v in [("verdict","UNCERTAIN"), ("confidence",0), ("notes",""), ("is_stock_photo",None)]:
+        if k not in parsed:
+            parsed[k] = v
+
+    parsed["provider"] = result.get("provider", "unknown")
+    parsed["model"] = result.get("model", "")
+    parsed["status"] = parsed.get("verdict", "UNCERTAIN")
+
+    if parsed["verdict"] in _KNOWN_IMAGE_VERDICTS and not parsed.get("_partial"):
+        await asyncio.to_thread(_remember_image_verdict, image_b64, isbn13, dict(parsed))
+    return parsed
 
 
 # ─── Ana verify fonksiyonu ────────────────────────────────────────────────────
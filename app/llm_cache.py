@@ -0,0 +1,142 @@
+"""
+LLM Response Cache — llm_router.route yanıtlarının kalıcı, boyut sınırlı (LRU) önbelleği.
+
+Ücretsiz kotalar (Gemini 1500/gün, Groq 14.4k/gün) bağlayıcı kısıt; aynı prompt'un tekrar
+analizi kota harcamamalı ve restart'ta kaybolmamalı.
+
+  llm_cache(key PK, task, provider, model, text, created_at, expires_at, last_hit_at, hits)
+    key → sha256(task, provider ailesi, normalize system+user prompt, görsel özeti,
+                 max_tokens, json_mode) — make_key()
+
+Önbellek çağrı yeri bazında açılır: route(..., cache_ttl_s=N). N yoksa / 0 ise hiç okunmaz
+ve yazılmaz. Satır sayısı LLM_CACHE_MAX_ENTRIES'i aşınca en uzun süredir kullanılmayanlar
+(last_hit_at) silinir.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import re
+import sqlite3
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional
+
+from app.core.config import get_settings
+
+logger = logging.getLogger("trackerbundle.llm_cache")
+
+_schema_ready: set = set()
+_WS = re.compile(r"\s+")
+
+
+def _path() -> Path:
+    return get_settings().resolved_data_dir() / "llm_cache.db"
+
+
+def _connect() -> sqlite3.Connection:
+    p = _path()
+    p.parent.mkdir(parents=True, exist_ok=True)
+    con = sqlite3.connect(p, timeout=10)
+    con.row_factory = sqlite3.Row
+    con.execute("PRAGMA synchronous=NORMAL;")
+    if str(p) not in _schema_ready:
+        con.execute("PRAGMA journal_mode=WAL;")
+        con.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS llm_cache (
+              key TEXT PRIMARY KEY,
+              task TEXT NOT NULL,
+              provider TEXT NOT NULL,
+              model TEXT NOT NULL,
+              text TEXT NOT NULL,
+              created_at INTEGER NOT NULL,
+              expires_at INTEGER NOT NULL,
+              last_hit_at INTEGER NOT NULL,
+              hits INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE INDEX IF NOT EXISTS idx_llm_cache_lru ON llm_cache(last_hit_at);
+            """
+        )
+        _schema_ready.add(str(p))
+    return con
+
+
+def _norm(text: str) -> str:
+    """Boşluk farkları (girinti, satır sonu) aynı prompt'u farklı anahtara düşürmesin."""
+    return _WS.sub(" ", text or "").strip()
+
+
+def make_key(
+    task: str,
+    family: Iterable[str],
+    system_prompt: str,
+    user_prompt: str,
+    image_b64: Optional[str] = None,
+    max_tokens: int = 0,
+    json_mode: bool = False,
+) -> str:
+    """family: task için yapılandırılmış provider adları — provider eklenip çıkınca anahtar değişir."""
+    image_digest = hashlib.sha256(image_b64.encode()).hexdigest() if image_b64 else ""
+    raw = json.dumps(
+        [task, sorted(family), _norm(system_prompt), _norm(user_prompt), image_digest, max_tokens, json_mode],
+        separators=(",", ":"), ensure_ascii=False,
+    )
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+# ── Okuma / yazma ────────────────────────────────────────────────────────────
+
+def get(key: str, now: Optional[int] = None) -> Optional[Dict[str, Any]]:
+    """{"text", "provider", "model"} — yoksa / süresi dolduysa None. Hit LRU sırasını tazeler."""
+    now = int(now if now is not None else time.time())
+    with _connect() as con:
+        row = con.execute(
+            "SELECT text, provider, model FROM llm_cache WHERE key=? AND expires_at > ?;", (key, now)
+        ).fetchone()
+        if row is None:
+            return None
+        con.execute("UPDATE llm_cache SET last_hit_at=?, hits=hits+1 WHERE key=?;", (now, key))
+    return {"text": row["text"], "provider": row["provider"], "model": row["model"]}
+
+
+def put(key: str, task: str, result: Dict[str, Any], ttl_s: float, now: Optional[int] = None) -> None:
+    now = int(now if now is not None else time.time())
+    max_entries = int(get_settings().llm_cache_max_entries)
+    with _connect() as con:
+        con.execute(
+            """
+            INSERT OR REPLACE INTO llm_cache(key, task, provider, model, text, created_at, expires_at, last_hit_at, hits)
+            VALUES(?,?,?,?,?,?,?,?,0);
+            """,
+            (key, task, result.get("provider", ""), result.get("model", ""), result.get("text", ""),
+             now, now + int(ttl_s), now),
+        )
+        n = con.execute("SELECT COUNT(*) FROM llm_cache;").fetchone()[0]
+        if n > max_entries:
+            # Önce süresi dolanlar, sonra en uzun süredir kullanılmayanlar
+            con.execute("DELETE FROM llm_cache WHERE expires_at <= ?;", (now,))
+            con.execute(
+                """
+                DELETE FROM llm_cache WHERE key IN (
+                  SELECT key FROM llm_cache ORDER BY last_hit_at LIMIT MAX(0, (SELECT COUNT(*) FROM llm_cache) - ?)
+                );
+                """,
+                (max_entries,),
+            )
+
+
+def stats() -> Dict[str, Any]:
+    with _connect() as con:
+        r = con.execute(
+            "SELECT COUNT(*), COALESCE(SUM(hits), 0), COALESCE(SUM(LENGTH(text)), 0) FROM llm_cache;"
+        ).fetchone()
+        by_task = {t: n for t, n in con.execute("SELECT task, COUNT(*) FROM llm_cache GROUP BY task;")}
+    return {"entries": r[0], "hits": r[1], "text_bytes": r[2], "by_task": by_task,
+            "max_entries": int(get_settings().llm_cache_max_entries)}
+
+
+def clear() -> int:
+    with _connect() as con:
+        return con.execute("DELETE FROM llm_cache;").rowcount
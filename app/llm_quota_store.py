@@ -0,0 +1,177 @@
+"""
+LLM Quota Store — llm_router kota / backoff durumu, süreçler arası paylaşımlı (SQLite).
+
+ProviderState (llm_router._states) süreç içidir: restart günlük sayacı sıfırlar, API /
+bot / scan worker ayrı sayar → günlük limit aşılır, provider 24 saat banlar. Bu store
+tüm süreçlerin ortak defteri:
+
+  llm_quota(provider PK, day_key, requests_today, minute_start, requests_this_minute,
+            backoff_until, updated_at)
+    day_key → provider'ın kota sıfırlama saatine hizalı gün (ör. Gemini: Pasifik gece yarısı)
+
+reserve() kontrol + artırmayı tek BEGIN IMMEDIATE transaction'ında yapar: iki süreç son
+kalan isteği aynı anda alamaz. set_backoff() 429 / auth ban'ını diğer süreçlere yayar.
+"""
+from __future__ import annotations
+
+import logging
+import sqlite3
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional
+
+from app.core.config import get_settings
+
+logger = logging.getLogger("trackerbundle.llm_quota_store")
+
+_schema_ready: set = set()
+
+
+def _path() -> Path:
+    return get_settings().resolved_data_dir() / "llm_quota.db"
+
+
+def _connect() -> sqlite3.Connection:
+    p = _path()
+    p.parent.mkdir(parents=True, exist_ok=True)
+    con = sqlite3.connect(p, timeout=10, isolation_level=None)   # transaction'lar elle (BEGIN IMMEDIATE)
+    con.row_factory = sqlite3.Row
+    con.execute("PRAGMA synchronous=NORMAL;")
+    if str(p) not in _schema_ready:
+        con.execute("PRAGMA journal_mode=WAL;")
+        con.execute(
+            """
+            CREATE TABLE IF NOT EXISTS llm_quota (
+              provider TEXT PRIMARY KEY,
+              day_key TEXT NOT NULL,
+              requests_today INTEGER NOT NULL DEFAULT 0,
+              minute_start REAL NOT NULL DEFAULT 0,
+              requests_this_minute INTEGER NOT NULL DEFAULT 0,
+              backoff_until REAL NOT NULL DEFAULT 0,
+              updated_at REAL NOT NULL
+            );
+            """
+        )
+        _schema_ready.add(str(p))
+    return con
+
+
+def day_key(reset_tz: str = "UTC", reset_hour: int = 0, now: Optional[float] = None) -> str:
+    """Kota gününün anahtarı: reset_tz saat diliminde reset_hour'da değişir."""
+    try:
+        from zoneinfo import ZoneInfo
+        tz = ZoneInfo(reset_tz)
+    except Exception:
+        tz = timezone.utc
+    local = datetime.fromtimestamp(now if now is not None else time.time(), tz) - timedelta(hours=reset_hour)
+    return local.date().isoformat()
+
+
+def _view(row: Optional[sqlite3.Row], dk: str, now: float) -> Dict[str, Any]:
+    """Satırı şimdiki pencerelere göre yorumla (gün / dakika değiştiyse sayaç 0)."""
+    if row is None:
+        return {"requests_today": 0, "requests_this_minute": 0, "minute_start": now, "backoff_until": 0.0}
+    fresh_minute = now - row["minute_start"] < 60
+    return {
+        "requests_today": row["requests_today"] if row["day_key"] == dk else 0,
+        "requests_this_minute": row["requests_this_minute"] if fresh_minute else 0,
+        "minute_start": row["minute_start"] if fresh_minute else now,
+        "backoff_until": row["backoff_until"],
+    }
+
+
+# ── Yazma ────────────────────────────────────────────────────────────────────
+
+def reserve(provider: str, rpm: int, rpd: Optional[int], dk: str, now: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Atomik kontrol + artırma. Dönüş: güncel görünüm + "ok" (bool) ve reddedildiyse "reason"
+    ("backoff" | "rpm" | "rpd"). Reddedilen istek sayaçları artırmaz.
+    """
+    now = float(now if now is not None else time.time())
+    con = _connect()
+    try:
+        con.execute("BEGIN IMMEDIATE;")
+        row = con.execute("SELECT * FROM llm_quota WHERE provider=?;", (provider,)).fetchone()
+        v = _view(row, dk, now)
+        reason = None
+        if now < v["backoff_until"]:
+            reason = "backoff"
+        elif v["requests_this_minute"] >= rpm:
+            reason = "rpm"
+        elif rpd is not None and v["requests_today"] >= rpd:
+            reason = "rpd"
+        if reason is None:
+            v["requests_today"] += 1
+            v["requests_this_minute"] += 1
+            con.execute(
+                """
+                INSERT INTO llm_quota(provider, day_key, requests_today, minute_start, requests_this_minute,
+                                      backoff_until, updated_at)
+                VALUES(?,?,?,?,?,?,?)
+                ON CONFLICT(provider) DO UPDATE SET
+                  day_key=excluded.day_key, requests_today=excluded.requests_today,
+                  minute_start=excluded.minute_start, requests_this_minute=excluded.requests_this_minute,
+                  updated_at=excluded.updated_at;
+                """,
+                (provider, dk, v["requests_today"], v["minute_start"], v["requests_this_minute"],
+                 v["backoff_until"], now),
+            )
+        con.execute("COMMIT;")
+    except BaseException:
+        if con.in_transaction:
+            con.execute("ROLLBACK;")
+        raise
+    finally:
+        con.close()
+    return {**v, "ok": reason is None, "reason": reason}
+
+
+def set_backoff(provider: str, until: float, dk: str, now: Optional[float] = None) -> None:
+    """Backoff'u paylaş; mevcut daha uzunsa korunur."""
+    now = float(now if now is not None else time.time())
+    con = _connect()
+    try:
+        con.execute(
+            """
+            INSERT INTO llm_quota(provider, day_key, minute_start, backoff_until, updated_at)
+            VALUES(?,?,?,?,?)
+            ON CONFLICT(provider) DO UPDATE SET
+              backoff_until=MAX(llm_quota.backoff_until, excluded.backoff_until),
+              updated_at=excluded.updated_at;
+            """,
+            (provider, dk, now, float(until), now),
+        )
+    finally:
+        con.close()
+
+
+# ── Okuma ────────────────────────────────────────────────────────────────────
+
+def load(day_keys: Dict[str, str], now: Optional[float] = None) -> Dict[str, Dict[str, Any]]:
+    """day_keys: {provider: day_key}. Satırı olmayan provider sonuçta yer almaz."""
+    now = float(now if now is not None else time.time())
+    names = list(day_keys)
+    if not names:
+        return {}
+    con = _connect()
+    try:
+        rows = con.execute(
+            f"SELECT * FROM llm_quota WHERE provider IN ({','.join('?' * len(names))});", names
+        ).fetchall()
+    finally:
+        con.close()
+    return {r["provider"]: _view(r, day_keys[r["provider"]], now) for r in rows}
+
+
+def reset(providers: Optional[Iterable[str]] = None) -> int:
+    con = _connect()
+    try:
+        if providers is None:
+            return con.execute("DELETE FROM llm_quota;").rowcount
+        names = list(providers)
+        return con.execute(
+            f"DELETE FROM llm_quota WHERE provider IN ({','.join('?' * len(names))});", names
+        ).rowcount
+    finally:
+        con.close()
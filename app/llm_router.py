@@ -13,18 +13,38 @@ GÖREV → MODEL ATAMALARI:
                → OpenRouter Qwen3-235B:free   (sınırsız, 20 RPM)
                → Gemini fallback
 
-/llm/status endpoint → kota durumu, devre dışı providerlar
+SEÇİM: aynı tier'daki (eşdeğer) providerlar arasında ağırlıklı rastgele — ağırlık gecikme
+EWMA'sı, hata oranı EWMA'sı ve kalan dakika / eşzamanlılık payından. Eşzamanlılık sınırı
+rpm'den türetilir; dolan provider atlanır (burst 429 beklemeden sonraki tier'a taşar).
+Opsiyonel hedging: route(..., hedge_after_s=N) / LLM_HEDGE_AFTER_S.
+
+/llm/status endpoint → kota durumu, devre dışı providerlar, gecikme / hata / in-flight
+KOTA: sayaç ve backoff llm_quota_store'da (SQLite) — API, bot ve worker süreçleri ortak
+sayar, restart sıfırlamaz; günlük pencere provider'ın sıfırlama saatine hizalı.
+route(..., cache_ttl_s=N) → llm_cache (SQLite, LRU): aynı task + prompt + görsel tekrarında
+                             kota harcamadan önbellekten döner
+route(..., required_fields=[...]) → yanıt stream edilir (LLM_STREAM), JSON artımlı denetlenir:
+                             bozulduğu anda kesilip sıradaki providera geçilir, alanların hepsi
+                             tamamlanınca kesilir. time-to-verdict provider başına /llm/status'ta
+                             partial_ok=True → kesik stream ham metinle döner ("truncated")
 """
 from __future__ import annotations
 
 import asyncio
+import json
 import logging
+import math
+import random
 import time
+from contextlib import aclosing
 from dataclasses import dataclass, field
-from typing import Any, Dict, List, Optional
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
 
 import httpx
 
+from app.core.json_stream import JsonStreamValidator
+from app.core.keyed_lock import KeyedLock
+
 logger = logging.getLogger("trackerbundle.llm_router")
 
 
@@ -42,6 +62,15 @@ class ProviderDef:
     priority: int             # düşük = yüksek öncelik
     supports_vision: bool = False
     extra_headers: Dict[str, str] = field(default_factory=dict)
+    # Eşdeğer yetenek grubu: aynı tier'daki providerlar arasında yük dağıtılır (None → priority)
+    tier: Optional[int] = None
+    # Günlük kotanın sıfırlandığı an (llm_quota_store gün anahtarı): saat dilimi + saat
+    quota_reset_tz: str = "UTC"
+    quota_reset_hour: int = 0
+
+    @property
+    def effective_tier(self) -> int:
+        return self.tier if self.tier is not None else self.priority
 
 
 PROVIDERS: List[ProviderDef] = [
@@ -53,7 +82,8 @@ PROVIDERS: List[ProviderDef] = [
         tasks=["vision", "web_search", "reasoning"],
         rpm=15, rpd=1500,
         auth_env_key="gemini_api_key",
-        priority=9,
+        priority=9, tier=3,
+        quota_reset_tz="America/Los_Angeles",   # Gemini RPD Pasifik gece yarısı sıfırlanır
         supports_vision=True,
     ),
     # Groq — Llama 4 Scout (vision + reasoning, ücretsiz)
@@ -64,7 +94,7 @@ PROVIDERS: List[ProviderDef] = [
         tasks=["vision", "reasoning"],
         rpm=30, rpd=14400,
         auth_env_key="groq_api_key",
-        priority=1,
+        priority=1, tier=1,
         supports_vision=True,
     ),
     # Groq — Llama 3.3 70B (reasoning, hızlı, 14.4k/gün)
@@ -75,7 +105,7 @@ PROVIDERS: List[ProviderDef] = [
         tasks=["reasoning"],
         rpm=30, rpd=14400,
         auth_env_key="groq_api_key",
-        priority=2,
+        priority=2, tier=1,
     ),
     # Groq — GPT OSS 120B (daha büyük, reasoning fallback)
     ProviderDef(
@@ -85,7 +115,7 @@ PROVIDERS: List[ProviderDef] = [
         tasks=["reasoning"],
         rpm=30, rpd=14400,
         auth_env_key="groq_api_key",
-        priority=3,
+        priority=3, tier=1,
     ),
     # Cerebras (sınırsız, 30 RPM)
     ProviderDef(
@@ -95,7 +125,7 @@ PROVIDERS: List[ProviderDef] = [
         tasks=["reasoning"],
         rpm=30, rpd=None,
         auth_env_key="cerebras_api_key",
-        priority=4,
+        priority=4, tier=1,
     ),
     # OpenRouter DeepSeek-V3:free (sınırsız ücretsiz)
     ProviderDef(
@@ -105,7 +135,7 @@ PROVIDERS: List[ProviderDef] = [
         tasks=["reasoning", "web_search"],
         rpm=20, rpd=None,
         auth_env_key="openrouter_api_key",
-        priority=5,
+        priority=5, tier=2,
         extra_headers={"HTTP-Referer": "https://trackerbundle3.app", "X-Title": "TrackerBundle3"},
     ),
     # OpenRouter Qwen3-235B:free (en akıllı ücretsiz)
@@ -116,7 +146,7 @@ PROVIDERS: List[ProviderDef] = [
         tasks=["reasoning"],
         rpm=20, rpd=None,
         auth_env_key="openrouter_api_key",
-        priority=6,
+        priority=6, tier=2,
         extra_headers={"HTTP-Referer": "https://trackerbundle3.app", "X-Title": "TrackerBundle3"},
     ),
     # Perplexity kaldırıldı — free tier yok, Pro aboneliği ($20/ay) şart
@@ -126,6 +156,9 @@ PROVIDERS: List[ProviderDef] = [
 
 # ─── Quota tracker (in-memory) ────────────────────────────────────────────────
 
+_EWMA_ALPHA = 0.2
+_DEFAULT_LATENCY_S = 5.0     # henüz ölçüm yokken varsayılan gecikme
+
 @dataclass
 class ProviderState:
     requests_this_minute: int = 0
@@ -135,6 +168,14 @@ class ProviderState:
     consecutive_errors: int = 0
     backoff_until: float = 0.0
     last_used: float = 0.0
+    # Adaptif seçim metrikleri
+    inflight: int = 0
+    latency_ewma_s: Optional[float] = None
+    error_ewma: float = 0.0
+    # Stream: karar anına kadar geçen süre (geçerli ya da kesin bozuk), erken kesme sayaçları
+    ttv_ewma_s: Optional[float] = None
+    stream_early_stops: int = 0
+    stream_invalid: int = 0
 
     def reset_if_needed(self):
         now = time.time()
@@ -160,19 +201,53 @@ class ProviderState:
         self.requests_today += 1
         self.last_used = time.time()
 
-    def record_success(self):
+    def record_success(self, latency_s: Optional[float] = None):
         self.consecutive_errors = 0
+        self.error_ewma *= 1 - _EWMA_ALPHA
+        if latency_s is not None:
+            prev = self.latency_ewma_s
+            self.latency_ewma_s = latency_s if prev is None else prev + _EWMA_ALPHA * (latency_s - prev)
+
+    def record_verdict(self, ttv_s: float, outcome: str):
+        """outcome: "complete" | "early" (required alanlar tamam, kesildi) | "truncated" | "invalid"."""
+        prev = self.ttv_ewma_s
+        self.ttv_ewma_s = ttv_s if prev is None else prev + _EWMA_ALPHA * (ttv_s - prev)
+        if outcome == "early":
+            self.stream_early_stops += 1
+        elif outcome == "invalid":
+            self.stream_invalid += 1
 
     def record_error(self, retry_after: float = 0):
         self.consecutive_errors += 1
+        self.error_ewma += _EWMA_ALPHA * (1.0 - self.error_ewma)
         if retry_after > 0:
             self.backoff_until = time.time() + retry_after
         elif self.consecutive_errors >= 2:
             self.backoff_until = time.time() + min(30 * self.consecutive_errors, 300)
 
+    def max_inflight(self, defn: ProviderDef) -> int:
+        """
+        Eşzamanlı istek sınırı rpm'den (Little yasası): dakikalık hız × gözlenen gecikme.
+        rpm=30, 5s gecikme → 3 — burst'ler 429 beklemeden sonraki providera taşar.
+        """
+        latency = self.latency_ewma_s or _DEFAULT_LATENCY_S
+        return max(1, math.ceil(defn.rpm / 60 * latency))
+
+    def has_capacity(self, defn: ProviderDef) -> bool:
+        return self.inflight < self.max_inflight(defn)
+
+    def weight(self, defn: ProviderDef) -> float:
+        """Seçim ağırlığı: kalan dakika/eşzamanlılık payı × başarı oranı² / gecikme."""
+        self.reset_if_needed()
+        used = max(self.requests_this_minute / max(1, defn.rpm), self.inflight / self.max_inflight(defn))
+        headroom = max(0.0, 1.0 - used)
+        latency = self.latency_ewma_s or _DEFAULT_LATENCY_S
+        return headroom * (1.0 - self.error_ewma) ** 2 / max(latency, 0.05)
+
 
 _states: Dict[str, ProviderState] = {}
 _state_lock = asyncio.Lock()
+_cache_locks = KeyedLock()   # llm_cache anahtarı başına — duplicate çağrı önle
 
 
 def _get_state(name: str) -> ProviderState:
@@ -182,6 +257,61 @@ def _get_state(name: str) -> ProviderState:
     return _states[name]
 
 
+# ─── Paylaşımlı kota (llm_quota_store) ────────────────────────────────────────
+# _states süreç içi görünümdür; sayaç / backoff'un doğrusu tüm süreçlerin yazdığı
+# llm_quota_store'dadır. Store erişilemezse yalnız süreç içi sayaca düşülür.
+# SQLite WAL okuma/yazması ms altı — LLM çağrısının yanında ihmal edilebilir, senkron çağrılır.
+
+def _day_key(defn: ProviderDef) -> str:
+    from app import llm_quota_store
+    return llm_quota_store.day_key(defn.quota_reset_tz, defn.quota_reset_hour)
+
+
+def _apply_shared(state: ProviderState, view: Dict[str, Any]) -> None:
+    state.requests_today = view["requests_today"]
+    state.requests_this_minute = view["requests_this_minute"]
+    state.minute_window_start = view["minute_start"]
+    state.backoff_until = max(state.backoff_until, view["backoff_until"])
+
+
+def _sync_shared(defs: List[ProviderDef]) -> None:
+    """Diğer süreçlerin harcadığı kotayı / koyduğu backoff'u süreç içi state'e al."""
+    try:
+        from app import llm_quota_store
+        views = llm_quota_store.load({d.name: _day_key(d) for d in defs})
+    except Exception as e:
+        logger.warning("router: llm_quota_store okunamadı — %s", e)
+        return
+    for name, view in views.items():
+        _apply_shared(_get_state(name), view)
+
+
+def _reserve(defn: ProviderDef) -> bool:
+    """Kota slotunu atomik ayır (tüm süreçler için). False → rpm / rpd / backoff dolu."""
+    state = _get_state(defn.name)
+    try:
+        from app import llm_quota_store
+        view = llm_quota_store.reserve(defn.name, defn.rpm, defn.rpd, _day_key(defn))
+    except Exception as e:
+        logger.warning("router: llm_quota_store yazılamadı (%s) — süreç içi sayaç", e)
+        state.record_request()
+        return True
+    _apply_shared(state, view)
+    if not view["ok"]:
+        logger.info("router: %s skip (paylaşımlı kota: %s)", defn.name, view["reason"])
+        return False
+    state.last_used = time.time()
+    return True
+
+
+def _share_backoff(defn: ProviderDef) -> None:
+    try:
+        from app import llm_quota_store
+        llm_quota_store.set_backoff(defn.name, _get_state(defn.name).backoff_until, _day_key(defn))
+    except Exception as e:
+        logger.warning("router: backoff paylaşılamadı %s — %s", defn.name, e)
+
+
 # ─── API key erişimi ──────────────────────────────────────────────────────────
 
 def _get_api_key(defn: ProviderDef) -> Optional[str]:
@@ -208,6 +338,34 @@ async def _call_openai_compat(
     """OpenAI-uyumlu /chat/completions endpoint'i çağır, ham text döndür.
     image_b64 varsa son user mesajına vision content ekler (Llama 4 Scout destekler).
     """
+    headers, payload = _openai_request(defn, api_key, messages, max_tokens, temperature, image_b64, json_mode)
+    async with httpx.AsyncClient(timeout=60) as client:
+        r = await client.post(
+            f"{defn.base_url}/chat/completions",
+            json=payload,
+            headers=headers,
+        )
+        if r.status_code == 429:
+            retry_after = float(r.headers.get("Retry-After", 30))
+            raise _RateLimitError(retry_after)
+        if r.status_code in (401, 403):
+            raise _AuthError(f"{defn.name}: {r.status_code}")
+        if r.status_code != 200:
+            raise RuntimeError(f"{defn.name} HTTP {r.status_code}: {r.text[:200]}")
+    data = r.json()
+    return data["choices"][0]["message"]["content"]
+
+
+def _openai_request(
+    defn: ProviderDef,
+    api_key: str,
+    messages: List[Dict[str, Any]],
+    max_tokens: int,
+    temperature: float,
+    image_b64: Optional[str],
+    json_mode: bool,
+) -> Tuple[Dict[str, str], Dict[str, Any]]:
+    """(headers, payload) — tek çağrı ve stream ortak."""
     # Vision: son user mesajını multimodal content'e çevir
     if image_b64 and messages:
         msgs = list(messages)
@@ -238,21 +396,52 @@ async def _call_openai_compat(
     # Skip for vision calls — response_format conflicts with image input on some providers
     if json_mode and not image_b64:
         payload["response_format"] = {"type": "json_object"}
+    return headers, payload
+
+
+async def _stream_openai_compat(
+    defn: ProviderDef,
+    api_key: str,
+    messages: List[Dict[str, Any]],
+    max_tokens: int = 1200,
+    temperature: float = 0.1,
+    image_b64: Optional[str] = None,
+    json_mode: bool = False,
+) -> AsyncIterator[str]:
+    """_call_openai_compat'ın stream hali (SSE): text parçalarını üretir. Tüketici erken
+    çıkınca bağlantı kapanır → provider üretimi keser."""
+    headers, payload = _openai_request(defn, api_key, messages, max_tokens, temperature, image_b64, json_mode)
+    payload["stream"] = True
     async with httpx.AsyncClient(timeout=60) as client:
-        r = await client.post(
-            f"{defn.base_url}/chat/completions",
-            json=payload,
-            headers=headers,
-        )
-        if r.status_code == 429:
-            retry_after = float(r.headers.get("Retry-After", 30))
-            raise _RateLimitError(retry_after)
-        if r.status_code in (401, 403):
-            raise _AuthError(f"{defn.name}: {r.status_code}")
-        if r.status_code != 200:
-            raise RuntimeError(f"{defn.name} HTTP {r.status_code}: {r.text[:200]}")
-    data = r.json()
-    return data["choices"][0]["message"]["content"]
+        async with client.stream("POST", f"{defn.base_url}/chat/completions", json=payload, headers=headers) as r:
+            if r.status_code == 429:
+                raise _RateLimitError(float(r.headers.get("Retry-After", 30)))
+            if r.status_code in (401, 403):
+                raise _AuthError(f"{defn.name}: {r.status_code}")
+            if r.status_code != 200:
+                body = (await r.aread()).decode(errors="replace")
+                raise RuntimeError(f"{defn.name} HTTP {r.status_code}: {body[:200]}")
+            async for data in _sse_data(r):
+                try:
+                    delta = data["choices"][0]["delta"].get("content")
+                except (KeyError, IndexError, TypeError, AttributeError):
+                    continue
+                if delta:
+                    yield delta
+
+
+async def _sse_data(r: httpx.Response) -> AsyncIterator[Dict[str, Any]]:
+    """SSE "data: {...}" satırlarını JSON olarak üret; "[DONE]" ile biter."""
+    async for line in r.aiter_lines():
+        if not line.startswith("data:"):
+            continue
+        raw = line[5:].strip()
+        if raw == "[DONE]":
+            return
+        try:
+            yield json.loads(raw)
+        except ValueError:
+            continue
 
 
 class _RateLimitError(Exception):
@@ -265,6 +454,9 @@ class _AuthError(Exception):
 
 # ─── Gemini native çağrı (vision + Google Search destekli) ───────────────────
 
+_GEMINI_BASE = "https://generativelanguage.googleapis.com/v1beta/models"
+_GEMINI_MODEL = "gemini-2.5-flash-lite"
+
 async def _call_gemini_native(
     api_key: str,
     system_prompt: str,
@@ -272,18 +464,42 @@ async def _call_gemini_native(
     image_b64: Optional[str] = None,
     use_search: bool = False,
     json_mode: bool = False,
+    max_tokens: int = 1200,
 ) -> str:
     """Gemini native API — vision ve Google Search grounding destekli."""
-    GEMINI_BASE = "https://generativelanguage.googleapis.com/v1beta/models"
-    MODEL = "gemini-2.5-flash-lite"
-    url = f"{GEMINI_BASE}/{MODEL}:generateContent?key={api_key}"
+    url = f"{_GEMINI_BASE}/{_GEMINI_MODEL}:generateContent?key={api_key}"
+    payload = _gemini_payload(system_prompt, user_prompt, image_b64, use_search, json_mode, max_tokens)
+
+    async with httpx.AsyncClient(timeout=60) as client:
+        r = await client.post(url, json=payload, headers={"Content-Type": "application/json"})
+        if r.status_code == 429:
+            retry_after = float(r.headers.get("Retry-After", 60))
+            raise _RateLimitError(retry_after)
+        if r.status_code != 200:
+            raise RuntimeError(f"Gemini {r.status_code}: {r.text[:200]}")
+    # Extract text from Gemini response format
+    data = r.json()
+    try:
+        parts_out = data["candidates"][0]["content"]["parts"]
+        return "\n".join(p.get("text", "") for p in parts_out if "text" in p)
+    except (KeyError, IndexError):
+        return str(data)
+
 
+def _gemini_payload(
+    system_prompt: str,
+    user_prompt: str,
+    image_b64: Optional[str],
+    use_search: bool,
+    json_mode: bool,
+    max_tokens: int = 1200,
+) -> Dict[str, Any]:
     parts: List[Dict] = []
     if image_b64:
         parts.append({"inline_data": {"mime_type": "image/jpeg", "data": image_b64}})
     parts.append({"text": user_prompt})
 
-    gen_config: Dict[str, Any] = {"temperature": 0.1, "maxOutputTokens": 1200}
+    gen_config: Dict[str, Any] = {"temperature": 0.1, "maxOutputTokens": int(max_tokens)}
     # JSON mode: Gemini enforces JSON output via responseMimeType (skip for vision+search)
     if json_mode and not image_b64 and not use_search:
         gen_config["responseMimeType"] = "application/json"
@@ -294,21 +510,75 @@ async def _call_gemini_native(
     }
     if use_search:
         payload["tools"] = [{"google_search": {}}]
+    return payload
+
 
+async def _stream_gemini_native(
+    api_key: str,
+    system_prompt: str,
+    user_prompt: str,
+    image_b64: Optional[str] = None,
+    use_search: bool = False,
+    json_mode: bool = False,
+    max_tokens: int = 1200,
+) -> AsyncIterator[str]:
+    """_call_gemini_native'in stream hali (streamGenerateContent, SSE)."""
+    url = f"{_GEMINI_BASE}/{_GEMINI_MODEL}:streamGenerateContent?alt=sse&key={api_key}"
+    payload = _gemini_payload(system_prompt, user_prompt, image_b64, use_search, json_mode, max_tokens)
     async with httpx.AsyncClient(timeout=60) as client:
-        r = await client.post(url, json=payload, headers={"Content-Type": "application/json"})
-        if r.status_code == 429:
-            retry_after = float(r.headers.get("Retry-After", 60))
-            raise _RateLimitError(retry_after)
-        if r.status_code != 200:
-            raise RuntimeError(f"Gemini {r.status_code}: {r.text[:200]}")
-    # Extract text from Gemini response format
-    data = r.json()
-    try:
-        parts_out = data["candidates"][0]["content"]["parts"]
-        return "\n".join(p.get("text", "") for p in parts_out if "text" in p)
-    except (KeyError, IndexError):
-        return str(data)
+        async with client.stream("POST", url, json=payload, headers={"Content-Type": "application/json"}) as r:
+            if r.status_code == 429:
+                raise _RateLimitError(float(r.headers.get("Retry-After", 60)))
+            if r.status_code != 200:
+                body = (await r.aread()).decode(errors="replace")
+                raise RuntimeError(f"Gemini {r.status_code}: {body[:200]}")
+            async for data in _sse_data(r):
+                try:
+                    parts_out = data["candidates"][0]["content"]["parts"]
+                except (KeyError, IndexError, TypeError):
+                    continue
+                text = "".join(p.get("text", "") for p in parts_out if "text" in p)
+                if text:
+                    yield text
+
+
+class _InvalidOutputError(Exception):
+    """Stream edilen yanıt kesin bozuk ya da required alanlar gelmeden bitti."""
+    def __init__(self, reason: str, ttv_s: float):
+        super().__init__(reason)
+        self.reason = reason
+        self.ttv_s = ttv_s
+
+
+_STRICT_PREAMBLE = 16   # json_mode: yanıt "{" ile (en fazla ```json fence'i) başlamalı
+
+
+async def _consume_stream(
+    chunks: AsyncIterator[str],
+    required_fields: Sequence[str],
+    json_mode: bool,
+    t0: float,
+    partial_ok: bool = False,
+) -> Tuple[str, float, str]:
+    """
+    Parçaları JsonStreamValidator'dan geçir; bozulduğu ya da required alanlar tamamlandığı
+    anda stream'i kapat. Dönüş: (text, time_to_verdict_s, "complete" | "early" | "truncated").
+    partial_ok → stream JSON bitmeden kesilirse hata yerine ham metin "truncated" ile döner.
+    """
+    v = JsonStreamValidator(required_fields, max_preamble=_STRICT_PREAMBLE if json_mode else 300)
+    async with aclosing(chunks) as it:
+        async for chunk in it:
+            v.feed(chunk)
+            if v.invalid or v.satisfied:
+                break
+    ttv = time.monotonic() - t0
+    if v.invalid:
+        raise _InvalidOutputError(v.invalid, ttv)
+    if not v.satisfied:
+        if partial_ok and v.raw().strip():
+            return v.raw(), ttv, "truncated"
+        raise _InvalidOutputError(f"truncated — eksik: {', '.join(sorted(v.missing)) or 'kapanış'}", ttv)
+    return v.text(), ttv, "complete" if v.complete else "early"
 
 
 # ─── Ana router fonksiyonu ────────────────────────────────────────────────────
@@ -320,11 +590,24 @@ async def route(
     image_b64: Optional[str] = None,  # sadece vision task'ı için
     max_tokens: int = 1200,
     json_mode: bool = False,          # True → enforce JSON output (reasoning tasks only)
+    cache_ttl_s: Optional[float] = None,  # >0 → llm_cache'ten oku / yaz (çağrı yeri seçer)
+    hedge_after_s: Optional[float] = None,  # >0 → bu süre aşılınca sıradaki providera da gönder
+    required_fields: Optional[Sequence[str]] = None,  # verilirse stream + artımlı JSON denetimi
+    partial_ok: bool = False,         # True → kesik stream hata değil (çağıran kısmi çıktıyı kurtarır)
 ) -> Dict[str, Any]:
     """
-    En uygun provider'a isteği gönder, başarısız olursa sıradakine geç.
-    Döner: {"text": str, "provider": str, "model": str}
+    En uygun provider'a isteği gönder, başarısız olursa sıradakine geç. Sıra: tier + gözlenen
+    gecikme / hata oranı / kalan kota ile ağırlıklı (_plan). hedge_after_s None → LLM_HEDGE_AFTER_S.
+    required_fields: üst-seviye JSON alanları — LLM_STREAM açıksa yanıt stream edilir, bozuk
+    JSON'da hemen sıradaki providera geçilir, alanların hepsi gelince üretim kesilir.
+    partial_ok: stream required alanlar tamamlanmadan biterse sıradaki providera geçmek yerine
+    ham metin "stream": "truncated" ile döner (batch yanıtında tamamlanmış bölümler kurtarılır);
+    kesik sonuç önbelleğe yazılmaz.
+    Döner: {"text": str, "provider": str, "model": str}; stream edildiyse + "stream"
+    ("complete" | "early" | "truncated") ve "time_to_verdict_s"; önbellekten gelirse + "cached": True.
     """
+    hedge = _hedge_default() if hedge_after_s is None else float(hedge_after_s)
+    stream_fields = list(required_fields) if required_fields is not None and _stream_enabled() else None
     candidates = [
         p for p in sorted(PROVIDERS, key=lambda x: x.priority)
         if task in p.tasks
@@ -335,31 +618,96 @@ async def route(
     if not candidates:
         raise RuntimeError(f"task={task} için hiçbir provider yapılandırılmamış")
 
-    last_error: Optional[Exception] = None
+    if not cache_ttl_s:
+        return await _route_uncached(candidates, task, system_prompt, user_prompt, image_b64, max_tokens, json_mode,
+                                     hedge, stream_fields, partial_ok)
+
+    from app import llm_cache
+    key = llm_cache.make_key(task, [p.name for p in candidates], system_prompt, user_prompt,
+                             image_b64, max_tokens, json_mode)
+    # Aynı prompt eşzamanlı gelirse ikincisi ilkinin yazdığı sonucu okur (tek kota harcaması)
+    async with _cache_locks(key):
+        hit = await asyncio.to_thread(llm_cache.get, key)
+        if hit is not None:
+            logger.info("router: cache HIT task=%s provider=%s", task, hit["provider"])
+            return {**hit, "cached": True}
+        result = await _route_uncached(candidates, task, system_prompt, user_prompt, image_b64, max_tokens, json_mode,
+                                       hedge, stream_fields, partial_ok)
+        if result.get("stream") != "truncated":
+            try:
+                await asyncio.to_thread(llm_cache.put, key, task, result, cache_ttl_s)
+            except Exception as e:
+                logger.warning("router: llm_cache yazılamadı — %s", e)
+    return result
 
+
+def _plan(candidates: List[ProviderDef]) -> List[ProviderDef]:
+    """
+    Deneme sırası: tier'a göre; aynı tier içinde ağırlıklı rastgele (ProviderState.weight) —
+    yük eşdeğer providerlara yayılır, yavaşlayan / hata veren / dakika bütçesi azalan
+    provider daha az seçilir. Eşzamanlılık sınırındakiler en sona: burst önce sonraki
+    tier'a taşar, 429 beklenmez.
+    """
+    ready: List[ProviderDef] = []
+    saturated: List[ProviderDef] = []
     for defn in candidates:
-        state = _get_state(defn.name)
-        if not state.is_available(defn):
-            logger.info("router: %s skip (kota/backoff)", defn.name)
-            continue
+        (ready if _get_state(defn.name).has_capacity(defn) else saturated).append(defn)
 
-        api_key = _get_api_key(defn)
-        if not api_key:
-            continue
+    def _key(defn: ProviderDef):
+        w = _get_state(defn.name).weight(defn)
+        # Efraimidis–Spirakis: u^(1/w) büyükten küçüğe → tekrarsız ağırlıklı örnekleme
+        draw = -(random.random() ** (1.0 / w)) if w > 0 else 1.0
+        return defn.effective_tier, draw, defn.priority
 
-        try:
-            state.record_request()
-            logger.info("router: %s (%s) — task=%s", defn.name, defn.model, task)
+    return sorted(ready, key=_key) + sorted(saturated, key=_key)
+
+
+def _hedge_default() -> float:
+    try:
+        from app.core.config import get_settings
+        return float(get_settings().llm_hedge_after_s or 0)
+    except Exception:
+        return 0.0
+
+
+def _stream_enabled() -> bool:
+    try:
+        from app.core.config import get_settings
+        return bool(get_settings().llm_stream)
+    except Exception:
+        return False
+
+
+async def _route_uncached(
+    candidates: List[ProviderDef],
+    task: str,
+    system_prompt: str,
+    user_prompt: str,
+    image_b64: Optional[str],
+    max_tokens: int,
+    json_mode: bool,
+    hedge_after_s: float = 0.0,
+    stream_fields: Optional[List[str]] = None,
+    partial_ok: bool = False,
+) -> Dict[str, Any]:
+    # json_mode only for reasoning tasks (not vision, not web_search)
+    _json_mode = json_mode and task == "reasoning"
 
-            # json_mode only for reasoning tasks (not vision, not web_search)
-            _json_mode = json_mode and task == "reasoning"
+    async def attempt(defn: ProviderDef) -> Dict[str, Any]:
+        state = _get_state(defn.name)
+        api_key = _get_api_key(defn)
+        state.inflight += 1
+        logger.info("router: %s (%s) — task=%s", defn.name, defn.model, task)
+        t0 = time.monotonic()
+        stream_info: Dict[str, Any] = {}
+        try:
             if defn.name == "gemini":
-                text = await _call_gemini_native(
-                    api_key, system_prompt, user_prompt,
-                    image_b64=image_b64,
-                    use_search=(task == "web_search"),
-                    json_mode=_json_mode,
-                )
+                kw = dict(image_b64=image_b64, use_search=(task == "web_search"), json_mode=_json_mode,
+                          max_tokens=max_tokens)
+                if stream_fields is None:
+                    text = await _call_gemini_native(api_key, system_prompt, user_prompt, **kw)
+                else:
+                    chunks = _stream_gemini_native(api_key, system_prompt, user_prompt, **kw)
             else:
                 messages = [
                     {"role": "system", "content": system_prompt},
@@ -367,33 +715,116 @@ async def route(
                 ]
                 # Vision-capable non-Gemini providers (Llama 4 Scout on Groq)
                 img = image_b64 if (task == "vision" and defn.supports_vision) else None
-                text = await _call_openai_compat(defn, api_key, messages, max_tokens=max_tokens, image_b64=img, json_mode=_json_mode)
-
-            state.record_success()
-            return {"text": text, "provider": defn.name, "model": defn.model}
+                if stream_fields is None:
+                    text = await _call_openai_compat(defn, api_key, messages, max_tokens=max_tokens, image_b64=img, json_mode=_json_mode)
+                else:
+                    chunks = _stream_openai_compat(defn, api_key, messages, max_tokens=max_tokens, image_b64=img, json_mode=_json_mode)
+            if stream_fields is not None:
+                text, ttv, outcome = await _consume_stream(chunks, stream_fields, _json_mode, t0, partial_ok)
+                state.record_verdict(ttv, outcome)
+                stream_info = {"stream": outcome, "time_to_verdict_s": round(ttv, 3)}
+
+        except _InvalidOutputError as e:
+            state.record_error()
+            state.record_verdict(e.ttv_s, "invalid")
+            logger.warning("router: %s geçersiz JSON (%.2fs) — %s, next provider", defn.name, e.ttv_s, e.reason)
+            raise
 
         except _RateLimitError as e:
             state.record_error(retry_after=e.retry_after)
-            last_error = e
+            _share_backoff(defn)
             logger.warning("router: %s 429 — retry_after=%.0fs, next provider", defn.name, e.retry_after)
+            raise
 
         except _AuthError as e:
             state.backoff_until = time.time() + 86400  # auth hatası → 24 saat devre dışı
-            last_error = e
+            _share_backoff(defn)
             logger.error("router: %s auth error — devre dışı: %s", defn.name, e)
+            raise
 
         except Exception as e:
             state.record_error()
-            last_error = e
             logger.warning("router: %s error — %s, next provider", defn.name, e)
+            raise
+
+        finally:
+            state.inflight -= 1
+
+        state.record_success(time.monotonic() - t0)
+        return {"text": text, "provider": defn.name, "model": defn.model, **stream_info}
+
+    _sync_shared(candidates)
+    queue = _plan(candidates)
+
+    def next_ready() -> Optional[ProviderDef]:
+        while queue:
+            defn = queue.pop(0)
+            if not _get_state(defn.name).is_available(defn):
+                logger.info("router: %s skip (kota/backoff)", defn.name)
+                continue
+            if _get_api_key(defn) and _reserve(defn):
+                return defn
+        return None
+
+    last_error: Optional[BaseException] = None
+    while (defn := next_ready()) is not None:
+        if hedge_after_s > 0:
+            result, err = await _hedged(attempt, defn, next_ready, hedge_after_s)
+            if result is not None:
+                return result
+            last_error = err
+            continue
+        try:
+            return await attempt(defn)
+        except Exception as e:
+            last_error = e
 
     raise RuntimeError(f"Tüm providerlar başarısız — task={task}: {last_error}")
 
 
+async def _hedged(
+    attempt: Callable[[ProviderDef], Awaitable[Dict[str, Any]]],
+    primary: ProviderDef,
+    next_ready: Callable[[], Optional[ProviderDef]],
+    hedge_after_s: float,
+) -> Tuple[Optional[Dict[str, Any]], Optional[BaseException]]:
+    """
+    primary hedge_after_s içinde bitmezse aynı isteği sıradaki providera da gönder; ilk
+    başarılı yanıt kazanır, diğeri iptal edilir (iptal hata sayılmaz, kota sayılır).
+    İkisi de başarısızsa (None, son hata) → çağıran sıradaki providerla devam eder.
+    """
+    pending = {asyncio.ensure_future(attempt(primary))}
+    last_error: Optional[BaseException] = None
+    hedged = False
+    try:
+        while pending:
+            done, pending = await asyncio.wait(
+                pending, timeout=None if hedged else hedge_after_s, return_when=asyncio.FIRST_COMPLETED,
+            )
+            if not done:
+                hedged = True
+                backup = next_ready()
+                if backup is not None:
+                    logger.info("router: hedge %s → %s (%.1fs aşıldı)", primary.name, backup.name, hedge_after_s)
+                    pending.add(asyncio.ensure_future(attempt(backup)))
+                continue
+            for t in done:
+                if t.exception() is None:
+                    return t.result(), None
+                last_error = t.exception()
+    finally:
+        for t in pending:
+            t.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+    return None, last_error
+
+
 # ─── Status API ───────────────────────────────────────────────────────────────
 
 def get_status() -> Dict[str, Any]:
-    """Tüm providerların kota durumunu döndür (/llm/status endpoint için)."""
+    """Tüm providerların kota durumunu döndür (/llm/status endpoint için) — tüm süreçlerin toplamı."""
+    _sync_shared(PROVIDERS)
     result = {}
     for defn in PROVIDERS:
         state = _get_state(defn.name)
@@ -412,5 +843,14 @@ def get_status() -> Dict[str, Any]:
             "backoff_remaining_s": max(0, round(state.backoff_until - time.time())),
             "consecutive_errors": state.consecutive_errors,
             "priority": defn.priority,
+            "tier": defn.effective_tier,
+            "inflight": state.inflight,
+            "max_inflight": state.max_inflight(defn),
+            "latency_ewma_s": round(state.latency_ewma_s, 2) if state.latency_ewma_s is not None else None,
+            "error_rate": round(state.error_ewma, 3),
+            "quota_day": _day_key(defn),
+            "time_to_verdict_s": round(state.ttv_ewma_s, 2) if state.ttv_ewma_s is not None else None,
+            "stream_early_stops": state.stream_early_stops,
+            "stream_invalid": state.stream_invalid,
         }
     return result
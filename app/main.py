@@ -14,7 +14,7 @@ import io
 from typing import Dict, List, Optional
 
 import httpx
-from fastapi import FastAPI, HTTPException, Request, BackgroundTasks
+from fastapi import FastAPI, HTTPException, Request
 from pydantic import BaseModel, Field
 
 from app import isbn_store
@@ -82,6 +82,19 @@ def home():
     }
 
 
+@app.on_event("startup")
+async def _start_scan_queue():
+    """Restart sonrası kuyrukta / yarıda kalan scan job'larını geri yükle + metadata backfill + BookDepot sweep
+    + Finding cache compactor + suggested price materializer. SCAN_WORKER_MODE=external → hepsi
+    app.scan_worker'da çalışır, API sadece istek karşılar."""
+    from app import scan_queue
+    if not scan_queue.executes_jobs():
+        return
+    scan_queue.start()
+    asyncio.create_task(scan_queue.lease_loop())
+    scan_queue.start_background_loops()
+
+
 @app.get("/health")
 def health():
     return {"ok": True}
@@ -94,14 +107,13 @@ def status():
     import time as _t
     s = _gs2()
 
-    # BookFinder IP block durumu
-    try:
-        from app.bookfinder_client import _bookfinder_ip_blocked, _bookfinder_block_until
-        bf_blocked = _bookfinder_ip_blocked and _t.time() < _bookfinder_block_until
-        bf_block_remaining = max(0, int(_bookfinder_block_until - _t.time())) if bf_blocked else 0
-    except Exception:
-        bf_blocked = False
-        bf_block_remaining = 0
+    # Upstream circuit breaker'lar (BookFinder IP block dahil)
+    from app.core.circuit_breaker import snapshot_all
+    from app.bookfinder_client import latency_snapshot
+    breakers = snapshot_all()
+    bf = breakers.get("bookfinder.bookfinder") or {}
+    bf_blocked = bf.get("state") == "open"
+    bf_block_remaining = bf.get("retry_in_s", 0) if bf_blocked else 0
 
     # eBay Browse API backoff durumu
     try:
@@ -112,6 +124,20 @@ def status():
         ebay_backoff = False
         ebay_backoff_remaining = 0
 
+    try:
+        from app import scan_queue
+        queue_status = scan_queue.status()
+    except Exception:
+        queue_status = {}
+
+    try:
+        from app import market_snapshot_store
+        snapshot_stats = market_snapshot_store.stats()
+    except Exception:
+        snapshot_stats = {}
+
+    from app import bookdepot_sweep, finding_cache, suggested_price_materializer
+
     return {
         "ok": True,
         "service": "trackerbundle-api",
@@ -124,6 +150,13 @@ def status():
         "bookfinder_block_remaining_s": bf_block_remaining,
         "ebay_browse_backoff": ebay_backoff,
         "ebay_browse_backoff_remaining_s": ebay_backoff_remaining,
+        "scan_queue": queue_status,
+        "market_snapshot": snapshot_stats,
+        "circuit_breakers": breakers,
+        "bookfinder_latency": latency_snapshot(),
+        "bookdepot_sweep": bookdepot_sweep.status(),
+        "finding_cache": finding_cache.cache_stats(),
+        "suggested_price_materializer": suggested_price_materializer.status(),
     }
 
 
@@ -394,12 +427,10 @@ async def _alert_details_inner(isbn: str, ebay_item_id: str = ""):
             bucket = normalize_condition(it.get("condition"), it.get("conditionId"))
             buckets.setdefault(bucket, []).append(round(float(total), 2))
 
-        def _st(prices):
-            if not prices: return None
-            return {"count": len(prices), "min": round(min(prices), 2), "avg": round(sum(prices)/len(prices), 2)}
+        from app.core.quantile_sketch import describe as _st
 
         _NEW = {"brand_new"}
-        by_cond = {b: _st(p) for b, p in buckets.items() if _st(p)}
+        by_cond = {b: st for b, p in buckets.items() if (st := _st(p))}
         new_p  = [p for b, ps in buckets.items() if b in _NEW  for p in ps]
         used_p = [p for b, ps in buckets.items() if b not in _NEW for p in ps]
 
@@ -426,13 +457,14 @@ async def _alert_details_inner(isbn: str, ebay_item_id: str = ""):
         "sold_avg": None,
         "sold_count": None,
     }
-    # sold_stats_store'dan en güncel snapshot'ı çek
+    # Son 90 günlük used satış dağılımı (tekil satışlar → yoksa birikim sketch'i)
     try:
-        from app import sold_stats_store as _sss
-        v = _sss.query_window(isbn_clean, 90, "used")
-        if v:
-            sold_data["sold_avg"] = round(sum(v)/len(v), 2)
-            sold_data["sold_count"] = len(v)
+        from app import sold_items_store as _sis
+        w = _sis.distribution(isbn_clean, 90, "used")
+        if w["count"]:
+            sold_data["sold_avg"] = w["avg"]
+            sold_data["sold_count"] = w["count"]
+            sold_data.update(sold_p10=w["p10"], sold_p50=w["p50"], sold_p90=w["p90"])
     except Exception:
         pass
 
@@ -749,7 +781,8 @@ async def ebay_active_stats(isbn: str):
     """
     from app.ebay_client import browse_search_isbn, normalize_condition, item_total_price
     from app.core.config import get_settings as _gs
-    import statistics, httpx
+    from app.core.quantile_sketch import describe
+    import httpx
 
     s = _gs()
     calc_est = s.calculated_ship_estimate_usd if s.calculated_ship_estimate_usd > 0 else None
@@ -778,14 +811,8 @@ async def ebay_active_stats(isbn: str):
         })
 
     def _stats(rows):
-        prices = [r["total"] for r in rows]
-        if not prices:
-            return None
-        return {
-            "count": len(prices),
-            "min": round(min(prices), 2),
-            "avg": round(sum(prices)/len(prices), 2),
-        }
+        # count/min/max/avg + p10/p50/p90 — tek geçiş sketch, sıralama yok
+        return describe(r["total"] for r in rows)
 
     by_condition = {}
     for b, rows in buckets.items():
@@ -998,7 +1025,7 @@ async def ebay_debug_search(isbn: str, limit: int = 5, strict: bool = False):
 
 
 # ── CSV Arbitrage Scanner ─────────────────────────────────────────────────────
-from app.csv_arb_scanner import ScanFilters, scan_isbn_list, suggest_max_buy, IsbnMatchPolicy, InvalidIsbnPolicy
+from app.csv_arb_scanner import suggest_max_buy
 from app.profit_calc import FeeConfig
 
 class CsvArbRequest(BaseModel):
@@ -1029,118 +1056,47 @@ class CsvArbRequest(BaseModel):
     # Buyback filtresi
     buyback_only: bool = Field(default=False, description="Sadece buyback kanalında kârlı olanlar")
     min_buyback_profit: Optional[float] = Field(default=None, description="Min buyback kârı ($)")
+    # Kuyruk önceliği — yüksek olan önce çalışır
+    priority: int = Field(default=0, ge=-10, le=10)
+    # Kaynak başına max snapshot yaşı (sn): {"amazon": 1200, "buyback": 14400, ...} — 0 = her zaman çek
+    freshness: Optional[Dict[str, float]] = Field(default=None, description="market_snapshot_store tazelik şartları")
 
 
 @app.post("/discover/csv-arb")
-async def csv_arb_scan(req: CsvArbRequest, background_tasks: BackgroundTasks):
+async def csv_arb_scan(req: CsvArbRequest):
     """
-    ISBN listesini arka planda tara. job_id döner.
+    ISBN listesini kalıcı scan kuyruğuna ekle. job_id döner.
+    Worker slotu boşsa hemen başlar; değilse priority + sıra ile bekler.
     İlerlemeyi /discover/csv-arb/progress/{job_id} ile takip et.
     """
-    from app.scan_job_store import create_job, update_progress, finish_job, fail_job
+    from app import scan_queue
     if not req.isbns:
         raise HTTPException(status_code=422, detail="ISBN listesi boş")
     if len(req.isbns) > 1000:
         raise HTTPException(status_code=422, detail="Max 1000 ISBN")
 
-    filters = ScanFilters(
-        min_roi_pct=req.min_roi_pct,
-        max_roi_pct=req.max_roi_pct,
-        min_profit_usd=req.min_profit_usd,
-        min_amazon_price=req.min_amazon_price,
-        max_amazon_price=req.max_amazon_price,
-        min_buy_price=req.min_buy_price,
-        max_buy_price=req.max_buy_price,
-        max_buy_ratio_pct=req.max_buy_ratio_pct,
-        condition_in=req.condition_in,
-        source_in=req.source_in,
-        only_viable=req.only_viable,   # Kullanıcının filtre seçimi korunuyor
-        strict_mode=req.strict_mode,
-        isbn_match_policy=IsbnMatchPolicy(req.isbn_match_policy),
-        invalid_isbn_policy=InvalidIsbnPolicy(req.invalid_isbn_policy),
-        buyback_only=req.buyback_only,
-        min_buyback_profit=req.min_buyback_profit,
-    )
-
-    fees = FeeConfig(
-        referral_pct=req.fee_referral_pct if req.fee_referral_pct is not None else 0.15,
-        closing_fee=req.fee_closing if req.fee_closing is not None else 1.80,
-        fulfillment=req.fee_fulfillment if req.fee_fulfillment is not None else 3.50,
-        inbound=req.fee_inbound if req.fee_inbound is not None else 0.60,
-    )
-
-    # Kullanıcının gerçek filtre kriterleri (background'da uygulanacak)
-    user_filters = dict(
-        only_viable=req.only_viable,
-        min_roi_pct=req.min_roi_pct,
-        max_roi_pct=req.max_roi_pct,
-        min_profit_usd=req.min_profit_usd,
-        min_amazon_price=req.min_amazon_price,
-        max_amazon_price=req.max_amazon_price,
-        min_buy_price=req.min_buy_price,
-        max_buy_price=req.max_buy_price,
-    )
+    payload = req.model_dump()
+    try:
+        scan_queue.csv_arb_config(payload)  # geçersiz policy → 422 (kuyruğa girmeden)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
 
-    # Aynı anda sadece 1 aktif job — 2. istek "queued" olarak döner
-    from app.scan_job_store import _jobs as _all_jobs
-    active = [j for j in _all_jobs.values() if j.get("status") == "running"]
-    if active:
-        return {
-            "ok": False,
-            "queued": True,
-            "message": f"Şu an aktif bir tarama var ({active[0]['id']}). "
-                       f"Tamamlanmasını bekle veya farklı bir sekme aç.",
-            "active_job_id": active[0]["id"],
-            "active_job_progress": f"{active[0].get('progress',0)}/{active[0].get('total',0)}",
-        }
+    job_id = scan_queue.enqueue("csv_arb", payload, total=len(req.isbns), priority=req.priority)
+    return _enqueued_response(job_id, len(req.isbns), req.concurrency)
 
-    job_id = create_job(len(req.isbns))
 
-    async def _run():
-        import time as _t
-        from app.scan_job_store import _jobs, append_result
-        _jobs[job_id]["status"] = "running"
-        _jobs[job_id]["started_at"] = _t.time()
-        try:
-            def _on_isbn_done(done: int, total: int, new_accepted: list, new_rejected: list):
-                """Her ISBN bittikçe çağrılır — anlık sonuçlar job'a eklenir."""
-                update_progress(job_id, done)
-                append_result(job_id, new_accepted, new_rejected)
-
-            from app.scan_job_store import get_pause_event, get_cancel_event
-            result = await scan_isbn_list(
-                isbns=req.isbns,
-                filters=filters,
-                fees=fees,
-                concurrency=req.concurrency,
-                isbn_buy_prices=req.isbn_buy_prices or {},
-                isbn_amazon_prices=req.isbn_amazon_prices or {},
-                on_progress=_on_isbn_done,
-                pause_event=get_pause_event(job_id),
-                cancel_event=get_cancel_event(job_id),
-            )
-            # Post-filter: amazon_unavailable olanları göster ama ayrı tut
-            all_accepted = result["accepted"]
-            all_rejected = result["rejected"]
-            stats = result["stats"]
-            stats["amazon_unavailable"] = sum(1 for r in all_rejected if r.get("reason","").startswith("amazon_unavailable"))
-            finish_job(job_id, all_accepted, all_rejected, stats)
-        except Exception as e:
-            # Tarama yarıda kalsın — partial_accepted/rejected korunur
-            from app.scan_job_store import _jobs
-            partial_acc = _jobs.get(job_id, {}).get("partial_accepted", [])
-            partial_rej = _jobs.get(job_id, {}).get("partial_rejected", [])
-            if partial_acc or partial_rej:
-                # Partial sonuçları final olarak kaydet — kullanıcı kaybetmesin
-                finish_job(job_id, partial_acc, partial_rej, {"partial": True, "error": str(e)[:200]})
-            else:
-                fail_job(job_id, str(e))
-            logger.error("csv_arb job %s failed: %s", job_id, e)
-
-    background_tasks.add_task(_run)
-    # Tahmini süre: ~4s/ISBN ÷ concurrency
-    est = round(len(req.isbns) * 4 / req.concurrency)
-    return {"ok": True, "job_id": job_id, "total": len(req.isbns), "estimated_seconds": est}
+def _enqueued_response(job_id: str, total: int, concurrency: int) -> dict:
+    from app import scan_queue
+    from app.scan_job_store import queue_position
+    pos = queue_position(job_id)
+    return {
+        "ok": True,
+        "job_id": job_id,
+        "total": total,
+        "estimated_seconds": scan_queue.estimate_seconds(total, concurrency),
+        "queued": pos is not None,
+        "queue_position": pos,
+    }
 
 
 @app.get("/discover/csv-arb/progress/{job_id}")
@@ -1183,12 +1139,12 @@ async def csv_arb_resume(job_id: str):
 
 @app.post("/discover/csv-arb/cancel/{job_id}")
 async def csv_arb_cancel(job_id: str):
-    from app.scan_job_store import cancel_job, _jobs
+    from app.scan_job_store import cancel_job, get_job
     ok = cancel_job(job_id)
     if not ok:
         raise HTTPException(status_code=409, detail="Job iptal edilemedi")
     # Partial sonuçları döndür
-    job = _jobs.get(job_id, {})
+    job = get_job(job_id) or {}
     return {
         "ok": True,
         "status": "cancelled",
@@ -1198,35 +1154,56 @@ async def csv_arb_cancel(job_id: str):
     }
 
 @app.get("/discover/history")
-async def scan_history():
-    """Geçmiş tarama sonuçları."""
-    from app.scan_job_store import get_history
-    return {"ok": True, "history": get_history()}
+@app.get("/discover/scan-history")
+async def scan_history(limit: int = 50, offset: int = 0, isbn: Optional[str] = None):
+    """Geçmiş tarama sonuçları (SQLite index'ten, sayfalı). isbn verilirse o ISBN'in satırları."""
+    from app.scan_job_store import get_history, get_isbn_history
+    limit = max(1, min(limit, 200))
+    if isbn:
+        return {"ok": True, "isbn": isbn, "rows": get_isbn_history(isbn.strip(), limit=limit)}
+    return {"ok": True, "history": get_history(limit=limit, offset=max(0, offset))}
+
+
+@app.post("/metadata/backfill")
+async def metadata_backfill(refresh: bool = False):
+    """Watchlist + BookDepot ISBN'leri için edition metadata'yı önceden çek (düşük öncelikli job)."""
+    from app import scan_queue, book_meta_store
+    job_id = scan_queue.enqueue_meta_backfill(refresh=refresh)
+    return {"ok": True, "job_id": job_id, "queued": job_id is not None, "store": book_meta_store.stats()}
+
+
+@app.get("/market/snapshot/{isbn}")
+async def market_snapshot(isbn: str):
+    """ISBN'in kaynak bazlı son sonuçları ve yaşları (cross-scan memoization)."""
+    from app import market_snapshot_store
+    return {"ok": True, "isbn": isbn, "sources": market_snapshot_store.snapshot(isbn.strip())}
+
+
+@app.delete("/market/snapshot/{isbn}")
+async def market_snapshot_invalidate(isbn: str, source: Optional[str] = None):
+    """Snapshot'ı sil → sonraki scan ilgili kaynak(lar)ı yeniden çeker."""
+    from app import market_snapshot_store
+    return {"ok": True, "deleted": market_snapshot_store.invalidate(isbn.strip(), source)}
 
 
 @app.get("/analytics/summary")
 async def analytics_summary():
     """
     Metabase / monitoring için operasyonel özet.
-    Scan geçmişi, buyback istatistikleri, hata oranları.
+    Scan geçmişi (günlük rollup'lardan), buyback istatistikleri, hata oranları.
     """
     import time as _time
-    from app.scan_job_store import get_history
-    from app.alert_history_store import get_entries as get_alert_history
-    from app.isbn_store import get_isbns
-
-    history = get_history()
-    isbns   = get_isbns()
+    from app.scan_job_store import history_summary, daily_rollups
+    from app.alert_history_store import get_history as get_alert_history
+    from app.isbn_store import list_isbns
 
-    # Son 7 günün tarama istatistikleri
-    cutoff   = _time.time() - 7 * 86400
-    recent   = [h for h in history if h.get("ts", 0) >= cutoff]
-    total_accepted = sum(len(h.get("accepted", [])) for h in recent)
-    total_scanned  = sum((h.get("stats") or {}).get("total_isbns", 0) for h in recent)
+    hist   = history_summary(days=7)
+    isbns  = list_isbns()
 
-    # Alert istatistikleri (son 7 gün)
+    # Alert istatistikleri (son 7 gün) — alert_history max 500 entry tutar
+    cutoff = _time.time() - 7 * 86400
     try:
-        all_alerts = get_alert_history()
+        all_alerts = get_alert_history(limit=500)
         recent_alerts = [a for a in all_alerts if (a.get("ts") or 0) >= cutoff]
     except Exception:
         recent_alerts = []
@@ -1235,12 +1212,13 @@ async def analytics_summary():
         "ok": True,
         "ts": int(_time.time()),
         "watchlist_size": len(isbns),
-        "scans_last_7d": len(recent),
-        "isbns_scanned_7d": total_scanned,
-        "deals_found_7d": total_accepted,
+        "scans_last_7d": hist["scans"],
+        "isbns_scanned_7d": hist["isbns_scanned"],
+        "deals_found_7d": hist["deals_found"],
         "alerts_last_7d": len(recent_alerts),
-        "total_scans": len(history),
-        "last_scan_ts": history[0].get("ts") if history else None,
+        "total_scans": hist["total_scans"],
+        "last_scan_ts": hist["last_scan_ts"],
+        "daily": daily_rollups(days=7),
     }
 
 
@@ -1352,6 +1330,32 @@ async def ai_analyze(req: AiAnalyzeRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+class AiAnalyzeBatchRequest(BaseModel):
+    items: List[AiAnalyzeRequest] = Field(..., min_length=1, max_length=50)
+    batch_size: Optional[int] = Field(default=None, ge=1, le=10)
+
+
+@app.post("/ai/analyze-batch")
+async def ai_analyze_batch(req: AiAnalyzeBatchRequest):
+    """
+    Çoklu aday analizi: görselsiz adaylar batch_size'lık gruplar halinde tek LLM isteğinde.
+    Sonuçlar items sırasıyla döner; rate limiter'a tek çağrı olarak sayılır.
+    """
+    if not _ai_rate_check():
+        raise HTTPException(status_code=429, detail=f"Rate limit: max {_AI_RATE_MAX} AI calls per {_AI_RATE_WINDOW}s")
+    from app.ai_analyst import analyze_batch
+    try:
+        results = await asyncio.wait_for(
+            analyze_batch([i.model_dump() for i in req.items], batch_size=req.batch_size), timeout=180.0,
+        )
+        return {"count": len(results), "results": results}
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        logger.error("AI analyze batch error n=%d: %s", len(req.items), e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 # ─── LLM Status ──────────────────────────────────────────────────────────────
 
 @app.get("/llm/status")
@@ -1361,6 +1365,26 @@ async def llm_status():
     return get_status()
 
 
+@app.get("/llm/cache")
+async def llm_cache_stats():
+    """Kalıcı LLM yanıt önbelleği: satır / hit sayısı, task dağılımı."""
+    from app import llm_cache
+    return await asyncio.to_thread(llm_cache.stats)
+
+
+@app.post("/llm/cache/clear")
+async def llm_cache_clear():
+    from app import llm_cache
+    return {"ok": True, "removed": await asyncio.to_thread(llm_cache.clear)}
+
+
+@app.get("/llm/image-cache")
+async def llm_image_cache_stats():
+    """Vision görsel önbelleği: görsel / URL / karar sayısı, ham ve gönderilen bayt."""
+    from app import image_cache
+    return await asyncio.to_thread(image_cache.stats)
+
+
 # ─── Listing Verify endpoints ─────────────────────────────────────────────────
 
 class VerifyRequest(BaseModel):
@@ -1429,58 +1453,68 @@ class BookDepotImportPayload(BaseModel):
 
 @app.post("/bookdepot/import")
 async def bookdepot_import(payload: BookDepotImportPayload):
-    """BookDepot bookmarklet'ten gelen scraped data'yı JSON store'a kaydeder."""
-    from app.core.json_store import file_lock, _read_unsafe, _write_unsafe
-    from app.core.config import get_settings
+    """BookDepot bookmarklet'ten gelen scraped data'yı envanter store'una kaydeder."""
+    from app import bookdepot_store
 
     items = payload.items
     if not items:
         return {"ok": False, "error": "no_items"}
 
-    p = get_settings().resolved_data_dir() / "bookdepot_inventory.json"
-    inserted = 0
-    now = int(_time.time())
+    diff = await asyncio.to_thread(bookdepot_store.upsert_many, [i.model_dump() for i in items])
+    return {
+        "ok": True,
+        "inserted": diff["upserted"],
+        "new": diff["new"],
+        "price_dropped": diff["price_dropped"],
+        "total": await asyncio.to_thread(bookdepot_store.count),
+    }
 
-    with file_lock(p):
-        data = _read_unsafe(p, default={"items": {}, "updated_at": 0})
-        store = data.get("items", {})
-        for item in items:
-            isbn = item.isbn.replace("-", "").replace(" ", "").strip()
-            if len(isbn) < 10:
-                continue
-            store[isbn] = {
-                "isbn": isbn,
-                "title": item.title,
-                "price": item.price,
-                "qty": item.qty,
-                "url": item.url,
-                "scraped_at": now,
-            }
-            inserted += 1
-        data["items"] = store
-        data["updated_at"] = now
-        _write_unsafe(p, data)
 
-    return {"ok": True, "inserted": inserted, "total": len(store)}
+@app.post("/bookdepot/import-csv")
+async def bookdepot_import_csv(request: Request, rescan: bool = False):
+    """
+    BookDepot tam katalog export'u (ham CSV gövdesi, text/csv). Gövde diske spool edilir ve
+    satır satır batch'ler halinde içe aktarılır — büyük export'lar belleğe alınmaz.
+    rescan=true → yeni / fiyatı düşen ISBN'ler için bookdepot scan job'u kuyruğa eklenir.
+    """
+    import tempfile
+    from app import bookdepot_store
+
+    with tempfile.TemporaryFile("w+b") as tmp:
+        async for chunk in request.stream():
+            tmp.write(chunk)
+        if tmp.tell() == 0:
+            raise HTTPException(status_code=422, detail="CSV gövdesi boş")
+        tmp.seek(0)
+        try:
+            stats = await asyncio.to_thread(bookdepot_store.import_csv_file, tmp)
+        except ValueError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+    if rescan:
+        from app import scan_queue
+        stats["job_ids"] = await scan_queue.rescan_bookdepot()
+    return {"ok": True, **stats, "total": await asyncio.to_thread(bookdepot_store.count)}
 
 
 @app.get("/bookdepot/inventory")
-async def bookdepot_inventory(min_price: Optional[float] = None, max_price: Optional[float] = None):
-    """Kayıtlı BookDepot envanterini döndürür. Opsiyonel fiyat filtreleri."""
-    from app.core.json_store import _read_unsafe
-    from app.core.config import get_settings
-
-    p = get_settings().resolved_data_dir() / "bookdepot_inventory.json"
-    data = _read_unsafe(p, default={"items": {}})
-    items = list(data.get("items", {}).values())
-
-    if min_price is not None:
-        items = [i for i in items if i.get("price") is not None and i["price"] >= min_price]
-    if max_price is not None:
-        items = [i for i in items if i.get("price") is not None and i["price"] <= max_price]
+async def bookdepot_inventory(
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    limit: Optional[int] = None,
+    offset: int = 0,
+    sort: str = "scraped_at",
+):
+    """
+    Kayıtlı BookDepot envanteri — fiyat aralığı filtresi ve sayfalama (limit yoksa tümü).
+    sort: scraped_at (en yeni önce) | price | price_desc
+    """
+    from app import bookdepot_store
 
-    items.sort(key=lambda x: x.get("scraped_at", 0), reverse=True)
-    return {"ok": True, "count": len(items), "items": items}
+    if limit is not None:
+        limit = max(1, min(limit, 10000))
+    offset = max(0, offset)
+    total, items = await asyncio.to_thread(bookdepot_store.query, min_price, max_price, limit, offset, sort)
+    return {"ok": True, "count": len(items), "total": total, "offset": offset, "items": items}
 
 
 class BookDepotScanRequest(BaseModel):
@@ -1489,99 +1523,74 @@ class BookDepotScanRequest(BaseModel):
     condition_in: Optional[List[str]] = None
     only_viable: bool = True
     concurrency: int = Field(default=5, ge=1, le=8)
+    priority: int = Field(default=0, ge=-10, le=10)
+    freshness: Optional[Dict[str, float]] = None
+    # True → sadece yeni / son taramadan sonra fiyatı düşen ISBN'ler (bookdepot_store.pending_rescan)
+    changed_only: bool = False
 
 @app.post("/bookdepot/scan")
-async def bookdepot_scan(req: BookDepotScanRequest, background_tasks: BackgroundTasks):
-    """BookDepot envanterindeki ISBN'leri Amazon fiyatlarıyla karşılaştır."""
-    from app.core.json_store import _read_unsafe
-    from app.core.config import get_settings
-    from app.scan_job_store import create_job, update_progress, finish_job, fail_job, _jobs as _all_jobs
-    from app.csv_arb_scanner import scan_isbn_list, ScanFilters, IsbnMatchPolicy, InvalidIsbnPolicy
-    from app.profit_calc import FeeConfig, DEFAULT_FEES
-
-    p = get_settings().resolved_data_dir() / "bookdepot_inventory.json"
-    data = _read_unsafe(p, default={"items": {}})
-    items = data.get("items", {})
+async def bookdepot_scan(req: BookDepotScanRequest):
+    """BookDepot envanterindeki ISBN'leri Amazon fiyatlarıyla karşılaştır (kalıcı kuyruk üzerinden)."""
+    from app import bookdepot_store, scan_queue
+
+    if req.changed_only:
+        opts = req.model_dump(exclude={"changed_only"})
+        job_ids = await scan_queue.rescan_bookdepot(opts)
+        return {"ok": True, "job_ids": job_ids, "queued_jobs": len(job_ids)}
+
+    _, items = await asyncio.to_thread(bookdepot_store.query, None, None, 1000)
     if not items:
         raise HTTPException(status_code=422, detail="BookDepot envanteri boş — önce bookmarklet ile kitap kazıyın")
 
-    isbns = list(items.keys())
-    if len(isbns) > 1000:
-        isbns = isbns[:1000]
-
+    isbns = [i["isbn"] for i in items]
     # Build buy prices from bookdepot inventory
-    isbn_buy_prices = {}
-    for isbn, item in items.items():
-        if item.get("price") and item["price"] > 0:
-            isbn_buy_prices[isbn] = item["price"]
-
-    # Check for active jobs
-    active = [j for j in _all_jobs.values() if j.get("status") == "running"]
-    if active:
-        return {
-            "ok": False,
-            "queued": True,
-            "message": f"Aktif tarama var ({active[0]['id']}). Bitmesini bekleyin.",
-            "active_job_id": active[0]["id"],
-        }
+    isbn_buy_prices = {i["isbn"]: i["price"] for i in items if i.get("price") and i["price"] > 0}
 
-    filters = ScanFilters(
-        min_roi_pct=req.min_roi_pct,
-        min_profit_usd=req.min_profit_usd,
-        condition_in=req.condition_in,
-        only_viable=req.only_viable,
-        strict_mode=True,
-        isbn_match_policy=IsbnMatchPolicy.BALANCED,
-        invalid_isbn_policy=InvalidIsbnPolicy.BEST_EFFORT,
-    )
+    payload = {
+        **req.model_dump(),
+        "isbns": isbns,
+        "isbn_buy_prices": isbn_buy_prices,
+    }
+    # Item'lar job taradıkça taranmış işaretlenir (scan_queue._run_bookdepot)
+    job_id = scan_queue.enqueue("bookdepot", payload, total=len(isbns), priority=req.priority)
+    return _enqueued_response(job_id, len(isbns), req.concurrency)
 
-    job_id = create_job(len(isbns))
 
-    async def _run():
-        import time as _t
-        from app.scan_job_store import _jobs, append_result, get_pause_event, get_cancel_event
-        _jobs[job_id]["status"] = "running"
-        _jobs[job_id]["started_at"] = _t.time()
-        try:
-            def _on_done(done, total, new_acc, new_rej):
-                update_progress(job_id, done)
-                append_result(job_id, new_acc, new_rej)
-
-            result = await scan_isbn_list(
-                isbns=isbns,
-                filters=filters,
-                fees=DEFAULT_FEES,
-                concurrency=req.concurrency,
-                isbn_buy_prices=isbn_buy_prices,
-                on_progress=_on_done,
-                pause_event=get_pause_event(job_id),
-                cancel_event=get_cancel_event(job_id),
-            )
-            finish_job(job_id, result["accepted"], result["rejected"], result["stats"])
-        except Exception as e:
-            from app.scan_job_store import _jobs
-            partial_acc = _jobs.get(job_id, {}).get("partial_accepted", [])
-            partial_rej = _jobs.get(job_id, {}).get("partial_rejected", [])
-            if partial_acc or partial_rej:
-                finish_job(job_id, partial_acc, partial_rej, {"partial": True, "error": str(e)[:200]})
-            else:
-                fail_job(job_id, str(e))
-            logger.error("bookdepot_scan job %s failed: %s", job_id, e)
+@app.get("/bookdepot/history/{isbn}")
+async def bookdepot_history(isbn: str):
+    """BookDepot item'ı + fiyat geçmişi (sadece değişimler)."""
+    from app import bookdepot_store
+
+    isbn_clean = bookdepot_store.normalize_isbn(isbn) or isbn
+    item = await asyncio.to_thread(bookdepot_store.get, isbn_clean)
+    if item is None:
+        raise HTTPException(status_code=404, detail="not_found")
+    return {"ok": True, "item": item, "history": await asyncio.to_thread(bookdepot_store.history, isbn_clean)}
+
 
-    background_tasks.add_task(_run)
-    est = round(len(isbns) * 4 / req.concurrency)
-    return {"ok": True, "job_id": job_id, "total": len(isbns), "estimated_seconds": est}
+class BookDepotSweepRequest(BaseModel):
+    # Katalog her zaman BOOKDEPOT_CATALOG_URL'den indirilir — istemci URL veremez (SSRF)
+    rescan: bool = True
+
+@app.post("/bookdepot/sweep")
+async def bookdepot_sweep_now(req: BookDepotSweepRequest):
+    """Tam katalog sweep'ini hemen çalıştır: indir → farkla → değişenleri rescan kuyruğuna ekle."""
+    from app import bookdepot_sweep
+
+    try:
+        return {"ok": True, **await bookdepot_sweep.run_sweep(rescan=req.rescan)}
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except httpx.HTTPError as e:
+        raise HTTPException(status_code=502, detail=f"catalog download failed: {e}")
 
 
 @app.delete("/bookdepot/inventory")
 async def bookdepot_clear():
     """Tüm BookDepot envanterini temizler."""
-    from app.core.json_store import file_lock, _write_unsafe
-    from app.core.config import get_settings
+    from app import bookdepot_store
 
-    p = get_settings().resolved_data_dir() / "bookdepot_inventory.json"
-    with file_lock(p):
-        _write_unsafe(p, {"items": {}, "updated_at": int(_time.time())})
+    await asyncio.to_thread(bookdepot_store.clear)
     return {"ok": True, "message": "Envanter temizlendi"}
 
 
@@ -0,0 +1,199 @@
+"""
+Market Snapshot Store — ISBN başına kaynak bazlı son sonuçlar (cross-scan memoization).
+
+Aynı ISBN BookDepot taraması, CSV upload ve watchlist'te tekrar tekrar geçer.
+Her kaynak sonucu (isbn, source) satırında fetched_at ile saklanır; bir scan
+kaynak başına tazelik şartı belirtir (örn. amazon < 20dk, buyback < 4sa) ve
+sadece bayat bileşenler yeniden çekilir.
+
+  source: "amazon" | "ebay:<match_policy>:<invalid_policy>" | "buyback" | "buyback_trend"
+          (BookFinder ve metadata'nın kendi TTL'li cache'leri var → burada saklanmaz)
+  freshness: {"amazon": 1200, "buyback": 14400, ...}  (saniye, 0 = her zaman çek)
+             Verilmeyen kaynaklar DEFAULT_FRESHNESS'i kullanır. "ebay:*" anahtarları
+             "ebay" tazelik şartını kullanır.
+
+Boş / hatalı sonuçlar (örn. {}, {"ok": false} veya [{"_error": ...}]) saklanmaz — bir sonraki
+scan tekrar dener.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import sqlite3
+import time
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from app.core.config import get_settings
+
+logger = logging.getLogger("trackerbundle.market_snapshot")
+
+DEFAULT_FRESHNESS: Dict[str, float] = {
+    "amazon":        20 * 60,        # buybox hızlı değişir (eski _AMZ_TTL ile aynı)
+    "ebay":          15 * 60,
+    "buyback":       4 * 3600,
+    "buyback_trend": 24 * 3600,
+}
+
+_schema_ready: set = set()
+_inflight: Dict[Tuple[str, str], "asyncio.Future[Any]"] = {}
+_stats: Dict[str, Dict[str, int]] = {}   # source → {"hit": n, "miss": n}
+
+
+def _path() -> Path:
+    return get_settings().resolved_data_dir() / "market_snapshots.db"
+
+
+def _connect() -> sqlite3.Connection:
+    p = _path()
+    p.parent.mkdir(parents=True, exist_ok=True)
+    con = sqlite3.connect(p, timeout=10)
+    con.row_factory = sqlite3.Row
+    con.execute("PRAGMA synchronous=NORMAL;")
+    if str(p) not in _schema_ready:
+        con.execute("PRAGMA journal_mode=WAL;")
+        con.execute(
+            """
+            CREATE TABLE IF NOT EXISTS market_snapshot (
+              isbn TEXT NOT NULL,
+              source TEXT NOT NULL,
+              fetched_at REAL NOT NULL,
+              data_json TEXT NOT NULL,
+              PRIMARY KEY (isbn, source)
+            );
+            """
+        )
+        _schema_ready.add(str(p))
+    return con
+
+
+def _base(source: str) -> str:
+    return source.split(":", 1)[0]
+
+
+def max_age(source: str, freshness: Optional[Dict[str, float]] = None) -> float:
+    base = _base(source)
+    if freshness and base in freshness and freshness[base] is not None:
+        return float(freshness[base])
+    return float(DEFAULT_FRESHNESS.get(base, 0))
+
+
+def get(isbn: str, source: str, max_age_s: float) -> Optional[Any]:
+    """max_age_s'den taze kayıt varsa data, yoksa None."""
+    if max_age_s <= 0:
+        return None
+    try:
+        with _connect() as con:
+            r = con.execute(
+                "SELECT fetched_at, data_json FROM market_snapshot WHERE isbn=? AND source=?;",
+                (isbn, source),
+            ).fetchone()
+    except Exception as e:
+        logger.debug("snapshot get failed isbn=%s source=%s: %s", isbn, source, e)
+        return None
+    if r is None or time.time() - float(r["fetched_at"]) > max_age_s:
+        return None
+    return json.loads(r["data_json"])
+
+
+def put(isbn: str, source: str, data: Any, fetched_at: Optional[float] = None) -> None:
+    try:
+        with _connect() as con:
+            con.execute(
+                """
+                INSERT INTO market_snapshot(isbn, source, fetched_at, data_json) VALUES(?,?,?,?)
+                ON CONFLICT(isbn, source) DO UPDATE SET
+                    fetched_at=excluded.fetched_at, data_json=excluded.data_json
+                """,
+                (isbn, source, fetched_at or time.time(), json.dumps(data, default=str)),
+            )
+    except Exception as e:
+        logger.debug("snapshot put failed isbn=%s source=%s: %s", isbn, source, e)
+
+
+def snapshot(isbn: str) -> Dict[str, Dict[str, Any]]:
+    """ISBN'in tüm kaynak kayıtları: {source: {fetched_at, age_s, data}}."""
+    try:
+        with _connect() as con:
+            rows = con.execute(
+                "SELECT source, fetched_at, data_json FROM market_snapshot WHERE isbn=?;", (isbn,)
+            ).fetchall()
+    except Exception:
+        return {}
+    now = time.time()
+    return {
+        r["source"]: {
+            "fetched_at": r["fetched_at"],
+            "age_s": int(now - r["fetched_at"]),
+            "data": json.loads(r["data_json"]),
+        }
+        for r in rows
+    }
+
+
+def invalidate(isbn: str, source: Optional[str] = None) -> int:
+    with _connect() as con:
+        if source is None:
+            return con.execute("DELETE FROM market_snapshot WHERE isbn=?;", (isbn,)).rowcount
+        return con.execute("DELETE FROM market_snapshot WHERE isbn=? AND source=?;", (isbn, source)).rowcount
+
+
+def cacheable(data: Any) -> bool:
+    """Boş veya hata taşıyan sonuçlar saklanmaz."""
+    if not data:
+        return False
+    if isinstance(data, list):
+        return not any(isinstance(o, dict) and "_error" in o for o in data)
+    if isinstance(data, dict):
+        # partial: eksik / ara sonuç (örn. toplu metadata kaydı) — tam sonuç gelince tekrar denenmeli
+        return "_error" not in data and data.get("ok") is not False and not data.get("partial")
+    return True
+
+
+def _count(source: str, kind: str) -> None:
+    st = _stats.setdefault(_base(source), {"hit": 0, "miss": 0})
+    st[kind] += 1
+
+
+async def memoize(
+    isbn: str,
+    source: str,
+    fetch: Callable[[], Awaitable[Any]],
+    freshness: Optional[Dict[str, float]] = None,
+) -> Any:
+    """
+    Taze snapshot varsa onu döndür; yoksa fetch() çalıştır ve sonucu sakla.
+    Aynı (isbn, source) için eşzamanlı çağrılar tek fetch'i paylaşır.
+    """
+    age = max_age(source, freshness)
+    hit = get(isbn, source, age)
+    if hit is not None:
+        _count(source, "hit")
+        return hit
+    _count(source, "miss")
+
+    key = (isbn, source)
+    fut = _inflight.get(key)
+    if fut is not None:
+        return await asyncio.shield(fut)
+
+    fut = asyncio.get_running_loop().create_future()
+    _inflight[key] = fut
+    try:
+        data = await fetch()
+    except BaseException as e:
+        fut.set_exception(e)
+        fut.exception()   # bekleyen yoksa "never retrieved" uyarısını bastır
+        raise
+    else:
+        if cacheable(data):
+            put(isbn, source, data)
+        fut.set_result(data)
+        return data
+    finally:
+        _inflight.pop(key, None)
+
+
+def stats() -> Dict[str, Dict[str, int]]:
+    return {k: dict(v) for k, v in _stats.items()}
@@ -27,6 +27,7 @@ from typing import Any, Dict, List, Optional
 
 import httpx
 
+from app.core.circuit_breaker import get_breaker
 from app.core.config import get_settings
 
 logger = logging.getLogger("trackerbundle.nyt")
@@ -82,7 +83,8 @@ async def get_isbn_nyt_history(isbn: str) -> Dict[str, Any]:
 
     try:
         async with httpx.AsyncClient(timeout=5) as client:
-            r = await client.get(
+            r = await get_breaker("nyt", slow_call_s=4.0).call(
+                client.get,
                 f"{NYT_BASE}/lists/best-sellers/history.json",
                 params={"isbn": isbn13, "api-key": key},
             )
@@ -166,7 +168,8 @@ async def get_current_bestsellers(list_name: str = "hardcover-nonfiction") -> Li
 
     try:
         async with httpx.AsyncClient(timeout=12) as client:
-            r = await client.get(
+            r = await get_breaker("nyt", slow_call_s=4.0).call(
+                client.get,
                 f"{NYT_BASE}/lists/current/{list_name}.json",
                 params={"api-key": key},
             )
@@ -1,11 +1,19 @@
 """
-Scan Job Store — background CSV arb taramaları için in-memory job tracker.
-Her job: {id, status, progress, total, accepted, rejected, stats, error, created_at}
+Scan Job Store — background CSV arb taramaları için job tracker.
+Her job: {id, kind, priority, status, progress, total, accepted, rejected, stats, error, created_at}
+
+_jobs in-memory cache'tir; job meta'sı (kind, payload, priority, status, progress)
+DATA_DIR/scan_jobs.db (SQLite) içinde kalıcıdır → restart sonrası kuyruktaki
+job'lar recover_jobs() ile geri yüklenir (bkz. app/scan_queue.py).
+
+Scan geçmişi de aynı DB'dedir (scan_history + scan_history_rows + scan_daily_rollup):
+retention süresiz, eski rejected satırları compact_history() ile budanır,
+günlük rollup'lar finish anında artımlı güncellenir.
 """
 from __future__ import annotations
-import time, uuid, asyncio, json
+import time, uuid, asyncio, json, sqlite3
 from pathlib import Path
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional
 
 DATA_DIR = Path(__file__).resolve().parent / "data"
 HISTORY_FILE = DATA_DIR / "scan_history.json"
@@ -13,22 +21,298 @@ HISTORY_FILE = DATA_DIR / "scan_history.json"
 # ── In-memory job store ───────────────────────────────────────────────────────
 _jobs: Dict[str, Dict] = {}  # job_id → job dict
 
+# Kuyrukta bekleyen / yarıda kalan statüler — restart'ta yeniden kuyruğa alınır
+_RECOVERABLE = ("pending", "running", "paused")
+_NO_HISTORY_KINDS = ("meta_backfill",)  # bakım job'ları scan geçmişine yazılmaz
+_PROGRESS_PERSIST_S = 2.0  # progress'i en fazla 2 sn'de bir diske yaz
+
+
+# ── SQLite persistence ────────────────────────────────────────────────────────
+# SCAN_WORKER_MODE=external iken job'ları ayrı bir process (app/scan_worker.py)
+# çalıştırır: API job'u pending olarak yazar, worker claim eder, progress +
+# partial sonuçları scan_job_rows'a yazar; API get_job() ile DB'den okur.
+# Pause/cancel API tarafında DB status'ü değiştirir, worker sync_control() ile görür.
+
+_owned: set = set()                          # bu process'in çalıştırdığı job'lar
+_row_buffer: Dict[str, List[tuple]] = {}     # job_id → flush edilmemiş partial satırlar
+
+
+def _db_path() -> Path:
+    # DATA_DIR çağrı anında okunur — testler monkeypatch ile izole eder
+    return DATA_DIR / "scan_jobs.db"
+
+
+_schema_ready: set = set()   # şeması kurulmuş DB path'leri (DDL'i her bağlantıda tekrarlama)
+
+
+def _connect() -> sqlite3.Connection:
+    p = _db_path()
+    p.parent.mkdir(parents=True, exist_ok=True)
+    con = sqlite3.connect(p, timeout=10)
+    con.row_factory = sqlite3.Row
+    con.execute("PRAGMA synchronous=NORMAL;")
+    if str(p) not in _schema_ready:
+        con.execute("PRAGMA journal_mode=WAL;")
+        _create_schema(con)
+        _schema_ready.add(str(p))
+    return con
+
+
+def _create_schema(con: sqlite3.Connection) -> None:
+    con.execute(
+        """
+        CREATE TABLE IF NOT EXISTS scan_jobs (
+          id TEXT PRIMARY KEY,
+          kind TEXT NOT NULL,
+          priority INTEGER NOT NULL DEFAULT 0,
+          status TEXT NOT NULL,
+          total INTEGER NOT NULL,
+          progress INTEGER NOT NULL DEFAULT 0,
+          payload_json TEXT,
+          stats_json TEXT,
+          error TEXT,
+          created_at REAL NOT NULL,
+          started_at REAL,
+          finished_at REAL,
+          eta_s INTEGER,
+          worker TEXT,
+          heartbeat_at REAL
+        );
+        """
+    )
+    cols = {r["name"] for r in con.execute("PRAGMA table_info(scan_jobs);")}
+    for col, typ in (("eta_s", "INTEGER"), ("worker", "TEXT"), ("heartbeat_at", "REAL")):
+        if col not in cols:
+            con.execute(f"ALTER TABLE scan_jobs ADD COLUMN {col} {typ};")
+    con.execute("CREATE INDEX IF NOT EXISTS idx_scan_jobs_queue ON scan_jobs(status, priority DESC, created_at ASC);")
+    con.execute(
+        """
+        CREATE TABLE IF NOT EXISTS scan_job_rows (
+          seq INTEGER PRIMARY KEY AUTOINCREMENT,
+          job_id TEXT NOT NULL,
+          final INTEGER NOT NULL,                 -- 0 = partial (anlık), 1 = finish_job sonucu
+          bucket TEXT NOT NULL,                   -- 'accepted' | 'rejected'
+          row_json TEXT NOT NULL
+        );
+        """
+    )
+    con.execute("CREATE INDEX IF NOT EXISTS idx_scan_job_rows_job ON scan_job_rows(job_id, seq);")
+    # ── Scan history ──
+    con.execute(
+        """
+        CREATE TABLE IF NOT EXISTS scan_history (
+          job_id TEXT PRIMARY KEY,
+          ts REAL NOT NULL,
+          total_isbns INTEGER NOT NULL DEFAULT 0,
+          accepted_count INTEGER NOT NULL DEFAULT 0,
+          rejected_count INTEGER NOT NULL DEFAULT 0,
+          stats_json TEXT,
+          top_reasons_json TEXT
+        );
+        """
+    )
+    con.execute("CREATE INDEX IF NOT EXISTS idx_scan_history_ts ON scan_history(ts DESC);")
+    con.execute(
+        """
+        CREATE TABLE IF NOT EXISTS scan_history_rows (
+          id INTEGER PRIMARY KEY AUTOINCREMENT,
+          job_id TEXT NOT NULL,
+          ts REAL NOT NULL,
+          isbn TEXT,
+          accepted INTEGER NOT NULL,
+          source TEXT,
+          roi_pct REAL,
+          profit REAL,
+          reason TEXT,
+          row_json TEXT                           -- sadece accepted satırlar için tam satır
+        );
+        """
+    )
+    con.execute("CREATE INDEX IF NOT EXISTS idx_scan_history_rows_job ON scan_history_rows(job_id, accepted, id);")
+    con.execute("CREATE INDEX IF NOT EXISTS idx_scan_history_rows_isbn ON scan_history_rows(isbn, ts DESC);")
+    con.execute("CREATE INDEX IF NOT EXISTS idx_scan_history_rows_ts ON scan_history_rows(accepted, ts);")
+    con.execute(
+        """
+        CREATE TABLE IF NOT EXISTS scan_daily_rollup (
+          day TEXT PRIMARY KEY,                   -- YYYY-MM-DD (UTC)
+          scans INTEGER NOT NULL DEFAULT 0,
+          isbns_scanned INTEGER NOT NULL DEFAULT 0,
+          accepted INTEGER NOT NULL DEFAULT 0,
+          rejected INTEGER NOT NULL DEFAULT 0
+        );
+        """
+    )
+    con.execute("CREATE TABLE IF NOT EXISTS scan_meta (key TEXT PRIMARY KEY, value TEXT);")
+
+
+def _log_db_error(what: str, job_id: str, e: Exception) -> None:
+    import logging
+    logging.getLogger("trackerbundle.scan_jobs").warning("%s job %s failed: %s", what, job_id, e)
+
+
+def _persist(job_id: str) -> None:
+    """Job meta'sını SQLite'a tam yaz (create/recover). Hata scan'i durdurmaz (sadece log)."""
+    job = _jobs.get(job_id)
+    if not job:
+        return
+    try:
+        with _connect() as con:
+            con.execute(
+                """
+                INSERT INTO scan_jobs(id, kind, priority, status, total, progress, payload_json,
+                                      stats_json, error, created_at, started_at, finished_at, eta_s)
+                VALUES(?,?,?,?,?,?,?,?,?,?,?,?,?)
+                ON CONFLICT(id) DO UPDATE SET
+                    priority=excluded.priority,
+                    status=excluded.status,
+                    total=excluded.total,
+                    progress=excluded.progress,
+                    stats_json=excluded.stats_json,
+                    error=excluded.error,
+                    started_at=excluded.started_at,
+                    finished_at=excluded.finished_at,
+                    eta_s=excluded.eta_s
+                """,
+                (
+                    job_id, job["kind"], int(job["priority"]), job["status"], int(job["total"]),
+                    int(job["progress"]),
+                    json.dumps(job.get("payload")) if job.get("payload") is not None else None,
+                    json.dumps(job["stats"]) if job.get("stats") else None,
+                    job["error"], job["created_at"], job["started_at"], job.get("finished_at"),
+                    job.get("eta_s"),
+                ),
+            )
+        job["_persisted_at"] = time.time()
+    except Exception as e:
+        _log_db_error("persist", job_id, e)
+
+
+def _update(job_id: str, only_if_status: Optional[str] = None, **cols: Any) -> int:
+    """Tek job satırında kolon güncelle. only_if_status → koşullu (atomic claim). Returns rowcount."""
+    sets = ", ".join(f"{k}=?" for k in cols)
+    sql = f"UPDATE scan_jobs SET {sets} WHERE id=?"
+    args: List[Any] = list(cols.values()) + [job_id]
+    if only_if_status is not None:
+        sql += " AND status=?"
+        args.append(only_if_status)
+    try:
+        with _connect() as con:
+            return con.execute(sql, args).rowcount
+    except Exception as e:
+        _log_db_error("update", job_id, e)
+        return 0
+
+
+def _flush_rows(job_id: str, con: Optional[sqlite3.Connection] = None) -> None:
+    rows = _row_buffer.pop(job_id, None)
+    if not rows:
+        return
+    try:
+        if con is None:
+            with _connect() as c:
+                c.executemany("INSERT INTO scan_job_rows(job_id, final, bucket, row_json) VALUES(?,?,?,?);", rows)
+        else:
+            con.executemany("INSERT INTO scan_job_rows(job_id, final, bucket, row_json) VALUES(?,?,?,?);", rows)
+    except Exception as e:
+        _log_db_error("flush_rows", job_id, e)
+
+
+def _is_remote(job_id: str) -> bool:
+    """Job başka bir process'te (scan worker) mi çalışıyor → state DB'den okunmalı."""
+    if job_id in _owned:
+        return False
+    try:
+        from app.core.config import get_settings
+        return get_settings().scan_worker_mode == "external"
+    except Exception:
+        return False
+
+
+def _new_job_dict(r: sqlite3.Row) -> Dict:
+    return {
+        "id": r["id"],
+        "kind": r["kind"],
+        "priority": int(r["priority"]),
+        "payload": json.loads(r["payload_json"]) if r["payload_json"] else None,
+        "status": r["status"],
+        "progress": 0,
+        "total": int(r["total"]),
+        "accepted": [],
+        "rejected": [],
+        "partial_accepted": [],
+        "partial_rejected": [],
+        "stats": {},
+        "error": None,
+        "created_at": float(r["created_at"]),
+        "eta_s": None,
+        "started_at": None,
+        "finished_at": None,
+        "_row_seq": 0,
+    }
+
+
+def _sync_from_db(job_id: str) -> Optional[Dict]:
+    """DB'deki son durumu (meta + yeni satırlar) _jobs'a artımlı olarak yükle."""
+    try:
+        with _connect() as con:
+            r = con.execute("SELECT * FROM scan_jobs WHERE id=?;", (job_id,)).fetchone()
+            if r is None:
+                return _jobs.get(job_id)
+            job = _jobs.get(job_id)
+            if job is None:
+                job = _jobs[job_id] = _new_job_dict(r)
+            rows = con.execute(
+                "SELECT seq, final, bucket, row_json FROM scan_job_rows WHERE job_id=? AND seq>? ORDER BY seq;",
+                (job_id, job.get("_row_seq", 0)),
+            ).fetchall()
+    except Exception as e:
+        _log_db_error("sync", job_id, e)
+        return _jobs.get(job_id)
+    job["status"] = r["status"]
+    job["progress"] = int(r["progress"] or 0)
+    job["stats"] = json.loads(r["stats_json"]) if r["stats_json"] else {}
+    job["error"] = r["error"]
+    job["started_at"] = r["started_at"]
+    job["finished_at"] = r["finished_at"]
+    job["eta_s"] = r["eta_s"]
+    for row in rows:
+        key = ("" if row["final"] else "partial_") + row["bucket"]
+        job[key].append(json.loads(row["row_json"]))
+        job["_row_seq"] = row["seq"]
+    return job
+
+
 _JOB_TTL_S = 3600 * 4  # 4 saat — tamamlanan job'ları bellekten temizle
 
-def _evict_old_jobs() -> None:
-    """4 saatten eski tamamlanmış job'ları _jobs dict'inden sil."""
-    now = time.time()
+_TERMINAL = ("done", "error", "cancelled")
+
+def evict_old_jobs(now: Optional[float] = None) -> None:
+    """
+    4 saatten eski bitmiş job'ları _jobs'tan sil; başka process'in (scan worker) job'larının
+    yerel kopyalarını durumdan bağımsız sil — get_job onları DB'den yeniden okur.
+    create / finish / fail ve worker tick'inde çağrılır.
+    """
+    now = time.time() if now is None else now
     stale = [
         jid for jid, j in list(_jobs.items())
-        if j["status"] in ("done", "error")
-        and now - j.get("created_at", 0) > _JOB_TTL_S
+        if now - j.get("created_at", 0) > _JOB_TTL_S
+        and (j["status"] in _TERMINAL or _is_remote(jid))
     ]
     for jid in stale:
-        del _jobs[jid]
+        forget(jid)
     if stale:
         import logging
         logging.getLogger("trackerbundle.scan_jobs").debug("evicted %d old jobs", len(stale))
 
+def forget(job_id: str) -> None:
+    """Job'un yerel state'ini bırak (kalıcı kaydı DB'de kalır)."""
+    if job_id in _row_buffer:
+        _flush_rows(job_id)
+    _jobs.pop(job_id, None)
+    _owned.discard(job_id)
+    _pause_events.pop(job_id, None)
+    _cancel_events.pop(job_id, None)
+
 # ── Pause / Cancel events ─────────────────────────────────────────────────────
 # Her job için asyncio.Event — scanner her ISBN'den önce kontrol eder
 _pause_events:  Dict[str, asyncio.Event] = {}   # set = paused
@@ -41,32 +325,82 @@ def get_cancel_event(job_id: str) -> asyncio.Event:
     return _cancel_events.setdefault(job_id, asyncio.Event())
 
 def pause_job(job_id: str) -> bool:
-    job = _jobs.get(job_id)
+    job = get_job(job_id)
     if not job or job["status"] not in ("running", "pending"): return False
     get_pause_event(job_id).set()
     job["status"] = "paused"
+    _update(job_id, status="paused")
     return True
 
 def resume_job(job_id: str) -> bool:
-    job = _jobs.get(job_id)
+    job = get_job(job_id)
     if not job or job["status"] != "paused": return False
     get_pause_event(job_id).clear()
+    if job.get("started_at") is None:
+        # Kuyrukta beklerken durdurulmuş → hiç başlamadı; "running" yazılırsa kimse başlatmaz
+        job["status"] = "pending"
+        _update(job_id, status="pending")
+        from app import scan_queue
+        try:
+            scan_queue._fill_slots()
+        except RuntimeError:
+            pass  # event loop yok → start() / worker tick'i claim eder
+        return True
     job["status"] = "running"
+    _update(job_id, status="running")
     return True
 
 def cancel_job(job_id: str) -> bool:
-    job = _jobs.get(job_id)
+    job = get_job(job_id)
     if not job or job["status"] not in ("running", "paused", "pending"): return False
     get_cancel_event(job_id).set()
     get_pause_event(job_id).clear()   # unpause so scanner loop can see cancel
     job["status"] = "cancelled"
+    job["finished_at"] = time.time()
+    _update(job_id, status="cancelled", finished_at=job["finished_at"])
     return True
 
-def create_job(total: int) -> str:
-    _evict_old_jobs()  # her yeni job öncesi eski job'ları temizle
+def sync_control(job_id: str) -> Optional[str]:
+    """
+    Worker tarafı: API'nin DB'ye yazdığı pause/resume/cancel'ı yerel event'lere uygula.
+    Returns: DB'deki status (job yoksa None).
+    """
+    job = _jobs.get(job_id)
+    try:
+        with _connect() as con:
+            r = con.execute("SELECT status FROM scan_jobs WHERE id=?;", (job_id,)).fetchone()
+    except Exception as e:
+        _log_db_error("sync_control", job_id, e)
+        return None
+    if r is None or job is None:
+        return None
+    st = r["status"]
+    if st == "cancelled" and job["status"] != "cancelled":
+        get_cancel_event(job_id).set()
+        get_pause_event(job_id).clear()
+        job["status"] = "cancelled"
+    elif st == "paused" and job["status"] == "running":
+        get_pause_event(job_id).set()
+        job["status"] = "paused"
+    elif st == "running" and job["status"] == "paused":
+        get_pause_event(job_id).clear()
+        job["status"] = "running"
+    return st
+
+def create_job(total: int, kind: str = "csv_arb", payload: Optional[Dict[str, Any]] = None,
+               priority: int = 0) -> str:
+    """
+    Yeni job oluştur (status=pending) ve kalıcı hale getir.
+    payload: worker'ın job'u yeniden kurabilmesi için JSON-serializable parametreler.
+    priority: yüksek olan önce çalışır; eşitlikte created_at (FIFO).
+    """
+    evict_old_jobs()  # her yeni job öncesi eski job'ları temizle
     job_id = str(uuid.uuid4())[:8]
     _jobs[job_id] = {
         "id": job_id,
+        "kind": kind,
+        "priority": int(priority),
+        "payload": payload,
         "status": "pending",   # pending → running → paused → done | error | cancelled
         "progress": 0,
         "total": total,
@@ -79,12 +413,56 @@ def create_job(total: int) -> str:
         "created_at": time.time(),
         "eta_s": None,
         "started_at": None,
+        "finished_at": None,
+        "_row_seq": 0,
     }
     # Pre-create events (clear state)
     _pause_events[job_id] = asyncio.Event()
     _cancel_events[job_id] = asyncio.Event()
+    _persist(job_id)
     return job_id
 
+def mark_running(job_id: str, worker: str = "") -> bool:
+    """
+    pending → running (atomic claim: DB'de hâlâ pending ise).
+    Cancel edilmiş / başka worker'ın aldığı / bulunamayan job için False.
+    """
+    job = _jobs.get(job_id)
+    if not job or job["status"] != "pending":
+        return False
+    now = time.time()
+    if not _update(job_id, only_if_status="pending", status="running", started_at=now, worker=worker,
+                   heartbeat_at=now):
+        return False
+    job["status"] = "running"
+    job["started_at"] = now
+    _owned.add(job_id)
+    return True
+
+def claim_next_job(worker: str) -> Optional[str]:
+    """
+    Worker tarafı: DB'deki sıradaki pending job'u (priority DESC, created_at ASC)
+    atomic olarak claim et ve _jobs'a yükle. Kuyruk boşsa None.
+    """
+    try:
+        with _connect() as con:
+            ids = [r["id"] for r in con.execute(
+                "SELECT id FROM scan_jobs WHERE status='pending' ORDER BY priority DESC, created_at ASC LIMIT 10;"
+            ).fetchall()]
+    except Exception as e:
+        _log_db_error("claim", "-", e)
+        return None
+    for jid in ids:
+        job = _sync_from_db(jid)
+        if not job:
+            continue
+        if jid not in _pause_events:
+            _pause_events[jid] = asyncio.Event()
+            _cancel_events[jid] = asyncio.Event()
+        if mark_running(jid, worker=worker):
+            return jid
+    return None
+
 def update_progress(job_id: str, done: int) -> None:
     job = _jobs.get(job_id)
     if not job: return
@@ -94,6 +472,10 @@ def update_progress(job_id: str, done: int) -> None:
         rate = done / elapsed  # ISBN/s
         remaining = job["total"] - done
         job["eta_s"] = round(remaining / rate) if rate > 0 else None
+    if time.time() - job.get("_persisted_at", 0) >= _PROGRESS_PERSIST_S:
+        job["_persisted_at"] = time.time()
+        _flush_rows(job_id)
+        _update(job_id, progress=done, eta_s=job["eta_s"])
 
 def finish_job(job_id: str, accepted: list, rejected: list, stats: dict) -> None:
     job = _jobs.get(job_id)
@@ -103,13 +485,34 @@ def finish_job(job_id: str, accepted: list, rejected: list, stats: dict) -> None
     job["accepted"] = accepted
     job["rejected"] = rejected
     job["stats"] = stats
-    _save_to_history(job_id, accepted, rejected, stats)
+    job["finished_at"] = time.time()
+    _row_buffer.pop(job_id, None)   # final satırlar partial'ların yerini alır
+    try:
+        with _connect() as con:
+            con.executemany(
+                "INSERT INTO scan_job_rows(job_id, final, bucket, row_json) VALUES(?,?,?,?);",
+                [(job_id, 1, "accepted", json.dumps(r)) for r in accepted]
+                + [(job_id, 1, "rejected", json.dumps(r)) for r in rejected],
+            )
+            con.execute(
+                "UPDATE scan_jobs SET status='done', progress=?, stats_json=?, finished_at=?, eta_s=NULL WHERE id=?;",
+                (int(job["total"]), json.dumps(stats) if stats else None, job["finished_at"], job_id),
+            )
+    except Exception as e:
+        _log_db_error("finish", job_id, e)
+    if job.get("kind") not in _NO_HISTORY_KINDS:
+        _save_to_history(job_id, accepted, rejected, stats)
+    evict_old_jobs()
 
 def fail_job(job_id: str, error: str) -> None:
     job = _jobs.get(job_id)
     if not job: return
     job["status"] = "error"
     job["error"] = error
+    job["finished_at"] = time.time()
+    _flush_rows(job_id)
+    _update(job_id, status="error", error=error, finished_at=job["finished_at"])
+    evict_old_jobs()
 
 def append_result(job_id: str, accepted: list, rejected: list) -> None:
     """Her ISBN tarandıkça çağrılır — partial results anlık güncellenir."""
@@ -118,14 +521,141 @@ def append_result(job_id: str, accepted: list, rejected: list) -> None:
         return
     job["partial_accepted"].extend(accepted)
     job["partial_rejected"].extend(rejected)
+    buf = _row_buffer.setdefault(job_id, [])
+    buf.extend((job_id, 0, "accepted", json.dumps(r)) for r in accepted)
+    buf.extend((job_id, 0, "rejected", json.dumps(r)) for r in rejected)
 
 
 def get_job(job_id: str) -> Optional[Dict]:
+    if _is_remote(job_id):
+        return _sync_from_db(job_id)
     return _jobs.get(job_id)
 
+# ── Queue helpers (app/scan_queue.py kullanır) ────────────────────────────────
+
+def pending_jobs() -> List[Dict]:
+    """Çalışmayı bekleyen job'lar — priority DESC, created_at ASC (FIFO)."""
+    pend = [j for j in _jobs.values() if j["status"] == "pending"]
+    pend.sort(key=lambda j: (-j.get("priority", 0), j.get("created_at", 0)))
+    return pend
+
+def active_job_ids(kind: str) -> List[str]:
+    """Bu türden pending/running/paused job'lar (tüm process'ler — DB'den)."""
+    try:
+        with _connect() as con:
+            rows = con.execute(
+                f"SELECT id FROM scan_jobs WHERE kind=? AND status IN ({','.join('?' * len(_RECOVERABLE))});",
+                (kind, *_RECOVERABLE),
+            ).fetchall()
+    except Exception:
+        return [j["id"] for j in _jobs.values() if j.get("kind") == kind and j["status"] in _RECOVERABLE]
+    return [r["id"] for r in rows]
+
+def active_job_payloads(kind: str) -> List[Dict[str, Any]]:
+    """Bu türden pending/running/paused job'ların payload'ları (tüm process'ler — DB'den)."""
+    try:
+        with _connect() as con:
+            rows = con.execute(
+                f"SELECT payload_json FROM scan_jobs WHERE kind=? AND status IN ({','.join('?' * len(_RECOVERABLE))});",
+                (kind, *_RECOVERABLE),
+            ).fetchall()
+    except Exception as e:
+        _log_db_error("active_payloads", "-", e)
+        return [j.get("payload") or {} for j in _jobs.values() if j.get("kind") == kind and j["status"] in _RECOVERABLE]
+    return [json.loads(r["payload_json"]) for r in rows if r["payload_json"]]
+
+def db_job_ids(status: str) -> Optional[List[str]]:
+    """DB'deki (tüm process'ler) bu durumdaki job'lar, kuyruk sırasıyla. DB hatasında None."""
+    try:
+        with _connect() as con:
+            return [r["id"] for r in con.execute(
+                "SELECT id FROM scan_jobs WHERE status=? ORDER BY priority DESC, created_at ASC;", (status,)
+            ).fetchall()]
+    except Exception as e:
+        _log_db_error("db_job_ids", "-", e)
+        return None
+
+def queue_position(job_id: str) -> Optional[int]:
+    """Pending job'un kuyruktaki sırası (0 = sıradaki). Pending değilse None."""
+    if _is_remote(job_id):
+        ids = db_job_ids("pending")
+        if ids is None:
+            return None
+        return ids.index(job_id) if job_id in ids else None
+    for i, j in enumerate(pending_jobs()):
+        if j["id"] == job_id:
+            return i
+    return None
+
+def _lease_s() -> float:
+    try:
+        from app.core.config import get_settings
+        return float(get_settings().scan_job_lease_s)
+    except Exception:
+        return 60.0
+
+def heartbeat(job_ids: List[str], now: Optional[float] = None) -> None:
+    """Bu process'in çalıştırdığı job'ların lease'ini yenile (recover_jobs bunlara dokunmaz)."""
+    if not job_ids:
+        return
+    now = time.time() if now is None else now
+    try:
+        with _connect() as con:
+            con.executemany("UPDATE scan_jobs SET heartbeat_at=? WHERE id=?;", [(now, jid) for jid in job_ids])
+    except Exception as e:
+        _log_db_error("heartbeat", ",".join(job_ids), e)
+
+def recover_jobs(now: Optional[float] = None) -> List[str]:
+    """
+    Job'ları çalıştıran process'te startup'ta ve periyodik çağrılır: diskte pending kalan
+    job'ları ve lease'i dolmuş (sahibi SCAN_JOB_LEASE_S boyunca heartbeat yazmamış →
+    ölmüş) running job'ları pending'e çevirip _jobs'a yükle. Lease'i dolmuş paused job'lar
+    paused kalır; resume edilince baştan kuyruğa girer. Canlı başka bir worker'ın job'una
+    dokunulmaz. Yarıda kalan job'lar baştan çalışır (partial satırları silinir).
+    Returns: kuyruğa alınan (pending) job id'leri.
+    """
+    now = time.time() if now is None else now
+    recovered: List[str] = []
+    try:
+        with _connect() as con:
+            rows = con.execute(
+                "SELECT * FROM scan_jobs WHERE status IN (?,?,?) ORDER BY priority DESC, created_at ASC;",
+                _RECOVERABLE,
+            ).fetchall()
+            expired = now - _lease_s()
+            stale = [
+                r["id"] for r in rows
+                if r["status"] != "pending" and r["id"] not in _owned
+                and (r["heartbeat_at"] or 0) < expired
+            ]
+            rows = [r for r in rows if r["status"] == "pending" or r["id"] in stale]
+            for jid in stale:
+                con.execute("DELETE FROM scan_job_rows WHERE job_id=?;", (jid,))
+                # paused → paused kalır; started_at=NULL → resume_job pending'e çevirip yeniden dispatch eder
+                con.execute(
+                    "UPDATE scan_jobs SET status=CASE WHEN status='paused' THEN 'paused' ELSE 'pending' END, "
+                    "progress=0, eta_s=NULL, started_at=NULL, worker=NULL, heartbeat_at=NULL WHERE id=?;",
+                    (jid,),
+                )
+    except Exception as e:
+        _log_db_error("recover", "-", e)
+        return recovered
+    for r in rows:
+        jid = r["id"]
+        if jid in _jobs:
+            continue
+        paused = r["status"] == "paused"
+        _jobs[jid] = _new_job_dict(r)
+        _jobs[jid]["status"] = "paused" if paused else "pending"
+        _pause_events[jid] = asyncio.Event()
+        _cancel_events[jid] = asyncio.Event()
+        if not paused:
+            recovered.append(jid)
+    return recovered
+
 def get_job_progress(job_id: str) -> Optional[Dict]:
     """Poll endpoint için — heavy lists olmadan sadece progress."""
-    job = _jobs.get(job_id)
+    job = get_job(job_id)
     if not job: return None
     # Tarama devam ederken partial results, bittikten sonra final results
     if job["status"] == "done":
@@ -137,8 +667,10 @@ def get_job_progress(job_id: str) -> Optional[Dict]:
 
     return {
         "id": job["id"],
+        "kind": job.get("kind", "csv_arb"),
         "status": job["status"],
         "paused": job["status"] == "paused",
+        "queue_position": queue_position(job_id),
         "progress": job["progress"],
         "total": job["total"],
         "eta_s": job["eta_s"],
@@ -151,34 +683,119 @@ def get_job_progress(job_id: str) -> Optional[Dict]:
         "preview": acc[:5],
     }
 
-# ── Scan history (disk) ───────────────────────────────────────────────────────
+# ── Scan history (SQLite) ─────────────────────────────────────────────────────
+
+_HISTORY_ENTRY_ACCEPTED_MAX = 200       # get_history entry başına döndürülen accepted satır
+_HISTORY_REJECTED_RETENTION_DAYS = 90   # daha eski rejected satırları compaction'da silinir
+_COMPACT_INTERVAL_S = 86400             # compaction en fazla günde bir
+
+
+def _utc_day(ts: float) -> str:
+    return time.strftime("%Y-%m-%d", time.gmtime(ts))
+
+
+def _insert_history(con: sqlite3.Connection, job_id: str, ts: float, accepted: list,
+                    rejected_count: int, top_reasons: Dict[str, int], stats: dict,
+                    rejected: Optional[list] = None) -> bool:
+    """Tek scan'i history'e yaz + günlük rollup'ı artır. Aynı job ikinci kez → no-op (False)."""
+    stats = stats or {}
+    total_isbns = int(stats.get("total_isbns") or 0)
+    cur = con.execute(
+        """
+        INSERT OR IGNORE INTO scan_history(job_id, ts, total_isbns, accepted_count, rejected_count,
+                                           stats_json, top_reasons_json)
+        VALUES(?,?,?,?,?,?,?);
+        """,
+        (job_id, ts, total_isbns, len(accepted), int(rejected_count),
+         json.dumps(stats), json.dumps(top_reasons)),
+    )
+    if cur.rowcount == 0:
+        return False
+    rows = [
+        (job_id, ts, r.get("isbn"), 1, r.get("source"), r.get("roi_pct"), r.get("profit"), None, json.dumps(r))
+        for r in accepted
+    ] + [
+        (job_id, ts, r.get("isbn"), 0, r.get("source"), r.get("roi_pct"), r.get("profit"), r.get("reason"), None)
+        for r in (rejected or [])
+    ]
+    con.executemany(
+        """
+        INSERT INTO scan_history_rows(job_id, ts, isbn, accepted, source, roi_pct, profit, reason, row_json)
+        VALUES(?,?,?,?,?,?,?,?,?);
+        """,
+        rows,
+    )
+    con.execute(
+        """
+        INSERT INTO scan_daily_rollup(day, scans, isbns_scanned, accepted, rejected) VALUES(?,1,?,?,?)
+        ON CONFLICT(day) DO UPDATE SET
+            scans=scans+1,
+            isbns_scanned=isbns_scanned+excluded.isbns_scanned,
+            accepted=accepted+excluded.accepted,
+            rejected=rejected+excluded.rejected
+        """,
+        (_utc_day(ts), total_isbns, len(accepted), int(rejected_count)),
+    )
+    return True
+
+
+def _migrate_legacy_history(con: sqlite3.Connection) -> None:
+    """Eski scan_history.json (max 50 entry) varsa bir kere DB'ye aktar ve .migrated olarak sakla."""
+    if not HISTORY_FILE.exists():
+        return
+    try:
+        entries = json.loads(HISTORY_FILE.read_text())
+    except Exception:
+        entries = []
+    for e in entries if isinstance(entries, list) else []:
+        _insert_history(
+            con, str(e.get("job_id")), float(e.get("ts") or 0), e.get("accepted") or [],
+            int(e.get("rejected_count") or 0), e.get("top_reasons") or {}, e.get("stats") or {},
+        )
+    HISTORY_FILE.replace(HISTORY_FILE.with_suffix(".json.migrated"))
+
+
+def _history_connect() -> sqlite3.Connection:
+    con = _connect()
+    if HISTORY_FILE.exists():
+        with con:
+            _migrate_legacy_history(con)
+    return con
+
 
 def _save_to_history(job_id: str, accepted: list, rejected: list, stats: dict) -> None:
     try:
-        DATA_DIR.mkdir(exist_ok=True)
-        existing = []
-        if HISTORY_FILE.exists():
-            try:
-                existing = json.loads(HISTORY_FILE.read_text())
-            except Exception:
-                existing = []
-        entry = {
-            "job_id": job_id,
-            "ts": time.time(),
-            "stats": stats,
-            "accepted": accepted[:200],   # max 200 accepted kaydet
-            "rejected_count": len(rejected),
-            "top_reasons": _top_reasons(rejected),
-        }
-        existing.insert(0, entry)
-        existing = existing[:50]  # max 50 scan
-        tmp = HISTORY_FILE.with_suffix(".tmp")
-        tmp.write_text(json.dumps(existing, indent=2))
-        tmp.replace(HISTORY_FILE)
+        now = time.time()
+        with _history_connect() as con:
+            _insert_history(con, job_id, now, accepted, len(rejected), _top_reasons(rejected), stats, rejected)
+            last = con.execute("SELECT value FROM scan_meta WHERE key='last_compact_ts';").fetchone()
+        if not last or now - float(last["value"]) >= _COMPACT_INTERVAL_S:
+            compact_history()
     except Exception as e:
         import logging
         logging.getLogger("trackerbundle.scan_history").warning("save_history failed: %s", e)
 
+
+def compact_history(retention_days: int = _HISTORY_REJECTED_RETENTION_DAYS) -> int:
+    """
+    Eski rejected satırlarını sil (özetler, accepted satırlar ve rollup'lar süresiz kalır).
+    Returns: silinen satır sayısı.
+    """
+    cutoff = time.time() - retention_days * 86400
+    with _history_connect() as con:
+        deleted = con.execute(
+            "DELETE FROM scan_history_rows WHERE accepted=0 AND ts < ?;", (cutoff,)
+        ).rowcount
+        con.execute(
+            "INSERT INTO scan_meta(key, value) VALUES('last_compact_ts', ?) "
+            "ON CONFLICT(key) DO UPDATE SET value=excluded.value;",
+            (str(time.time()),),
+        )
+    if deleted:
+        import logging
+        logging.getLogger("trackerbundle.scan_history").info("compact_history: %d rejected rows removed", deleted)
+    return deleted
+
 def _top_reasons(rejected: list) -> Dict[str, int]:
     counts: Dict[str, int] = {}
     for r in rejected:
@@ -188,10 +805,85 @@ def _top_reasons(rejected: list) -> Dict[str, int]:
         counts[key] = counts.get(key, 0) + 1
     return dict(sorted(counts.items(), key=lambda x: -x[1])[:8])
 
-def get_history() -> list:
+def get_history(limit: int = 50, offset: int = 0) -> list:
+    """Son scan'ler (yeniden eskiye). Entry başına max 200 accepted satır."""
+    try:
+        with _history_connect() as con:
+            rows = con.execute(
+                "SELECT * FROM scan_history ORDER BY ts DESC LIMIT ? OFFSET ?;",
+                (int(limit), int(offset)),
+            ).fetchall()
+            out = []
+            for r in rows:
+                acc = con.execute(
+                    "SELECT row_json FROM scan_history_rows WHERE job_id=? AND accepted=1 ORDER BY id LIMIT ?;",
+                    (r["job_id"], _HISTORY_ENTRY_ACCEPTED_MAX),
+                ).fetchall()
+                out.append({
+                    "job_id": r["job_id"],
+                    "ts": r["ts"],
+                    "stats": json.loads(r["stats_json"]) if r["stats_json"] else {},
+                    "accepted": [json.loads(a["row_json"]) for a in acc],
+                    "accepted_count": r["accepted_count"],
+                    "rejected_count": r["rejected_count"],
+                    "top_reasons": json.loads(r["top_reasons_json"]) if r["top_reasons_json"] else {},
+                })
+            return out
+    except Exception as e:
+        import logging
+        logging.getLogger("trackerbundle.scan_history").warning("get_history failed: %s", e)
+        return []
+
+def get_isbn_history(isbn: str, limit: int = 50) -> list:
+    """Bir ISBN'in geçmiş scan satırları (idx_scan_history_rows_isbn)."""
+    try:
+        with _history_connect() as con:
+            rows = con.execute(
+                """
+                SELECT job_id, ts, accepted, source, roi_pct, profit, reason
+                FROM scan_history_rows WHERE isbn=? ORDER BY ts DESC LIMIT ?;
+                """,
+                (isbn, int(limit)),
+            ).fetchall()
+        return [dict(r) | {"accepted": bool(r["accepted"])} for r in rows]
+    except Exception:
+        return []
+
+def history_summary(days: int = 7) -> Dict[str, Any]:
+    """
+    /analytics/summary için: son `days` UTC günü (bugün dahil) rollup'lardan +
+    toplam scan sayısı / son scan zamanı index'ten. Full scan yok.
+    """
+    since = _utc_day(time.time() - (days - 1) * 86400)
+    try:
+        with _history_connect() as con:
+            r = con.execute(
+                """
+                SELECT COALESCE(SUM(scans),0) AS scans, COALESCE(SUM(isbns_scanned),0) AS isbns,
+                       COALESCE(SUM(accepted),0) AS accepted
+                FROM scan_daily_rollup WHERE day >= ?;
+                """,
+                (since,),
+            ).fetchone()
+            t = con.execute("SELECT COUNT(*) AS n, MAX(ts) AS last_ts FROM scan_history;").fetchone()
+    except Exception:
+        return {"scans": 0, "isbns_scanned": 0, "deals_found": 0, "total_scans": 0, "last_scan_ts": None}
+    return {
+        "scans": int(r["scans"]),
+        "isbns_scanned": int(r["isbns"]),
+        "deals_found": int(r["accepted"]),
+        "total_scans": int(t["n"]),
+        "last_scan_ts": t["last_ts"],
+    }
+
+def daily_rollups(days: int = 30) -> list:
+    """Son `days` günün rollup satırları (eskiden yeniye)."""
+    since = _utc_day(time.time() - (days - 1) * 86400)
     try:
-        if HISTORY_FILE.exists():
-            return json.loads(HISTORY_FILE.read_text())
+        with _history_connect() as con:
+            rows = con.execute(
+                "SELECT * FROM scan_daily_rollup WHERE day >= ? ORDER BY day;", (since,)
+            ).fetchall()
+        return [dict(r) for r in rows]
     except Exception:
-        pass
-    return []
+        return []
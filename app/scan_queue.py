@@ -0,0 +1,559 @@
+"""
+Scan Queue — kalıcı scan job kuyruğu + worker pool.
+
+  enqueue(kind, payload, total, priority) → job_id
+      Job scan_job_store'a yazılır (SQLite'ta kalıcı), status=pending.
+  Dispatcher (_fill_slots)
+      Aynı anda en fazla `scan_max_concurrent_jobs` job çalıştırır.
+      Sıradaki job = priority DESC, created_at ASC. Job bitince slot boşalır
+      ve sıradaki job otomatik başlar.
+  FairShareGate
+      Tüm job'ların paylaştığı global upstream bütçesi:
+      `scan_global_concurrency` eşzamanlı ISBN + ISBN başlangıçları arası
+      `scan_isbn_min_interval_s` bekleme (eBay Browse 429 koruması).
+      Boşalan slot en az slot kullanan job'a verilir (round-robin) →
+      1000 ISBN'lik bir job 20 ISBN'lik bir job'u aç bırakmaz.
+  start()
+      Startup'ta çağrılır: diskte pending/running/paused kalan job'ları
+      recover_jobs() ile geri yükler ve kuyruğu çalıştırır.
+
+SCAN_WORKER_MODE:
+  inline   (default) job'lar API process'inde çalışır.
+  external API sadece kuyruğa yazar; job'ları ayrı systemd servisi
+           (python -m app.scan_worker) claim edip çalıştırır → uzun taramalar
+           API event loop'unu (panel, /alerts/details, bot) hiç meşgul etmez.
+
+Job türleri register() ile kaydedilir: "csv_arb" (/discover/csv-arb),
+"bookdepot" (/bookdepot/scan, BookDepot sweep rescan'leri) ve "meta_backfill" (book_meta_store ısıtma,
+priority=-10). Handler payload'dan taramayı yeniden kurar —
+bu yüzden payload JSON-serializable olmalı.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+from app import scan_job_store
+from app.core.config import get_settings
+
+logger = logging.getLogger("trackerbundle.scan_queue")
+
+# handler(job_id, payload, on_progress, gate) → {"accepted", "rejected", "stats"}
+Handler = Callable[[str, Dict[str, Any], Callable[..., None], Callable[[], Any]], Awaitable[Dict[str, Any]]]
+
+_HANDLERS: Dict[str, Handler] = {}
+
+
+def register(kind: str) -> Callable[[Handler], Handler]:
+    def _deco(fn: Handler) -> Handler:
+        _HANDLERS[kind] = fn
+        return fn
+    return _deco
+
+
+# ── Fair-share gate ───────────────────────────────────────────────────────────
+
+class FairShareGate:
+    """
+    Job'lar arası adil paylaşılan global ISBN slot havuzu.
+    slot(job_id) → async context manager; slot alınınca global pacing uygulanır.
+    """
+
+    def __init__(self, capacity: int, min_interval_s: float = 0.0):
+        self.capacity = max(1, int(capacity))
+        self.min_interval_s = max(0.0, float(min_interval_s))
+        self._in_use: Dict[str, int] = {}
+        self._waiters: Dict[str, Deque[asyncio.Future]] = {}
+        self._last_grant: Dict[str, float] = {}
+        self._pace_lock = asyncio.Lock()
+        self._last_start = 0.0
+        self.granted_total = 0
+
+    def in_use(self) -> int:
+        return sum(self._in_use.values())
+
+    def _grant(self, job_id: str) -> None:
+        self._in_use[job_id] = self._in_use.get(job_id, 0) + 1
+        self._last_grant[job_id] = time.monotonic()
+        self.granted_total += 1
+
+    def _dispatch(self) -> None:
+        while self.in_use() < self.capacity:
+            ready = [jid for jid, q in self._waiters.items() if q]
+            if not ready:
+                return
+            # En az slot kullanan job; eşitlikte en uzun süredir slot almayan
+            jid = min(ready, key=lambda j: (self._in_use.get(j, 0), self._last_grant.get(j, 0.0)))
+            fut = self._waiters[jid].popleft()
+            if not self._waiters[jid]:
+                del self._waiters[jid]
+            if fut.done():
+                continue
+            self._grant(jid)
+            fut.set_result(None)
+
+    async def acquire(self, job_id: str) -> None:
+        if self.in_use() < self.capacity and not any(self._waiters.values()):
+            self._grant(job_id)
+        else:
+            fut = asyncio.get_running_loop().create_future()
+            self._waiters.setdefault(job_id, deque()).append(fut)
+            try:
+                await fut
+            except asyncio.CancelledError:
+                if fut.done() and not fut.cancelled():
+                    self.release(job_id)  # slot verilmişti ama kullanılmayacak
+                else:
+                    q = self._waiters.get(job_id)
+                    if q and fut in q:
+                        q.remove(fut)
+                raise
+        if self.min_interval_s > 0:
+            async with self._pace_lock:
+                wait = self._last_start + self.min_interval_s - time.monotonic()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                self._last_start = time.monotonic()
+
+    def release(self, job_id: str) -> None:
+        n = self._in_use.get(job_id, 0) - 1
+        if n > 0:
+            self._in_use[job_id] = n
+        else:
+            self._in_use.pop(job_id, None)
+            self._last_grant.pop(job_id, None)
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, job_id: str) -> AsyncIterator[None]:
+        await self.acquire(job_id)
+        try:
+            yield
+        finally:
+            self.release(job_id)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "capacity": self.capacity,
+            "in_use": self.in_use(),
+            "by_job": dict(self._in_use),
+            "waiting": {jid: len(q) for jid, q in self._waiters.items() if q},
+            "granted_total": self.granted_total,
+        }
+
+
+_gate: Optional[FairShareGate] = None
+
+
+def get_gate() -> FairShareGate:
+    global _gate
+    if _gate is None:
+        s = get_settings()
+        _gate = FairShareGate(s.scan_global_concurrency, s.scan_isbn_min_interval_s)
+    return _gate
+
+
+# ── Dispatcher ────────────────────────────────────────────────────────────────
+
+_running: Dict[str, asyncio.Task] = {}
+_worker_id: Optional[str] = None   # set → bu process external scan worker
+_lease_tick_at = 0.0                # son heartbeat / lease recovery zamanı
+
+
+def _max_jobs() -> int:
+    return max(1, int(get_settings().scan_max_concurrent_jobs))
+
+
+def executes_jobs() -> bool:
+    """Bu process job çalıştırıyor mu? (inline mod veya external worker process)"""
+    return _worker_id is not None or get_settings().scan_worker_mode != "external"
+
+
+def _spawn(job_id: str) -> None:
+    task = asyncio.get_running_loop().create_task(_execute(job_id))
+    _running[job_id] = task
+    task.add_done_callback(lambda _t, jid=job_id: _on_job_exit(jid))
+
+
+def _fill_slots() -> None:
+    """Boş worker slotu varsa sıradaki pending job'ları claim edip başlat."""
+    if not executes_jobs():
+        return
+    if _worker_id is not None:
+        # External worker: kuyruk DB'de — API'nin yazdığı job'ları claim et
+        while len(_running) < _max_jobs():
+            jid = scan_job_store.claim_next_job(_worker_id)
+            if jid is None:
+                return
+            _spawn(jid)
+        return
+    for job in scan_job_store.pending_jobs():
+        if len(_running) >= _max_jobs():
+            return
+        jid = job["id"]
+        if jid in _running:
+            continue
+        if scan_job_store.mark_running(jid):
+            _spawn(jid)
+
+
+def _on_job_exit(job_id: str) -> None:
+    _running.pop(job_id, None)
+    if _worker_id is not None:
+        # Worker sonuçları sunmaz (API DB'den okur) → bitmiş job'un satırlarını bellekte tutma
+        scan_job_store.forget(job_id)
+    try:
+        _fill_slots()
+    except RuntimeError:
+        pass  # loop kapanıyor
+
+
+async def _execute(job_id: str) -> None:
+    job = scan_job_store.get_job(job_id)
+    if not job:
+        return
+    kind = job.get("kind", "csv_arb")
+    handler = _HANDLERS.get(kind)
+    if handler is None:
+        scan_job_store.fail_job(job_id, f"unknown_job_kind:{kind}")
+        return
+
+    def _on_progress(done: int, total: int, new_accepted: list, new_rejected: list) -> None:
+        """Her ISBN bittikçe çağrılır — anlık sonuçlar job'a eklenir."""
+        scan_job_store.update_progress(job_id, done)
+        scan_job_store.append_result(job_id, new_accepted, new_rejected)
+
+    gate = get_gate()
+    try:
+        result = await handler(job_id, job.get("payload") or {}, _on_progress, lambda: gate.slot(job_id))
+        scan_job_store.finish_job(job_id, result["accepted"], result["rejected"], result["stats"])
+    except Exception as e:
+        # Tarama yarıda kalsın — partial_accepted/rejected korunur
+        j = scan_job_store.get_job(job_id) or {}
+        partial_acc = j.get("partial_accepted", [])
+        partial_rej = j.get("partial_rejected", [])
+        if partial_acc or partial_rej:
+            # Partial sonuçları final olarak kaydet — kullanıcı kaybetmesin
+            scan_job_store.finish_job(job_id, partial_acc, partial_rej, {"partial": True, "error": str(e)[:200]})
+        else:
+            scan_job_store.fail_job(job_id, str(e))
+        logger.error("%s job %s failed: %s", kind, job_id, e)
+
+
+def enqueue(kind: str, payload: Dict[str, Any], total: int, priority: int = 0) -> str:
+    """Job'u kalıcı kuyruğa ekle; çalışan bir event loop varsa hemen dispatch et."""
+    job_id = scan_job_store.create_job(total, kind=kind, payload=payload, priority=priority)
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return job_id  # loop yok → start() çağrıldığında çalışır
+    _fill_slots()
+    return job_id
+
+
+def start() -> List[str]:
+    """Startup hook: yarıda kalan job'ları geri yükle ve kuyruğu çalıştır."""
+    if not executes_jobs():
+        return []  # external mod: recovery'yi scan worker yapar
+    global _lease_tick_at
+    recovered = scan_job_store.recover_jobs()
+    _lease_tick_at = time.time()
+    if recovered:
+        logger.info("scan_queue: %d job recovered from disk: %s", len(recovered), recovered)
+    _fill_slots()
+    return recovered
+
+
+def start_worker(worker_id: str) -> List[str]:
+    """External scan worker process'inde start() yerine çağrılır."""
+    global _worker_id
+    _worker_id = worker_id
+    return start()
+
+
+def tick_leases(now: Optional[float] = None) -> List[str]:
+    """
+    SCAN_JOB_LEASE_S/3'te bir: çalışan job'ların heartbeat'ini yaz, lease'i dolmuş (sahibi
+    ölmüş) job'ları geri al. Returns: recover edilen job id'leri.
+    """
+    global _lease_tick_at
+    now = time.time() if now is None else now
+    if now - _lease_tick_at < float(get_settings().scan_job_lease_s) / 3:
+        return []
+    _lease_tick_at = now
+    scan_job_store.heartbeat(list(_running), now)
+    recovered = scan_job_store.recover_jobs(now)
+    if recovered:
+        logger.info("scan_queue: %d job recovered (lease expired): %s", len(recovered), recovered)
+    return recovered
+
+
+async def lease_loop() -> None:
+    """Inline mod: API process'i job çalıştırırken lease'leri tazele (worker'da poll_worker yapar)."""
+    while True:
+        try:
+            tick_leases()
+            _fill_slots()
+        except Exception as e:
+            logger.warning("scan_queue lease tick failed: %s", e)
+        await asyncio.sleep(max(1.0, float(get_settings().scan_job_lease_s) / 3))
+
+
+def poll_worker() -> None:
+    """
+    External worker tick'i: çalışan job'lar için API'den gelen pause/cancel'ı
+    uygula, lease'leri tazele, boş slot varsa yeni job claim et.
+    """
+    for jid in list(_running):
+        scan_job_store.sync_control(jid)
+    tick_leases()
+    scan_job_store.evict_old_jobs()
+    _fill_slots()
+
+
+def enqueue_bookdepot_rescan(opts: Optional[Dict[str, Any]] = None) -> List[str]:
+    """
+    Yeni / son taramadan sonra fiyatı düşen BookDepot item'ları için 1000'lik "bookdepot"
+    job'ları ekle. opts: BookDepotScanRequest alanları. Item'lar job taradıkça (handler'da)
+    taranmış işaretlenir; hâlâ kuyrukta / çalışan bir job'da olan ISBN'ler tekrar eklenmez.
+    """
+    from app import bookdepot_store
+
+    opts = dict(opts or {})
+    priority = int(opts.pop("priority", -5) or 0)
+    queued = {i for p in scan_job_store.active_job_payloads("bookdepot") for i in (p.get("isbns") or [])}
+    items = [it for it in bookdepot_store.pending_rescan() if it["isbn"] not in queued]
+    job_ids: List[str] = []
+    for i in range(0, len(items), 1000):
+        chunk = items[i:i + 1000]
+        isbns = [it["isbn"] for it in chunk]
+        payload = {
+            **opts,
+            "isbns": isbns,
+            "isbn_buy_prices": {it["isbn"]: it["price"] for it in chunk},
+        }
+        job_ids.append(enqueue("bookdepot", payload, total=len(isbns), priority=priority))
+    if job_ids:
+        logger.info("bookdepot rescan enqueued jobs=%s isbns=%d", job_ids, len(items))
+    return job_ids
+
+
+async def rescan_bookdepot(opts: Optional[Dict[str, Any]] = None) -> List[str]:
+    """
+    Event loop'tan enqueue_bookdepot_rescan: SQLite işi thread'de, dispatch loop'ta.
+    (Thread'de enqueue çalışan loop bulamaz → _fill_slots'u burada çağırmazsak job'lar
+    inline modda bir sonraki dispatch'e kadar pending kalır.)
+    """
+    job_ids = await asyncio.to_thread(enqueue_bookdepot_rescan, opts)
+    if job_ids:
+        _fill_slots()
+    return job_ids
+
+
+def start_background_loops() -> List["asyncio.Task"]:
+    """
+    Job çalıştıran process'in periyodik işleri: metadata backfill, BookDepot sweep, Finding
+    cache compactor, suggested price materializer (inline → API, external → scan worker).
+    """
+    from app import bookdepot_sweep, finding_cache, suggested_price_materializer
+    return [
+        asyncio.create_task(meta_backfill_loop()),
+        asyncio.create_task(bookdepot_sweep.sweep_loop()),
+        asyncio.create_task(finding_cache.compact_loop()),
+        asyncio.create_task(suggested_price_materializer.materialize_loop()),
+    ]
+
+
+async def meta_backfill_loop() -> None:
+    """Her META_BACKFILL_INTERVAL_S'de eksik/bayat metadata için backfill job'u ekle."""
+    interval = int(get_settings().meta_backfill_interval_s)
+    if interval <= 0:
+        return
+    while True:
+        try:
+            enqueue_meta_backfill()
+        except Exception as e:
+            logger.warning("meta_backfill enqueue failed: %s", e)
+        await asyncio.sleep(interval)
+
+
+def status() -> Dict[str, Any]:
+    if executes_jobs():
+        running = sorted(_running.keys())
+        pending = [j["id"] for j in scan_job_store.pending_jobs()]
+    else:
+        # External mod API tarafı: kuyruk worker'da — yerel _jobs kopyaları bayat olabilir
+        running = scan_job_store.db_job_ids("running") or []
+        pending = scan_job_store.db_job_ids("pending") or []
+    return {
+        "mode": get_settings().scan_worker_mode,
+        "worker_id": _worker_id,
+        "max_concurrent_jobs": _max_jobs(),
+        "running": running,
+        "pending": pending,
+        "gate": get_gate().snapshot(),
+    }
+
+
+def estimate_seconds(total: int, concurrency: int) -> int:
+    """Tahmini süre: ~4s/ISBN ÷ concurrency (kuyrukta bekleme hariç)."""
+    return round(total * 4 / max(1, concurrency))
+
+
+# ── Job handlers ──────────────────────────────────────────────────────────────
+
+def csv_arb_config(p: Dict[str, Any]) -> Tuple[Any, Any]:
+    """CsvArbRequest payload'ı → (ScanFilters, FeeConfig). Geçersiz policy → ValueError."""
+    from app.csv_arb_scanner import ScanFilters, IsbnMatchPolicy, InvalidIsbnPolicy
+    from app.profit_calc import FeeConfig
+
+    filters = ScanFilters(
+        min_roi_pct=p.get("min_roi_pct"),
+        max_roi_pct=p.get("max_roi_pct"),
+        min_profit_usd=p.get("min_profit_usd"),
+        min_amazon_price=p.get("min_amazon_price"),
+        max_amazon_price=p.get("max_amazon_price"),
+        min_buy_price=p.get("min_buy_price"),
+        max_buy_price=p.get("max_buy_price"),
+        max_buy_ratio_pct=p.get("max_buy_ratio_pct"),
+        condition_in=p.get("condition_in"),
+        source_in=p.get("source_in"),
+        only_viable=p.get("only_viable", True),   # Kullanıcının filtre seçimi korunuyor
+        strict_mode=p.get("strict_mode", True),
+        isbn_match_policy=IsbnMatchPolicy(p.get("isbn_match_policy") or "balanced"),
+        invalid_isbn_policy=InvalidIsbnPolicy(p.get("invalid_isbn_policy") or "best_effort"),
+        buyback_only=p.get("buyback_only", False),
+        min_buyback_profit=p.get("min_buyback_profit"),
+    )
+
+    def _fee(key: str, default: float) -> float:
+        v = p.get(key)
+        return v if v is not None else default
+
+    fees = FeeConfig(
+        referral_pct=_fee("fee_referral_pct", 0.15),
+        closing_fee=_fee("fee_closing", 1.80),
+        fulfillment=_fee("fee_fulfillment", 3.50),
+        inbound=_fee("fee_inbound", 0.60),
+    )
+    return filters, fees
+
+
+@register("csv_arb")
+async def _run_csv_arb(job_id: str, payload: Dict[str, Any], on_progress, gate) -> Dict[str, Any]:
+    from app.csv_arb_scanner import scan_isbn_list
+
+    filters, fees = csv_arb_config(payload)
+    result = await scan_isbn_list(
+        isbns=payload.get("isbns") or [],
+        filters=filters,
+        fees=fees,
+        concurrency=int(payload.get("concurrency") or 5),
+        isbn_buy_prices=payload.get("isbn_buy_prices") or {},
+        isbn_amazon_prices=payload.get("isbn_amazon_prices") or {},
+        on_progress=on_progress,
+        pause_event=scan_job_store.get_pause_event(job_id),
+        cancel_event=scan_job_store.get_cancel_event(job_id),
+        gate=gate,
+        freshness=payload.get("freshness"),
+    )
+    # Post-filter: amazon_unavailable olanları göster ama ayrı tut
+    result["stats"]["amazon_unavailable"] = sum(
+        1 for r in result["rejected"] if r.get("reason", "").startswith("amazon_unavailable")
+    )
+    return result
+
+
+@register("bookdepot")
+async def _run_bookdepot(job_id: str, payload: Dict[str, Any], on_progress, gate) -> Dict[str, Any]:
+    from app import bookdepot_store
+    from app.csv_arb_scanner import scan_isbn_list, ScanFilters, IsbnMatchPolicy, InvalidIsbnPolicy
+    from app.profit_calc import DEFAULT_FEES
+
+    filters = ScanFilters(
+        min_roi_pct=payload.get("min_roi_pct"),
+        min_profit_usd=payload.get("min_profit_usd"),
+        condition_in=payload.get("condition_in"),
+        only_viable=payload.get("only_viable", True),
+        strict_mode=True,
+        isbn_match_policy=IsbnMatchPolicy.BALANCED,
+        invalid_isbn_policy=InvalidIsbnPolicy.BEST_EFFORT,
+    )
+    result = await scan_isbn_list(
+        isbns=payload.get("isbns") or [],
+        filters=filters,
+        fees=DEFAULT_FEES,
+        concurrency=int(payload.get("concurrency") or 5),
+        isbn_buy_prices=payload.get("isbn_buy_prices") or {},
+        on_progress=on_progress,
+        pause_event=scan_job_store.get_pause_event(job_id),
+        cancel_event=scan_job_store.get_cancel_event(job_id),
+        gate=gate,
+        freshness=payload.get("freshness"),
+    )
+    # Sadece gerçekten taranan ISBN'ler: fail / cancel / crash'te kalanlar bir sonraki rescan'e kalır
+    await asyncio.to_thread(bookdepot_store.mark_scanned, result.get("scanned") or [])
+    return result
+
+
+@register("meta_backfill")
+async def _run_meta_backfill(job_id: str, payload: Dict[str, Any], on_progress, gate) -> Dict[str, Any]:
+    """Edition metadata'yı önceden ısıt → scan'ler _check_edition için ağa çıkmaz."""
+    import httpx
+    from app.ai_analyst import _check_edition
+
+    isbns = payload.get("isbns") or []
+    refresh = bool(payload.get("refresh"))
+    sem = asyncio.Semaphore(int(payload.get("concurrency") or 4))
+    cancel_event = scan_job_store.get_cancel_event(job_id)
+    pause_event = scan_job_store.get_pause_event(job_id)
+    done = 0
+    found = 0
+
+    async def _wait_if_paused() -> bool:
+        """Pause'da bekle; cancel gelirse False."""
+        while pause_event.is_set():
+            if cancel_event.is_set():
+                return False
+            await asyncio.sleep(0.5)
+        return not cancel_event.is_set()
+
+    async with httpx.AsyncClient(timeout=12) as client:
+        async def _one(isbn: str) -> None:
+            nonlocal done, found
+            async with sem:
+                if not await _wait_if_paused():
+                    return
+                async with gate():
+                    try:
+                        meta = await _check_edition(isbn, client, refresh=refresh)
+                        found += bool(meta.get("source"))
+                    except Exception as e:
+                        logger.debug("meta_backfill isbn=%s failed: %s", isbn, e)
+                done += 1
+                on_progress(done, len(isbns), [], [])
+
+        await asyncio.gather(*[_one(i) for i in isbns])
+    return {"accepted": [], "rejected": [], "stats": {"total_isbns": len(isbns), "done": done, "found": found}}
+
+
+def enqueue_meta_backfill(refresh: bool = False) -> Optional[str]:
+    """
+    Watchlist + BookDepot ISBN'lerinden metadata'sı eksik/bayat olanlar için
+    düşük öncelikli backfill job'u ekle. Zaten bekleyen/çalışan varsa veya
+    yapılacak iş yoksa None.
+    """
+    from app import book_meta_store
+
+    if scan_job_store.active_job_ids("meta_backfill"):
+        return None
+    isbns = book_meta_store.watched_isbns() if refresh else book_meta_store.backfill_isbns()
+    if not isbns:
+        return None
+    job_id = enqueue("meta_backfill", {"isbns": isbns, "refresh": refresh}, total=len(isbns), priority=-10)
+    logger.info("meta_backfill enqueued job=%s isbns=%d", job_id, len(isbns))
+    return job_id
@@ -0,0 +1,55 @@
+"""
+Scan Worker — CSV arb / BookDepot taramalarını API'den ayrı process'te çalıştırır.
+
+API (SCAN_WORKER_MODE=external) job'ları sadece scan_jobs.db'ye yazar.
+Bu servis:
+  - startup'ta yarıda kalan job'ları recover eder,
+  - her SCAN_WORKER_POLL_S saniyede pending job claim eder (priority + FIFO),
+  - progress + partial sonuçları DB'ye yazar (API /discover/csv-arb/progress okur),
+  - API'den gelen pause/resume/cancel'ı DB üzerinden uygular,
+  - çalışan job'ların lease'ini (heartbeat) tazeler; lease'i dolmuş job'ları recover eder,
+  - metadata backfill, BookDepot sweep, Finding compactor ve suggested price materializer
+    döngülerini çalıştırır (external modda API bunları başlatmaz).
+
+BookFinder HTML regex parse, büyük Browse JSON decode ve per-row analytics
+böylece uvicorn event loop'unu meşgul etmez.
+
+systemd: deploy/systemd/trackerbundle-scan-worker.service
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import socket
+
+from app import scan_queue
+from app.core.config import get_settings
+
+logger = logging.getLogger("trackerbundle.scan_worker")
+
+
+async def main() -> None:
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    s = get_settings()
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    poll = max(0.2, float(s.scan_worker_poll_s))
+    logger.info(
+        "Scan worker start id=%s max_jobs=%s global_concurrency=%s poll=%.1fs",
+        worker_id, s.scan_max_concurrent_jobs, s.scan_global_concurrency, poll,
+    )
+    if s.scan_worker_mode != "external":
+        logger.warning("SCAN_WORKER_MODE=%s — API de job çalıştırabilir; external olarak ayarla", s.scan_worker_mode)
+
+    scan_queue.start_worker(worker_id)
+    scan_queue.start_background_loops()
+    while True:
+        try:
+            scan_queue.poll_worker()
+        except Exception:
+            logger.exception("poll_worker crash")
+        await asyncio.sleep(poll)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -12,11 +12,11 @@ from app.core.config import get_settings
 from app import isbn_store
 from app.rules_store import get_rule, effective_limit
 from app import run_state
-from app.ebay_client import browse_search_isbn, finding_sold_stats, normalize_condition, item_total_price, hybrid_verify_items
+from app.ebay_client import browse_search_isbn, normalize_condition, item_total_price, hybrid_verify_items
 from app.alert_store import check_and_mark
 from app.smart_dedup import should_send as smart_should_send
 from app import alert_history_store
-from app import sold_stats_store
+from app import finding_sold, sold_stats_store
 
 logger = logging.getLogger("trackerbundle.scheduler_ebay")
 
@@ -216,24 +216,29 @@ async def _fetch_sold(client: httpx.AsyncClient, isbn: str) -> Dict[str, Any]:
     Başarılıysa sold_stats_store'a snapshot yazar (365d/3yr birikim için).
     """
     try:
-        result = await finding_sold_stats(client, isbn)
+        # Paylaşılan 90d tüm-koşullar sonucu (suggested-price ile aynı tek Finding çağrısı)
+        result = await finding_sold.fetch_sold_stats(client, isbn)
     except Exception:
         logger.warning("ISBN %s sold stats fetch failed (non-fatal)", isbn)
         return {}
 
     # ── Accumulator'a yaz (sold_avg hesaplaması için geçmiş veri biriktir) ───
-    # finding_sold_stats → tüm condition'lar için toplam + condition breakdown döner
+    # finding_sold_stats sadece özet döner (count/avg/min/max) → sahte [avg]*count
+    # listesi yerine ağırlıklı tek centroid olarak yazılır.
     # by_condition breakdown'u ayrı ayrı saklıyoruz (new/used kondisyon trendsı için)
     try:
-        all_totals = _rebuild_totals_from_stats(result)
-        if all_totals:
-            sold_stats_store.append_snapshot(isbn, 90, None, all_totals)
+        if result.get("sold_count"):
+            sold_stats_store.append_aggregate(
+                isbn, 90, None, result["sold_count"], result.get("sold_avg"),
+                result.get("sold_min"), result.get("sold_max"),
+            )
         # Condition breakdown
         for bucket, stats in (result.get("by_condition") or {}).items():
             cond_key = "new" if bucket == "brand_new" else "used"
-            cond_totals = _rebuild_totals_from_bucket(stats)
-            if cond_totals:
-                sold_stats_store.append_snapshot(isbn, 90, cond_key, cond_totals)
+            if stats.get("count"):
+                sold_stats_store.append_aggregate(
+                    isbn, 90, cond_key, stats["count"], stats.get("avg"), stats.get("min"), stats.get("max"),
+                )
     except Exception:
         logger.debug("sold_stats_store append failed isbn=%s (non-fatal)", isbn)
 
@@ -0,0 +1,184 @@
+"""
+Sold Items Store — eBay itemId ile tekilleştirilmiş bireysel satış kayıtları (SQLite).
+
+sold_stats_store snapshot toplamlarını biriktirir; örtüşen 30d/90d snapshot'larında aynı
+satış birden fazla sayılır. Bu store her satışı bir kez tutar:
+
+  sold_item(item_id PK, isbn, source, cond, price, shipping, total, ended_at, seen_at)
+    item_id  → eBay itemId (UNIQUE) — aynı pencereyi tekrar ingest etmek satır eklemez
+    cond     → "new" | "used"
+    ended_at → satış/bitiş zamanı (bilinmiyorsa ilk görüldüğü an)
+
+Yazanlar:
+  - finding_sold.fetch — paylaşılan Finding yolu (findCompletedItems → finding_items());
+    suggested_price_endpoint ve scheduler_ebay buradan okur
+  - ebay_client.finding_sold_stats (doğrudan Finding çağrısı)
+  - sold_scraper (eBay sold HTML → html_extract.ebay_sold_items())
+
+ingest() önce bilinen itemId'leri tek SELECT ile eler; hepsi biliniyorsa yazma
+transaction'ı açılmaz (tekrar ingest ucuz no-op).
+"""
+from __future__ import annotations
+
+import logging
+import math
+import sqlite3
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+from app.core.config import get_settings
+from app.core.quantile_sketch import describe
+
+logger = logging.getLogger("trackerbundle.sold_items_store")
+
+_schema_ready: set = set()
+_SQL_VARS = 500   # IN (...) başına parametre (SQLite limiti 999)
+
+
+def _path() -> Path:
+    return get_settings().resolved_data_dir() / "sold_items.db"
+
+
+def _connect() -> sqlite3.Connection:
+    p = _path()
+    p.parent.mkdir(parents=True, exist_ok=True)
+    con = sqlite3.connect(p, timeout=10)
+    con.row_factory = sqlite3.Row
+    con.execute("PRAGMA synchronous=NORMAL;")
+    if str(p) not in _schema_ready:
+        con.execute("PRAGMA journal_mode=WAL;")
+        con.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS sold_item (
+              item_id TEXT NOT NULL,
+              isbn TEXT NOT NULL,
+              source TEXT NOT NULL,
+              cond TEXT NOT NULL,
+              price REAL NOT NULL,
+              shipping REAL NOT NULL DEFAULT 0,
+              total REAL NOT NULL,
+              ended_at INTEGER NOT NULL,
+              seen_at INTEGER NOT NULL
+            );
+            CREATE UNIQUE INDEX IF NOT EXISTS uq_sold_item_id ON sold_item(item_id);
+            CREATE INDEX IF NOT EXISTS idx_sold_item_window ON sold_item(isbn, cond, ended_at);
+            """
+        )
+        _schema_ready.add(str(p))
+    return con
+
+
+def _clean(isbn: str) -> str:
+    return isbn.replace("-", "").replace(" ", "").strip()
+
+
+def cond_key(bucket: Optional[str]) -> str:
+    """normalize_condition bucket'ı → "new" | "used"."""
+    return "new" if bucket in ("new", "brand_new") else "used"
+
+
+# ── Yazma ────────────────────────────────────────────────────────────────────
+
+def ingest(isbn: str, items: Iterable[Dict[str, Any]], source: str, now: Optional[int] = None) -> int:
+    """
+    items: {item_id, price, shipping?, total?, cond?, ended_at?} — item_id'siz olanlar atlanır.
+    Dönüş: yeni eklenen satış sayısı (daha önce görülen itemId'ler 0 sayılır).
+    """
+    isbn_clean = _clean(isbn)
+    now = int(now if now is not None else time.time())
+    rows: Dict[str, tuple] = {}
+    for it in items:
+        item_id = str(it.get("item_id") or "").strip()
+        price = it.get("price")
+        if not item_id or price is None:
+            continue
+        ship = float(it.get("shipping") or 0.0)
+        total = it.get("total")
+        total = float(total) if total is not None else float(price) + ship
+        ended = it.get("ended_at")
+        rows[item_id] = (
+            item_id, isbn_clean, source, cond_key(it.get("cond")), float(price), ship,
+            round(total, 2), int(ended) if ended else now, now,
+        )
+    if not rows:
+        return 0
+
+    with _connect() as con:
+        ids = list(rows)
+        known: set = set()
+        for i in range(0, len(ids), _SQL_VARS):
+            chunk = ids[i:i + _SQL_VARS]
+            q = f"SELECT item_id FROM sold_item WHERE item_id IN ({','.join('?' * len(chunk))});"
+            known.update(r[0] for r in con.execute(q, chunk))
+        fresh = [rows[i] for i in ids if i not in known]
+        if not fresh:
+            return 0
+        con.executemany(
+            """
+            INSERT OR IGNORE INTO sold_item(item_id, isbn, source, cond, price, shipping, total, ended_at, seen_at)
+            VALUES(?,?,?,?,?,?,?,?,?);
+            """,
+            fresh,
+        )
+    logger.debug("isbn=%s source=%s: %d new sold items (%d known)", isbn_clean, source, len(fresh), len(known))
+    return len(fresh)
+
+
+# ── Okuma ────────────────────────────────────────────────────────────────────
+
+def window_totals(isbn: str, window_days: int, cond: Optional[str] = None) -> List[float]:
+    """Son window_days gündeki tekil satışların toplam fiyatları (eskiden yeniye). cond=None → hepsi."""
+    sql = "SELECT total FROM sold_item WHERE isbn=? AND ended_at >= ?"
+    args: List[Any] = [_clean(isbn), int(time.time() - window_days * 86400)]
+    if cond is not None:
+        sql += " AND cond=?"
+        args.append(cond)
+    with _connect() as con:
+        return [r[0] for r in con.execute(sql + " ORDER BY ended_at;", args)]
+
+
+def window_stats(isbn: str, window_days: int, cond: Optional[str] = None) -> Dict[str, Any]:
+    """{count, avg, min, max, std, p10, p50, p90} — veri yoksa count=0, diğerleri None."""
+    vals = window_totals(isbn, window_days, cond)
+    d = describe(vals)
+    if d is None:
+        return {"count": 0, "avg": None, "min": None, "max": None, "std": None,
+                "p10": None, "p50": None, "p90": None}
+    avg = sum(vals) / len(vals)
+    d["std"] = round(math.sqrt(sum((v - avg) ** 2 for v in vals) / len(vals)), 2)
+    return d
+
+
+def distribution(isbn: str, window_days: int = 365, cond: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Satış fiyatı dağılımı: tekil satışlar varsa onlardan, yoksa sold_stats_store'un
+    materialize pencere sketch'inden. "source": "items" | "accumulator" | None.
+    """
+    w = window_stats(isbn, window_days, cond)
+    if w["count"]:
+        return {**w, "source": "items"}
+    from app import sold_stats_store
+    w = sold_stats_store.window_stats(isbn, window_days, cond)
+    return {**w, "source": "accumulator" if w["count"] else None}
+
+
+def span_days(isbn: str, cond: Optional[str] = None) -> Optional[float]:
+    """En eski ve en yeni satış arasındaki gün sayısı; None → kayıt yok."""
+    sql = "SELECT MIN(ended_at), MAX(ended_at) FROM sold_item WHERE isbn=?"
+    args: List[Any] = [_clean(isbn)]
+    if cond is not None:
+        sql += " AND cond=?"
+        args.append(cond)
+    with _connect() as con:
+        lo, hi = con.execute(sql + ";", args).fetchone()
+    if lo is None:
+        return None
+    return round((hi - lo) / 86400, 1)
+
+
+def count(isbn: Optional[str] = None) -> int:
+    with _connect() as con:
+        if isbn is None:
+            return int(con.execute("SELECT COUNT(*) FROM sold_item;").fetchone()[0])
+        return int(con.execute("SELECT COUNT(*) FROM sold_item WHERE isbn=?;", (_clean(isbn),)).fetchone()[0])
@@ -18,14 +18,16 @@ import asyncio
 import logging
 import math
 import random
-import re
 import time
 from pathlib import Path
 from typing import Optional
 
 import httpx
 
+from app import html_extract
+from app.core.circuit_breaker import CircuitBreaker, get_breaker
 from app.core.config import get_settings
+from app.core.quantile_sketch import describe
 from app.core.json_store import file_lock, _read_unsafe, _write_unsafe
 
 logger = logging.getLogger("trackerbundle.sold_scraper")
@@ -101,45 +103,55 @@ def _parse_prices(html: str) -> list[float]:
         chrome prices (e.g. shipping labels, promo banners) and returning
         false positives ($20 for every ISBN).  Removed entirely.
     """
-    prices: list[float] = []
-    # Primary: s-item__price spans
-    for m in re.finditer(
-        r'class="[^"]*s-item__price[^"]*"[^>]*>\s*\$([0-9,]+(?:\.[0-9]{1,2})?)',
-        html, re.IGNORECASE
-    ):
-        try:
-            v = float(m.group(1).replace(",", ""))
-            if 0.25 <= v <= 5000:
-                prices.append(v)
-        except ValueError:
-            pass
+    # Primary: s-item__price spans (regex sadece ilk s-item__price'tan itibaren taranır)
+    prices = [v for v in html_extract.ebay_sold_prices(html) if 0.25 <= v <= 5000]
     # Skip the first match — always a promotional / placeholder item
     if prices:
         prices = prices[1:]
     return prices[:_MAX_ITEMS]
 
 
+def _parse_items(html: str) -> list[dict]:
+    """itemId'li sold kayıtları (sold_items_store için) — _parse_prices ile aynı promo/aralık kuralları."""
+    items = [it for it in html_extract.ebay_sold_items(html) if 0.25 <= it["price"] <= 5000]
+    return [it for it in items[1:] if it["item_id"]][:_MAX_ITEMS]
+
+
+def _parse(html: str) -> tuple[list[float], list[dict]]:
+    return _parse_prices(html), _parse_items(html)
+
+
+def _ingest(isbn: str, new_items: list[dict], all_items: list[dict]) -> None:
+    """New sayfası → "new"; filtresiz sayfada New'de olmayan itemId'ler → "used"."""
+    try:
+        from app import sold_items_store
+        new_ids = {it["item_id"] for it in new_items}
+        sold_items_store.ingest(isbn, [{**it, "cond": "new"} for it in new_items], "scraper")
+        sold_items_store.ingest(
+            isbn, [{**it, "cond": "used"} for it in all_items if it["item_id"] not in new_ids], "scraper",
+        )
+    except Exception:
+        logger.debug("sold_items_store ingest failed isbn=%s (non-fatal)", isbn)
+
+
 def _stats(prices: list[float]) -> Optional[dict]:
-    if not prices:
+    """count/min/max/avg + p10/p50/p90 (sketch; liste sıralanmaz). median = p50 (eski alan)."""
+    d = describe(prices)
+    if d is None:
         return None
-    n = len(prices)
-    s = sorted(prices)
-    med = s[n // 2] if n % 2 else round((s[n//2-1] + s[n//2]) / 2, 2)
-    return {
-        "count":  n,
-        "min":    round(min(prices), 2),
-        "max":    round(max(prices), 2),
-        "avg":    round(sum(prices) / n, 2),
-        "median": round(med, 2),
-    }
+    return {**d, "median": d["p50"]}
+
+
+class CaptchaError(Exception):
+    """eBay sold sayfası yerine CAPTCHA / challenge döndü."""
 
 
 async def _fetch_condition(
     client: httpx.AsyncClient,
     isbn: str,
     cond_id: str,
-) -> tuple[list[float], str]:
-    """Fetch sold prices for one condition. Returns (prices, url).
+) -> tuple[list[float], str, list[dict]]:
+    """Fetch sold prices for one condition. Returns (prices, url, items with itemId).
 
     If cond_id is empty, no condition filter is applied (returns all conditions).
     """
@@ -159,18 +171,30 @@ async def _fetch_condition(
         "Connection":              "keep-alive",
         "Upgrade-Insecure-Requests": "1",
     }
-    try:
+    async def _get() -> httpx.Response:
         r = await client.get(url, headers=headers, timeout=18)
+        # eBay CAPTCHA / challenge: 200 döner ama breaker'a hata sayılmalı (call() içinde
+        # record_success sayaçı sıfırlamadan önce)
+        if r.status_code == 200 and ("splashui/captcha" in r.text or "challenge" in r.url.path):
+            raise CaptchaError(str(r.url))
+        return r
+
+    try:
+        r = await _breaker().call(_get)
         if r.status_code == 200:
-            # eBay CAPTCHA / challenge detection
-            if "splashui/captcha" in r.text or "challenge" in r.url.path:
-                logger.warning("sold_scrape CAPTCHA detected isbn=%s cond=%s", isbn, cond_id)
-                return [], url  # graceful empty — will trigger "blocked" flag
-            return _parse_prices(r.text), url
+            prices, items = await html_extract.run(_parse, r.text)
+            return prices, url, items
         logger.debug("sold_scrape HTTP %d isbn=%s cond=%s", r.status_code, isbn, cond_id)
+    except CaptchaError:
+        logger.warning("sold_scrape CAPTCHA detected isbn=%s cond=%s", isbn, cond_id)
+        return [], url, []  # graceful empty — will trigger "blocked" flag
     except Exception as exc:
         logger.debug("sold_scrape fetch cond=%s isbn=%s: %s", cond_id, isbn, exc)
-    return [], url
+    return [], url, []
+
+
+def _breaker() -> CircuitBreaker:
+    return get_breaker("sold_scraper.ebay", slow_call_s=15.0)
 
 
 def _fmt_cache_date(ts: float) -> str:
@@ -198,14 +222,15 @@ async def fetch_sold_avg(isbn: str, force: bool = False) -> dict:
             return {**cached, "cached": True, "cache_age_s": age,
                     "cache_date": _fmt_cache_date(cached.get("ts", time.time()))}
 
-    # Human-like delay on live fetch
-    await asyncio.sleep(random.uniform(0.6, 1.4))
+    # Human-like delay on live fetch (circuit open → istek atılmayacak, bekleme)
+    if not _breaker().is_open():
+        await asyncio.sleep(random.uniform(0.6, 1.4))
 
     stale = _cache_get_stale(isbn_clean)  # always available, even if TTL expired
 
     try:
         async with httpx.AsyncClient(follow_redirects=True, timeout=22) as client:
-            (new_prices, new_url), (all_cond_prices, all_url) = await asyncio.gather(
+            (new_prices, new_url, new_items), (all_cond_prices, all_url, all_items) = await asyncio.gather(
                 _fetch_condition(client, isbn_clean, _COND_NEW),
                 _fetch_condition(client, isbn_clean, _COND_USED),
             )
@@ -243,6 +268,7 @@ async def fetch_sold_avg(isbn: str, force: bool = False) -> dict:
         else:
             # Only save to cache on successful fetch
             _cache_set(isbn_clean, result)
+            _ingest(isbn_clean, new_items, all_items)
             logger.info("sold_scrape isbn=%s new=%d used=%d", isbn_clean, len(new_prices), len(used_prices))
         return result
 
@@ -1,49 +1,55 @@
 """
-Sold stats accumulator — 365d/3yr geçmişi oluşturmak için günlük snapshot biriktirir.
+Sold stats accumulator — 365d/3yr geçmişi için günlük, önceden toplanmış satış bucket'ları.
 
 Problem:
   eBay Finding API maksimum 90 günlük veri döndürür. 365d/3yr penceresi için
   doğrudan sorgu yapılamaz. Bu modül her başarılı 30d/90d Finding API çağrısından
-  sonra fiyatları diske yazar; zaman içinde biriken snapshotlardan uzun dönem
+  sonra fiyatları biriktirir; zaman içinde biriken bucket'lardan uzun dönem
   istatistikleri hesaplanır.
 
-Storage:
-  data/sold_stats/{sha1(isbn_clean)[:16]}.json
-  {
-    "isbn": str,
-    "entries": [
-      {
-        "ts":     float,         # Snapshot alım zamanı (Unix)
-        "days":   int,           # Sorgu penceresi (30 veya 90)
-        "cond":   str | null,    # "new" | "used" | null (hepsi)
-        "totals": [float, ...]   # price + shipping (her satış için)
-      },
-      ...
-    ]
-  }
+Storage (SQLite, {store_dir}/sold_stats.db):
+  sold_bucket   (isbn, cond, day) → count, sum, sumsq, min, max, sketch
+                  day  = UTC gün numarası (ts // 86400), cond = "all" | "new" | "used"
+                  sketch = t-digest centroid'leri (app.core.quantile_sketch) — birleştirilebilir
+  sold_snapshot (isbn, days, cond) → first_ts, last_ts, n   (throttle + span + özet)
+  sold_window   (isbn, cond, window_days) → günlük materialize edilmiş pencere özeti +
+                  birleştirilmiş sketch (p10/p50/p90 okuması tek satır; append'te geçersiz)
+
+  Snapshot eklemek tek bir bucket satırını günceller (dosya yeniden yazımı yok);
+  pencere sorguları O(gün) satır okur. ISBN başına kayıt: gün × koşul başına ~birkaç yüz byte.
 
 Kısıtlar:
   - Aynı isbn+days+cond için 6 saatten sık snapshot atlanır (throttle).
-  - 400 günden eski entry'ler otomatik silinir.
+  - SOLD_STATS_MAX_AGE_DAYS'ten (1100) eski bucket'lar silinir — 3yr penceresi dolabilsin.
   - Farklı günlerde alınan 30d snapshotları örtüşebilir (aynı satış birden
-    fazla snapshot'ta gözükebilir). Bu, uzun pencere ortalamalarında hafif
-    üst-bias yaratır. Dedup için itemId eklenmesi ileride yapılabilir.
+    fazla snapshot'ta gözükebilir). itemId ile tekilleştirilmiş satışlar
+    sold_items_store'dadır; uzun pencereler önce oradan okunur, bu store
+    oradaki kayıtlardan önceki birikim için yedek olarak kalır.
+  - Eski format (data/sold_stats/{sha1}.json) ISBN ilk okunduğunda bucket'lara
+    taşınır ve dosya silinir.
 """
 from __future__ import annotations
 
 import hashlib
 import json
 import logging
+import math
 import os
+import sqlite3
 import time
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from app.core.quantile_sketch import TDigest
 
 logger = logging.getLogger("trackerbundle.sold_stats_store")
 
 # ── Sabitler ─────────────────────────────────────────────────────────────────
-_MAX_AGE_DAYS = int(os.getenv("SOLD_STATS_MAX_AGE_DAYS", "400"))
+_MAX_AGE_DAYS = int(os.getenv("SOLD_STATS_MAX_AGE_DAYS", "1100"))
 _THROTTLE_SECONDS = int(os.getenv("SOLD_STATS_THROTTLE_H", "6")) * 3600
+_SKETCH_COMPRESSION = 50.0
+
+_schema_ready: set = set()
 
 
 # ── Dizin ─────────────────────────────────────────────────────────────────────
@@ -62,36 +68,128 @@ def _store_dir() -> Path:
 
 
 def _isbn_path(isbn_clean: str) -> Path:
+    """Eski per-ISBN JSON dosyası (sadece migration için)."""
     h = hashlib.sha1(isbn_clean.encode()).hexdigest()[:16]
     return _store_dir() / f"{h}.json"
 
 
-# ── I/O ───────────────────────────────────────────────────────────────────────
-def _load(isbn_clean: str) -> Dict:
+def _clean(isbn: str) -> str:
+    return isbn.replace("-", "").replace(" ", "").strip()
+
+
+def _cond_key(cond: Optional[str]) -> str:
+    return cond or "all"
+
+
+# ── DB ────────────────────────────────────────────────────────────────────────
+def _connect() -> sqlite3.Connection:
+    p = _store_dir() / "sold_stats.db"
+    con = sqlite3.connect(p, timeout=10)
+    con.row_factory = sqlite3.Row
+    con.execute("PRAGMA synchronous=NORMAL;")
+    if str(p) not in _schema_ready:
+        con.execute("PRAGMA journal_mode=WAL;")
+        con.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS sold_bucket (
+              isbn TEXT NOT NULL,
+              cond TEXT NOT NULL,
+              day INTEGER NOT NULL,
+              count REAL NOT NULL,
+              sum REAL NOT NULL,
+              sumsq REAL NOT NULL,
+              min REAL NOT NULL,
+              max REAL NOT NULL,
+              sketch TEXT NOT NULL,
+              PRIMARY KEY (isbn, cond, day)
+            );
+            CREATE TABLE IF NOT EXISTS sold_snapshot (
+              isbn TEXT NOT NULL,
+              days INTEGER NOT NULL,
+              cond TEXT NOT NULL,
+              first_ts REAL NOT NULL,
+              last_ts REAL NOT NULL,
+              n INTEGER NOT NULL,
+              PRIMARY KEY (isbn, days, cond)
+            );
+            CREATE TABLE IF NOT EXISTS sold_window (
+              isbn TEXT NOT NULL,
+              cond TEXT NOT NULL,
+              window_days INTEGER NOT NULL,
+              day INTEGER NOT NULL,
+              stats TEXT NOT NULL,
+              sketch TEXT NOT NULL,
+              PRIMARY KEY (isbn, cond, window_days)
+            );
+            """
+        )
+        _schema_ready.add(str(p))
+    return con
+
+
+def _merge_bucket(
+    con: sqlite3.Connection, isbn: str, cond: str, day: int,
+    count: float, total: float, sumsq: float, lo: float, hi: float, sketch: TDigest,
+) -> None:
+    r = con.execute(
+        "SELECT count, sum, sumsq, min, max, sketch FROM sold_bucket WHERE isbn=? AND cond=? AND day=?;",
+        (isbn, cond, day),
+    ).fetchone()
+    if r is not None:
+        sketch = TDigest.from_json(r["sketch"], _SKETCH_COMPRESSION).merge(sketch)
+        count += r["count"]
+        total += r["sum"]
+        sumsq += r["sumsq"]
+        lo, hi = min(lo, r["min"]), max(hi, r["max"])
+    con.execute(
+        """
+        INSERT OR REPLACE INTO sold_bucket(isbn, cond, day, count, sum, sumsq, min, max, sketch)
+        VALUES(?,?,?,?,?,?,?,?,?);
+        """,
+        (isbn, cond, day, count, total, sumsq, lo, hi, sketch.to_json()),
+    )
+
+
+def _touch_snapshot(con: sqlite3.Connection, isbn: str, days: int, cond: str, ts: float) -> None:
+    con.execute(
+        """
+        INSERT INTO sold_snapshot(isbn, days, cond, first_ts, last_ts, n) VALUES(?,?,?,?,?,1)
+        ON CONFLICT(isbn, days, cond) DO UPDATE SET
+            first_ts=MIN(first_ts, excluded.first_ts), last_ts=MAX(last_ts, excluded.last_ts), n=n+1
+        """,
+        (isbn, days, cond, ts, ts),
+    )
+
+
+def _migrate_legacy(isbn_clean: str) -> None:
     p = _isbn_path(isbn_clean)
     if not p.exists():
-        return {"isbn": isbn_clean, "entries": []}
+        return
     try:
-        return json.loads(p.read_text(encoding="utf-8"))
+        data = json.loads(p.read_text(encoding="utf-8"))
     except Exception:
-        return {"isbn": isbn_clean, "entries": []}
+        data = {}
+    with _connect() as con:
+        for e in data.get("entries") or []:
+            totals = [float(t) for t in (e.get("totals") or [])]
+            ts = float(e.get("ts", 0))
+            cond = _cond_key(e.get("cond"))
+            if totals:
+                d = TDigest(_SKETCH_COMPRESSION)
+                d.extend(totals)
+                _merge_bucket(con, isbn_clean, cond, int(ts // 86400), len(totals), sum(totals),
+                              sum(t * t for t in totals), min(totals), max(totals), d)
+            _touch_snapshot(con, isbn_clean, int(e.get("days") or 0), cond, ts)
+        con.execute("DELETE FROM sold_window WHERE isbn=?;", (isbn_clean,))
+    try:
+        p.unlink()
+    except Exception:
+        pass
+    logger.debug("isbn=%s legacy sold_stats JSON migrated", isbn_clean)
 
 
-def _save(isbn_clean: str, data: Dict) -> None:
-    p = _isbn_path(isbn_clean)
-    tmp = p.with_suffix(".tmp")
-    try:
-        tmp.write_text(
-            json.dumps(data, ensure_ascii=False, separators=(",", ":")),
-            encoding="utf-8",
-        )
-        os.replace(tmp, p)
-    except Exception as e:
-        logger.warning("sold_stats write error isbn=%s: %s", isbn_clean, e)
-        try:
-            tmp.unlink(missing_ok=True)
-        except Exception:
-            pass
+def _prune(con: sqlite3.Connection, isbn: str, now: float) -> None:
+    con.execute("DELETE FROM sold_bucket WHERE isbn=? AND day < ?;", (isbn, int(now // 86400) - _MAX_AGE_DAYS))
 
 
 # ── Public API ────────────────────────────────────────────────────────────────
@@ -103,7 +201,7 @@ def append_snapshot(
     totals: List[float],
 ) -> bool:
     """
-    Bir Finding API yanıtından gelen fiyatları sakla.
+    Bir Finding API yanıtından gelen fiyatları bugünün bucket'ına ekle.
 
     Returns:
       True  → snapshot eklendi
@@ -111,65 +209,147 @@ def append_snapshot(
     """
     if not totals:
         return False
+    totals = [float(t) for t in totals]
+    d = TDigest(_SKETCH_COMPRESSION)
+    d.extend(totals)
+    return _append(isbn, days, cond, len(totals), sum(totals), sum(t * t for t in totals),
+                   min(totals), max(totals), d)
 
-    isbn_clean = isbn.replace("-", "").replace(" ", "").strip()
-    data = _load(isbn_clean)
-    entries: List[Dict] = data.get("entries") or []
-    now = time.time()
 
-    # Throttle: aynı isbn+days+cond için çok erken
-    for e in reversed(entries):
-        if e.get("days") == days and e.get("cond") == cond:
-            if now - float(e.get("ts", 0)) < _THROTTLE_SECONDS:
-                logger.debug(
-                    "isbn=%s days=%d cond=%s snapshot throttled", isbn_clean, days, cond
-                )
-                return False
-            break
-
-    entries.append({"ts": round(now, 1), "days": days, "cond": cond, "totals": totals})
-
-    # Eski entry'leri sil
-    cutoff = now - (_MAX_AGE_DAYS * 86400)
-    entries = [e for e in entries if float(e.get("ts", 0)) >= cutoff]
-
-    data["isbn"] = isbn_clean
-    data["entries"] = entries
-    _save(isbn_clean, data)
-    logger.debug(
-        "isbn=%s days=%d cond=%s: stored %d prices, total entries=%d",
-        isbn_clean, days, cond, len(totals), len(entries),
-    )
+def append_aggregate(
+    isbn: str,
+    days: int,
+    cond: Optional[str],
+    count: int,
+    avg: float,
+    lo: Optional[float] = None,
+    hi: Optional[float] = None,
+) -> bool:
+    """
+    Sadece özet (count/avg/min/max) bilinen sonuçlar için: `[avg] * count` sahte örnekleri
+    yerine tek ağırlıklı centroid yazılır (varyans bilinmiyor → 0 kabul edilir).
+    """
+    if not count or avg is None:
+        return False
+    avg = float(avg)
+    d = TDigest(_SKETCH_COMPRESSION)
+    d.add(avg, float(count))
+    return _append(isbn, days, cond, float(count), avg * count, avg * avg * count,
+                   float(lo if lo is not None else avg), float(hi if hi is not None else avg), d)
+
+
+def _append(isbn: str, days: int, cond: Optional[str], count: float, total: float, sumsq: float,
+            lo: float, hi: float, sketch: TDigest) -> bool:
+    isbn_clean = _clean(isbn)
+    ck = _cond_key(cond)
+    _migrate_legacy(isbn_clean)
+    now = time.time()
+    with _connect() as con:
+        r = con.execute(
+            "SELECT last_ts FROM sold_snapshot WHERE isbn=? AND days=? AND cond=?;", (isbn_clean, days, ck)
+        ).fetchone()
+        # Throttle: aynı isbn+days+cond için çok erken
+        if r is not None and now - float(r["last_ts"]) < _THROTTLE_SECONDS:
+            logger.debug("isbn=%s days=%d cond=%s snapshot throttled", isbn_clean, days, cond)
+            return False
+        _merge_bucket(con, isbn_clean, ck, int(now // 86400), count, total, sumsq, lo, hi, sketch)
+        _touch_snapshot(con, isbn_clean, days, ck, now)
+        _prune(con, isbn_clean, now)
+        con.execute("DELETE FROM sold_window WHERE isbn=?;", (isbn_clean,))
+    logger.debug("isbn=%s days=%d cond=%s: stored %d prices", isbn_clean, days, cond, int(count))
     return True
 
 
+def _window_rows(isbn: str, window_days: int, cond: Optional[str]) -> List[sqlite3.Row]:
+    isbn_clean = _clean(isbn)
+    _migrate_legacy(isbn_clean)
+    since = int((time.time() - window_days * 86400) // 86400)
+    sql = "SELECT count, sum, sumsq, min, max, sketch FROM sold_bucket WHERE isbn=? AND day >= ?"
+    args: List[Any] = [isbn_clean, since]
+    if cond is not None:
+        sql += " AND cond=?"
+        args.append(cond)
+    with _connect() as con:
+        return con.execute(sql + " ORDER BY day, cond;", args).fetchall()
+
+
+def _merged_sketch(rows: Iterable[sqlite3.Row]) -> TDigest:
+    d = TDigest(_SKETCH_COMPRESSION)
+    for r in rows:
+        d.merge(TDigest.from_json(r["sketch"], _SKETCH_COMPRESSION))
+    return d
+
+
+_EMPTY_STATS: Dict[str, Any] = {"count": 0, "avg": None, "min": None, "max": None, "std": None,
+                                "p10": None, "p50": None, "p90": None}
+
+
+def _window(isbn: str, window_days: int, cond: Optional[str]) -> Tuple[Dict[str, Any], TDigest]:
+    """
+    Pencere özeti + birleştirilmiş sketch. sold_window'da (isbn, cond, window) başına
+    materialize edilir: aynı UTC gün içinde ve yeni append gelmedikçe tek satır okunur;
+    aksi halde O(gün) bucket birleştirilip yeniden yazılır.
+    """
+    isbn_clean = _clean(isbn)
+    ck = "*" if cond is None else cond
+    today = int(time.time() // 86400)
+    with _connect() as con:
+        r = con.execute(
+            "SELECT day, stats, sketch FROM sold_window WHERE isbn=? AND cond=? AND window_days=?;",
+            (isbn_clean, ck, window_days),
+        ).fetchone()
+    if r is not None and r["day"] == today:
+        return json.loads(r["stats"]), TDigest.from_json(r["sketch"], _SKETCH_COMPRESSION)
+
+    rows = _window_rows(isbn_clean, window_days, cond)
+    sketch = _merged_sketch(rows)
+    n = sum(r["count"] for r in rows)
+    if not n:
+        stats = dict(_EMPTY_STATS)
+    else:
+        avg = sum(r["sum"] for r in rows) / n
+        sumsq = sum(r["sumsq"] for r in rows)
+        stats = {
+            "count": int(round(n)),
+            "avg": round(avg, 2),
+            "min": round(min(r["min"] for r in rows), 2),
+            "max": round(max(r["max"] for r in rows), 2),
+            "std": round(math.sqrt(max(0.0, sumsq / n - avg * avg)), 2),
+            **sketch.percentiles(),
+        }
+    with _connect() as con:
+        con.execute(
+            "INSERT OR REPLACE INTO sold_window(isbn, cond, window_days, day, stats, sketch) VALUES(?,?,?,?,?,?);",
+            (isbn_clean, ck, window_days, today, json.dumps(stats), sketch.to_json()),
+        )
+    return stats, sketch
+
+
 def query_window(
     isbn: str,
     window_days: int,
     cond: Optional[str],
 ) -> List[float]:
     """
-    Son `window_days` gün içinde biriktirilen tüm satış fiyatlarını döndürür.
+    Son `window_days` gün içindeki satış fiyatları — bucket sketch'lerinden yeniden kurulan
+    yaklaşık örnek listesi (az örnekte birebir). Sadece özet gereken yerlerde window_stats().
 
-    Not: Ardışık snapshotlar örtüşen veri içerebilir (aynı satış birden fazla
-    snapshot'ta gözükebilir). Bu, istatistiklere hafif üst-bias katar ancak
-    alım kararı için pratik açıdan ihmal edilebilir düzeydedir.
+    cond=None → tüm koşulların bucket'ları.
     """
-    isbn_clean = isbn.replace("-", "").replace(" ", "").strip()
-    data = _load(isbn_clean)
-    entries: List[Dict] = data.get("entries") or []
+    return _window(isbn, window_days, cond)[1].samples()
+
 
-    cutoff = time.time() - (window_days * 86400)
-    result: List[float] = []
+def window_sketch(isbn: str, window_days: int, cond: Optional[str]) -> TDigest:
+    """Pencerenin birleştirilmiş sketch'i (başka pencere / kaynaklarla merge için)."""
+    return _window(isbn, window_days, cond)[1]
 
-    for e in entries:
-        if float(e.get("ts", 0)) < cutoff:
-            continue
-        if cond is not None and e.get("cond") != cond:
-            continue
-        result.extend(e.get("totals") or [])
 
-    return result
+def window_stats(isbn: str, window_days: int, cond: Optional[str]) -> Dict[str, Any]:
+    """
+    Pencere özeti: {count, avg, min, max, std, p10, p50, p90}. Veri yoksa count=0,
+    diğerleri None. Günün ilk sorgusundan sonra tek satır okuma (sold_window).
+    """
+    return dict(_window(isbn, window_days, cond)[0])
 
 
 def snapshot_span_days(isbn: str, cond: Optional[str]) -> Optional[float]:
@@ -178,32 +358,36 @@ def snapshot_span_days(isbn: str, cond: Optional[str]) -> Optional[float]:
     İlk snapshot'tan beri geçen süreyi gösterir.
     None → henüz snapshot yok.
     """
-    isbn_clean = isbn.replace("-", "").replace(" ", "").strip()
-    data = _load(isbn_clean)
-    entries = [
-        e for e in (data.get("entries") or [])
-        if cond is None or e.get("cond") == cond
-    ]
-    if not entries:
+    isbn_clean = _clean(isbn)
+    _migrate_legacy(isbn_clean)
+    sql = "SELECT MIN(first_ts) AS lo, MAX(last_ts) AS hi FROM sold_snapshot WHERE isbn=?"
+    args: List[Any] = [isbn_clean]
+    if cond is not None:
+        sql += " AND cond=?"
+        args.append(cond)
+    with _connect() as con:
+        r = con.execute(sql + ";", args).fetchone()
+    if r is None or r["lo"] is None:
         return None
-    ts_values = [float(e.get("ts", 0)) for e in entries]
-    span = max(ts_values) - min(ts_values)
-    return round(span / 86400, 1)
+    return round((r["hi"] - r["lo"]) / 86400, 1)
 
 
 def entry_summary(isbn: str) -> Dict:
-    """Debug / panel için: kaç entry var, kaç günlük span."""
-    isbn_clean = isbn.replace("-", "").replace(" ", "").strip()
-    data = _load(isbn_clean)
-    entries = data.get("entries") or []
+    """Debug / panel için: kaç snapshot var, kaç günlük span, kaç bucket."""
+    isbn_clean = _clean(isbn)
+    _migrate_legacy(isbn_clean)
+    with _connect() as con:
+        snaps = con.execute("SELECT days, cond, n FROM sold_snapshot WHERE isbn=?;", (isbn_clean,)).fetchall()
+        buckets = con.execute("SELECT COUNT(*) FROM sold_bucket WHERE isbn=?;", (isbn_clean,)).fetchone()[0]
     by_window: Dict[str, int] = {}
-    for e in entries:
-        key = f"{e.get('days')}d_{e.get('cond') or 'all'}"
-        by_window[key] = by_window.get(key, 0) + 1
+    for r in snaps:
+        key = f"{r['days']}d_{r['cond']}"
+        by_window[key] = by_window.get(key, 0) + int(r["n"])
     return {
         "isbn": isbn_clean,
-        "total_entries": len(entries),
+        "total_entries": sum(by_window.values()),
         "by_window": by_window,
+        "buckets": int(buckets),
         "span_days": snapshot_span_days(isbn_clean, None),
     }
 
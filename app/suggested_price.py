@@ -1,7 +1,8 @@
 """
 Suggested price calculator with caching and trend analysis.
 
-Uses eBay Finding API (findCompletedItems) for sold stats by ISBN.
+Uses eBay Finding API (findCompletedItems) for sold stats by ISBN — through the shared
+finding_sold fetcher (one 90-day all-conditions call per ISBN; windows derived locally).
 
 Cache policy:
   - Short windows (30d, 100d): refresh every SGPRICE_SHORT_TTL_HOURS (default 2h)
@@ -32,11 +33,13 @@ import json
 import time
 import asyncio
 from pathlib import Path
-from datetime import datetime, timezone, timedelta
+from datetime import datetime, timezone
 from typing import Any, Dict, Optional
 
 import httpx
 
+from app.core.keyed_lock import KeyedLock
+
 # ── Paths ──────────────────────────────────────────────────────────────────────
 DATA_DIR   = Path(__file__).resolve().parent / "data"
 CACHE_FILE = DATA_DIR / "suggested_price_cache.json"
@@ -45,7 +48,6 @@ CACHE_FILE = DATA_DIR / "suggested_price_cache.json"
 SHORT_TTL_HOURS    = float(os.getenv("SGPRICE_SHORT_TTL_HOURS", "2"))
 LONG_TTL_HOURS     = float(os.getenv("SGPRICE_LONG_TTL_HOURS", "6"))
 TREND_THRESHOLD    = float(os.getenv("SGPRICE_TREND_THRESHOLD", "0.40"))
-EBAY_APP_ID        = os.getenv("EBAY_APP_ID", "").strip()
 
 # period_key -> (days_back, ttl_hours)
 _PERIODS: Dict[str, tuple] = {
@@ -55,12 +57,15 @@ _PERIODS: Dict[str, tuple] = {
     "3yr":  (1095, LONG_TTL_HOURS),
 }
 
-# ── Async concurrency lock (one refresh at a time per process) ────────────────
+# ── Async concurrency locks ───────────────────────────────────────────────────
+# _cache_lock: guards the shared JSON file (short, no network inside)
+# _isbn_locks: one refresh at a time per ISBN; different ISBNs run in parallel
 _cache_lock: asyncio.Lock | None = None
+_isbn_locks = KeyedLock()
 
 
 def _get_lock() -> asyncio.Lock:
-    """Lazy-create the lock so it belongs to the running event loop."""
+    """Lazy-create the file lock so it belongs to the running event loop."""
     global _cache_lock
     if _cache_lock is None:
         _cache_lock = asyncio.Lock()
@@ -89,66 +94,29 @@ def _write_cache_unsafe(data: Dict[str, Any]) -> None:
     _os.replace(tmp, CACHE_FILE)
 
 
-# ── eBay Finding API helper with date range ───────────────────────────────────
+# ── eBay Finding API (shared 90-day result) ──────────────────────────────────
 
 async def _finding_sold_avg(
     client: httpx.AsyncClient,
-    keywords: str,
+    isbn: str,
     days: int,
 ) -> Optional[float]:
     """
-    Query findCompletedItems for `keywords` within last `days` days.
-    Returns average sold price (float) or None if no data / error.
+    Average sold total (price + shipping) for the last `days` days, derived locally from
+    the shared 90-day all-conditions Finding result (finding_sold.fetch — one API call
+    per ISBN, cached). Windows longer than 90 days use the deduplicated sold history
+    (sold_items_store) when it has data, else the 90-day set.
+    Returns None if no data.
     """
-    if not EBAY_APP_ID:
-        raise RuntimeError("EBAY_APP_ID not set — cannot fetch sold stats")
-
-    now_utc        = datetime.now(timezone.utc)
-    end_time_from  = (now_utc - timedelta(days=days)).strftime("%Y-%m-%dT%H:%M:%S.000Z")
-
-    base   = "https://svcs.ebay.com/services/search/FindingService/v1"
-    params = {
-        "OPERATION-NAME":               "findCompletedItems",
-        "SERVICE-VERSION":              "1.13.0",
-        "SECURITY-APPNAME":             EBAY_APP_ID,
-        "RESPONSE-DATA-FORMAT":         "JSON",
-        "REST-PAYLOAD":                 "true",
-        "keywords":                     keywords,
-        "paginationInput.entriesPerPage": "100",
-        "itemFilter(0).name":           "SoldItemsOnly",
-        "itemFilter(0).value":          "true",
-        "itemFilter(1).name":           "EndTimeFrom",
-        "itemFilter(1).value":          end_time_from,
-    }
-
-    try:
-        r = await client.get(base, params=params, timeout=20)
-        j = r.json() if r.text else {}
-        if r.status_code < 200 or r.status_code >= 300:
-            return None
-
-        resp  = (j.get("findCompletedItemsResponse") or [])[0]
-        sr    = (resp.get("searchResult") or [])[0]
-        items = sr.get("item") or []
-
-        totals: list[float] = []
-        for it in items:
-            selling = (it.get("sellingStatus") or [])[0]
-            cur     = (selling.get("currentPrice") or [])[0]
-            v       = cur.get("__value__")
-            if v is None:
-                continue
-            try:
-                totals.append(float(v))
-            except Exception:
-                continue
-
-        if not totals:
-            return None
-        return sum(totals) / len(totals)
+    from app import finding_sold, sold_items_store
 
-    except Exception:
+    res = await finding_sold.fetch(client, isbn)
+    totals = finding_sold.window(res["items"], min(days, finding_sold.FINDING_MAX_DAYS))
+    if days > finding_sold.FINDING_MAX_DAYS:
+        totals = sold_items_store.window_totals(isbn, days) or totals
+    if not totals:
         return None
+    return sum(totals) / len(totals)
 
 
 # ── Public API ────────────────────────────────────────────────────────────────
@@ -160,23 +128,19 @@ def _safe_int(x: Any) -> Optional[int]:
         return None
 
 
-async def get_suggested_price(isbn: str) -> Dict[str, Any]:
+async def _refresh_avgs(isbn: str) -> Dict[str, Optional[float]]:
     """
-    Returns a dict with:
-      isbn            : str
-      suggested       : int | None       weighted average, int-rounded
-      avgs            : {30d, 100d, 365d, 3yr}  each int | None
-      trend           : "up" | "down" | "flat" | "unknown"
-      delta_pct       : float | None     (avg_30d − avg_365d) / avg_365d × 100
-      price_shift_flag: bool             true if |delta_pct| > threshold
-      fetched_at      : ISO-8601 UTC string
+    Cached period averages for isbn, refreshing stale periods first.
+
+    The per-ISBN lock makes concurrent callers for the same ISBN wait for one refresh and
+    then read its result; different ISBNs refresh in parallel. The file lock is only held
+    around the (synchronous) JSON read/write, never across network I/O.
     """
-    lock = _get_lock()
-    async with lock:
-        cache  = _read_cache_unsafe()
-        entry: Dict[str, Any]          = cache.get(isbn) or {}
-        avgs:  Dict[str, Optional[float]] = {k: entry.get("avgs", {}).get(k) for k in _PERIODS}
-        fetched_at_ts: Dict[str, float]   = entry.get("fetched_at_ts", {})
+    async with _isbn_locks(isbn):
+        async with _get_lock():
+            entry: Dict[str, Any] = _read_cache_unsafe().get(isbn) or {}
+        avgs: Dict[str, Optional[float]] = {k: entry.get("avgs", {}).get(k) for k in _PERIODS}
+        fetched_at_ts: Dict[str, float] = dict(entry.get("fetched_at_ts", {}))
         now_ts = time.time()
 
         # Determine which periods are stale
@@ -187,19 +151,35 @@ async def get_suggested_price(isbn: str) -> Dict[str, Any]:
                 stale.append((period_key, days))
 
         if stale:
-            keywords = f"ISBN {isbn}"
+            # All periods share one Finding call (first lookup fetches, the rest hit its cache)
             async with httpx.AsyncClient(timeout=25) as client:
                 for period_key, days in stale:
-                    val = await _finding_sold_avg(client, keywords, days)
-                    avgs[period_key]            = val
-                    fetched_at_ts[period_key]   = now_ts
-
-            # Persist updated cache (atomic)
-            cache[isbn] = {
-                "avgs":         {k: v for k, v in avgs.items()},
-                "fetched_at_ts": fetched_at_ts,
-            }
-            _write_cache_unsafe(cache)
+                    avgs[period_key]          = await _finding_sold_avg(client, isbn, days)
+                    fetched_at_ts[period_key] = now_ts
+
+            # Persist updated cache (atomic); re-read so writers for other ISBNs survive
+            async with _get_lock():
+                cache = _read_cache_unsafe()
+                cache[isbn] = {
+                    "avgs":          dict(avgs),
+                    "fetched_at_ts": fetched_at_ts,
+                }
+                _write_cache_unsafe(cache)
+    return avgs
+
+
+async def get_suggested_price(isbn: str) -> Dict[str, Any]:
+    """
+    Returns a dict with:
+      isbn            : str
+      suggested       : int | None       weighted average, int-rounded
+      avgs            : {30d, 100d, 365d, 3yr}  each int | None
+      trend           : "up" | "down" | "flat" | "unknown"
+      delta_pct       : float | None     (avg_30d − avg_365d) / avg_365d × 100
+      price_shift_flag: bool             true if |delta_pct| > threshold
+      fetched_at      : ISO-8601 UTC string
+    """
+    avgs = await _refresh_avgs(isbn)
 
     # ── Weighted suggested price ──────────────────────────────────────────────
     # Weights: 30d=0.25, 100d=0.25, 365d=0.50
@@ -0,0 +1,104 @@
+"""
+Suggested Price Materializer — watchlist'in önerilen fiyatlarını arka planda önceden hesapla.
+
+  run_once()          → isbn_store watchlist'ini suggested_price_store ile eşitle, en bayat
+                        ISBN'leri (due) sırayla hesapla, sonucu store'a yaz
+  materialize_loop()  → startup'ta başlar; her SGPRICE_MATERIALIZE_INTERVAL_S'de run_once()
+
+Kota: SGPRICE_FINDING_DAILY_BUDGET günlük Finding çağrısı aralıklara bölünür
+(tur bütçesi = günlük × aralık / 86400). finding_sold cache'ten dönen ISBN'ler bütçe
+harcamaz; Finding backoff aktifken tur atlanır (stale veriyle hesaplamak boşa yazma olur).
+/suggested-price bu sayede sadece store'dan PK okuması yapar.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import math
+import time
+from typing import Any, Dict, Optional
+
+import httpx
+
+from app import finding_cache, suggested_price_store
+from app.core.config import get_settings
+
+logger = logging.getLogger("trackerbundle.suggested_price_materializer")
+
+_last: Dict[str, Any] = {}
+_MAX_ISBNS_PER_RUN = 500   # cache'ten dönenler bütçe harcamaz; tur süresini yine de sınırla
+
+
+def _run_budget(daily: int, interval_s: int) -> int:
+    return max(1, math.ceil(daily * interval_s / 86400))
+
+
+async def run_once(budget: Optional[int] = None) -> Dict[str, Any]:
+    """Tek tur. budget: bu turda harcanabilecek Finding çağrısı (None → config'ten)."""
+    s = get_settings()
+    if budget is None:
+        budget = _run_budget(int(s.sgprice_finding_daily_budget), int(s.sgprice_materialize_interval_s))
+    if finding_cache.is_rate_limited():
+        return {"skipped": "finding_backoff", "finished_at": int(time.time())}
+
+    from app import isbn_store
+    from app.suggested_price_endpoint import _compute_locks, compute
+
+    t0 = time.time()
+    watched = await asyncio.to_thread(
+        lambda: suggested_price_store.sync_watchlist(isbn_store.list_isbns())
+    )
+    isbns = await asyncio.to_thread(
+        suggested_price_store.due, _MAX_ISBNS_PER_RUN, int(s.sgprice_materialize_max_age_s)
+    )
+
+    computed = calls = failed = 0
+    async with httpx.AsyncClient(timeout=40) as client:
+        for isbn in isbns:
+            if calls >= budget or finding_cache.is_rate_limited():
+                break
+            try:
+                async with _compute_locks(isbn):   # endpoint aynı ISBN'i hesaplıyorsa bekle
+                    data, used = await compute(client, isbn)
+                    await asyncio.to_thread(suggested_price_store.put, isbn, data)
+            except Exception as e:
+                failed += 1
+                logger.warning("materialize failed isbn=%s: %s", isbn, e)
+                continue
+            calls += used
+            computed += 1
+
+    stats = {
+        "watched": watched, "due": len(isbns), "computed": computed, "failed": failed,
+        "finding_calls": calls, "budget": budget,
+        "duration_s": round(time.time() - t0, 1), "finished_at": int(time.time()),
+    }
+    logger.info(
+        "suggested price materialize: due=%d computed=%d calls=%d/%d (%.1fs)",
+        len(isbns), computed, calls, budget, stats["duration_s"],
+    )
+    return stats
+
+
+async def materialize_loop() -> None:
+    interval = int(get_settings().sgprice_materialize_interval_s)
+    if interval <= 0:
+        return
+    while True:
+        try:
+            stats = await run_once()
+            _last.clear()
+            _last.update(stats)
+        except Exception as e:
+            _last.update(error=str(e)[:200], failed_at=int(time.time()))
+            logger.warning("suggested price materialize failed: %s", e)
+        await asyncio.sleep(interval)
+
+
+def status() -> Dict[str, Any]:
+    out = dict(_last)
+    try:
+        out["store"] = suggested_price_store.stats(int(get_settings().sgprice_materialize_max_age_s))
+    except Exception as e:
+        out["store"] = {"error": str(e)[:200]}
+    return out
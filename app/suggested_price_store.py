@@ -0,0 +1,171 @@
+"""
+Suggested Price Store — önceden hesaplanmış /suggested-price yanıtları (SQLite).
+
+  suggested_price(isbn PK, watched, requested_at, computed_at, data)
+    watched      → 1: watchlist'te (isbn_store) — materializer her zaman taze tutar
+    requested_at → panelden son talep (watchlist dışı ISBN'ler de bir süre taze tutulur)
+    computed_at  → son hesaplama; NULL → henüz hesaplanmadı
+    data         → endpoint yanıtı (JSON)
+
+Endpoint sadece get() okur (PK araması); hesaplamayı suggested_price_materializer
+arka planda, Finding kota bütçesi içinde yapar. due() sırası: hiç hesaplanmamış →
+watchlist → en eski computed_at.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import sqlite3
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+from app.core.config import get_settings
+
+logger = logging.getLogger("trackerbundle.suggested_price_store")
+
+_schema_ready: set = set()
+_REQUESTED_KEEP_S = 7 * 86400   # watchlist dışı, panelden istenen ISBN'ler bu süre taze tutulur
+
+
+def _path() -> Path:
+    return get_settings().resolved_data_dir() / "suggested_price.db"
+
+
+def _connect() -> sqlite3.Connection:
+    p = _path()
+    p.parent.mkdir(parents=True, exist_ok=True)
+    con = sqlite3.connect(p, timeout=10)
+    con.row_factory = sqlite3.Row
+    con.execute("PRAGMA synchronous=NORMAL;")
+    if str(p) not in _schema_ready:
+        con.execute("PRAGMA journal_mode=WAL;")
+        con.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS suggested_price (
+              isbn TEXT PRIMARY KEY,
+              watched INTEGER NOT NULL DEFAULT 0,
+              requested_at INTEGER,
+              computed_at INTEGER,
+              data TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_sgprice_due ON suggested_price(computed_at);
+            """
+        )
+        _schema_ready.add(str(p))
+    return con
+
+
+def _clean(isbn: str) -> str:
+    return isbn.replace("-", "").replace(" ", "").strip()
+
+
+# ── Okuma ────────────────────────────────────────────────────────────────────
+
+def get(isbn: str, max_age_s: Optional[int] = None, now: Optional[int] = None) -> Optional[Dict[str, Any]]:
+    """
+    {"data": dict, "computed_at": int, "requested_at": int | None} — hesaplanmamışsa veya
+    max_age_s verilip sonuç ondan eskiyse None.
+    """
+    now = int(now if now is not None else time.time())
+    oldest = now - int(max_age_s) if max_age_s is not None else 0
+    with _connect() as con:
+        row = con.execute(
+            """
+            SELECT data, computed_at, requested_at FROM suggested_price
+            WHERE isbn=? AND computed_at IS NOT NULL AND computed_at >= ?;
+            """,
+            (_clean(isbn), oldest),
+        ).fetchone()
+    if row is None:
+        return None
+    return {"data": json.loads(row["data"]), "computed_at": row["computed_at"], "requested_at": row["requested_at"]}
+
+
+def due(limit: int, max_age_s: int, now: Optional[int] = None) -> List[str]:
+    """
+    Yenilenmesi gereken ISBN'ler: watchlist'tekiler + son 7 günde istenenler; hiç
+    hesaplanmamış veya max_age_s'den eski. Sıra: hesaplanmamış → watchlist → en eski.
+    """
+    now = int(now if now is not None else time.time())
+    with _connect() as con:
+        rows = con.execute(
+            """
+            SELECT isbn FROM suggested_price
+            WHERE (watched=1 OR requested_at >= ?)
+              AND (computed_at IS NULL OR computed_at < ?)
+            ORDER BY computed_at IS NOT NULL, watched DESC, computed_at, rowid
+            LIMIT ?;
+            """,
+            (now - _REQUESTED_KEEP_S, now - int(max_age_s), int(limit)),
+        ).fetchall()
+    return [r[0] for r in rows]
+
+
+def stats(max_age_s: int, now: Optional[int] = None) -> Dict[str, Any]:
+    now = int(now if now is not None else time.time())
+    with _connect() as con:
+        r = con.execute(
+            """
+            SELECT COUNT(*),
+                   COALESCE(SUM(watched), 0),
+                   COALESCE(SUM(computed_at IS NOT NULL), 0),
+                   COALESCE(SUM(computed_at IS NULL OR computed_at < ?), 0),
+                   MIN(computed_at)
+            FROM suggested_price;
+            """,
+            (now - int(max_age_s),),
+        ).fetchone()
+    return {"rows": r[0], "watched": r[1], "computed": r[2], "stale": r[3], "oldest_computed_at": r[4]}
+
+
+# ── Yazma ────────────────────────────────────────────────────────────────────
+
+def put(isbn: str, data: Dict[str, Any], now: Optional[int] = None) -> None:
+    now = int(now if now is not None else time.time())
+    with _connect() as con:
+        con.execute(
+            """
+            INSERT INTO suggested_price(isbn, computed_at, data) VALUES(?,?,?)
+            ON CONFLICT(isbn) DO UPDATE SET computed_at=excluded.computed_at, data=excluded.data;
+            """,
+            (_clean(isbn), now, json.dumps(data, separators=(",", ":"))),
+        )
+
+
+def mark_requested(isbn: str, now: Optional[int] = None) -> None:
+    """Panel talebi — watchlist dışı ISBN'i materializer kapsamına alır."""
+    now = int(now if now is not None else time.time())
+    with _connect() as con:
+        con.execute(
+            """
+            INSERT INTO suggested_price(isbn, requested_at) VALUES(?,?)
+            ON CONFLICT(isbn) DO UPDATE SET requested_at=excluded.requested_at;
+            """,
+            (_clean(isbn), now),
+        )
+
+
+def sync_watchlist(isbns: Iterable[str]) -> int:
+    """watched bayrağını isbn_store listesiyle eşitle; yeni ISBN'ler satır olarak eklenir."""
+    wanted = {_clean(i) for i in isbns if i}
+    with _connect() as con:
+        con.execute("UPDATE suggested_price SET watched=0 WHERE watched=1;")
+        con.executemany(
+            """
+            INSERT INTO suggested_price(isbn, watched) VALUES(?, 1)
+            ON CONFLICT(isbn) DO UPDATE SET watched=1;
+            """,
+            [(i,) for i in sorted(wanted)],
+        )
+    return len(wanted)
+
+
+def invalidate(isbn: str) -> bool:
+    """Hesaplanmış sonucu düşür; watched/requested korunur → sonraki turda ilk sıraya girer."""
+    with _connect() as con:
+        cur = con.execute(
+            "UPDATE suggested_price SET computed_at=NULL, data=NULL WHERE isbn=? AND computed_at IS NOT NULL;",
+            (_clean(isbn),),
+        )
+    return cur.rowcount > 0
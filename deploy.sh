@@ -5,8 +5,8 @@ cd /home/ubuntu/trackerbundle3
 echo "⬇️  git pull..."
 git pull origin main
 echo "🔄 Restart..."
-sudo systemctl restart trackerbundle-api trackerbundle-ebay-scheduler trackerbundle-bot
+sudo systemctl restart trackerbundle-api trackerbundle-ebay-scheduler trackerbundle-bot trackerbundle-scan-worker
 sleep 2
 echo "📊 Durum:"
-systemctl is-active trackerbundle-api trackerbundle-ebay-scheduler trackerbundle-bot
+systemctl is-active trackerbundle-api trackerbundle-ebay-scheduler trackerbundle-bot trackerbundle-scan-worker
 echo "✅ Tamam! Tarayıcıda Ctrl+Shift+R yap."
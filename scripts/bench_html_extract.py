@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+HTML extraction benchmark — tests/fixtures/html corpus'u üzerinde kaynak parser'larının
+parse süresini ve doğruluğunu ölçer.
+
+Kullanım:
+    python scripts/bench_html_extract.py                 # fixture'lar olduğu gibi
+    python scripts/bench_html_extract.py --pad-kb 500    # her sayfanın başına ~500KB gürültü ekle
+    python scripts/bench_html_extract.py --source abebooks --repeat 200
+
+Doğruluk: çıkarılan fiyat toplamları expected.json ile karşılaştırılır (bookfinder
+kaynakları için sıralı, eBay sold için sayfa sırası). Eşleşmeyen kaynak varsa exit 1.
+
+Yeni kaynak fixture'ı: sayfayı tests/fixtures/html/<source>.html olarak kaydet,
+beklenen fiyatları expected.json'a ekle (<source> bookfinder_client.PARSERS'ta olmalı).
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from app import bookfinder_client, sold_scraper  # noqa: E402
+
+FIXTURES = ROOT / "tests" / "fixtures" / "html"
+_PAD_UNIT = '<div class="card"><a href="/item/0">Related title</a><span class="meta">320 pages</span></div>\n'
+
+
+def extract(source: str, html: str) -> list:
+    if source == "ebay_sold":
+        return sold_scraper._parse_prices(html)
+    return sorted(o["total"] for o in bookfinder_client.PARSERS[source](html))
+
+
+def load_corpus(pad_kb: int = 0) -> dict:
+    expected = json.loads((FIXTURES / "expected.json").read_text())
+    pad = _PAD_UNIT * (pad_kb * 1024 // len(_PAD_UNIT)) if pad_kb else ""
+    corpus = {}
+    for source, want in expected.items():
+        html = (FIXTURES / f"{source}.html").read_text()
+        if pad:
+            html = html.replace("<main>", "<main>" + pad, 1)
+        corpus[source] = (html, want if source == "ebay_sold" else sorted(want))
+    return corpus
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--pad-kb", type=int, default=0)
+    ap.add_argument("--repeat", type=int, default=50)
+    ap.add_argument("--source", action="append", help="sadece bu kaynak(lar)")
+    args = ap.parse_args()
+
+    corpus = load_corpus(args.pad_kb)
+    failed = 0
+    print(f"{'source':<14}{'KB':>7}{'p50 ms':>10}{'p95 ms':>10}  accuracy")
+    for source, (html, want) in sorted(corpus.items()):
+        if args.source and source not in args.source:
+            continue
+        times = []
+        for _ in range(args.repeat):
+            t0 = time.perf_counter()
+            got = extract(source, html)
+            times.append((time.perf_counter() - t0) * 1000)
+        ok = got == want
+        failed += not ok
+        times.sort()
+        p95 = times[min(len(times) - 1, int(len(times) * 0.95))]
+        print(f"{source:<14}{len(html) // 1024:>7}{statistics.median(times):>10.2f}{p95:>10.2f}  "
+              f"{'ok' if ok else f'MISMATCH got={got} want={want}'}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
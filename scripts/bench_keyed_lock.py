@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Eşzamanlılık benchmark'ı — N farklı ISBN için suggested_price.get_suggested_price,
+tek global kilit (eski davranış) ile ISBN başına kilit (KeyedLock) karşılaştırması.
+
+Ağ yok: _finding_sold_avg sahte, her çağrı --latency-ms kadar bekler. Cache dosyası
+geçici dizinde tutulur.
+
+Kullanım:
+    python scripts/bench_keyed_lock.py                  # 20 ISBN, 150 ms gecikme
+    python scripts/bench_keyed_lock.py -n 100 --latency-ms 50
+
+Beklenen: global kilitte süre ≈ N × periyot × gecikme; KeyedLock'ta ≈ periyot × gecikme.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import sys
+import tempfile
+import time
+from contextlib import asynccontextmanager
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from app import suggested_price  # noqa: E402
+from app.core.keyed_lock import KeyedLock  # noqa: E402
+
+
+class _GlobalLock:
+    """Eski davranış: her anahtar aynı kilidi paylaşır."""
+
+    def __init__(self) -> None:
+        self._lock = asyncio.Lock()
+
+    @asynccontextmanager
+    async def __call__(self, key):
+        async with self._lock:
+            yield
+
+
+async def _run(n: int, locks, tmp: Path) -> float:
+    suggested_price.CACHE_FILE.unlink(missing_ok=True)
+    suggested_price._isbn_locks = locks
+    isbns = [f"978{i:010d}" for i in range(n)]
+    t0 = time.perf_counter()
+    await asyncio.gather(*(suggested_price.get_suggested_price(i) for i in isbns))
+    return time.perf_counter() - t0
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("-n", type=int, default=20, help="farklı ISBN sayısı")
+    ap.add_argument("--latency-ms", type=float, default=150.0, help="sahte Finding çağrısı gecikmesi")
+    args = ap.parse_args()
+
+    async def fake_avg(client, isbn, days):
+        await asyncio.sleep(args.latency_ms / 1000)
+        return 10.0
+
+    with tempfile.TemporaryDirectory() as d:
+        tmp = Path(d)
+        suggested_price.DATA_DIR = tmp
+        suggested_price.CACHE_FILE = tmp / "suggested_price_cache.json"
+        suggested_price._finding_sold_avg = fake_avg
+
+        periods = len(suggested_price._PERIODS)
+        print(f"{'lock':<10}{'ISBNs':>7}{'wall s':>10}{'ideal s':>10}{'speedup':>10}")
+        rows = []
+        for name, locks in (("global", _GlobalLock()), ("keyed", KeyedLock())):
+            wall = asyncio.run(_run(args.n, locks, tmp))
+            rows.append(wall)
+            ideal = periods * args.latency_ms / 1000 * (args.n if name == "global" else 1)
+            print(f"{name:<10}{args.n:>7}{wall:>10.2f}{ideal:>10.2f}{rows[0] / wall:>9.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
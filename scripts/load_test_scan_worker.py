@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+API latency load test — büyük bir scan job çalışırken API p99'u ölçer.
+
+Kullanım (sunucuda, API + scan worker ayaktayken):
+    python scripts/load_test_scan_worker.py --isbns 1200 --duration 120
+
+Adımlar:
+  1. Baseline: probe endpoint'lerine (--concurrency paralel) --baseline-s boyunca istek at.
+  2. /discover/csv-arb ile --isbns adet ISBN'lik scan job(lar)ı başlat (job başına max 1000).
+  3. Job çalışırken aynı probe yükünü --duration boyunca tekrar ölç.
+  4. p50/p95/p99 karşılaştır. p99(during) > p99(baseline) * --max-ratio → exit 1.
+
+SCAN_WORKER_MODE=inline ile çalıştırıp fark görülebilir: inline modda scan
+API event loop'unu paylaşır ve p99 belirgin şekilde yükselir.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+from typing import Dict, List
+
+import httpx
+
+PROBES = ["/health", "/status", "/alerts/summary", "/isbns"]
+
+
+def _isbn13(core9: str) -> str:
+    body = "978" + core9
+    total = sum((1 if i % 2 == 0 else 3) * int(c) for i, c in enumerate(body))
+    return body + str((10 - total % 10) % 10)
+
+
+def synthetic_isbns(n: int, seed: int = 42) -> List[str]:
+    rnd = random.Random(seed)
+    return [_isbn13(f"{rnd.randrange(10**9):09d}") for _ in range(n)]
+
+
+def _pct(values: List[float], p: float) -> float:
+    if not values:
+        return 0.0
+    s = sorted(values)
+    k = min(len(s) - 1, max(0, int(round(p / 100 * (len(s) - 1)))))
+    return s[k]
+
+
+def summarize(lat_ms: List[float]) -> Dict[str, float]:
+    return {
+        "n": len(lat_ms),
+        "p50": round(_pct(lat_ms, 50), 1),
+        "p95": round(_pct(lat_ms, 95), 1),
+        "p99": round(_pct(lat_ms, 99), 1),
+        "mean": round(statistics.fmean(lat_ms), 1) if lat_ms else 0.0,
+    }
+
+
+async def probe(client: httpx.AsyncClient, seconds: float, concurrency: int) -> List[float]:
+    lat: List[float] = []
+    deadline = time.monotonic() + seconds
+
+    async def _one_worker(i: int) -> None:
+        n = i
+        while time.monotonic() < deadline:
+            path = PROBES[n % len(PROBES)]
+            n += 1
+            t0 = time.perf_counter()
+            try:
+                r = await client.get(path)
+                r.raise_for_status()
+            except Exception:
+                continue
+            lat.append((time.perf_counter() - t0) * 1000)
+
+    await asyncio.gather(*[_one_worker(i) for i in range(concurrency)])
+    return lat
+
+
+async def watch_job(client: httpx.AsyncClient, job_id: str) -> None:
+    while True:
+        try:
+            r = await client.get(f"/discover/csv-arb/progress/{job_id}")
+            d = r.json()
+            print(f"  job {job_id}: {d.get('status')} {d.get('progress')}/{d.get('total')}", file=sys.stderr)
+            if d.get("status") in ("done", "error", "cancelled"):
+                return
+        except Exception:
+            pass
+        await asyncio.sleep(5)
+
+
+async def run(args: argparse.Namespace) -> int:
+    async with httpx.AsyncClient(base_url=args.base, timeout=30) as client:
+        print(f"Baseline: {args.baseline_s}s, concurrency={args.concurrency}")
+        base = summarize(await probe(client, args.baseline_s, args.concurrency))
+        print(f"  baseline  {base}")
+
+        # /discover/csv-arb job başına max 1000 ISBN → büyük listeler birden çok job'a bölünür
+        isbns = synthetic_isbns(args.isbns)
+        job_ids: List[str] = []
+        for i in range(0, len(isbns), 1000):
+            r = await client.post("/discover/csv-arb", json={
+                "isbns": isbns[i:i + 1000],
+                "only_viable": False,
+                "concurrency": 8,
+            })
+            r.raise_for_status()
+            job = r.json()
+            job_ids.append(job["job_id"])
+            print(f"Scan job {job['job_id']} enqueued ({job['total']} ISBN, queue_position={job.get('queue_position')})")
+
+        watchers = [asyncio.create_task(watch_job(client, jid)) for jid in job_ids]
+        during = summarize(await probe(client, args.duration, args.concurrency))
+        for w in watchers:
+            w.cancel()
+        print(f"  during    {during}")
+
+        if not args.keep_job:
+            for jid in job_ids:
+                await client.post(f"/discover/csv-arb/cancel/{jid}")
+
+    ratio = during["p99"] / base["p99"] if base["p99"] else float("inf")
+    print(f"p99 ratio during/baseline = {ratio:.2f} (max {args.max_ratio})")
+    return 0 if ratio <= args.max_ratio else 1
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--base", default=os.getenv("API_BASE", "http://127.0.0.1:8000"))
+    ap.add_argument("--isbns", type=int, default=1200)
+    ap.add_argument("--baseline-s", type=float, default=20)
+    ap.add_argument("--duration", type=float, default=120)
+    ap.add_argument("--concurrency", type=int, default=8)
+    ap.add_argument("--max-ratio", type=float, default=1.5)
+    ap.add_argument("--keep-job", action="store_true", help="Ölçüm sonrası job'u iptal etme")
+    sys.exit(asyncio.run(run(ap.parse_args())))
+
+
+if __name__ == "__main__":
+    main()
@@ -10,13 +10,35 @@ if str(ROOT) not in sys.path:
 
 @pytest.fixture(autouse=True)
 def isolate_global_state(monkeypatch, tmp_path):
-    from app import ai_analyst, scan_job_store
+    from app import ai_analyst, scan_job_store, market_snapshot_store, book_meta_store, bookfinder_client
+    from app import bookdepot_store, finding_cache, image_cache, llm_cache, llm_quota_store, sold_items_store, sold_stats_store, suggested_price_store
     ai_analyst._ai_cache.clear()
     ai_analyst._ai_inflight.clear()
     scan_job_store._jobs.clear()
+    scan_job_store._owned.clear()
+    scan_job_store._row_buffer.clear()
     data_dir = tmp_path / "scan_data"
     monkeypatch.setattr(scan_job_store, "DATA_DIR", data_dir, raising=False)
     monkeypatch.setattr(scan_job_store, "HISTORY_FILE", data_dir / "scan_history.json", raising=False)
+    monkeypatch.setattr(market_snapshot_store, "_path", lambda: data_dir / "market_snapshots.db")
+    monkeypatch.setattr(book_meta_store, "_path", lambda: data_dir / "book_meta.db")
+    monkeypatch.setattr(bookfinder_client, "_cache_path", lambda: data_dir / "bookfinder_cache.db")
+    monkeypatch.setattr(bookdepot_store, "_path", lambda: data_dir / "bookdepot.db")
+    monkeypatch.setattr(bookdepot_store, "_legacy_path", lambda: data_dir / "bookdepot_inventory.json")
+    sold_dir = data_dir / "sold_stats"
+    sold_dir.mkdir(parents=True, exist_ok=True)
+    monkeypatch.setattr(sold_stats_store, "_store_dir", lambda: sold_dir)
+    monkeypatch.setattr(sold_items_store, "_path", lambda: data_dir / "sold_items.db")
+    (data_dir / "finding_cache").mkdir()
+    monkeypatch.setattr(finding_cache, "_cache_dir", lambda: data_dir / "finding_cache")
+    monkeypatch.setattr(suggested_price_store, "_path", lambda: data_dir / "suggested_price.db")
+    monkeypatch.setattr(llm_cache, "_path", lambda: data_dir / "llm_cache.db")
+    monkeypatch.setattr(llm_quota_store, "_path", lambda: data_dir / "llm_quota.db")
+    monkeypatch.setattr(image_cache, "_path", lambda: data_dir / "image_cache.db")
+    market_snapshot_store._inflight.clear()
+    from app.core import circuit_breaker
+    circuit_breaker._breakers.clear()
+    market_snapshot_store._stats.clear()
     try:
         import app.main as main
         main._ai_requests.clear()
@@ -100,3 +100,44 @@ async def test_cache_different_sellers_get_different_verdicts(monkeypatch):
     r2 = await ai_analyst.analyze_isbn("9780132350884",
         {"buy_price":24.99,"source_condition":"used","ebay_title":"Book B","ebay_seller_name":"bravo","item_id":"item2"})
     assert r1["summary"] != r2["summary"]
+
+def _batch_el(i, verdict="WATCH"):
+    return {"id": i, "verdict": verdict, "confidence": 60, "summary": f"cand {i}", "price_trend": "STABLE",
+            "price_trend_reason": "n/a", "risk_level": "MEDIUM", "risks": [], "competitors": "4",
+            "buy_suggestion": "$10", "image_verdict": "NO_IMAGE", "image_notes": "",
+            "sources_checked": ["provided_data"]}
+
+def _batch_items(n):
+    return [{"isbn": "9780132350884", "candidate": {"buy_price": 20.0 + 5 * i, "source_condition": "used",
+             "ebay_title": f"Book {i}", "item_id": f"it{i}"}} for i in range(n)]
+
+def test_split_batch_salvages_valid_sections():
+    body = json.dumps({"results": [_batch_el(1), {"id": 2, "verdict": "MAYBE"}, _batch_el(1, "BUY"), _batch_el(3)]})
+    cut = body[:body.rindex('{"id": 3')] + '{"id": 3, "verdict": "BU'            # kesilmiş çıktı
+    assert set(ai_analyst._split_batch("```json\n" + body + "\n```", ["1", "2", "3"])) == {"1", "3"}
+    assert ai_analyst._split_batch(cut, ["1", "2", "3"])["1"]["verdict"] == "WATCH"   # ilk id kazanır
+    assert ai_analyst._split_batch("no json here", ["1"]) == {}
+
+@pytest.mark.asyncio
+async def test_analyze_batch_one_request_with_single_fallback(monkeypatch):
+    monkeypatch.setattr(llm_router, "get_status", lambda: {"stub": {"configured": True}})
+    async def fake_edition(isbn, client): return {}
+    calls = []
+    async def fake_route(**kw):
+        calls.append(kw)
+        if kw["system_prompt"] == ai_analyst._system_prompt(False, batch=True):
+            # 3. aday bozuk → yalnız o tekil çağrıya düşer
+            return {"text": json.dumps({"results": [_batch_el(1), _batch_el(2), {"id": 3}, _batch_el(4)]}),
+                    "provider": "groq", "model": "llama"}
+        return {"text": json.dumps(_batch_el(0, "PASS")), "provider": "groq", "model": "llama"}
+    monkeypatch.setattr(ai_analyst, "_check_edition", fake_edition)
+    monkeypatch.setattr(llm_router, "route", fake_route)
+
+    results = await ai_analyst.analyze_batch(_batch_items(4), batch_size=5)
+    assert len(calls) == 2 and "### CANDIDATE id=4" in calls[0]["user_prompt"]
+    assert [r["summary"] for r in results] == ["cand 1", "cand 2", "cand 0", "cand 4"]
+    assert results[0]["_batch_size"] == 4 and "_batch_size" not in results[2]
+    assert REQUIRED_PARSE_KEYS.issubset(results[1].keys())
+
+    again = await ai_analyst.analyze_batch(_batch_items(4))
+    assert len(calls) == 2 and all(r["_from_cache"] for r in again)
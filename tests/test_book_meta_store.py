@@ -0,0 +1,200 @@
+"""
+book_meta_store + _check_edition cache/paralel fetch + meta_backfill job testleri.
+"""
+from __future__ import annotations
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from app import ai_analyst, book_meta_store, scan_job_store, scan_queue
+
+ISBN = "9780132350884"
+
+
+def _transport(calls: list, delay: float = 0.0):
+    async def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request.url.host + request.url.path)
+        if delay:
+            await asyncio.sleep(delay)
+        if "googleapis" in request.url.host:
+            return httpx.Response(200, json={"items": [{"volumeInfo": {
+                "title": "Clean Code", "authors": ["Robert Martin"], "publishedDate": "2008-08-01",
+                "categories": ["Computers"]}}]})
+        if request.url.path == "/search.json":
+            return httpx.Response(200, json={"docs": [{"key": "/works/OL1W", "title": "Clean Code",
+                                                       "first_publish_year": 2008}]})
+        if request.url.path.endswith("/editions.json"):
+            return httpx.Response(200, json={"entries": [
+                {"isbn_13": [ISBN], "publish_date": "Aug 2008"},
+                {"isbn_13": ["9780000000000"], "publish_date": "2024"},
+            ]})
+        if request.url.path == "/api/books":
+            return httpx.Response(200, json={f"ISBN:{ISBN}": {
+                "classifications": {"dewey_decimal_class": ["005.1"]}}})
+        return httpx.Response(404)
+    return httpx.MockTransport(handler)
+
+
+class TestCheckEdition:
+    async def test_fetches_and_caches(self):
+        calls: list = []
+        async with httpx.AsyncClient(transport=_transport(calls)) as client:
+            meta = await ai_analyst._check_edition(ISBN, client)
+            n = len(calls)
+            again = await ai_analyst._check_edition(ISBN, client)
+
+        assert meta["google_title"] == "Clean Code"
+        assert meta["has_newer_edition"] is True
+        assert meta["dewey"] == "005.1"
+        assert again == meta
+        assert len(calls) == n                                     # ikinci çağrı ağa çıkmadı
+        assert sum(c.endswith("/api/books") for c in calls) == 1  # jscmd=data tek istek
+
+    async def test_independent_sources_fetched_in_parallel(self):
+        calls: list = []
+        async with httpx.AsyncClient(transport=_transport(calls, delay=0.05)) as client:
+            t0 = time.perf_counter()
+            await ai_analyst._check_edition(ISBN, client)
+            elapsed = time.perf_counter() - t0
+        # GB + OL search + OL books paralel, sonra editions → ~2 tur (sıralı olsaydı 4)
+        assert elapsed < 0.05 * 3.5
+
+    async def test_refresh_bypasses_cache(self):
+        calls: list = []
+        async with httpx.AsyncClient(transport=_transport(calls)) as client:
+            await ai_analyst._check_edition(ISBN, client)
+            n = len(calls)
+            await ai_analyst._check_edition(ISBN, client, refresh=True)
+        assert len(calls) == 2 * n
+
+
+class TestStore:
+    def test_miss_has_short_ttl(self):
+        book_meta_store.put(ISBN, {"has_newer_edition": None}, fetched_at=time.time() - book_meta_store.MISS_TTL_S - 1)
+        assert book_meta_store.get(ISBN) is None
+        book_meta_store.put(ISBN, {"source": "google_books"}, fetched_at=time.time() - book_meta_store.MISS_TTL_S - 1)
+        assert book_meta_store.get(ISBN) == {"source": "google_books"}
+
+    def test_stale_lists_missing_and_expired(self):
+        book_meta_store.put("9780000000001", {"source": "google_books"})
+        book_meta_store.put("9780000000002", {"source": "google_books"}, fetched_at=time.time() - book_meta_store.META_TTL_S - 1)
+        assert book_meta_store.stale(["9780000000001", "9780000000002", "9780000000003", "9780000000003"]) == [
+            "9780000000002", "9780000000003"]
+
+
+class TestBackfillJob:
+    @pytest.fixture(autouse=True)
+    def _queue(self, monkeypatch):
+        scan_queue._running.clear()
+        monkeypatch.setattr(scan_queue, "_gate", scan_queue.FairShareGate(4, 0.0))
+        monkeypatch.setattr(book_meta_store, "watched_isbns", lambda: ["9780000000001", "9780000000002"])
+        yield
+        scan_queue._running.clear()
+
+    async def test_backfill_warms_store_without_history(self, monkeypatch):
+        async def fake_fetch(isbn, client):
+            return {"source": "google_books", "isbn": isbn}
+        monkeypatch.setattr(ai_analyst, "_fetch_edition", fake_fetch)
+        book_meta_store.put("9780000000001", {"source": "google_books"})
+
+        jid = scan_queue.enqueue_meta_backfill()
+        assert scan_job_store.get_job(jid)["payload"]["isbns"] == ["9780000000002"]
+        assert scan_queue.enqueue_meta_backfill() is None   # zaten kuyrukta
+        while scan_queue._running:
+            await asyncio.gather(*list(scan_queue._running.values()), return_exceptions=True)
+
+        assert scan_job_store.get_job(jid)["status"] == "done"
+        assert book_meta_store.get("9780000000002") == {"source": "google_books", "isbn": "9780000000002"}
+        assert scan_job_store.get_history() == []
+        assert scan_queue.enqueue_meta_backfill() is None   # her şey taze
+
+    async def test_backfill_waits_while_paused(self, monkeypatch):
+        fetched = []
+
+        async def fake_fetch(isbn, client):
+            fetched.append(isbn)
+            return {"source": "google_books", "isbn": isbn}
+        monkeypatch.setattr(ai_analyst, "_fetch_edition", fake_fetch)
+
+        jid = scan_queue.enqueue_meta_backfill()
+        assert scan_job_store.pause_job(jid)
+        await asyncio.sleep(0.05)
+        assert fetched == [] and scan_job_store.get_job(jid)["status"] == "paused"
+
+        assert scan_job_store.resume_job(jid)
+        while scan_queue._running:
+            await asyncio.gather(*list(scan_queue._running.values()), return_exceptions=True)
+        assert sorted(fetched) == ["9780000000001", "9780000000002"]
+        assert scan_job_store.get_job(jid)["status"] == "done"
+
+
+# ── Toplu çözümleme (resolve_editions_bulk) ───────────────────────────────────
+
+def _isbn13(n: int) -> str:
+    body = f"978{n:09d}"
+    total = sum((1 if i % 2 == 0 else 3) * int(c) for i, c in enumerate(body))
+    return body + str((10 - total % 10) % 10)
+
+
+def _bulk_transport(calls: list):
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request.url.path)
+        if "googleapis" in request.url.host:
+            isbns = [p.split(":", 1)[1] for p in request.url.params["q"].split(" OR ")]
+            return httpx.Response(200, json={"items": [
+                {"volumeInfo": {"title": f"Book {i}", "publishedDate": "2015",
+                                "industryIdentifiers": [{"type": "ISBN_13", "identifier": i}]}}
+                for i in isbns
+            ]})
+        if request.url.path == "/api/books":
+            keys = request.url.params["bibkeys"].split(",")
+            return httpx.Response(200, json={k: {"title": "x", "number_of_pages": 300,
+                                                 "classifications": {"dewey_decimal_class": ["512.5"]}}
+                                             for k in keys})
+        return httpx.Response(404)
+    return httpx.MockTransport(handler)
+
+
+class TestBulkResolver:
+    async def test_batches_requests_and_stores_partial(self):
+        isbns = [_isbn13(i) for i in range(60)]
+        calls: list = []
+        async with httpx.AsyncClient(transport=_bulk_transport(calls)) as client:
+            stats = await ai_analyst.resolve_editions_bulk(isbns, client)
+
+        assert stats["resolved"] == 60
+        assert len(calls) == 2 + 3          # 60/50 OL + 60/20 GB
+        meta = book_meta_store.get(isbns[0], partial_ok=True)
+        assert meta["google_title"] == "Book " + isbns[0]
+        assert meta["page_count"] == 300 and meta["dewey"] == "512.5"
+        assert meta["has_newer_edition"] is None
+        assert book_meta_store.get(isbns[0]) is None            # tam kayıt değil
+        assert isbns[0] in book_meta_store.stale([isbns[0]])    # backfill yükseltir
+
+    async def test_scan_path_uses_partial_analyze_path_upgrades(self):
+        isbn = _isbn13(7)
+        async with httpx.AsyncClient(transport=_bulk_transport([])) as client:
+            await ai_analyst.resolve_editions_bulk([isbn], client)
+
+        calls: list = []
+        async with httpx.AsyncClient(transport=_transport(calls)) as client:
+            scan_meta = await ai_analyst._check_edition(isbn, client, partial_ok=True)
+            assert calls == []
+            full = await ai_analyst._check_edition(isbn, client)
+        assert scan_meta.get("partial") is True
+        assert calls and "partial" not in full
+        assert book_meta_store.get(isbn) == full
+
+    async def test_skips_already_cached(self):
+        isbn = _isbn13(3)
+        book_meta_store.put(isbn, {"source": "google_books"})
+        calls: list = []
+        async with httpx.AsyncClient(transport=_bulk_transport(calls)) as client:
+            stats = await ai_analyst.resolve_editions_bulk([isbn], client)
+        assert stats["requested"] == 0 and calls == []
+
+    def test_partial_meta_not_memoized_in_market_snapshot(self):
+        from app import market_snapshot_store
+        assert market_snapshot_store.cacheable({"source": "google_books", "partial": True}) is False
@@ -0,0 +1,96 @@
+"""
+bookdepot_store testleri: upsert, akış halinde CSV import, sayfalı fiyat aralığı
+sorgusu, eski JSON envanterinin taşınması ve scanner'ın job başına tek yükleme yapması.
+"""
+from __future__ import annotations
+import io
+import json
+
+import pytest
+
+import app.csv_arb_scanner as scanner
+from app import bookdepot_store as bd
+
+
+def _items(n: int, start_price: float = 1.0):
+    return [{"isbn": f"978000000{i:04d}", "title": f"Book {i}", "price": start_price + i, "qty": "3"}
+            for i in range(n)]
+
+
+class TestStore:
+    def test_upsert_updates_and_skips_invalid(self):
+        assert bd.upsert_many(_items(3) + [{"isbn": "123", "price": 2.0}])["upserted"] == 3
+        bd.upsert_many([{"isbn": "978-000000-0001", "title": "Renamed", "price": "$9.50"}])
+        item = bd.get("9780000000001")
+        assert item["title"] == "Renamed" and item["price"] == 9.5
+        assert bd.count() == 3
+
+    def test_query_price_range_and_pagination(self):
+        bd.upsert_many(_items(10) + [{"isbn": "9781111111111", "title": "no price"}])
+        total, page = bd.query(min_price=3, max_price=8, limit=2, offset=1, sort="price")
+        assert total == 6
+        assert [i["price"] for i in page] == [4.0, 5.0]
+        total, page = bd.query()
+        assert total == 11 and len(page) == 11
+        _, page = bd.query(sort="price_desc", limit=1)
+        assert page[0]["price"] == 10.0
+
+    def test_get_many_returns_only_known(self):
+        bd.upsert_many(_items(3))
+        got = bd.get_many(["9780000000000", "9780000000002", "9789999999999"])
+        assert set(got) == {"9780000000000", "9780000000002"}
+
+    def test_clear(self):
+        bd.upsert_many(_items(2))
+        assert bd.clear() == 2
+        assert bd.count() == 0
+
+
+class TestCsvImport:
+    def test_header_aliases_and_batches(self):
+        lines = ["ISBN13,Book Title,Our Price,Qty Available"]
+        lines += [f"978000000{i:04d},Title {i},${i + 1}.99,{i}" for i in range(25)]
+        lines += ["not-an-isbn,Bad,1.00,1"]
+        stats = bd.import_csv(io.StringIO("\n".join(lines)), batch_size=10)
+        assert stats == {"rows": 26, "imported": 25, "skipped": 1, "new": 25, "price_dropped": 0}
+        item = bd.get("9780000000024")
+        assert item["title"] == "Title 24" and item["price"] == 25.99 and item["qty"] == "24"
+
+    def test_missing_isbn_column_raises(self):
+        with pytest.raises(ValueError):
+            bd.import_csv(io.StringIO("title,price\nX,1.00\n"))
+
+
+def test_legacy_json_inventory_is_migrated(tmp_path, monkeypatch):
+    legacy = tmp_path / "legacy" / "bookdepot_inventory.json"
+    legacy.parent.mkdir()
+    legacy.write_text(json.dumps({"items": {
+        "9780132350884": {"isbn": "9780132350884", "title": "Clean Code", "price": 4.5, "scraped_at": 1000},
+    }}))
+    monkeypatch.setattr(bd, "_path", lambda: tmp_path / "legacy" / "bookdepot.db")
+    monkeypatch.setattr(bd, "_legacy_path", lambda: legacy)
+    item = bd.get("9780132350884")
+    assert item["price"] == 4.5 and item["scraped_at"] == 1000
+    assert not legacy.exists()
+    assert (legacy.parent / "bookdepot_inventory.json.migrated").exists()
+
+
+async def test_scanner_loads_inventory_once_per_job(monkeypatch):
+    bd.upsert_many(_items(3))
+    monkeypatch.setattr(bd, "get", lambda isbn: pytest.fail("ISBN başına okuma yapılmamalı"))
+    calls = []
+    real_get_many = bd.get_many
+    monkeypatch.setattr(bd, "get_many", lambda isbns: calls.append(list(isbns)) or real_get_many(isbns))
+
+    seen = {}
+
+    async def _fake_scan_one(isbn, filters, fees, **kw):
+        seen[isbn] = await scanner._get_bookdepot_offers(isbn, kw["bd_inventory"])
+        return []
+
+    monkeypatch.setattr(scanner, "_scan_one", _fake_scan_one)
+    isbns = ["9780000000000", "9780000000001", "9789999999999"]
+    await scanner.scan_isbn_list(isbns, scanner.ScanFilters(), concurrency=3)
+    assert len(calls) == 1
+    assert seen["9780000000001"][0]["buy_price"] == 2.0
+    assert seen["9789999999999"] == []
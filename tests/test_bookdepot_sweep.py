@@ -0,0 +1,137 @@
+"""
+BookDepot sweep testleri: snapshot farkı (yeni / fiyatı düşen / kaybolan), fiyat geçmişi
+ve sadece değişen ISBN'lerin rescan kuyruğuna alınması.
+"""
+from __future__ import annotations
+import io
+import time
+
+from app import bookdepot_store as bd, bookdepot_sweep, scan_job_store, scan_queue
+
+A, B, C, D = "9780000000001", "9780000000002", "9780000000003", "9780000000004"
+
+
+def _csv(rows) -> bytes:
+    return ("isbn,title,price\n" + "".join(f"{i},T{i},{p}\n" for i, p in rows)).encode()
+
+
+def _import(rows, now):
+    return bd.import_csv_file(io.BytesIO(_csv(rows)), now=now)
+
+
+def test_diff_tracks_new_dropped_and_history():
+    first = _import([(A, 5.0), (B, 8.0), (C, 3.0)], now=1000)
+    assert (first["new"], first["price_dropped"]) == (3, 0)
+    assert {i["isbn"] for i in bd.pending_rescan()} == {A, B, C}
+    bd.mark_scanned([A, B, C], now=1000)
+    assert bd.pending_rescan() == []
+
+    second = _import([(A, 4.0), (B, 9.0), (C, 3.0), (D, 2.0)], now=2000)
+    assert (second["new"], second["price_dropped"]) == (1, 1)
+    pending = {i["isbn"]: i for i in bd.pending_rescan()}
+    assert set(pending) == {A, D}                    # B pahalandı, C değişmedi
+    assert pending[A]["prev_price"] == 5.0 and pending[A]["price_changed_at"] == 2000
+    assert [h["price"] for h in bd.history(A)] == [5.0, 4.0]
+    assert [h["price"] for h in bd.history(C)] == [3.0]
+
+
+def test_deactivate_missing_hides_items():
+    _import([(A, 5.0), (B, 8.0)], now=1000)
+    _import([(A, 5.0)], now=2000)
+    assert bd.deactivate_missing(2000) == 1
+    assert bd.all_isbns() == [A]
+    assert bd.get_many([A, B]).keys() == {A}
+    _import([(B, 7.0)], now=3000)                    # geri gelince tekrar aktif
+    assert set(bd.all_isbns()) == {A, B}
+
+
+def test_enqueue_rescan_only_changed():
+    _import([(A, 5.0), (B, 8.0)], now=1000)
+    [jid] = scan_queue.enqueue_bookdepot_rescan()
+    job = scan_job_store.get_job(jid)
+    assert job["kind"] == "bookdepot" and job["priority"] == -5
+    assert job["payload"]["isbn_buy_prices"] == {A: 5.0, B: 8.0}
+    assert scan_queue.enqueue_bookdepot_rescan() == []          # zaten kuyrukta
+
+    scan_job_store.cancel_job(jid)                               # taranmadı → kaybolmaz
+    [jid2] = scan_queue.enqueue_bookdepot_rescan()
+    scan_job_store.cancel_job(jid2)
+    bd.mark_scanned([A, B])                                      # job tamamlandı
+    assert scan_queue.enqueue_bookdepot_rescan() == []
+
+    _import([(A, 5.0), (B, 6.5)], now=int(time.time()) + 5)    # mark_scanned'dan sonra
+    [jid3] = scan_queue.enqueue_bookdepot_rescan({"min_roi_pct": 30, "priority": 2})
+    job = scan_job_store.get_job(jid3)
+    assert job["payload"]["isbns"] == [B] and job["payload"]["min_roi_pct"] == 30 and job["priority"] == 2
+
+
+async def test_handler_marks_only_scanned_isbns(monkeypatch):
+    import app.csv_arb_scanner as scanner
+    _import([(A, 5.0), (B, 8.0)], now=1000)
+
+    async def _partial_scan(**kw):
+        return {"accepted": [], "rejected": [], "stats": {}, "scanned": [A]}   # B'de cancel
+
+    monkeypatch.setattr(scanner, "scan_isbn_list", _partial_scan)
+    await scan_queue._HANDLERS["bookdepot"]("j", {"isbns": [A, B]}, None, None)
+    assert [i["isbn"] for i in bd.pending_rescan()] == [B]
+
+
+async def test_run_sweep_downloads_diffs_and_enqueues(monkeypatch):
+    _import([(A, 5.0), (B, 8.0)], now=1000)
+    bd.mark_scanned([A, B], now=1000)
+
+    async def _fake_download(url, dest):
+        data = _csv([(A, 4.0), (C, 2.0)])
+        dest.write(data)
+        return len(data)
+
+    jobs = []
+    monkeypatch.setattr(bookdepot_sweep, "_download", _fake_download)
+    monkeypatch.setattr(scan_queue, "enqueue",
+                        lambda kind, payload, total, priority=0: jobs.append(payload["isbns"]) or "j")
+    stats = await bookdepot_sweep.run_sweep("https://example.test/catalog.csv")
+    assert (stats["new"], stats["price_dropped"], stats["deactivated"]) == (1, 1, 1)
+    assert sorted(jobs[0]) == [A, C]
+    assert bookdepot_sweep.status()["rows"] == 2
+
+
+async def test_empty_export_does_not_deactivate(monkeypatch):
+    _import([(A, 5.0)], now=1000)
+
+    async def _empty(url, dest):
+        dest.write(b"isbn,title,price\n")
+        return 17
+
+    monkeypatch.setattr(bookdepot_sweep, "_download", _empty)
+    stats = await bookdepot_sweep.run_sweep("https://example.test/catalog.csv", rescan=False)
+    assert stats["deactivated"] == 0 and bd.all_isbns() == [A]
+
+
+async def test_run_sweep_dispatches_rescan_jobs(monkeypatch):
+    # enqueue thread'de çalışır (loop yok) → dispatch rescan_bookdepot'ta loop'tan yapılmalı
+    spawned = []
+    monkeypatch.setattr(scan_queue, "_spawn", spawned.append)
+
+    async def _fake_download(url, dest):
+        data = _csv([(A, 4.0), (B, 3.0)])
+        dest.write(data)
+        return len(data)
+
+    monkeypatch.setattr(bookdepot_sweep, "_download", _fake_download)
+    stats = await bookdepot_sweep.run_sweep("https://example.test/catalog.csv")
+    assert stats["job_ids"] and spawned == stats["job_ids"]
+
+
+async def test_sweep_endpoint_ignores_client_url(monkeypatch):
+    from app import main
+    seen = []
+
+    async def _fake_run(url=None, rescan=True):
+        seen.append(url)
+        return {"rows": 0}
+
+    monkeypatch.setattr(bookdepot_sweep, "run_sweep", _fake_run)
+    req = main.BookDepotSweepRequest.model_validate({"url": "http://169.254.169.254/latest", "rescan": False})
+    assert (await main.bookdepot_sweep_now(req))["ok"]
+    assert seen == [None]                       # her zaman BOOKDEPOT_CATALOG_URL
@@ -0,0 +1,166 @@
+"""
+bookfinder_client deadline-aware fan-out testleri: erken dönüş, bütçe,
+arka planda cache güncelleme, gecikme histogramına göre kaynak seçimi ve
+(isbn, source) başına artımlı cache.
+"""
+from __future__ import annotations
+import asyncio
+import time
+
+import pytest
+
+from app import bookfinder_client as bf
+
+ISBN = "9780132350884"
+
+
+def _src(name: str, delay: float, price: float):
+    async def _fn(c, isbn):
+        await asyncio.sleep(delay)
+        o = bf._o(price, 0.0, name, name.upper(), "USED")
+        return {"source": name, "new": None, "used": bf._stats([o]), "url": ""}
+    return _fn
+
+
+@pytest.fixture(autouse=True)
+def _isolated(monkeypatch, tmp_path):
+    monkeypatch.setattr(bf, "_cache_path", lambda: tmp_path / "bookfinder_cache.db")
+    monkeypatch.setattr(bf, "_latency", {})
+    monkeypatch.setattr(bf, "_samples", {})
+    monkeypatch.setattr(bf, "_LAT_EXPLORE_P", 0.0)
+    monkeypatch.setattr(bf, "_SOURCES", [
+        ("fast1", _src("fast1", 0.0, 10.0)),
+        ("fast2", _src("fast2", 0.01, 9.0)),
+        ("fast3", _src("fast3", 0.01, 11.0)),
+        ("slow",  _src("slow", 0.3, 5.0)),
+    ])
+
+
+async def _drain_background():
+    while bf._background:
+        await asyncio.gather(*list(bf._background))
+
+
+async def test_returns_when_enough_sources_answered_and_late_updates_cache():
+    t0 = time.monotonic()
+    out = await bf.fetch_bookfinder(ISBN, budget_s=5.0, min_sources=3)
+    assert time.monotonic() - t0 < 0.2
+    assert out["ok"] and out["late_sources"] == ["slow"]
+    assert out["cheapest"] == 9.0
+
+    await _drain_background()
+    cached = await bf.fetch_bookfinder(ISBN)
+    assert cached["cached"] is True
+    assert cached["cheapest"] == 5.0               # geç gelen kaynak cache'e yazıldı
+    assert "late_sources" not in cached
+
+
+async def test_budget_expiry_returns_partial():
+    t0 = time.monotonic()
+    out = await bf.fetch_bookfinder(ISBN, budget_s=0.1, min_sources=10)
+    assert time.monotonic() - t0 < 0.25
+    assert sorted(out["sources"]) == ["fast1", "fast2", "fast3"]
+    await _drain_background()
+
+
+async def test_no_budget_waits_for_all_sources():
+    out = await bf.fetch_bookfinder(ISBN)
+    assert "late_sources" not in out
+    assert len(out["sources"]) == 4
+
+
+def test_histogram_excludes_sources_slower_than_budget():
+    for _ in range(10):
+        bf._observe("slow", 5.0)
+        bf._observe("fast1", 0.2)
+    assert bf.latency_quantile("slow") == 8.0
+    assert bf.latency_quantile("fast1") == 0.25
+    names = [n for n, _ in bf._select_sources(2.0)]
+    assert "slow" not in names and "fast1" in names
+    assert len(bf._select_sources(None)) == 4
+
+
+def test_select_keeps_minimum_three_sources():
+    for name in ("fast1", "fast2", "fast3", "slow"):
+        for _ in range(10):
+            bf._observe(name, 5.0 if name == "slow" else 3.0)
+    assert len(bf._select_sources(1.0)) == 3
+
+
+# ── Kaynak başına cache ───────────────────────────────────────────────────────
+
+def _counting(monkeypatch, results: dict):
+    calls: list = []
+
+    def _mk(name):
+        async def _fn(c, isbn):
+            calls.append(name)
+            price = results[name]
+            if price is None:
+                return None
+            o = bf._o(price, 0.0, name, name.upper(), "USED")
+            return {"source": name, "new": None, "used": bf._stats([o]), "url": ""}
+        return _fn
+
+    monkeypatch.setattr(bf, "_SOURCES", [(n, _mk(n)) for n in results])
+    return calls
+
+
+def _age(source: str, seconds: float):
+    with bf._connect() as con:
+        con.execute(
+            "UPDATE bf_source_cache SET fetched_at = fetched_at - ? WHERE isbn=? AND source=?;",
+            (seconds, ISBN, source),
+        )
+
+
+async def test_only_stale_sources_are_refetched(monkeypatch):
+    monkeypatch.setattr(bf, "_SOURCE_TTL_S", {"bulk": 3600})
+    calls = _counting(monkeypatch, {"market": 10.0, "bulk": 8.0})
+    await bf.fetch_bookfinder(ISBN)
+    assert sorted(calls) == ["bulk", "market"]
+
+    _age("bulk", 7200)                             # bulk TTL (1h) doldu, market (24h) taze
+    calls.clear()
+    out = await bf.fetch_bookfinder(ISBN)
+    assert calls == ["bulk"]
+    assert out["cached"] is False and out["cached_sources"] == ["market"]
+    assert sorted(out["sources"]) == ["bulk", "market"]    # merge-on-read
+    assert out["cache_age_s"] < 5
+
+
+async def test_failed_source_retried_after_short_ttl(monkeypatch):
+    results = {"a": 10.0, "b": None}
+    calls = _counting(monkeypatch, results)
+    out = await bf.fetch_bookfinder(ISBN)
+    assert out["sources"] == ["a"]
+
+    calls.clear()
+    out = await bf.fetch_bookfinder(ISBN)
+    assert calls == [] and out["cached"] is True   # boş sonuç da 1h cache'te
+
+    _age("b", bf._EMPTY_TTL_S + 1)
+    results["b"] = 7.0
+    out = await bf.fetch_bookfinder(ISBN)
+    assert calls == ["b"]
+    assert out["cheapest"] == 7.0
+
+
+async def test_force_skips_recently_fetched_sources(monkeypatch):
+    calls = _counting(monkeypatch, {"a": 10.0, "b": 9.0, "c": None})
+    await bf.fetch_bookfinder(ISBN)
+    _age("a", bf._FORCE_MIN_AGE_S + 1)
+
+    calls.clear()
+    out = await bf.fetch_bookfinder(ISBN, force=True)
+    assert sorted(calls) == ["a", "c"]             # b yeni çekildi; boş c her zaman yeniden denenir
+    assert out["cheapest"] == 9.0
+
+
+async def test_condition_filter_applied_on_read(monkeypatch):
+    _counting(monkeypatch, {"a": 10.0})
+    await bf.fetch_bookfinder(ISBN, condition="all")
+    out = await bf.fetch_bookfinder(ISBN, condition="new")
+    assert out["ok"] is False and out["error"] == "Fiyat verisi bulunamadı"
+    out = await bf.fetch_bookfinder(ISBN, condition="used")
+    assert out["cached"] is True and out["cheapest"] == 10.0
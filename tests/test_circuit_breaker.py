@@ -0,0 +1,140 @@
+"""
+core/circuit_breaker.py testleri: eşik, half-open probe, backoff, yavaş çağrı,
+HTTP status sınıflandırması ve kaynak modüllerinde hızlı skip.
+"""
+from __future__ import annotations
+import asyncio
+
+import httpx
+import pytest
+
+from app.core import circuit_breaker as cb
+from app.core.circuit_breaker import CircuitBreaker, CircuitOpenError
+
+
+def _resp(status: int):
+    async def _fn():
+        return httpx.Response(status)
+    return _fn
+
+
+async def _boom():
+    raise httpx.ConnectTimeout("timeout")
+
+
+def _expire(b: CircuitBreaker) -> None:
+    b._open_until = 0.0
+
+
+class TestStateMachine:
+    async def test_opens_after_consecutive_failures(self):
+        b = CircuitBreaker("t", failure_threshold=3, open_s=60)
+        for _ in range(3):
+            with pytest.raises(httpx.ConnectTimeout):
+                await b.call(_boom)
+        assert b.state == cb.OPEN
+        with pytest.raises(CircuitOpenError):
+            await b.call(_resp(200))
+        assert b.snapshot()["rejected_total"] == 1
+
+    async def test_success_resets_failure_count(self):
+        b = CircuitBreaker("t", failure_threshold=3)
+        await b.call(_resp(500))
+        await b.call(_resp(500))
+        await b.call(_resp(200))
+        await b.call(_resp(500))
+        assert b.state == cb.CLOSED
+
+    async def test_not_found_is_not_a_failure(self):
+        b = CircuitBreaker("t", failure_threshold=1)
+        await b.call(_resp(404))
+        assert b.state == cb.CLOSED
+
+    async def test_half_open_allows_single_probe_then_closes(self):
+        b = CircuitBreaker("t", failure_threshold=1, open_s=60)
+        await b.call(_resp(429))
+        _expire(b)
+        assert b.state == cb.HALF_OPEN
+
+        gate = asyncio.Event()
+
+        async def _slow_ok():
+            await gate.wait()
+            return httpx.Response(200)
+
+        probe = asyncio.create_task(b.call(_slow_ok))
+        await asyncio.sleep(0)
+        with pytest.raises(CircuitOpenError):
+            await b.call(_resp(200))     # probe sürerken ikinci istek reddedilir
+        gate.set()
+        await probe
+        assert b.state == cb.CLOSED
+
+    async def test_failed_probe_reopens_with_backoff(self):
+        b = CircuitBreaker("t", failure_threshold=1, open_s=10, max_open_s=15)
+        await b.call(_resp(503))
+        _expire(b)
+        await b.call(_resp(503))
+        assert b.state == cb.OPEN and b._open_s == 15
+
+    async def test_slow_call_counts_as_failure(self):
+        b = CircuitBreaker("t", failure_threshold=1, slow_call_s=0.01)
+
+        async def _slow():
+            await asyncio.sleep(0.03)
+            return httpx.Response(200)
+
+        await b.call(_slow)
+        assert b.state == cb.OPEN
+        assert b.last_error.startswith("slow_")
+
+    def test_trip_and_registry_snapshot(self):
+        cb.get_breaker("x.y").trip("http_403", open_s=3600)
+        snap = cb.snapshot_all()["x.y"]
+        assert snap["state"] == cb.OPEN
+        assert snap["retry_in_s"] > 3500
+
+
+class TestSourceIntegration:
+    async def test_bookfinder_block_trips_breaker_and_skips(self):
+        from app import bookfinder_client as bf
+        calls = []
+
+        def handler(request):
+            calls.append(str(request.url))
+            return httpx.Response(403)
+
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as c:
+            assert await bf._src_bookfinder(c, "9780132350884") is None
+            assert await bf._src_bookfinder(c, "9780132350884") is None
+        assert len(calls) == 1
+        assert cb.get_breaker("bookfinder.bookfinder").snapshot()["retry_in_s"] > 3500
+
+    async def test_open_source_makes_no_request(self):
+        from app import bookfinder_client as bf
+        calls = []
+
+        def handler(request):
+            calls.append(1)
+            return httpx.Response(200, text="")
+
+        bf._breaker("abebooks").trip("test")
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as c:
+            assert await bf._src_abebooks(c, "9780132350884") is None
+        assert calls == []
+
+    async def test_sold_scraper_captcha_pages_open_circuit(self):
+        from app import sold_scraper
+        calls = []
+
+        def handler(request):
+            calls.append(1)
+            return httpx.Response(200, text='<html><form action="/splashui/captcha_submit"></form></html>')
+
+        threshold = sold_scraper._breaker().failure_threshold
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as c:
+            for _ in range(threshold + 2):
+                prices, _url, items = await sold_scraper._fetch_condition(c, "9780132350884", "")
+                assert prices == [] and items == []
+        assert sold_scraper._breaker().snapshot()["state"] == "open"
+        assert len(calls) == threshold
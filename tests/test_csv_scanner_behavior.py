@@ -78,3 +78,59 @@ async def test_buyback_filter_rejects_no_buyback_data(monkeypatch):
     results = await scanner._scan_one(
         "9780132350884", scanner.ScanFilters(buyback_only=True), scanner.DEFAULT_FEES)
     assert not any(r.accepted for r in results)
+
+
+# ── Toplu metadata prefetch: gate + cancel ────────────────────────────────────
+
+def _isbn_list(n):
+    return [f"97800000{i:05d}" for i in range(n)]
+
+
+@pytest.mark.asyncio
+async def test_bulk_prefetch_runs_inside_gate_slot(monkeypatch):
+    import contextlib
+    import app.ai_analyst as ai_analyst
+    held = []
+
+    @contextlib.asynccontextmanager
+    async def gate():
+        held.append(1)
+        try:
+            yield
+        finally:
+            held.pop()
+
+    async def fake_bulk(isbns, client=None):
+        assert held, "prefetch gate slot'u dışında çalıştı"
+
+    async def fake_scan_one(isbn, filters, fees, **kw):
+        return []
+
+    monkeypatch.setattr(ai_analyst, "resolve_editions_bulk", fake_bulk)
+    monkeypatch.setattr(scanner, "_scan_one", fake_scan_one)
+    out = await scanner.scan_isbn_list(_isbn_list(scanner._BULK_META_MIN), scanner.ScanFilters(), gate=gate)
+    assert out["accepted"] == []
+
+
+@pytest.mark.asyncio
+async def test_cancel_interrupts_bulk_prefetch(monkeypatch):
+    import asyncio
+    import time
+    import app.ai_analyst as ai_analyst
+    cancel = asyncio.Event()
+    scanned = []
+
+    async def slow_bulk(isbns, client=None):
+        await asyncio.sleep(30)
+
+    async def fake_scan_one(isbn, filters, fees, **kw):
+        scanned.append(isbn)
+        return []
+
+    monkeypatch.setattr(ai_analyst, "resolve_editions_bulk", slow_bulk)
+    monkeypatch.setattr(scanner, "_scan_one", fake_scan_one)
+    asyncio.get_running_loop().call_later(0.05, cancel.set)
+    t0 = time.monotonic()
+    await scanner.scan_isbn_list(_isbn_list(scanner._BULK_META_MIN), scanner.ScanFilters(), cancel_event=cancel)
+    assert time.monotonic() - t0 < 5
+    assert scanned == []
@@ -0,0 +1,54 @@
+"""
+finding_cache testleri: SQLite indeksli cache — get/set/stale, ISBN başına silme,
+istatistikler, compactor ve eski JSON dosyalarının taşınması.
+"""
+from __future__ import annotations
+import json
+import time
+
+from app import finding_cache as fc
+
+
+def test_roundtrip_ttl_and_stale(monkeypatch):
+    fc.set_cached("isbn1", 30, "used", [10.0, 12.5])
+    assert fc.get_cached("isbn1", 30, "used") == [10.0, 12.5]
+    assert fc.get_cached("isbn1", 30, None) is None
+    real = time.time()
+    monkeypatch.setattr(fc.time, "time", lambda: real + fc._SHORT_TTL + 60)
+    assert fc.get_cached("isbn1", 30, "used") is None              # TTL doldu
+    assert fc.get_stale("isbn1", 30, "used") == [10.0, 12.5]       # fallback hâlâ var
+
+
+def test_clear_isbn_only_touches_that_isbn():
+    for days in (30, 90):
+        for cond in ("new", "used", None):
+            fc.set_cached("isbn1", days, cond, [1.0])
+    fc.set_cached("isbn2", 30, None, [2.0])
+    assert fc.clear_isbn("isbn1") == 6
+    assert fc.get_cached("isbn1", 30, "new") is None
+    assert fc.get_cached("isbn2", 30, None) == [2.0]
+    st = fc.cache_stats()
+    assert (st["entries"], st["isbns"], st["stale"]) == (1, 1, 0) and st["bytes"] > 0
+
+
+def test_compact_removes_only_past_grace():
+    fc.set_cached("isbn1", 30, None, [1.0])
+    fc.set_cached("isbn2", 365, None, [2.0])
+    now = time.time()
+    assert fc.compact(now + fc._SHORT_TTL + 60) == 0                 # stale ama grace içinde
+    assert fc.compact(now + fc._SHORT_TTL + fc._STALE_GRACE + 60) == 1
+    assert fc.get_stale("isbn1", 30, None) is None
+    assert fc.get_stale("isbn2", 365, None) == [2.0]
+    assert fc.cache_stats()["last_compact"]["removed"] == 1
+
+
+def test_legacy_json_files_migrated(monkeypatch, tmp_path):
+    d = tmp_path / "legacy_fc"
+    d.mkdir()
+    (d / "0123456789abcdef.json").write_text(json.dumps(
+        {"ts": time.time(), "totals": [9.5], "isbn": "isbn9", "days": 90, "condition": "used"}))
+    (d / "notes.json").write_text("{}")
+    monkeypatch.setattr(fc, "_cache_dir", lambda: d)
+    assert fc.get_cached("isbn9", 90, "used") == [9.5]
+    assert not (d / "0123456789abcdef.json").exists()
+    assert (d / "notes.json").exists()
@@ -0,0 +1,93 @@
+"""
+finding_sold testleri: ISBN başına tek (sayfalı) Finding çağrısı, pencere/koşul türetme,
+eşzamanlı çağrıların paylaşımı, cache ve stale fallback.
+"""
+from __future__ import annotations
+import asyncio
+import time
+from datetime import datetime, timezone
+
+import httpx
+import pytest
+
+from app import finding_cache, finding_sold, sold_items_store
+from app.core.config import get_settings
+
+NOW = time.time()
+
+
+def _iso(days_ago: float) -> str:
+    return datetime.fromtimestamp(NOW - days_ago * 86400, timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.000Z")
+
+
+def _item(i, price, days_ago, cond="Used"):
+    return {"itemId": [str(i)], "sellingStatus": [{"currentPrice": [{"__value__": str(price)}]}],
+            "condition": [{"conditionDisplayName": [cond]}],
+            "listingInfo": [{"endTime": [_iso(days_ago)]}]}
+
+
+def _page(items, total_pages=1):
+    return {"findCompletedItemsResponse": [{
+        "searchResult": [{"item": items}],
+        "paginationOutput": [{"totalPages": [str(total_pages)]}],
+    }]}
+
+
+class _Client:
+    def __init__(self, pages, status=200):
+        self.pages, self.status, self.calls = pages, status, []
+
+    async def get(self, url, params=None, timeout=None):
+        self.calls.append(dict(params))
+        await asyncio.sleep(0)
+        page = int(params["paginationInput.pageNumber"])
+        req = httpx.Request("GET", url)
+        if self.status != 200:
+            return httpx.Response(self.status, text="boom", request=req)
+        return httpx.Response(200, json=self.pages[page - 1], request=req)
+
+
+@pytest.fixture(autouse=True)
+def _app_id(monkeypatch):
+    monkeypatch.setattr(get_settings(), "ebay_app_id", "test-app")
+    finding_sold._inflight.clear()
+
+
+async def test_single_call_serves_all_windows_and_conditions():
+    client = _Client([_page([_item(1, 10, 5), _item(2, 20, 40, "Brand New"), _item(3, 30, 80)])])
+    res = await finding_sold.fetch(client, "978-0132350884")
+    assert res["source"] == "live" and len(client.calls) == 1
+    items = res["items"]
+    assert finding_sold.window(items, 30, "used") == [10.0]
+    assert sorted(finding_sold.window(items, 90, "used")) == [10.0, 30.0]
+    assert finding_sold.window(items, 90, "new") == [20.0]
+    assert (await finding_sold.fetch(client, "9780132350884"))["source"] == "cache"
+    assert len(client.calls) == 1
+    assert sold_items_store.count("9780132350884") == 3
+
+
+async def test_pagination_and_summary():
+    full = [_item(i, 10 + i % 5, 10) for i in range(100)]
+    client = _Client([_page(full, 2), _page([_item(500, 99, 1, "Brand New")], 2)])
+    st = await finding_sold.fetch_sold_stats(client, "isbn1")
+    assert [c["paginationInput.pageNumber"] for c in client.calls] == ["1", "2"]
+    assert st["sold_count"] == 101 and st["sold_max"] == 99
+    assert st["by_condition"]["brand_new"]["count"] == 1
+
+
+async def test_concurrent_callers_share_one_request():
+    client = _Client([_page([_item(1, 10, 5)])])
+    a, b = await asyncio.gather(finding_sold.fetch(client, "isbn1"), finding_sold.fetch(client, "isbn1"))
+    assert a["items"] == b["items"] and len(client.calls) == 1
+
+
+async def test_error_and_backoff_fall_back_to_stale(monkeypatch):
+    finding_cache.set_cached("isbn1", 90, "items", [{"item_id": "1", "total": 7.0, "cond": "good"}])
+    monkeypatch.setattr(finding_cache, "get_cached", lambda *a: None)
+    res = await finding_sold.fetch(_Client([], status=503), "isbn1")
+    assert res["source"] == "stale" and res["items"][0]["total"] == 7.0
+
+    monkeypatch.setattr(finding_cache, "is_rate_limited", lambda: True)
+    client = _Client([])
+    assert (await finding_sold.fetch(client, "isbn2"))["source"] == "empty"
+    assert client.calls == []
@@ -0,0 +1,59 @@
+"""
+html_extract: bölge bulucular, fixture corpus'u üzerinde kaynak parser doğruluğu
+ve büyük dokümanların thread'e aktarılması.
+"""
+from __future__ import annotations
+import json
+import threading
+from pathlib import Path
+
+import pytest
+
+from app import bookfinder_client as bf, html_extract, sold_scraper
+
+FIXTURES = Path(__file__).parent / "fixtures" / "html"
+EXPECTED = json.loads((FIXTURES / "expected.json").read_text())
+
+
+@pytest.mark.parametrize("source", sorted(EXPECTED))
+def test_fixture_corpus_accuracy(source):
+    html = (FIXTURES / f"{source}.html").read_text()
+    if source == "ebay_sold":
+        assert sold_scraper._parse_prices(html) == EXPECTED[source]
+    else:
+        assert sorted(o["total"] for o in bf.PARSERS[source](html)) == sorted(EXPECTED[source])
+
+
+def test_every_bookfinder_source_has_parser():
+    assert set(bf.PARSERS) == {name for name, _ in bf._SOURCES}
+
+
+def test_jsonld_blobs_skips_other_scripts():
+    html = (
+        '<script type="application/json">{"a":1}</script>'
+        '<p>ld+json mentioned in text</p>'
+        '<script id="x" type="application/ld+json">{"b":2}</script>'
+        "<script type='application/ld+json'>{\"c\":3}</script>"
+    )
+    assert html_extract.jsonld_blobs(html) == ['{"b":2}', '{"c":3}']
+    assert html_extract.jsonld_blobs("<html></html>") == []
+
+
+def test_rsc_chunks_filters_by_needle():
+    html = 'self.__next_f.push([1,"a"]) self.__next_f.push([1,"has newOffers"]) self.__next_f.push([1,"b'
+    assert list(html_extract.rsc_chunks(html)) == ["a", "has newOffers"]
+    assert list(html_extract.rsc_chunks(html, "newOffers")) == ["has newOffers"]
+
+
+def test_ebay_sold_prices_without_marker_is_empty():
+    assert html_extract.ebay_sold_prices("<div>$12.00</div>") == []
+    assert html_extract.ebay_sold_prices('<span class="S-ITEM__PRICE">$1,200.50</span>') == [1200.5]
+
+
+async def test_large_documents_parsed_off_loop(monkeypatch):
+    monkeypatch.setattr(html_extract, "get_settings", lambda: type("S", (), {"html_offload_min_kb": 1})())
+    seen = []
+    fn = lambda h: seen.append(threading.current_thread() is threading.main_thread()) or len(h)
+    assert await html_extract.run(fn, "x" * 100) == 100
+    assert await html_extract.run(fn, "x" * 4096) == 4096
+    assert seen == [True, False]
@@ -0,0 +1,118 @@
+"""
+image_cache testleri: eBay boyut varyantı, URL başına tek indirme, aynı içeriğin (stok görsel)
+tekilleştirilmesi ve daha önce değerlendirilmiş görselde vision çağrısının atlanması.
+"""
+from __future__ import annotations
+import json
+
+import httpx
+import pytest
+
+import app.listing_verifier as lv
+from app import image_cache
+
+STOCK = b"\xff\xd8\xff\xe0stock-cover-bytes"
+
+
+def _transport(hits):
+    def handler(request):
+        hits.append(str(request.url))
+        if request.url.path.endswith(".txt"):
+            return httpx.Response(200, text="not an image", headers={"content-type": "text/plain"})
+        return httpx.Response(200, content=STOCK, headers={"content-type": "image/jpeg"})
+    return httpx.MockTransport(handler)
+
+
+def test_sized_url_picks_ebay_variant():
+    url = "https://i.ebayimg.com/images/g/abc/s-l1600.jpg"
+    assert image_cache.sized_url(url, 640) == "https://i.ebayimg.com/images/g/abc/s-l640.jpg"
+    assert image_cache.sized_url(url, 450) == "https://i.ebayimg.com/images/g/abc/s-l400.jpg"
+    assert image_cache.sized_url("https://i.ebayimg.com/images/g/abc/s-l300.jpg", 640).endswith("s-l300.jpg")
+    assert image_cache.sized_url("https://example.com/s-l1600.jpg", 640) == "https://example.com/s-l1600.jpg"
+
+
+async def test_fetch_once_per_url_and_dedup_by_content():
+    hits = []
+    async with httpx.AsyncClient(transport=_transport(hits)) as client:
+        a = await image_cache.fetch("https://i.ebayimg.com/images/g/a/s-l1600.jpg", client)
+        again = await image_cache.fetch("https://i.ebayimg.com/images/g/a/s-l1600.jpg", client)
+        b = await image_cache.fetch("https://i.ebayimg.com/images/g/b/s-l1600.jpg", client)
+        assert await image_cache.fetch("https://example.com/x.txt", client) is None
+
+    assert hits[0].endswith("/a/s-l640.jpg") and len(hits) == 3     # a, b, txt — tekrar yok
+    assert again["from_cache"] and not a["deduped"] and b["deduped"]
+    assert a["sha"] == b["sha"] and a["b64"] == b["b64"]
+    st = image_cache.stats()
+    assert (st["images"], st["urls"]) == (1, 2)
+
+
+def test_verdict_expires_and_follows_image_eviction(monkeypatch):
+    from app.core.config import get_settings
+    monkeypatch.setattr(get_settings(), "image_cache_max_entries", 1)
+    old = image_cache._store("https://x.test/a.jpg", b"a-bytes", "image/jpeg", now=1000)
+    d_old = image_cache.digest(old["b64"])
+    image_cache.put_verdict(d_old, "9780132350884", {"verdict": "MATCH"}, now=1000)
+    assert image_cache.get_verdict(d_old, "9780132350884", now=1000 + 60) == {"verdict": "MATCH"}
+    assert image_cache.get_verdict(d_old, "9780132350884", now=1000 + image_cache._VERDICT_TTL_S) is None
+
+    image_cache._store("https://x.test/b.jpg", b"b-bytes", "image/jpeg", now=2000)   # a evict edilir
+    assert image_cache.stats()["images"] == 1
+    assert image_cache.get_verdict(d_old, "9780132350884", now=2000) is None
+    assert image_cache.stats()["verdicts"] == 0
+
+    image_cache.put_verdict("d1", "9780132350884", {"verdict": "MATCH"}, now=3000)
+    image_cache.put_verdict("d2", "9780132350884", {"verdict": "MATCH"}, now=3000 + image_cache._VERDICT_TTL_S)
+    assert image_cache.stats()["verdicts"] == 1      # süresi dolan satır yazarken temizlenir
+
+
+def test_downscale_with_pillow():
+    Image = pytest.importorskip("PIL.Image")
+    import io
+    buf = io.BytesIO()
+    Image.new("RGB", (1600, 1200), "white").save(buf, "PNG")
+    out, mime, w, h = image_cache._downscale(buf.getvalue(), "image/png", 640)
+    assert (mime, w, h) == ("image/jpeg", 640, 480) and len(out) < len(buf.getvalue())
+
+
+async def test_seen_image_skips_vision_call(monkeypatch):
+    hits, calls = [], []
+    real_client = httpx.AsyncClient
+    monkeypatch.setattr(lv.httpx, "AsyncClient", lambda **kw: real_client(transport=_transport(hits)))
+
+    async def fake_route(**kw):
+        calls.append(kw)
+        return {"text": json.dumps({"verdict": "MATCH", "confidence": 90, "notes": "ok", "is_stock_photo": True}),
+                "provider": "gemini_flash", "model": "m"}
+
+    monkeypatch.setattr("app.llm_router.route", fake_route)
+    first = await lv._verify_image_vision("https://i.ebayimg.com/images/g/a/s-l1600.jpg", "9780132350884",
+                                          "Clean Code", {"source_condition": "used"})
+    # Başka satıcı, aynı stok görsel → indirme var, vision yok
+    second = await lv._verify_image_vision("https://i.ebayimg.com/images/g/b/s-l1600.jpg", "9780132350884",
+                                           "Clean Code", {"source_condition": "used"})
+    assert len(calls) == 1 and len(hits) == 2
+    assert first["verdict"] == second["verdict"] == "MATCH"
+    assert second["from_image_cache"] and second["stock_photo_risk"]
+    assert second["notes"].count("⚠️") == 1
+
+
+async def test_analyst_reuses_image_verdict_without_vision(monkeypatch):
+    from app import ai_analyst, llm_router
+    monkeypatch.setattr(llm_router, "get_status", lambda: {"stub": {"configured": True}})
+    seen_images = []
+
+    async def fake_edition(isbn, client): return {}
+    async def fake_fetch(url, client): return "c3RvY2s="
+    async def fake_call_llm(prompt, image_b64):
+        seen_images.append(image_b64)
+        return ai_analyst._parse_json(json.dumps({"verdict": "WATCH", "image_verdict": "MATCH" if image_b64 else "NO_IMAGE",
+                                                  "image_notes": "cover ok"}))
+    monkeypatch.setattr(ai_analyst, "_check_edition", fake_edition)
+    monkeypatch.setattr(ai_analyst, "_fetch_image_b64", fake_fetch)
+    monkeypatch.setattr(ai_analyst, "_call_llm", fake_call_llm)
+
+    cand = {"buy_price": 20.0, "ebay_image_url": "https://i.ebayimg.com/images/g/a/s-l1600.jpg"}
+    await ai_analyst.analyze_isbn("9780132350884", {**cand, "item_id": "one"})
+    r = await ai_analyst.analyze_isbn("9780132350884", {**cand, "item_id": "two"})
+    assert seen_images == ["c3RvY2s=", None]                      # ikinci istek reasoning task
+    assert r["image_verdict"] == "MATCH" and r["image_from_cache"] and r["image_verified"]
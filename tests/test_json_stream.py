@@ -0,0 +1,68 @@
+"""
+JsonStreamValidator testleri: parça sınırından bağımsız sonuç, _parse_json toleransları
+(fence / önsöz / sondaki virgül), kesin bozuk çıktının ilk fırsatta yakalanması ve
+required alanlar tamamlanınca kapatılmış JSON üretimi.
+"""
+from __future__ import annotations
+import json
+
+import pytest
+
+from app.core.json_stream import JsonStreamValidator
+
+OBJ = {"verdict": "BUY", "confidence": 70, "risks": ["a", {"x": [1, 2.5e3]}], "ok": True, "n": None,
+       "s": 'q"}'}
+
+
+def _feed(text, step, **kw):
+    v = JsonStreamValidator(**kw)
+    for i in range(0, len(text), step):
+        v.feed(text[i:i + step])
+        if v.invalid or v.satisfied:
+            break
+    return v
+
+
+@pytest.mark.parametrize("step", [1, 3, 1000])
+def test_complete_object_any_chunking(step):
+    v = _feed("Here you go:\n```json\n" + json.dumps(OBJ) + "\n```\nDone.", step)
+    assert v.complete and v.invalid is None
+    assert json.loads(v.text()) == OBJ
+    assert v.fields == set(OBJ)
+
+
+def test_trailing_commas_tolerated():
+    v = _feed('{"a": [1, 2,], "b": {"c": 1,},}', 1)
+    assert v.complete and v.invalid is None
+
+
+@pytest.mark.parametrize("text", [
+    '{verdict: "BUY"}',            # tırnaksız anahtar
+    "{'verdict': 'BUY'}",          # tek tırnak
+    '{"verdict": BUY}',            # tırnaksız değer
+    '{"a": tru}', '{"a": 01}',     # bozuk literal
+    '{"a": [1}',                   # eşleşmeyen kapanış
+    '{"a": 1 "b": 2}',             # virgül eksik
+])
+def test_invalid_detected(text):
+    assert _feed(text, 1).invalid
+
+
+def test_invalid_detected_before_end():
+    v = _feed('{"verdict": nope, "confidence": 50, "summary": "..."}', 1)
+    assert v.invalid and v._pos < 16
+
+
+def test_preamble_limit():
+    assert _feed("I cannot help with that. " * 5, 4, max_preamble=50).invalid == "no_json"
+    assert _feed('```json\n{"a": 1}', 4, max_preamble=16).complete
+
+
+def test_required_fields_close_partial_object():
+    v = _feed('{"verdict": "WATCH", "risks": ["x", "y"], "summary": "long text that is never fin', 5,
+              required=("verdict", "risks"))
+    assert v.satisfied and not v.complete
+    assert json.loads(v.text()) == {"verdict": "WATCH", "risks": ["x", "y"]}
+
+    v = _feed('{"verdict": "WATCH", "summ', 5, required=("verdict", "confidence"))
+    assert not v.satisfied and v.missing == {"confidence"}
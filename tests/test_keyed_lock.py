@@ -0,0 +1,73 @@
+"""
+KeyedLock testleri: aynı anahtar serileşir, farklı anahtarlar paralel; suggested_price
+ve ai_analyst farklı ISBN'leri tek bir kilit arkasında sıraya sokmaz.
+"""
+from __future__ import annotations
+import asyncio
+import time
+
+import pytest
+
+from app import suggested_price
+from app.core.keyed_lock import KeyedLock
+
+DELAY = 0.1
+
+
+async def test_same_key_serializes_other_keys_run_in_parallel():
+    locks = KeyedLock()
+    order = []
+
+    async def work(key, tag):
+        async with locks(key):
+            order.append(f"{tag}+")
+            await asyncio.sleep(0.02)
+            order.append(f"{tag}-")
+
+    await asyncio.gather(work("a", "a1"), work("a", "a2"), work("b", "b1"))
+    assert order.index("a1-") < order.index("a2+")      # aynı anahtar sırayla
+    assert order.index("b1+") < order.index("a1-")      # farklı anahtar beklemedi
+    assert len(locks) == 0                              # kullanılmayan kilit silinir
+
+
+async def test_lock_released_on_exception():
+    locks = KeyedLock()
+    with pytest.raises(RuntimeError):
+        async with locks("k"):
+            raise RuntimeError("boom")
+    assert "k" not in locks
+    async with locks("k"):
+        assert locks.locked("k")
+
+
+@pytest.fixture
+def _sgprice(monkeypatch, tmp_path):
+    monkeypatch.setattr(suggested_price, "DATA_DIR", tmp_path)
+    monkeypatch.setattr(suggested_price, "CACHE_FILE", tmp_path / "suggested_price_cache.json")
+    calls = []
+
+    async def fake_avg(client, isbn, days):
+        calls.append((isbn, days))
+        await asyncio.sleep(DELAY)
+        return 10.0
+
+    monkeypatch.setattr(suggested_price, "_finding_sold_avg", fake_avg)
+    return calls
+
+
+async def test_suggested_price_different_isbns_resolve_in_parallel(_sgprice):
+    isbns = [f"97800000000{i:02d}" for i in range(8)]
+    t0 = time.perf_counter()
+    results = await asyncio.gather(*(suggested_price.get_suggested_price(i) for i in isbns))
+    elapsed = time.perf_counter() - t0
+
+    per_isbn = DELAY * len(suggested_price._PERIODS)
+    assert elapsed < per_isbn * 2                       # global kilitte ~8 × per_isbn sürerdi
+    assert all(r["suggested"] == 10 for r in results)
+    cache = suggested_price._read_cache_unsafe()
+    assert set(cache) == set(isbns)                     # eşzamanlı yazımlar birbirini ezmedi
+
+
+async def test_suggested_price_same_isbn_refreshes_once(_sgprice):
+    await asyncio.gather(*(suggested_price.get_suggested_price("9780132350884") for _ in range(4)))
+    assert len(_sgprice) == len(suggested_price._PERIODS)   # ikinci/üçüncü çağrı cache'ten okudu
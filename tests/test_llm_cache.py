@@ -0,0 +1,74 @@
+"""
+llm_cache testleri: normalize anahtar, TTL, LRU sınırı ve route(cache_ttl_s=...) ile
+tekrar çağrının / eşzamanlı çağrının kota harcamaması.
+"""
+from __future__ import annotations
+import asyncio
+
+import pytest
+
+import app.llm_router as router
+from app import llm_cache
+from app.core.config import get_settings
+
+
+def _res(text="ok"):
+    return {"text": text, "provider": "groq", "model": "llama"}
+
+
+def test_key_normalizes_whitespace_and_separates_inputs():
+    k = llm_cache.make_key("reasoning", ["groq"], "sys", "Hello\n   world ")
+    assert k == llm_cache.make_key("reasoning", ["groq"], " sys", "Hello world")
+    assert k != llm_cache.make_key("vision", ["groq"], "sys", "Hello world")
+    assert k != llm_cache.make_key("reasoning", ["groq", "gemini"], "sys", "Hello world")
+    assert k != llm_cache.make_key("reasoning", ["groq"], "sys", "Hello world", image_b64="AAAA")
+    assert k != llm_cache.make_key("reasoning", ["groq"], "sys", "Hello world", json_mode=True)
+
+
+def test_ttl_and_lru_eviction(monkeypatch):
+    llm_cache.put("a", "reasoning", _res("A"), ttl_s=100, now=1000)
+    assert llm_cache.get("a", now=1050)["text"] == "A"
+    assert llm_cache.get("a", now=1100) is None
+
+    monkeypatch.setattr(get_settings(), "llm_cache_max_entries", 2)
+    llm_cache.put("b", "reasoning", _res("B"), ttl_s=10 ** 6, now=2000)
+    llm_cache.put("c", "reasoning", _res("C"), ttl_s=10 ** 6, now=2001)
+    llm_cache.get("b", now=2002)                      # b yakın zamanda kullanıldı
+    llm_cache.put("d", "vision", _res("D"), ttl_s=10 ** 6, now=2003)
+    assert llm_cache.get("c", now=2004) is None       # en uzun süredir kullanılmayan
+    assert llm_cache.get("b", now=2004) and llm_cache.get("d", now=2004)
+    st = llm_cache.stats()
+    assert st["entries"] == 2 and st["by_task"] == {"reasoning": 1, "vision": 1}
+
+
+@pytest.fixture
+def _provider(monkeypatch):
+    monkeypatch.setattr(router, "_get_api_key", lambda defn: "k" if defn.name == "groq" else None)
+    router._states.clear()
+    calls = []
+
+    async def fake_call(defn, api_key, messages, max_tokens=1200, image_b64=None, json_mode=False):
+        calls.append(messages[-1]["content"])
+        await asyncio.sleep(0.02)
+        return '{"verdict": "BUY"}'
+
+    monkeypatch.setattr(router, "_call_openai_compat", fake_call)
+    return calls
+
+
+async def test_route_serves_repeat_and_concurrent_calls_from_cache(_provider):
+    kw = dict(task="reasoning", system_prompt="s", user_prompt="u", cache_ttl_s=3600)
+    first, second = await asyncio.gather(router.route(**kw), router.route(**kw))
+    assert len(_provider) == 1
+    assert "cached" not in first and second["cached"] is True and second["text"] == first["text"]
+
+    third = await router.route(**{**kw, "user_prompt": "  u\n"})
+    assert third["cached"] is True and len(_provider) == 1
+    assert router._get_state("groq").requests_today == 1     # kota sayacı artmadı
+
+
+async def test_route_without_ttl_never_caches(_provider):
+    for _ in range(2):
+        r = await router.route(task="reasoning", system_prompt="s", user_prompt="u")
+        assert "cached" not in r
+    assert len(_provider) == 2 and llm_cache.stats()["entries"] == 0
@@ -0,0 +1,95 @@
+"""
+llm_quota_store testleri: provider sıfırlama saatine hizalı gün, atomik reserve (eşzamanlı
+yazarlar limiti aşamaz), restart / ayrı süreç sonrası sayaç ve backoff'un korunması.
+"""
+from __future__ import annotations
+import threading
+from datetime import datetime, timezone
+
+import pytest
+
+import app.llm_router as router
+from app import llm_quota_store as q
+
+
+def _ts(s: str) -> float:
+    return datetime.fromisoformat(s).replace(tzinfo=timezone.utc).timestamp()
+
+
+def test_day_key_aligned_to_provider_reset():
+    # 06:00 UTC = 23:00 PDT (önceki gün) → Gemini günü henüz değişmedi
+    now = _ts("2026-07-02T06:00:00")
+    assert q.day_key("UTC", now=now) == "2026-07-02"
+    assert q.day_key("America/Los_Angeles", now=now) == "2026-07-01"
+    assert q.day_key("America/Los_Angeles", now=_ts("2026-07-02T07:30:00")) == "2026-07-02"
+    assert q.day_key("UTC", reset_hour=8, now=now) == "2026-07-01"
+    assert q.day_key("Not/AZone", now=now) == "2026-07-02"          # bilinmeyen tz → UTC
+
+
+def test_reserve_enforces_limits_and_windows():
+    now = 1_000_000.0
+    for _ in range(3):
+        assert q.reserve("p", rpm=10, rpd=3, dk="d1", now=now)["ok"]
+    r = q.reserve("p", rpm=10, rpd=3, dk="d1", now=now + 61)
+    assert (r["ok"], r["reason"], r["requests_today"]) == (False, "rpd", 3)
+    assert q.reserve("p", rpm=10, rpd=3, dk="d2", now=now + 62)["requests_today"] == 1   # yeni gün
+
+    assert q.reserve("m", rpm=2, rpd=None, dk="d1", now=now)["ok"]
+    assert q.reserve("m", rpm=2, rpd=None, dk="d1", now=now + 1)["ok"]
+    assert q.reserve("m", rpm=2, rpd=None, dk="d1", now=now + 2)["reason"] == "rpm"
+    assert q.reserve("m", rpm=2, rpd=None, dk="d1", now=now + 61)["ok"]                 # yeni dakika
+
+    q.set_backoff("m", now + 500, "d1", now=now)
+    q.set_backoff("m", now + 100, "d1", now=now)                     # kısa backoff uzunu ezmez
+    assert q.reserve("m", rpm=2, rpd=None, dk="d1", now=now + 400)["reason"] == "backoff"
+    assert q.load({"m": "d1"}, now=now + 400)["m"]["backoff_until"] == now + 500
+
+
+def test_concurrent_writers_never_overshoot():
+    ok = []
+
+    def worker():
+        for _ in range(5):
+            ok.append(q.reserve("shared", rpm=1000, rpd=25, dk="d")["ok"])
+
+    threads = [threading.Thread(target=worker) for _ in range(10)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert sum(ok) == 25 and len(ok) == 50
+
+
+@pytest.fixture
+def _one_provider(monkeypatch):
+    defn = router.ProviderDef(name="solo", base_url="http://x", model="m", tasks=["reasoning"],
+                              rpm=100, rpd=2, auth_env_key="k", priority=1)
+    monkeypatch.setattr(router, "PROVIDERS", [defn])
+    monkeypatch.setattr(router, "_get_api_key", lambda d: "key")
+    router._states.clear()
+    return defn
+
+
+async def test_router_quota_survives_restart(monkeypatch, _one_provider):
+    async def fake(defn, api_key, messages, max_tokens=1200, image_b64=None, json_mode=False):
+        return "ok"
+
+    monkeypatch.setattr(router, "_call_openai_compat", fake)
+    await router.route("reasoning", "s", "u1")
+    router._states.clear()                                            # restart / başka süreç
+    assert router.get_status()["solo"]["requests_today"] == 1
+    await router.route("reasoning", "s", "u2")
+    router._states.clear()
+    with pytest.raises(RuntimeError, match="başarısız"):
+        await router.route("reasoning", "s", "u3")                    # rpd=2 tüm süreçlerde doldu
+
+
+async def test_router_shares_rate_limit_backoff(monkeypatch, _one_provider):
+    async def limited(defn, api_key, messages, max_tokens=1200, image_b64=None, json_mode=False):
+        raise router._RateLimitError(120)
+
+    monkeypatch.setattr(router, "_call_openai_compat", limited)
+    with pytest.raises(RuntimeError):
+        await router.route("reasoning", "s", "u")
+    router._states.clear()
+    assert router.get_status()["solo"]["backoff_remaining_s"] > 100
@@ -975,3 +975,196 @@ class TestEdgeCases:
         """Multiple get_state calls for same provider."""
         states = [_get_state("test") for _ in range(100)]
         assert all(s is states[0] for s in states)
+
+
+# ─── Adaptive Selection / Hedging ────────────────────────────────────────────
+
+def _tier_defs(*names, rpm=60):
+    return [ProviderDef(name=n, base_url="http://x", model=n, tasks=["reasoning"], rpm=rpm, rpd=None,
+                        auth_env_key="k", priority=i, tier=1) for i, n in enumerate(names)]
+
+
+class TestAdaptiveSelection:
+
+    def test_inflight_cap_derived_from_rpm_and_latency(self):
+        defn = _tier_defs("a", rpm=30)[0]
+        st = _get_state("a")
+        assert st.max_inflight(defn) == 3                 # 30/60 × 5s varsayılan
+        st.latency_ewma_s = 1.0
+        assert st.max_inflight(defn) == 1
+        st.inflight = 1
+        assert not st.has_capacity(defn)
+
+    def test_ewma_tracks_latency_and_errors(self):
+        st = _get_state("a")
+        st.record_success(latency_s=2.0)
+        assert st.latency_ewma_s == 2.0
+        st.record_success(latency_s=7.0)
+        assert st.latency_ewma_s == pytest.approx(3.0)
+        st.record_error()
+        assert st.error_ewma == pytest.approx(0.2)
+        st.record_success()
+        assert st.error_ewma == pytest.approx(0.16)
+
+    def test_plan_spreads_load_within_tier(self):
+        defs = _tier_defs("a", "b")
+        firsts = {router._plan(defs)[0].name for _ in range(200)}
+        assert firsts == {"a", "b"}
+
+    def test_plan_prefers_fast_healthy_and_moves_saturated_last(self):
+        a, b, c = _tier_defs("a", "b", "c")
+        _get_state("a").latency_ewma_s = 10.0
+        _get_state("a").error_ewma = 0.5
+        _get_state("b").latency_ewma_s = 1.0
+        wins = sum(router._plan([a, b])[0].name == "b" for _ in range(300))
+        assert wins > 270
+        _get_state("b").inflight = 99                     # eşzamanlılık sınırında
+        assert [d.name for d in router._plan([a, b, c])][-1] == "b"
+
+    def test_lower_tier_always_before_higher(self):
+        low, high = _tier_defs("low", "high")
+        high.tier = 2
+        _get_state("low").latency_ewma_s = 30.0
+        assert all(router._plan([high, low])[0].name == "low" for _ in range(50))
+
+    def test_status_exposes_metrics(self):
+        info = get_status()["groq"]
+        for k in ("tier", "inflight", "max_inflight", "latency_ewma_s", "error_rate"):
+            assert k in info
+
+    @pytest.mark.asyncio
+    async def test_hedge_sends_to_second_provider_after_threshold(self, monkeypatch):
+        defs = _tier_defs("slow", "fast")
+        defs[1].tier = 2                                  # sıra sabit: slow → fast
+        monkeypatch.setattr(router, "PROVIDERS", defs)
+        monkeypatch.setattr(router, "_get_api_key", lambda d: "key")
+        cancelled = []
+
+        async def fake_openai(defn, api_key, messages, max_tokens=1200, image_b64=None, json_mode=False):
+            if defn.name == "slow":
+                try:
+                    await asyncio.sleep(5)
+                except asyncio.CancelledError:
+                    cancelled.append(defn.name)
+                    raise
+            return defn.name
+
+        monkeypatch.setattr(router, "_call_openai_compat", fake_openai)
+        t0 = time.monotonic()
+        result = await route("reasoning", "sys", "user", hedge_after_s=0.05)
+        assert result["provider"] == "fast" and time.monotonic() - t0 < 1
+        assert cancelled == ["slow"]
+        assert _get_state("slow").inflight == 0 and _get_state("slow").consecutive_errors == 0
+
+    @pytest.mark.asyncio
+    async def test_burst_overflows_to_next_provider(self, monkeypatch):
+        defs = _tier_defs("a", "b", rpm=6)                # cap = ceil(6/60 × 5s) = 1
+        defs[1].tier = 2
+        monkeypatch.setattr(router, "PROVIDERS", defs)
+        monkeypatch.setattr(router, "_get_api_key", lambda d: "key")
+
+        async def fake_openai(defn, api_key, messages, max_tokens=1200, image_b64=None, json_mode=False):
+            await asyncio.sleep(0.02)
+            return defn.name
+
+        monkeypatch.setattr(router, "_call_openai_compat", fake_openai)
+        results = await asyncio.gather(route("reasoning", "s", "u1"), route("reasoning", "s", "u2"))
+        assert sorted(r["provider"] for r in results) == ["a", "b"]
+
+
+class TestStreaming:
+
+    @pytest.fixture
+    def two(self, monkeypatch):
+        defs = _tier_defs("bad", "good")
+        defs[1].tier = 2                                  # sıra sabit: bad → good
+        monkeypatch.setattr(router, "PROVIDERS", defs)
+        monkeypatch.setattr(router, "_get_api_key", lambda d: "key")
+        return defs
+
+    @staticmethod
+    def _streams(monkeypatch, outputs):
+        consumed = {}
+
+        async def fake_stream(defn, api_key, messages, max_tokens=1200, image_b64=None, json_mode=False):
+            consumed[defn.name] = 0
+            for chunk in outputs[defn.name]:
+                consumed[defn.name] += 1
+                yield chunk
+
+        monkeypatch.setattr(router, "_stream_openai_compat", fake_stream)
+        return consumed
+
+    @pytest.mark.asyncio
+    async def test_invalid_output_cancelled_and_next_provider_stops_early(self, monkeypatch, two):
+        consumed = self._streams(monkeypatch, {
+            "bad": ["{verdict", ": BUY}", " never", " read"],
+            "good": ['{"verdict": "BUY", ', '"confidence": 80', ', "sources_checked": [', '"x"]}', " thanks!"],
+        })
+        r = await route("reasoning", "s", "u", json_mode=True, required_fields=["verdict", "confidence"])
+        assert r["provider"] == "good" and r["stream"] == "early"
+        assert json.loads(r["text"]) == {"verdict": "BUY", "confidence": 80}
+        assert consumed == {"bad": 1, "good": 3}          # bozuk ilk parçada, iyi alanlar tamamlanınca kesildi
+        st = get_status()
+        assert st["bad"]["stream_invalid"] == 1 and st["good"]["stream_early_stops"] == 1
+        assert st["good"]["time_to_verdict_s"] is not None
+
+    @pytest.mark.asyncio
+    async def test_truncated_output_falls_through(self, monkeypatch, two):
+        self._streams(monkeypatch, {
+            "bad": ['{"verdict": "BUY", "confid'],
+            "good": ['```json\n{"verdict": "PASS", "confidence": 10}\n```'],
+        })
+        r = await route("reasoning", "s", "u", required_fields=["verdict", "confidence"])
+        assert r["provider"] == "good" and r["stream"] == "complete"
+        assert json.loads(r["text"])["verdict"] == "PASS"
+        assert _get_state("bad").consecutive_errors == 1
+
+    @pytest.mark.asyncio
+    async def test_truncated_batch_stream_salvaged_and_not_cached(self, monkeypatch, two):
+        from app.ai_analyst import _split_batch
+        calls = []
+
+        async def fake_stream(defn, api_key, messages, max_tokens=1200, image_b64=None, json_mode=False):
+            calls.append(defn.name)
+            for chunk in ['{"results": [{"id": 1, "verdict": "BUY"}, ', '{"id": 2, "verdict": "PA']:
+                yield chunk
+
+        monkeypatch.setattr(router, "_stream_openai_compat", fake_stream)
+        kw = dict(json_mode=True, cache_ttl_s=3600, required_fields=("results",), partial_ok=True)
+        r = await route("reasoning", "s", "batch", **kw)
+        assert r["provider"] == "bad" and r["stream"] == "truncated"
+        assert _split_batch(r["text"], ["1", "2"]) == {"1": {"id": 1, "verdict": "BUY"}}
+        assert _get_state("bad").consecutive_errors == 0
+
+        await route("reasoning", "s", "batch", **kw)   # kesik sonuç önbelleğe yazılmadı
+        assert calls == ["bad", "bad"]
+
+    @pytest.mark.asyncio
+    async def test_gemini_gets_requested_max_tokens(self, monkeypatch):
+        defs = _tier_defs("gemini")
+        monkeypatch.setattr(router, "PROVIDERS", defs)
+        monkeypatch.setattr(router, "_get_api_key", lambda d: "key")
+        seen = {}
+
+        async def fake_stream(api_key, system_prompt, user_prompt, **kw):
+            seen.update(kw)
+            yield '{"results": []}'
+
+        monkeypatch.setattr(router, "_stream_gemini_native", fake_stream)
+        await route("reasoning", "s", "u", max_tokens=4000, json_mode=True, required_fields=("results",))
+        assert seen["max_tokens"] == 4000
+        payload = router._gemini_payload("s", "u", None, False, True, 4000)
+        assert payload["generationConfig"]["maxOutputTokens"] == 4000
+
+    @pytest.mark.asyncio
+    async def test_stream_disabled_uses_single_call(self, monkeypatch, two):
+        from app.core.config import get_settings
+        monkeypatch.setattr(get_settings(), "llm_stream", False)
+
+        async def fake_openai(defn, api_key, messages, max_tokens=1200, image_b64=None, json_mode=False):
+            return '{"verdict": "BUY"}'
+
+        monkeypatch.setattr(router, "_call_openai_compat", fake_openai)
+        r = await route("reasoning", "s", "u", required_fields=["verdict"])
+        assert "stream" not in r and r["text"] == '{"verdict": "BUY"}'
@@ -0,0 +1,127 @@
+"""
+market_snapshot_store testleri: kaynak bazlı tazelik, sadece bayat bileşenin
+yeniden çekilmesi, in-flight dedup ve _scan_one entegrasyonu.
+"""
+from __future__ import annotations
+import asyncio
+import time
+
+import pytest
+
+import app.csv_arb_scanner as scanner
+from app import market_snapshot_store as snap
+
+ISBN = "9780132350884"
+
+
+class TestStore:
+    def test_put_get_respects_max_age(self):
+        snap.put(ISBN, "amazon", {"used": {"buybox": {"total": 20.0}}}, fetched_at=time.time() - 600)
+        assert snap.get(ISBN, "amazon", 1200) == {"used": {"buybox": {"total": 20.0}}}
+        assert snap.get(ISBN, "amazon", 300) is None
+        assert snap.get(ISBN, "amazon", 0) is None
+
+    def test_snapshot_lists_sources_with_age(self):
+        snap.put(ISBN, "amazon", {"x": 1})
+        snap.put(ISBN, "buyback_trend", {"trend": 2}, fetched_at=time.time() - 86400)
+        s = snap.snapshot(ISBN)
+        assert set(s) == {"amazon", "buyback_trend"}
+        assert s["buyback_trend"]["age_s"] >= 86400
+
+    def test_freshness_override_and_ebay_prefix(self):
+        assert snap.max_age("amazon") == snap.DEFAULT_FRESHNESS["amazon"]
+        assert snap.max_age("ebay:precision:reject", {"ebay": 60}) == 60
+        assert snap.max_age("buyback", {"amazon": 1}) == snap.DEFAULT_FRESHNESS["buyback"]
+
+    @pytest.mark.parametrize("data", [{}, [], {"ok": False}, [{"_error": "429"}]])
+    def test_empty_or_error_not_cacheable(self, data):
+        assert snap.cacheable(data) is False
+
+    def test_invalidate(self):
+        snap.put(ISBN, "amazon", {"x": 1})
+        snap.put(ISBN, "buyback", {"ok": True})
+        assert snap.invalidate(ISBN, "amazon") == 1
+        assert set(snap.snapshot(ISBN)) == {"buyback"}
+
+
+class TestMemoize:
+    async def test_fresh_hit_skips_fetch(self):
+        calls = []
+
+        async def _fetch():
+            calls.append(1)
+            return {"v": len(calls)}
+
+        assert await snap.memoize(ISBN, "amazon", _fetch) == {"v": 1}
+        assert await snap.memoize(ISBN, "amazon", _fetch) == {"v": 1}
+        assert len(calls) == 1
+        assert snap.stats()["amazon"] == {"hit": 1, "miss": 1}
+
+    async def test_zero_freshness_always_refetches(self):
+        calls = []
+
+        async def _fetch():
+            calls.append(1)
+            return {"v": len(calls)}
+
+        await snap.memoize(ISBN, "amazon", _fetch)
+        assert await snap.memoize(ISBN, "amazon", _fetch, {"amazon": 0}) == {"v": 2}
+
+    async def test_concurrent_callers_share_one_fetch(self):
+        calls = []
+
+        async def _fetch():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return [{"buy_price": 5.0}]
+
+        res = await asyncio.gather(*[snap.memoize(ISBN, "buyback", _fetch) for _ in range(4)])
+        assert len(calls) == 1
+        assert all(r == [{"buy_price": 5.0}] for r in res)
+
+    async def test_error_result_not_stored(self):
+        async def _fetch():
+            return [{"_error": "rate_limited"}]
+
+        await snap.memoize(ISBN, "ebay:balanced:best_effort", _fetch)
+        assert snap.snapshot(ISBN) == {}
+
+
+async def test_scan_one_refetches_only_stale_components(monkeypatch):
+    calls = {"amazon": 0, "ebay": 0, "bf": 0, "bb": 0}
+
+    async def fake_amazon(asin):
+        calls["amazon"] += 1
+        return {"used": {"buybox": {"total": 45.0}, "top2": []}, "new": {}}
+
+    async def fake_ebay(isbn, filters=None):
+        calls["ebay"] += 1
+        return [{"source": "ebay", "source_condition": "used", "buy_price": 10.0, "item_id": "x",
+                 "title": "", "url": "", "image_url": "", "description": "", "seller_name": "",
+                 "seller_feedback": None, "match_quality": "CONFIRMED", "match_reason": "",
+                 "query_mode": "gtin", "isbn_normalized": isbn}]
+
+    async def fake_bf(isbn):
+        calls["bf"] += 1
+        return [{"source": "abebooks", "source_condition": "used", "buy_price": 12.0, "item_id": "s1",
+                 "title": "", "url": ""}]
+
+    async def fake_bb(isbn):
+        calls["bb"] += 1
+        return {"ok": False}
+
+    monkeypatch.setattr(scanner, "_get_amazon_prices", fake_amazon)
+    monkeypatch.setattr(scanner, "_get_ebay_offers", fake_ebay)
+    monkeypatch.setattr(scanner, "_get_bookfinder_offers", fake_bf)
+    monkeypatch.setattr(scanner, "_get_buyback_prices", fake_bb)
+
+    filters = scanner.ScanFilters(only_viable=False)
+    first = await scanner._scan_one(ISBN, filters, scanner.DEFAULT_FEES)
+    second = await scanner._scan_one(ISBN, filters, scanner.DEFAULT_FEES, freshness={"ebay": 0})
+
+    assert calls["amazon"] == 1          # taze snapshot
+    assert calls["ebay"] == 2            # ebay: 0 → yeniden çekildi
+    assert calls["bf"] == 2              # bookfinder snapshot'lanmaz (kaynak cache'i bookfinder_client'ta)
+    assert calls["bb"] == 2              # ok=False saklanmaz
+    assert "metadata" not in snap.snapshot(ISBN)   # book_meta_store + NYT kendi TTL'leriyle
+    assert [r.to_dict() for r in first] == [r.to_dict() for r in second]
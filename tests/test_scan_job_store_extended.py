@@ -361,3 +361,78 @@ class TestHistoryPersistence:
 
         hist = store.get_history()
         assert len(hist[0]["accepted"]) <= 200
+
+
+# ── SQLite scan history: rollups, migration, compaction ──────────────────────
+
+class TestHistoryStore:
+    def test_history_unbounded_with_pagination(self):
+        import app.scan_job_store as store
+        ids = []
+        for _ in range(60):
+            jid = create_job(1)
+            finish_job(jid, [], [], {})
+            ids.append(jid)
+        assert len(store.get_history(limit=50)) == 50
+        assert len(store.get_history(limit=50, offset=50)) == 10
+        assert store.history_summary()["total_scans"] == 60
+
+    def test_daily_rollup_counts(self):
+        import app.scan_job_store as store
+        jid = create_job(3)
+        finish_job(jid, [{"isbn": "a"}, {"isbn": "b"}], [{"isbn": "c", "reason": "loss"}],
+                   {"total_isbns": 3})
+        jid2 = create_job(2)
+        finish_job(jid2, [{"isbn": "d"}], [], {"total_isbns": 2})
+
+        s = store.history_summary(days=7)
+        assert s["scans"] == 2
+        assert s["isbns_scanned"] == 5
+        assert s["deals_found"] == 3
+        assert s["last_scan_ts"] is not None
+        day = store.daily_rollups(days=1)[0]
+        assert day["rejected"] == 1
+
+    def test_same_job_saved_twice_is_noop(self):
+        import app.scan_job_store as store
+        jid = create_job(1)
+        finish_job(jid, [{"isbn": "a"}], [], {"total_isbns": 1})
+        store._save_to_history(jid, [{"isbn": "a"}], [], {"total_isbns": 1})
+        assert store.history_summary()["scans"] == 1
+
+    def test_isbn_history_lookup(self):
+        import app.scan_job_store as store
+        jid = create_job(2)
+        finish_job(jid, [{"isbn": "9780132350884", "roi_pct": 40.0, "source": "ebay"}],
+                   [{"isbn": "9780000000002", "reason": "not_viable"}], {})
+        rows = store.get_isbn_history("9780132350884")
+        assert len(rows) == 1
+        assert rows[0]["accepted"] is True
+        assert rows[0]["roi_pct"] == 40.0
+        assert store.get_isbn_history("9780000000002")[0]["reason"] == "not_viable"
+
+    def test_legacy_json_migrated_once(self):
+        import app.scan_job_store as store
+        store.DATA_DIR.mkdir(parents=True, exist_ok=True)
+        legacy = [{"job_id": "old1", "ts": time.time() - 3600, "stats": {"total_isbns": 4},
+                   "accepted": [{"isbn": "x"}], "rejected_count": 3, "top_reasons": {"loss": 3}}]
+        store.HISTORY_FILE.write_text(json.dumps(legacy))
+
+        hist = store.get_history()
+        assert [h["job_id"] for h in hist] == ["old1"]
+        assert hist[0]["accepted"] == [{"isbn": "x"}]
+        assert not store.HISTORY_FILE.exists()
+        assert store.get_history()[0]["job_id"] == "old1"   # ikinci okumada tekrar import yok
+        assert store.history_summary()["total_scans"] == 1
+
+    def test_compaction_drops_old_rejected_rows_only(self):
+        import app.scan_job_store as store
+        jid = create_job(2)
+        finish_job(jid, [{"isbn": "a"}], [{"isbn": "b", "reason": "loss"}], {"total_isbns": 2})
+        with store._connect() as con:
+            con.execute("UPDATE scan_history_rows SET ts = ts - 200*86400;")
+
+        assert store.compact_history(retention_days=90) == 1
+        assert store.get_isbn_history("b") == []
+        assert len(store.get_isbn_history("a")) == 1
+        assert store.get_history()[0]["rejected_count"] == 1   # özet korunur
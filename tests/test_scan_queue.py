@@ -0,0 +1,388 @@
+"""
+scan_queue.py + scan_job_store persistence testleri:
+FairShareGate adaleti, priority sırası, eşzamanlı job limiti, restart recovery.
+"""
+from __future__ import annotations
+import asyncio
+import time
+
+import pytest
+
+from app import scan_job_store, scan_queue
+from app.scan_job_store import create_job, get_job, recover_jobs, pending_jobs, queue_position, _jobs
+
+
+@pytest.fixture(autouse=True)
+def reset_queue(monkeypatch):
+    scan_queue._running.clear()
+    monkeypatch.setattr(scan_queue, "_gate", scan_queue.FairShareGate(4, 0.0))
+    monkeypatch.setattr(scan_queue, "_max_jobs", lambda: 2)
+    yield
+    scan_queue._running.clear()
+    scan_queue._HANDLERS.pop("test", None)
+
+
+async def _drain():
+    while scan_queue._running:
+        await asyncio.gather(*list(scan_queue._running.values()), return_exceptions=True)
+
+
+# ── FairShareGate ─────────────────────────────────────────────────────────────
+
+class TestFairShareGate:
+    async def test_capacity_respected(self):
+        gate = scan_queue.FairShareGate(2)
+        peak = 0
+
+        async def _work():
+            nonlocal peak
+            async with gate.slot("a"):
+                peak = max(peak, gate.in_use())
+                await asyncio.sleep(0.01)
+
+        await asyncio.gather(*[_work() for _ in range(6)])
+        assert peak == 2
+        assert gate.in_use() == 0
+
+    async def test_waiting_job_gets_next_slot(self):
+        gate = scan_queue.FairShareGate(2)
+        order = []
+        release = asyncio.Event()
+
+        async def _work(jid: str, i: int):
+            async with gate.slot(jid):
+                order.append((jid, i))
+                await release.wait()
+
+        # Büyük job kapasiteyi doldurur ve 3 ISBN daha bekletir
+        big = [asyncio.create_task(_work("big", i)) for i in range(5)]
+        await asyncio.sleep(0)
+        small = asyncio.create_task(_work("small", 0))
+        await asyncio.sleep(0)
+        release.set()
+        await asyncio.gather(*big, small)
+        # small, big'in kuyruktaki ISBN'lerinin hepsinden önce slot almalı
+        assert order.index(("small", 0)) <= 3
+
+    async def test_cancelled_waiter_does_not_leak_slot(self):
+        gate = scan_queue.FairShareGate(1)
+        await gate.acquire("a")
+        waiter = asyncio.create_task(gate.acquire("b"))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        gate.release("a")
+        assert gate.in_use() == 0
+
+    def test_snapshot_fields(self):
+        snap = scan_queue.FairShareGate(3).snapshot()
+        for key in ("capacity", "in_use", "by_job", "waiting", "granted_total"):
+            assert key in snap
+
+
+# ── Persistence / ordering ────────────────────────────────────────────────────
+
+class TestJobPersistence:
+    def test_pending_order_priority_then_fifo(self):
+        a = create_job(1, priority=0)
+        b = create_job(1, priority=5)
+        c = create_job(1, priority=0)
+        assert [j["id"] for j in pending_jobs()] == [b, a, c]
+        assert queue_position(b) == 0
+
+    def test_recover_requeues_unfinished_jobs(self):
+        jid = create_job(3, kind="csv_arb", payload={"isbns": ["1", "2", "3"]}, priority=2)
+        scan_job_store.mark_running(jid)
+        done = create_job(1)
+        scan_job_store.finish_job(done, [], [], {})
+
+        _jobs.clear()   # process restart simülasyonu
+        scan_job_store._owned.clear()
+        recovered = recover_jobs(now=time.time() + scan_job_store._lease_s() + 1)
+
+        assert recovered == [jid]
+        job = get_job(jid)
+        assert job["status"] == "pending"
+        assert job["payload"] == {"isbns": ["1", "2", "3"]}
+        assert job["priority"] == 2
+        assert get_job(done) is None
+
+    def test_live_workers_job_not_recovered_until_lease_expires(self, monkeypatch):
+        jid = create_job(1, kind="csv_arb")
+        scan_job_store.mark_running(jid, worker="other")
+        scan_job_store._owned.clear()               # başka bir (canlı) worker'ın job'u
+        _jobs.clear()
+        lease = scan_job_store._lease_s()
+        t = time.time()
+
+        assert recover_jobs(now=t + lease / 2) == []
+        assert jid not in _jobs
+        scan_job_store.heartbeat([jid], now=t + lease / 2)     # sahibi heartbeat yazıyor
+        assert recover_jobs(now=t + lease + 1) == []
+        assert recover_jobs(now=t + lease * 1.5 + 1) == [jid]  # sahibi öldü
+
+    def test_tick_leases_renews_running_jobs(self, monkeypatch):
+        monkeypatch.setattr(scan_queue, "_lease_tick_at", 0.0)
+        jid = create_job(1, kind="csv_arb")
+        scan_job_store.mark_running(jid)
+        monkeypatch.setitem(scan_queue._running, jid, None)
+        later = time.time() + 1000
+        scan_queue.tick_leases(now=later)
+        assert scan_queue.tick_leases(now=later + 1) == []     # lease/3 dolmadan tekrar çalışmaz
+        scan_job_store._owned.clear()
+        assert recover_jobs(now=later + scan_job_store._lease_s() / 2) == []
+
+    async def test_recover_keeps_paused_job_paused(self):
+        @scan_queue.register("test")
+        async def _h(job_id, payload, on_progress, gate):
+            return {"accepted": [], "rejected": [], "stats": {}}
+
+        jid = create_job(2, kind="test")
+        scan_job_store.mark_running(jid)
+        assert scan_job_store.pause_job(jid)
+
+        _jobs.clear()   # process restart simülasyonu
+        scan_job_store._owned.clear()
+        assert recover_jobs(now=time.time() + scan_job_store._lease_s() + 1) == []
+        assert get_job(jid)["status"] == "paused"
+        assert pending_jobs() == []
+
+        assert scan_job_store.resume_job(jid)       # baştan kuyruğa girer
+        await _drain()
+        assert get_job(jid)["status"] == "done"
+
+    def test_cancelled_job_not_recovered(self):
+        jid = create_job(1)
+        scan_job_store.cancel_job(jid)
+        _jobs.clear()
+        assert recover_jobs() == []
+
+
+# ── Dispatcher ────────────────────────────────────────────────────────────────
+
+class TestDispatcher:
+    async def test_runs_at_most_max_jobs_concurrently(self):
+        active = 0
+        peak = 0
+
+        @scan_queue.register("test")
+        async def _h(job_id, payload, on_progress, gate):
+            nonlocal active, peak
+            active += 1
+            peak = max(peak, active)
+            async with gate():
+                await asyncio.sleep(0.01)
+            on_progress(1, 1, [{"isbn": payload["isbn"]}], [])
+            active -= 1
+            return {"accepted": [{"isbn": payload["isbn"]}], "rejected": [], "stats": {}}
+
+        ids = [scan_queue.enqueue("test", {"isbn": str(i)}, total=1) for i in range(5)]
+        await _drain()
+        assert peak == 2
+        assert all(get_job(j)["status"] == "done" for j in ids)
+
+    async def test_handler_error_fails_job(self):
+        @scan_queue.register("test")
+        async def _h(job_id, payload, on_progress, gate):
+            raise RuntimeError("boom")
+
+        jid = scan_queue.enqueue("test", {}, total=1)
+        await _drain()
+        assert get_job(jid)["status"] == "error"
+        assert "boom" in get_job(jid)["error"]
+
+    async def test_handler_error_keeps_partial_results(self):
+        @scan_queue.register("test")
+        async def _h(job_id, payload, on_progress, gate):
+            on_progress(1, 2, [{"isbn": "a"}], [])
+            raise RuntimeError("mid-scan")
+
+        jid = scan_queue.enqueue("test", {}, total=2)
+        await _drain()
+        job = get_job(jid)
+        assert job["status"] == "done"
+        assert job["stats"]["partial"] is True
+
+    async def test_cancelled_pending_job_never_runs(self):
+        ran = []
+
+        @scan_queue.register("test")
+        async def _h(job_id, payload, on_progress, gate):
+            ran.append(job_id)
+            return {"accepted": [], "rejected": [], "stats": {}}
+
+        jid = create_job(1, kind="test")
+        scan_job_store.cancel_job(jid)
+        scan_queue.start()
+        await _drain()
+        assert ran == []
+
+    async def test_paused_pending_job_runs_after_resume(self):
+        ran = []
+
+        @scan_queue.register("test")
+        async def _h(job_id, payload, on_progress, gate):
+            ran.append(job_id)
+            return {"accepted": [], "rejected": [], "stats": {}}
+
+        jid = create_job(1, kind="test")
+        assert scan_job_store.pause_job(jid)
+        scan_queue.start()
+        await _drain()
+        assert ran == [] and get_job(jid)["status"] == "paused"
+
+        assert scan_job_store.resume_job(jid)
+        await _drain()
+        assert ran == [jid] and get_job(jid)["status"] == "done"
+
+    async def test_unknown_kind_fails(self):
+        jid = scan_queue.enqueue("no_such_kind", {}, total=1)
+        await _drain()
+        assert get_job(jid)["error"] == "unknown_job_kind:no_such_kind"
+
+
+def test_csv_arb_config_rejects_bad_policy():
+    with pytest.raises(ValueError):
+        scan_queue.csv_arb_config({"isbn_match_policy": "bogus"})
+
+
+# ── External scan worker (SCAN_WORKER_MODE=external) ─────────────────────────
+
+@pytest.fixture
+def external_mode(monkeypatch):
+    from app.core.config import get_settings
+    monkeypatch.setattr(get_settings(), "scan_worker_mode", "external")
+    monkeypatch.setattr(scan_queue, "_worker_id", None)
+    yield
+    scan_job_store._owned.clear()
+
+
+def _api_view(job_id: str) -> None:
+    """Aynı process'te 'API tarafını' simüle et: yerel state'i unut, DB'den oku."""
+    scan_job_store._owned.discard(job_id)
+    _jobs.pop(job_id, None)
+
+
+class TestExternalWorker:
+    async def test_api_does_not_execute_jobs(self, external_mode):
+        jid = scan_queue.enqueue("csv_arb", {"isbns": ["x"]}, total=1)
+        assert scan_queue._running == {}
+        assert get_job(jid)["status"] == "pending"
+        assert scan_queue.start() == []   # recovery worker'ın işi
+
+    async def test_worker_claims_and_publishes_progress(self, external_mode):
+        jid = scan_queue.enqueue("csv_arb", {"isbns": ["a", "b"]}, total=2)
+        assert scan_job_store.claim_next_job("w1") == jid
+        assert scan_job_store.claim_next_job("w2") is None   # ikinci kez claim edilemez
+
+        scan_job_store.append_result(jid, [{"isbn": "a"}], [])
+        _jobs[jid]["_persisted_at"] = 0
+        scan_job_store.update_progress(jid, 1)
+
+        _api_view(jid)
+        p = scan_job_store.get_job_progress(jid)
+        assert p["status"] == "running"
+        assert p["progress"] == 1
+        assert p["accepted"] == [{"isbn": "a"}]
+
+    async def test_finish_visible_to_api(self, external_mode):
+        jid = scan_queue.enqueue("csv_arb", {}, total=2)
+        scan_job_store.claim_next_job("w1")
+        scan_job_store.finish_job(jid, [{"isbn": "a", "roi_pct": 50}], [{"isbn": "b", "reason": "loss"}], {"total_isbns": 2})
+
+        _api_view(jid)
+        job = get_job(jid)
+        assert job["status"] == "done"
+        assert job["accepted"] == [{"isbn": "a", "roi_pct": 50}]
+        assert job["rejected"] == [{"isbn": "b", "reason": "loss"}]
+        assert job["stats"] == {"total_isbns": 2}
+
+    async def test_api_pause_cancel_reaches_worker(self, external_mode):
+        jid = scan_queue.enqueue("csv_arb", {}, total=5)
+        scan_job_store.claim_next_job("w1")
+        # API tarafı DB'ye pause yazar → worker sync_control ile event'i set eder
+        scan_job_store._update(jid, status="paused")
+        assert scan_job_store.sync_control(jid) == "paused"
+        assert scan_job_store.get_pause_event(jid).is_set()
+
+        scan_job_store._update(jid, status="cancelled")
+        scan_job_store.sync_control(jid)
+        assert scan_job_store.get_cancel_event(jid).is_set()
+        assert not scan_job_store.get_pause_event(jid).is_set()
+
+    async def test_worker_runs_claimed_job(self, external_mode):
+        @scan_queue.register("test")
+        async def _h(job_id, payload, on_progress, gate):
+            return {"accepted": [], "rejected": [], "stats": {"ok": 1}}
+
+        jid = scan_queue.enqueue("test", {}, total=1)
+        assert scan_queue._running == {}
+        scan_queue.start_worker("w1")
+        await _drain()
+        _api_view(jid)
+        assert get_job(jid)["status"] == "done"
+
+    async def test_worker_forgets_finished_job(self, external_mode):
+        @scan_queue.register("test")
+        async def _h(job_id, payload, on_progress, gate):
+            return {"accepted": [{"isbn": "a"}], "rejected": [], "stats": {}}
+
+        jid = scan_queue.enqueue("test", {}, total=1)
+        _jobs.pop(jid, None)               # worker job'u yalnızca DB'den claim eder
+        scan_queue.start_worker("w1")
+        await _drain()
+        assert jid not in _jobs
+        assert jid not in scan_job_store._owned
+        assert get_job(jid)["accepted"] == [{"isbn": "a"}]
+
+    async def test_status_reads_queue_from_db(self, external_mode):
+        a = scan_queue.enqueue("csv_arb", {}, total=1)
+        b = scan_queue.enqueue("csv_arb", {}, total=1)
+        assert scan_queue.status()["pending"] == [a, b]
+        # worker a'yı claim edip bitirir — API'nin yerel kopyası hâlâ "pending"
+        assert scan_job_store.claim_next_job("w1") == a
+        assert scan_queue.status()["running"] == [a]
+        scan_job_store._update(a, status="done")
+        st = scan_queue.status()
+        assert st["pending"] == [b]
+        assert st["running"] == []
+
+    async def test_poll_worker_evicts_old_jobs(self, external_mode, monkeypatch):
+        monkeypatch.setattr(scan_queue, "_worker_id", "w1")
+        jid = create_job(1, kind="csv_arb")
+        scan_job_store.finish_job(jid, [], [], {})
+        assert jid in _jobs
+        _jobs[jid]["created_at"] -= scan_job_store._JOB_TTL_S + 1
+        scan_queue.poll_worker()
+        assert jid not in _jobs
+        assert get_job(jid)["status"] == "done"   # kalıcı kayıt DB'de
+
+    def test_api_evicts_stale_remote_copy(self, external_mode):
+        jid = create_job(1, kind="csv_arb")
+        _api_view(jid)
+        assert get_job(jid)["status"] == "pending"   # DB'den yerel kopya
+        _jobs[jid]["created_at"] -= scan_job_store._JOB_TTL_S + 1
+        scan_job_store.evict_old_jobs()
+        assert jid not in _jobs
+
+    async def test_api_startup_leaves_background_work_to_worker(self, external_mode, monkeypatch):
+        from app import main
+        monkeypatch.setattr(scan_queue, "start_background_loops", lambda: pytest.fail("API'de başlamamalı"))
+        monkeypatch.setattr(scan_queue, "lease_loop", lambda: pytest.fail("API'de başlamamalı"))
+        await main._start_scan_queue()
+
+    def test_recover_resets_orphaned_running_job(self, external_mode):
+        jid = create_job(3, kind="csv_arb")
+        scan_job_store.mark_running(jid, worker="dead-worker")
+        scan_job_store.append_result(jid, [{"isbn": "a"}], [])
+        scan_job_store._flush_rows(jid)
+        scan_job_store._owned.clear()
+        _jobs.clear()
+
+        assert scan_job_store.recover_jobs() == []      # lease henüz dolmadı — worker canlı olabilir
+        assert scan_job_store.recover_jobs(now=time.time() + scan_job_store._lease_s() + 1) == [jid]
+        _api_view(jid)
+        job = get_job(jid)
+        assert job["status"] == "pending"
+        assert job["partial_accepted"] == []
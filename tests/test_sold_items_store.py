@@ -0,0 +1,81 @@
+"""
+sold_items_store testleri: itemId ile idempotent ingest, pencere sorguları ve Finding /
+eBay sold HTML ayrıştırıcılarının item bazlı çıktısı.
+"""
+from __future__ import annotations
+import time
+
+from app import html_extract, sold_items_store as sis, sold_scraper
+from app.ebay_client import finding_items
+
+NOW = int(time.time())
+
+
+def _item(item_id, total, days_ago=1, cond="used"):
+    return {"item_id": item_id, "price": total, "cond": cond, "ended_at": NOW - days_ago * 86400}
+
+
+class TestIngest:
+    def test_reingest_is_noop(self):
+        items = [_item("1001", 10.0), _item("1002", 20.0)]
+        assert sis.ingest("978-0132350884", items, "finding") == 2
+        assert sis.ingest("9780132350884", items, "finding") == 0
+        assert sis.ingest("9780132350884", items + [_item("1003", 30.0)], "scraper") == 1
+        assert sis.count("9780132350884") == 3
+
+    def test_overlapping_windows_count_each_sale_once(self):
+        sale = [_item("2001", 12.0, days_ago=10)]
+        sis.ingest("isbn1", sale, "finding")                       # 30d yanıtı
+        sis.ingest("isbn1", sale + [_item("2002", 18.0, days_ago=60)], "finding")   # 90d yanıtı
+        assert sis.window_totals("isbn1", 365) == [18.0, 12.0]
+        assert sis.window_totals("isbn1", 30) == [12.0]
+
+    def test_items_without_id_skipped_and_cond_mapped(self):
+        n = sis.ingest("isbn1", [
+            {"item_id": None, "price": 5.0},
+            {"item_id": "3001", "price": 9.0, "shipping": 4.0, "cond": "brand_new"},
+        ], "finding")
+        assert n == 1
+        assert sis.window_totals("isbn1", 30, "new") == [13.0]
+        assert sis.window_stats("isbn1", 30, "used")["count"] == 0
+
+    def test_window_stats_and_span(self):
+        sis.ingest("isbn1", [_item("4001", 10.0, 100), _item("4002", 30.0, 400)], "finding")
+        w = sis.window_stats("isbn1", 1095, "used")
+        assert (w["count"], w["avg"], w["min"], w["max"], w["std"]) == (2, 20.0, 10.0, 30.0, 10.0)
+        assert sis.span_days("isbn1", "used") == 300.0
+        assert sis.span_days("isbn2") is None
+
+
+def test_finding_items_parses_ids_and_end_time():
+    j = {"findCompletedItemsResponse": [{"searchResult": [{"item": [
+        {"itemId": ["1234567890"],
+         "sellingStatus": [{"currentPrice": [{"__value__": "12.50"}]}],
+         "shippingInfo": [{"shippingServiceCost": [{"__value__": "3.99"}]}],
+         "condition": [{"conditionDisplayName": ["Very Good"]}],
+         "listingInfo": [{"endTime": ["2024-05-01T12:00:00.000Z"]}]},
+        {"itemId": ["999"], "sellingStatus": [{"currentPrice": [{}]}]},
+    ]}]}]}
+    (it,) = finding_items(j)
+    assert it["item_id"] == "1234567890" and it["total"] == 16.49
+    assert it["cond"] == "very_good" and it["ended_at"] == 1714564800
+
+
+def test_ebay_sold_html_items():
+    def li(item_id, price, date, ship=""):
+        return (f'<li class="s-item s-item__pl-on-bottom"><a class="s-item__link" '
+                f'href="https://www.ebay.com/itm/{item_id}?hash=x">t</a>'
+                f'<span class="POSITIVE">Sold  {date}</span>'
+                f'<span class="s-item__price">${price}</span>{ship}</li>')
+    html = ("<ul>" + li("123456", "20.00", "Jan 1, 2024")
+            + li("111111111111", "12.99", "Mar 5, 2024", '<span class="s-item__shipping">+$4.50 shipping</span>')
+            + li("222222222222", "8.00", "Mar 6, 2024") + "</ul>")
+    items = html_extract.ebay_sold_items(html)
+    assert [i["price"] for i in items] == [20.0, 12.99, 8.0]
+    assert items[1] == {"item_id": "111111111111", "price": 12.99, "shipping": 4.5, "ended_at": 1709596800}
+    # İlk kart promo → atlanır; new sayfasındaki itemId used'a sayılmaz
+    parsed = sold_scraper._parse_items(html)
+    assert [i["item_id"] for i in parsed] == ["111111111111", "222222222222"]
+    sold_scraper._ingest("isbn1", parsed[:1], parsed)
+    assert sis.window_totals("isbn1", 10000, "new") == [17.49]
+    assert sis.window_totals("isbn1", 10000, "used") == [8.0]
@@ -0,0 +1,127 @@
+"""
+sold_stats_store testleri: t-digest sketch doğruluğu / birleştirme, günlük bucket'lar,
+O(gün) pencere özeti, özet (aggregate) yazımı ve eski JSON formatının taşınması.
+"""
+from __future__ import annotations
+import json
+import random
+import time
+
+from app import sold_stats_store as sss
+from app.core.quantile_sketch import TDigest
+
+
+def _exact(xs, q):
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(q * len(xs)))]
+
+
+class TestTDigest:
+    def test_small_inputs_are_exact(self):
+        d = TDigest()
+        d.extend([30.0, 10.0, 20.0])
+        assert d.quantile(0.5) == 20.0
+        assert d.samples() == [10.0, 20.0, 30.0]
+        assert TDigest.from_json(d.to_json()).samples() == [10.0, 20.0, 30.0]
+
+    def test_merged_quantiles_close_to_exact(self):
+        rng = random.Random(7)
+        xs = [rng.lognormvariate(3, 0.5) for _ in range(20000)]
+        merged = TDigest()
+        for i in range(0, len(xs), 500):            # 40 "günlük" parça
+            part = TDigest()
+            part.extend(xs[i:i + 500])
+            merged.merge(TDigest.from_json(part.to_json()))
+        assert merged.count == len(xs)
+        assert len(merged.centroids()) <= 60
+        for q in (0.1, 0.5, 0.9):
+            assert abs(merged.quantile(q) - _exact(xs, q)) / _exact(xs, q) < 0.02
+
+
+class TestBuckets:
+    def test_same_day_snapshots_merge_into_one_bucket(self, monkeypatch):
+        monkeypatch.setattr(sss, "_THROTTLE_SECONDS", 0)
+        sss.append_snapshot("978-0132350884", 90, "used", [10.0, 20.0])
+        sss.append_snapshot("9780132350884", 90, "used", [30.0])
+        assert sss.entry_summary("9780132350884")["buckets"] == 1
+        assert sss.entry_summary("9780132350884")["total_entries"] == 2
+        assert sss.query_window("9780132350884", 365, "used") == [10.0, 20.0, 30.0]
+
+    def test_window_stats(self):
+        sss.append_snapshot("isbn1", 90, "used", [10.0, 20.0, 30.0, 40.0])
+        w = sss.window_stats("isbn1", 90, "used")
+        assert (w["count"], w["avg"], w["min"], w["max"]) == (4, 25.0, 10.0, 40.0)
+        assert w["std"] == 11.18 and 20.0 <= w["p50"] <= 30.0
+        assert sss.window_stats("isbn1", 90, "new")["count"] == 0
+
+    def test_append_aggregate_writes_weighted_centroid(self):
+        assert sss.append_aggregate("isbn1", 90, None, 12, 15.5, 9.0, 22.0) is True
+        w = sss.window_stats("isbn1", 365, None)
+        assert (w["count"], w["avg"], w["min"], w["max"], w["p50"]) == (12, 15.5, 9.0, 22.0, 15.5)
+        assert sss.append_aggregate("isbn2", 90, None, 0, 15.5) is False
+
+    def test_old_buckets_pruned_and_outside_window(self, monkeypatch):
+        monkeypatch.setattr(sss, "_THROTTLE_SECONDS", 0)
+        real = time.time()
+        monkeypatch.setattr(sss.time, "time", lambda: real - 400 * 86400)
+        sss.append_snapshot("isbn1", 90, None, [5.0])
+        monkeypatch.setattr(sss.time, "time", lambda: real)
+        sss.append_snapshot("isbn1", 90, None, [7.0])
+        assert sss.query_window("isbn1", 365, None) == [7.0]
+        assert sorted(sss.query_window("isbn1", 1095, None)) == [5.0, 7.0]
+        monkeypatch.setattr(sss, "_MAX_AGE_DAYS", 30)
+        sss.append_snapshot("isbn1", 30, None, [9.0])
+        assert sss.entry_summary("isbn1")["buckets"] == 1
+
+
+def test_legacy_json_migrated_on_first_access():
+    now = time.time()
+    path = sss._isbn_path("isbn1")
+    path.write_text(json.dumps({"isbn": "isbn1", "entries": [
+        {"ts": now - 10 * 86400, "days": 30, "cond": "used", "totals": [10.0, 12.0]},
+        {"ts": now - 86400, "days": 30, "cond": "used", "totals": [14.0]},
+    ]}))
+    assert sss.query_window("isbn1", 365, "used") == [10.0, 12.0, 14.0]
+    assert not path.exists()
+    assert sss.snapshot_span_days("isbn1", "used") == 9.0
+    assert sss.entry_summary("isbn1")["by_window"] == {"30d_used": 2}
+
+
+class TestPercentiles:
+    def test_describe_single_pass(self):
+        from app.core.quantile_sketch import describe
+        assert describe([]) is None
+        d = describe(v for v in [3.0, 1.0, 2.0, 4.0])
+        assert (d["count"], d["min"], d["max"], d["avg"], d["p50"]) == (4, 1.0, 4.0, 2.5, 2.5)
+
+    def test_window_materialized_until_next_append(self, monkeypatch):
+        monkeypatch.setattr(sss, "_THROTTLE_SECONDS", 0)
+        sss.append_snapshot("isbn1", 90, "used", [10.0, 20.0, 30.0])
+        first = sss.window_stats("isbn1", 365, "used")
+        assert (first["p10"], first["p50"], first["p90"]) == (10.0, 20.0, 30.0)
+
+        real_rows = sss._window_rows
+        monkeypatch.setattr(sss, "_window_rows", lambda *a: (_ for _ in ()).throw(AssertionError("bucket scan")))
+        assert sss.window_stats("isbn1", 365, "used") == first            # tek satır okuma
+        assert sss.window_sketch("isbn1", 365, "used").count == 3
+
+        monkeypatch.setattr(sss, "_window_rows", real_rows)
+        sss.append_snapshot("isbn1", 90, "used", [40.0])                  # cache geçersiz
+        assert sss.window_stats("isbn1", 365, "used")["count"] == 4
+
+    def test_distribution_prefers_items_then_accumulator(self):
+        from app import sold_items_store as sis
+        sss.append_snapshot("isbn1", 90, None, [50.0])
+        assert sis.distribution("isbn1", 365)["source"] == "accumulator"
+        sis.ingest("isbn1", [{"item_id": "1", "price": 10.0}, {"item_id": "2", "price": 12.0}], "finding")
+        d = sis.distribution("isbn1", 365)
+        assert d["source"] == "items" and d["p50"] == 11.0
+        assert sis.distribution("isbn2", 365) == {**sis.window_stats("isbn2", 365), "source": None}
+
+
+def test_scanner_volatility_tier():
+    from app.csv_arb_scanner import _volatility_tier
+    assert _volatility_tier({"count": 2, "p10": 10.0, "p90": 40.0}) == ""
+    assert _volatility_tier({"count": 9, "p10": 10.0, "p90": 12.0}) == "LOW"
+    assert _volatility_tier({"count": 9, "p10": 10.0, "p90": 20.0}) == "MEDIUM"
+    assert _volatility_tier({"count": 9, "p10": 10.0, "p90": 40.0}) == "HIGH"
@@ -0,0 +1,111 @@
+"""
+Suggested price materialize testleri: store sıralaması (hesaplanmamış → watchlist → en
+eski), endpoint'in store'dan okuması, materializer'ın Finding bütçesine uyması.
+"""
+from __future__ import annotations
+
+import time
+
+import pytest
+
+from app import finding_cache, isbn_store, suggested_price_endpoint, suggested_price_materializer
+from app import suggested_price_store as store
+
+A, B, C, D = "9780000000001", "9780000000002", "9780000000003", "9780000000004"
+DAY = 86400
+
+
+def test_due_orders_uncomputed_then_watched_then_oldest():
+    now = 100 * DAY
+    store.sync_watchlist([A, B, C])
+    store.mark_requested(D, now=now - DAY)
+    store.put(A, {"isbn": A}, now=now - 3 * DAY)
+    store.put(B, {"isbn": B}, now=now - 2 * DAY)
+    store.put(D, {"isbn": D}, now=now - 5 * DAY)
+    assert store.due(10, DAY, now=now) == [C, A, B, D]
+    assert store.due(2, DAY, now=now) == [C, A]
+
+    store.sync_watchlist([A])                       # B/C watchlist'ten çıktı, hiç istenmedi
+    assert store.due(10, DAY, now=now) == [A, D]
+    assert store.due(10, 4 * DAY, now=now) == [D]   # A yeterince taze
+
+
+def test_get_put_invalidate_and_stats():
+    assert store.get(A) is None
+    store.mark_requested(A, now=1000)
+    assert store.get(A) is None                     # satır var, sonuç yok
+    store.put(A, {"ok": True, "used": {"suggested": 12}}, now=2000)
+    row = store.get(A)
+    assert row["computed_at"] == 2000 and row["data"]["used"]["suggested"] == 12
+    assert store.stats(DAY, now=2000 + DAY // 2)["computed"] == 1
+
+    assert store.get(A, max_age_s=DAY, now=2000 + DAY) is not None
+    assert store.get(A, max_age_s=DAY, now=2001 + DAY) is None     # bayat → miss
+
+    assert store.invalidate(A) is True and store.get(A) is None
+    assert store.invalidate(A) is False
+    assert store.due(10, DAY, now=2000) == [A]      # talep kaydı korunur
+
+
+def _fake_compute(calls_per_isbn, seen):
+    async def _compute(client, isbn, force=False):
+        seen.append((isbn, force))
+        return {"ok": True, "isbn": isbn, "new": None, "used": {"suggested": 10}}, calls_per_isbn
+    return _compute
+
+
+async def test_endpoint_reads_store_and_computes_on_miss(monkeypatch):
+    seen = []
+    monkeypatch.setattr(suggested_price_endpoint, "compute", _fake_compute(1, seen))
+    first = await suggested_price_endpoint.get_suggested_price(A, force_refresh=False)
+    assert first["cached"] is False and seen == [(A, False)]
+
+    second = await suggested_price_endpoint.get_suggested_price(A, force_refresh=False)
+    assert second["cached"] is True and second["used"]["suggested"] == 10
+    assert len(seen) == 1                           # saf okuma — hesaplama yok
+
+    await suggested_price_endpoint.get_suggested_price(A, force_refresh=True)
+    assert seen[-1] == (A, True)
+    assert store.due(10, 0, now=int(time.time()) + 1) == [A]   # panel talebi → materializer kapsamında
+
+
+async def test_endpoint_recomputes_stale_row_and_touches_hits(monkeypatch):
+    from app.core.config import get_settings
+    seen = []
+    monkeypatch.setattr(suggested_price_endpoint, "compute", _fake_compute(1, seen))
+    max_age = int(get_settings().sgprice_materialize_max_age_s)
+    now = int(time.time())
+
+    store.put(A, {"ok": True, "isbn": A, "used": {"suggested": 7}}, now=now - max_age)
+    hit = await suggested_price_endpoint.get_suggested_price(A, force_refresh=False)
+    assert hit["cached"] is True and seen == []
+    assert store.get(A)["requested_at"] >= now       # hit → materializer kapsamına alındı
+
+    store.put(B, {"ok": True, "isbn": B, "used": {"suggested": 7}},
+              now=now - max_age * suggested_price_endpoint._STALE_FACTOR - 1)
+    fresh = await suggested_price_endpoint.get_suggested_price(B, force_refresh=False)
+    assert fresh["cached"] is False and seen == [(B, False)]
+    assert fresh["used"]["suggested"] == 10
+
+
+async def test_materializer_respects_budget_and_backoff(monkeypatch):
+    seen = []
+    monkeypatch.setattr(suggested_price_endpoint, "compute", _fake_compute(2, seen))
+    monkeypatch.setattr(isbn_store, "list_isbns", lambda: [A, B, C, D])
+
+    stats = await suggested_price_materializer.run_once(budget=3)
+    assert stats["computed"] == 2 and stats["finding_calls"] == 4
+    assert [i for i, _ in seen] == [A, B]           # hepsi hesaplanmamış → rowid sırası
+    assert store.get(A) is not None and store.get(C) is None
+
+    stats = await suggested_price_materializer.run_once(budget=10)
+    assert stats["due"] == 2 and {i for i, _ in seen[2:]} == {C, D}
+
+    monkeypatch.setattr(finding_cache, "is_rate_limited", lambda: True)
+    assert (await suggested_price_materializer.run_once(budget=10))["skipped"] == "finding_backoff"
+    assert suggested_price_materializer.status()["store"]["computed"] == 4
+
+
+@pytest.mark.parametrize("daily,interval,expected", [(2500, 900, 27), (10, 60, 1), (0, 900, 1)])
+def test_run_budget(daily, interval, expected):
+    assert suggested_price_materializer._run_budget(daily, interval) == expected